@@ -0,0 +1,294 @@
+"""
+Agent热路径基准测试
+
+在合成数据上测量各环节的延迟分位数和吞吐：
+- stock_tools中的每个工具
+- SimpleRetriever.search
+- SimpleStockAgent.query（MockLLM）
+- 进程内ASGI客户端调用/chat（端到端）
+
+结果以JSON输出，便于在不同提交之间对比。
+
+用法：
+    python -m benchmarks.bench_hotpath --stocks 500 --years 5 --docs 10000 --output result.json
+"""
+
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, Dict, List, Any
+
+import numpy as np
+import yaml
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import TERMS, stock_names, generate_stocks, generate_knowledge_index
+from server.src.data.stock_loader import StockDataLoader, set_loader
+from server.src.rag.simple_retriever import SimpleRetriever, set_retriever
+
+
+CONFIG_PATH = "./server/configs/server_config.yaml"
+
+
+# ==================== 统计 ====================
+
+def summarize(latencies: List[float], elapsed: float) -> Dict[str, float]:
+    """延迟分位数（毫秒）和吞吐（次/秒）"""
+    values = np.array(latencies) * 1000
+
+    return {
+        "count": len(values),
+        "mean_ms": round(float(values.mean()), 3),
+        "p50_ms": round(float(np.percentile(values, 50)), 3),
+        "p95_ms": round(float(np.percentile(values, 95)), 3),
+        "p99_ms": round(float(np.percentile(values, 99)), 3),
+        "max_ms": round(float(values.max()), 3),
+        "throughput_per_second": round(len(values) / elapsed, 2) if elapsed else 0.0,
+    }
+
+
+def measure(func: Callable[[int], Any], iterations: int, warmup: int = 3) -> Dict[str, float]:
+    """顺序调用func(i) iterations次（先预热warmup次）"""
+    for i in range(warmup):
+        func(i)
+
+    latencies = []
+    start = time.perf_counter()
+
+    for i in range(iterations):
+        t = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - t)
+
+    return summarize(latencies, time.perf_counter() - start)
+
+
+@contextlib.contextmanager
+def quiet():
+    """屏蔽被测代码的打印输出"""
+    with contextlib.redirect_stdout(io.StringIO()):
+        yield
+
+
+# ==================== 准备 ====================
+
+def prepare_data(args: argparse.Namespace) -> Path:
+    """准备合成数据（目录中已有数据时直接复用）"""
+    data_dir = Path(args.data_dir) if args.data_dir else Path(tempfile.mkdtemp(prefix="bench_"))
+    stocks_dir = data_dir / "stocks"
+    index_path = data_dir / "knowledge_index.json"
+
+    if len(list(stocks_dir.glob("*.parquet"))) != args.stocks:
+        print(f"生成合成行情: {args.stocks}只 × {args.years}年 -> {stocks_dir}", file=sys.stderr)
+        for path in stocks_dir.glob("*.parquet"):
+            path.unlink()
+        generate_stocks(stocks_dir, args.stocks, args.years, args.seed)
+
+    if not index_path.exists() or len(json.loads(index_path.read_text(encoding='utf-8'))) != args.docs:
+        print(f"生成合成知识库: {args.docs}条 -> {index_path}", file=sys.stderr)
+        generate_knowledge_index(index_path, args.docs, args.seed)
+
+    return data_dir
+
+
+def write_config(data_dir: Path, args: argparse.Namespace) -> str:
+    """基于服务端配置生成测试配置（强制MockLLM，按参数开关缓存）"""
+    with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+        config = yaml.safe_load(f)
+
+    config['model']['mock_mode'] = True
+    config['model'].setdefault('batching', {})['enabled'] = False
+    config['cache']['enabled'] = False
+    config['cache']['local_enabled'] = args.cache
+
+    path = data_dir / "bench_config.yaml"
+    with open(path, 'w', encoding='utf-8') as f:
+        yaml.safe_dump(config, f, allow_unicode=True)
+
+    return str(path)
+
+
+def git_commit() -> str:
+    """当前提交（不在git仓库中时返回unknown）"""
+    try:
+        return subprocess.check_output(["git", "rev-parse", "--short", "HEAD"], text=True).strip()
+    except Exception:
+        return "unknown"
+
+
+# ==================== 各环节 ====================
+
+def bench_tools(names: List[str], iterations: int, rng: random.Random) -> Dict[str, Dict]:
+    """逐个工具测量"""
+    from server.src.tools.stock_tools import get_all_tools
+
+    arguments = {
+        "get_stock_price": lambda i: {"stock": rng.choice(names)},
+        "get_technical_indicators": lambda i: {"stock": rng.choice(names)},
+        "get_stock_history": lambda i: {"stock": rng.choice(names), "days": 10},
+        "compare_stocks": lambda i: {"stocks": rng.sample(names, min(3, len(names)))},
+        "analyze_stock": lambda i: {"stock": rng.choice(names)},
+        "screen_stocks": lambda i: [
+            {"condition": "rsi < 30", "sort_by": "rsi", "ascending": True},
+            {"condition": "close > ma20 and macd > 0", "sort_by": "change_20d"},
+            {"condition": "", "sort_by": "change_pct"},
+        ][i % 3],
+    }
+
+    results = {}
+
+    for tool in get_all_tools():
+        make_args = arguments.get(tool.name)
+        if make_args is None:
+            continue
+
+        # 首次调用包含面板加载和指标预计算，单独记录；计时包含渲染为文本
+        start = time.perf_counter()
+        str(tool.func(**make_args(0)))
+        first_call_ms = (time.perf_counter() - start) * 1000
+
+        stats = measure(lambda i: str(tool.func(**make_args(i))), iterations)
+        stats["first_call_ms"] = round(first_call_ms, 3)
+        results[tool.name] = stats
+
+    return results
+
+
+def bench_retriever(retriever: SimpleRetriever, iterations: int) -> Dict:
+    """知识库检索"""
+    queries = [f"{term}是什么意思" for term in TERMS]
+    return measure(lambda i: retriever.search(queries[i % len(queries)], top_k=3), iterations)
+
+
+def agent_queries(names: List[str], rng: random.Random, count: int) -> List[str]:
+    """覆盖各条路由的查询"""
+    templates = [
+        lambda: f"{rng.choice(names)}现在的股价是多少",
+        lambda: f"{rng.choice(names)}的技术指标怎么样",
+        lambda: f"{rng.choice(names)}最近10天走势",
+        lambda: f"对比一下{rng.choice(names)}和{rng.choice(names)}",
+        lambda: f"分析一下{rng.choice(names)}",
+        lambda: f"什么是{rng.choice(TERMS)}",
+        lambda: "RSI低于30的股票有哪些",
+    ]
+    return [templates[i % len(templates)]() for i in range(count)]
+
+
+def bench_agent(agent, queries: List[str]) -> Dict:
+    """Agent.query（MockLLM）"""
+    with quiet():
+        return measure(lambda i: agent.query(queries[i % len(queries)]), len(queries))
+
+
+async def bench_chat(queries: List[str], concurrency: int) -> Dict:
+    """进程内ASGI客户端调用/chat"""
+    import httpx
+    from server.src.api import main as api
+
+    with quiet():
+        await api.startup_event()
+
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    status: Dict[str, int] = {}
+
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench") as client:
+        async def request(query: str):
+            async with semaphore:
+                t = time.perf_counter()
+                response = await client.post("/chat", json={"query": query}, timeout=120)
+                latencies.append(time.perf_counter() - t)
+                status[str(response.status_code)] = status.get(str(response.status_code), 0) + 1
+
+        with quiet():
+            start = time.perf_counter()
+            await asyncio.gather(*(request(query) for query in queries))
+            elapsed = time.perf_counter() - start
+
+    api.scheduler.shutdown()
+
+    stats = summarize(latencies, elapsed)
+    stats["concurrency"] = concurrency
+    stats["status"] = status
+
+    return stats
+
+
+# ==================== 入口 ====================
+
+def main():
+    parser = argparse.ArgumentParser(description="Agent热路径基准测试")
+    parser.add_argument("--stocks", type=int, default=500, help="合成股票数")
+    parser.add_argument("--years", type=int, default=5, help="每只股票的年数")
+    parser.add_argument("--docs", type=int, default=10000, help="合成知识库文档数")
+    parser.add_argument("--data-dir", default=None, help="合成数据目录（默认使用临时目录）")
+    parser.add_argument("--iterations", type=int, default=200, help="每个工具/检索的调用次数")
+    parser.add_argument("--agent-queries", type=int, default=100, help="Agent.query的调用次数")
+    parser.add_argument("--chat-requests", type=int, default=100, help="/chat请求数")
+    parser.add_argument("--concurrency", type=int, default=8, help="/chat并发数")
+    parser.add_argument("--cache", action="store_true", help="启用进程内响应缓存")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--output", default=None, help="结果JSON文件（默认输出到标准输出）")
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    data_dir = prepare_data(args)
+    config_path = write_config(data_dir, args)
+    names = [key.rsplit("_", 1)[0] for key in stock_names(args.stocks)]
+
+    report: Dict[str, Any] = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "params": {k: v for k, v in vars(args).items() if k not in ("output", "data_dir")},
+        },
+        "startup": {},
+    }
+
+    with quiet():
+        start = time.perf_counter()
+        loader = StockDataLoader(str(data_dir / "stocks"))
+        loader.get_panel()
+        report["startup"]["panel_load_seconds"] = round(time.perf_counter() - start, 3)
+        set_loader(loader)
+
+        start = time.perf_counter()
+        retriever = SimpleRetriever(str(data_dir / "knowledge_index.json"))
+        report["startup"]["retriever_load_seconds"] = round(time.perf_counter() - start, 3)
+        set_retriever(retriever)
+
+        report["tools"] = bench_tools(names, args.iterations, rng)
+
+    report["retriever"] = bench_retriever(retriever, args.iterations)
+
+    from server.src.agent.stock_agent import get_agent
+    with quiet():
+        agent = get_agent(config_path)
+
+    report["agent_query"] = bench_agent(agent, agent_queries(names, rng, args.agent_queries))
+    report["chat"] = asyncio.run(bench_chat(agent_queries(names, rng, args.chat_requests), args.concurrency))
+
+    output = json.dumps(report, ensure_ascii=False, indent=2)
+
+    if args.output:
+        Path(args.output).write_text(output, encoding='utf-8')
+        print(f"结果已保存到 {args.output}", file=sys.stderr)
+    else:
+        print(output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,105 @@
+"""
+批量推理基准测试
+
+用MockLLM的延迟模拟后端对比逐条推理（max_batch_size=1）和连续批处理
+在不同并发数下的吞吐（tokens/s）与单请求延迟。
+
+用法：
+    python -m benchmarks.bench_llm_batching --concurrency 1 4 8 16 --requests 64
+"""
+
+import argparse
+import json
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, List
+
+import numpy as np
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.llm.base import LLMConfig
+from server.src.llm.mock_llm import MockLLM
+from server.src.llm.batching import BatchingLLM, MockBatchBackend
+
+
+PROMPTS = [
+    "比亚迪现在的股价是多少？",
+    "贵州茅台最近表现怎么样？",
+    "什么是MACD指标？",
+    "请分析一下宁德时代",
+    "你好",
+]
+
+
+def run(
+    max_batch_size: int,
+    concurrency: int,
+    num_requests: int,
+    args: argparse.Namespace
+) -> Dict:
+    """以固定并发数提交请求，返回吞吐和延迟统计"""
+    inner = MockLLM(LLMConfig(mock_mode=True))
+    backend = MockBatchBackend(
+        inner,
+        step_latency=args.step_ms / 1000,
+        per_sequence_latency=args.per_sequence_ms / 1000,
+        prefill_latency=args.prefill_ms / 1000
+    )
+    llm = BatchingLLM(inner, backend=backend, max_batch_size=max_batch_size, batch_window_ms=args.window_ms)
+
+    latencies: List[float] = []
+
+    def request(i: int):
+        start = time.perf_counter()
+        llm.generate_sync(PROMPTS[i % len(PROMPTS)], max_length=args.max_chars)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(request, range(num_requests)))
+    elapsed = time.perf_counter() - start
+
+    stats = llm.engine.stats()
+    llm.engine.close()
+
+    latencies = np.array(latencies)
+
+    return {
+        "tokens_per_second": round(stats["tokens"] / elapsed, 1),
+        "requests_per_second": round(num_requests / elapsed, 2),
+        "avg_batch_size": stats["avg_batch_size"],
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="批量推理基准测试")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 8, 16], help="并发数")
+    parser.add_argument("--requests", type=int, default=64, help="每组请求数")
+    parser.add_argument("--max-batch-size", type=int, default=16, help="批处理的最大批大小")
+    parser.add_argument("--max-chars", type=int, default=120, help="每个回答的最大长度")
+    parser.add_argument("--step-ms", type=float, default=20, help="每步解码的固定耗时")
+    parser.add_argument("--per-sequence-ms", type=float, default=1, help="每步解码中每个序列的额外耗时")
+    parser.add_argument("--prefill-ms", type=float, default=50, help="prefill的固定耗时")
+    parser.add_argument("--window-ms", type=float, default=10, help="收集同批请求的等待时间")
+    args = parser.parse_args()
+
+    report = {"requests": args.requests, "max_batch_size": args.max_batch_size, "results": []}
+
+    for concurrency in args.concurrency:
+        report["results"].append({
+            "concurrency": concurrency,
+            "sequential": run(1, concurrency, args.requests, args),
+            "batched": run(args.max_batch_size, concurrency, args.requests, args),
+        })
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,185 @@
+"""
+知识库检索基准测试
+
+对比旧版逐文档关键词打分和倒排索引 + BM25检索的召回率与延迟。
+知识库会被复制到指定的文档数（默认10万条），每条副本都视为原文档的等价物。
+
+用法：
+    python -m benchmarks.bench_retriever --docs 100000 --top-k 3
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Set, Tuple, Callable
+
+import numpy as np
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.rag.inverted_index import InvertedIndex
+
+
+# ==================== 旧版打分（对照组） ====================
+
+def legacy_search(index: List[Dict], query: str, top_k: int = 3, min_score: float = 0.0) -> List[int]:
+    """旧版SimpleRetriever.search的打分逻辑（逐文档扫描）"""
+    query_lower = query.lower()
+    query_words = set(query_lower.split())
+    
+    results = []
+    
+    for doc_id, doc in enumerate(index):
+        score = 0.0
+        content = doc.get('content', '').lower()
+        title = doc.get('title', '').lower()
+        keywords = doc.get('keywords', [])
+        
+        if query_lower in content or query_lower in title:
+            score += 10.0
+        
+        for kw in keywords:
+            if kw.lower() in query_lower:
+                score += 5.0
+            if kw.lower() in query_words:
+                score += 3.0
+        
+        content_words = set(content.split())
+        title_words = set(title.split())
+        
+        common_words = query_words & (content_words | title_words)
+        score += len(common_words) * 0.5
+        
+        if score > min_score:
+            results.append((score, doc_id))
+    
+    results.sort(key=lambda x: x[0], reverse=True)
+    
+    return [doc_id for _, doc_id in results[:top_k]]
+
+
+# ==================== 数据与查询 ====================
+
+def replicate(docs: List[Dict], num_docs: int) -> Tuple[List[Dict], np.ndarray]:
+    """把知识库复制到num_docs条，返回复制后的文档和每条对应的原文档编号"""
+    origin = np.arange(num_docs) % len(docs)
+    return [docs[i] for i in origin], origin
+
+
+def build_queries(docs: List[Dict], per_doc: int = 3) -> List[Tuple[str, Set[int]]]:
+    """
+    由文档关键词构造查询
+
+    查询形如“XX是什么意思”，相关文档为正文中包含该关键词的所有原文档
+    """
+    queries = []
+    seen = set()
+    
+    for doc in docs:
+        for keyword in doc.get('keywords', [])[:per_doc]:
+            if keyword in seen:
+                continue
+            seen.add(keyword)
+            
+            relevant = {i for i, d in enumerate(docs) if keyword in d.get('content', '')}
+            if relevant:
+                queries.append((f"{keyword}是什么意思", relevant))
+    
+    return queries
+
+
+def evaluate(
+    search: Callable[[str], List[int]],
+    queries: List[Tuple[str, Set[int]]],
+    origin: np.ndarray,
+    top_k: int
+) -> Dict:
+    """计算召回率和延迟分位数"""
+    latencies = []
+    recalls = []
+    
+    for query, relevant in queries:
+        start = time.perf_counter()
+        hits = search(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+        
+        found = {int(origin[doc_id]) for doc_id in hits}
+        recalls.append(len(found & relevant) / min(top_k, len(relevant)))
+    
+    latencies = np.array(latencies)
+    
+    return {
+        "recall_at_k": round(float(np.mean(recalls)), 4),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 3),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 3),
+        "p99_ms": round(float(np.percentile(latencies, 99)), 3),
+        "mean_ms": round(float(latencies.mean()), 3),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="知识库检索基准测试")
+    parser.add_argument("--index", default="./data/knowledge_index.json", help="知识库索引文件")
+    parser.add_argument("--docs", type=int, default=100000, help="复制后的文档数")
+    parser.add_argument("--top-k", type=int, default=3, help="返回结果数")
+    parser.add_argument("--legacy-queries", type=int, default=20, help="旧版打分只跑前N条查询（太慢）")
+    args = parser.parse_args()
+    
+    with open(args.index, 'r', encoding='utf-8') as f:
+        base_docs = json.load(f)
+    
+    docs, origin = replicate(base_docs, args.docs)
+    queries = build_queries(base_docs)
+    
+    start = time.perf_counter()
+    inverted_index = InvertedIndex.build(docs)
+    build_seconds = time.perf_counter() - start
+    
+    top_k = args.top_k
+    copies = args.docs // len(base_docs) + 1
+    
+    def dedup(hits: List[int]) -> List[int]:
+        """按原文档去重后取前K（副本之间分数相同，不去重时前K可能全是同一文档）"""
+        unique, result = set(), []
+        for doc_id in hits:
+            if origin[doc_id] not in unique:
+                unique.add(origin[doc_id])
+                result.append(doc_id)
+            if len(result) == top_k:
+                break
+        return result
+    
+    def bm25_search(query: str) -> List[int]:
+        return dedup([doc_id for doc_id, _ in inverted_index.search(query, top_k=top_k * copies)])
+    
+    def bm25_raw_search(query: str) -> List[int]:
+        return [doc_id for doc_id, _ in inverted_index.search(query, top_k=top_k)]
+    
+    def legacy(query: str) -> List[int]:
+        return dedup(legacy_search(docs, query, top_k=top_k * copies))
+    
+    # 旧版打分太慢，只在前N条查询上对比
+    sample = queries[:args.legacy_queries]
+    
+    report = {
+        "docs": args.docs,
+        "queries": len(queries),
+        "top_k": top_k,
+        "bm25_build_seconds": round(build_seconds, 3),
+        "bm25_all_queries": evaluate(bm25_raw_search, queries, origin, top_k),
+        "comparison": {
+            "queries": len(sample),
+            "legacy": evaluate(legacy, sample, origin, top_k),
+            "bm25": evaluate(bm25_search, sample, origin, top_k),
+            "bm25_raw": evaluate(bm25_raw_search, sample, origin, top_k),
+        },
+    }
+    
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,93 @@
+"""
+冷启动基准测试
+
+在不同规模的合成数据上对比行情数据的加载耗时：
+- before：逐个文件完整读取parquet（旧版首次查询每只股票时的路径）
+- sequential：单线程读取parquet并构建面板
+- prewarm_cold：预热阶段并行读取parquet，构建面板并写入合并的列存储
+- prewarm_warm：再次启动时直接映射列存储（零拷贝）
+
+注意：合成文件刚写入，处于操作系统页缓存中，测得的是不含磁盘IO的解码/转换耗时。
+
+用法：
+    python -m benchmarks.bench_startup --stocks 50 500 5000 --years 3
+"""
+
+import argparse
+import json
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict
+
+import pandas as pd
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import generate_stocks
+from server.src.data.stock_loader import StockDataLoader
+from server.src.data.panel_store import StockPanel
+
+
+def timed(func) -> float:
+    """执行func并返回耗时（秒）"""
+    start = time.perf_counter()
+    func()
+    return round(time.perf_counter() - start, 4)
+
+
+def run(data_dir: Path) -> Dict[str, float]:
+    """对一个数据目录测量各种加载方式"""
+    files = sorted(data_dir.glob("*.parquet"))
+    store_dir = data_dir / ".panel"
+    shutil.rmtree(store_dir, ignore_errors=True)
+
+    result = {
+        "before": timed(lambda: [pd.read_parquet(path) for path in files]),
+        "sequential": timed(lambda: StockPanel.from_files(files, max_workers=1)),
+        "parallel": timed(lambda: StockPanel.from_files(files)),
+        "prewarm_cold": timed(lambda: StockDataLoader(str(data_dir)).prewarm()),
+    }
+
+    def warm_start():
+        loader = StockDataLoader(str(data_dir))
+        panel = loader.prewarm()
+        assert panel.mapped
+        # 每只股票的首次查询
+        for sid in range(len(panel)):
+            panel.latest(sid)
+
+    result["prewarm_warm"] = timed(warm_start)
+    result["store_mb"] = round(sum(f.stat().st_size for f in store_dir.iterdir()) / 1024 ** 2, 2)
+
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="冷启动基准测试")
+    parser.add_argument("--stocks", type=int, nargs="+", default=[50, 500, 5000], help="股票数")
+    parser.add_argument("--years", type=int, default=3, help="每只股票的年数")
+    parser.add_argument("--data-dir", default=None, help="合成数据目录（默认使用临时目录）")
+    args = parser.parse_args()
+
+    base_dir = Path(args.data_dir) if args.data_dir else Path(tempfile.mkdtemp(prefix="bench_startup_"))
+    report = {"years": args.years, "results": []}
+
+    for num_stocks in args.stocks:
+        data_dir = base_dir / f"stocks_{num_stocks}"
+
+        if len(list(data_dir.glob("*.parquet"))) != num_stocks:
+            print(f"生成合成行情: {num_stocks}只 × {args.years}年", file=sys.stderr)
+            shutil.rmtree(data_dir, ignore_errors=True)
+            generate_stocks(data_dir, num_stocks, args.years)
+
+        report["results"].append(dict(stocks=num_stocks, **run(data_dir)))
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
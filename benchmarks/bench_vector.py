@@ -0,0 +1,113 @@
+"""
+向量检索基准测试
+
+在合成知识库上对比IVF近似检索与暴力检索：召回率（recall@k，以暴力检索结果为准）和延迟，
+并对比逐条与批量查询向量化的吞吐。默认使用哈希向量，不需要模型文件。
+
+用法：
+    python -m benchmarks.bench_vector --docs 100000 --top-k 5 --nprobe 1 8 32 64 128
+"""
+
+import argparse
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict
+
+import numpy as np
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from benchmarks.synthetic import TERMS, generate_knowledge_index
+from server.src.rag.ann_index import IVFIndex, recall_at_k
+from server.src.rag.embeddings import create_embedder
+from server.src.rag.vector_retriever import document_text
+
+
+def build_queries(num_queries: int, seed: int = 0) -> List[str]:
+    """由金融词汇组合构造查询"""
+    rng = np.random.default_rng(seed)
+    templates = ["什么是{a}", "{a}和{b}有什么关系", "{a}偏高时怎么看{b}", "如何结合{a}判断{b}"]
+
+    return [
+        templates[i % len(templates)].format(a=a, b=b)
+        for i, (a, b) in enumerate(rng.choice(TERMS, size=(num_queries, 2)))
+    ]
+
+
+def timed(func, *args) -> tuple:
+    start = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description="向量检索基准测试")
+    parser.add_argument("--docs", type=int, default=100000, help="合成文档数")
+    parser.add_argument("--queries", type=int, default=200, help="查询数")
+    parser.add_argument("--top-k", type=int, default=5, help="返回结果数")
+    parser.add_argument("--nlist", type=int, default=None, help="IVF簇数（默认自动）")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 8, 16, 32], help="扫描的簇数")
+    parser.add_argument("--model", default="hashing", help="向量模型（hashing或sentence-transformers模型）")
+    parser.add_argument("--dim", type=int, default=512, help="哈希向量维度")
+    parser.add_argument("--out", default="./bench_data/bench_vector_docs.json", help="合成知识库文件")
+    args = parser.parse_args()
+
+    docs = generate_knowledge_index(Path(args.out), args.docs)
+    queries = build_queries(args.queries)
+    embedder = create_embedder({"embedding_model": args.model, "embedding_dim": args.dim})
+
+    doc_vectors, embed_seconds = timed(embedder.embed_documents, [document_text(doc) for doc in docs])
+    index, build_seconds = timed(IVFIndex.build, doc_vectors, args.nlist)
+
+    # 查询向量化：逐条 vs 一次批量
+    _, single_seconds = timed(lambda: [embedder.embed_queries([q]) for q in queries])
+    query_vectors, batch_seconds = timed(embedder.embed_queries, queries)
+
+    exact_ids, exact_seconds = timed(lambda: np.concatenate([
+        index.exact_search(vector[None, :], args.top_k)[0] for vector in query_vectors
+    ]))
+
+    report: Dict = {
+        "docs": args.docs,
+        "queries": len(queries),
+        "top_k": args.top_k,
+        "embedder": embedder.name,
+        "dim": embedder.dim,
+        "nlist": index.nlist,
+        "embed_docs_seconds": round(embed_seconds, 3),
+        "build_seconds": round(build_seconds, 3),
+        "query_embedding": {
+            "single_ms_per_query": round(single_seconds / len(queries) * 1000, 4),
+            "batch_ms_per_query": round(batch_seconds / len(queries) * 1000, 4),
+        },
+        "exact_ms_per_query": round(exact_seconds / len(queries) * 1000, 4),
+        "ivf": [],
+    }
+
+    for nprobe in args.nprobe:
+        # 逐条查询计时（服务端每次请求一个查询）
+        latencies = []
+        approx_ids = []
+        for vector in query_vectors:
+            start = time.perf_counter()
+            ids, _ = index.search(vector[None, :], args.top_k, nprobe)
+            latencies.append((time.perf_counter() - start) * 1000)
+            approx_ids.append(ids[0])
+
+        latencies = np.array(latencies)
+        report["ivf"].append({
+            "nprobe": min(nprobe, index.nlist),
+            "recall_at_k": round(recall_at_k(np.array(approx_ids), exact_ids), 4),
+            "p50_ms": round(float(np.percentile(latencies, 50)), 4),
+            "p95_ms": round(float(np.percentile(latencies, 95)), 4),
+            "mean_ms": round(float(latencies.mean()), 4),
+        })
+
+    print(json.dumps(report, ensure_ascii=False, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+"""
+基准测试用的合成数据
+
+- 股票行情：N只股票 × M年的日线数据，字段与data/stocks下的parquet文件一致
+- 知识库索引：指定条数的文档，字段与data/knowledge_index.json一致
+
+用法：
+    python -m benchmarks.synthetic --stocks 500 --years 5 --docs 10000 --out ./bench_data
+"""
+
+import argparse
+import json
+from pathlib import Path
+from typing import List, Dict
+
+import numpy as np
+import pandas as pd
+
+
+# 合成文档使用的金融词汇
+TERMS = [
+    "市盈率", "市净率", "净资产收益率", "毛利率", "净利率", "资产负债率", "现金流", "分红",
+    "均线", "MACD", "RSI", "KDJ", "布林带", "成交量", "换手率", "量比", "支撑位", "压力位",
+    "金叉", "死叉", "超买", "超卖", "背离", "突破", "回调", "止损", "止盈", "仓位",
+    "北向资金", "融资融券", "涨停", "跌停", "科创板", "创业板", "主板", "可转债", "ETF", "基金",
+    "估值", "成长股", "价值股", "周期股", "蓝筹股", "龙头股", "题材", "板块轮动", "业绩预告", "财报",
+]
+
+SENTENCES = [
+    "{a}是衡量{b}的重要指标，通常需要结合{c}一起判断。",
+    "当{a}出现明显变化时，投资者应关注{b}和{c}的配合情况。",
+    "{a}与{b}之间存在一定关联，但不能单独作为买卖依据。",
+    "分析{a}时，可以参考历史区间内{b}的分布以及{c}的走势。",
+    "{a}偏高说明{b}可能承压，此时控制{c}尤为重要。",
+]
+
+
+def stock_names(num_stocks: int) -> List[str]:
+    """合成股票的文件名（股票名称_代码）"""
+    return [f"合成{i:05d}_{600000 + i:06d}" for i in range(num_stocks)]
+
+
+def generate_stocks(
+    out_dir: Path,
+    num_stocks: int = 500,
+    years: int = 5,
+    seed: int = 0
+) -> List[Path]:
+    """
+    生成合成行情数据
+
+    Args:
+        out_dir: 输出目录
+        num_stocks: 股票数
+        years: 年数（每年约244个交易日）
+        seed: 随机种子
+
+    Returns:
+        生成的parquet文件路径
+    """
+    out_dir.mkdir(parents=True, exist_ok=True)
+    rng = np.random.default_rng(seed)
+
+    num_days = years * 244
+    dates = pd.bdate_range(end="2025-12-31", periods=num_days).strftime("%Y-%m-%d")
+    paths = []
+
+    for key in stock_names(num_stocks):
+        name, code = key.rsplit("_", 1)
+
+        returns = rng.normal(0.0003, 0.02, num_days)
+        close = rng.uniform(5, 200) * np.exp(np.cumsum(returns))
+        prev_close = np.concatenate([[close[0]], close[:-1]])
+        open_ = prev_close * (1 + rng.normal(0, 0.005, num_days))
+        high = np.maximum(open_, close) * (1 + np.abs(rng.normal(0, 0.008, num_days)))
+        low = np.minimum(open_, close) * (1 - np.abs(rng.normal(0, 0.008, num_days)))
+        volume = rng.integers(10_000, 2_000_000, num_days)
+        change = close - prev_close
+
+        df = pd.DataFrame({
+            "date": dates,
+            "open": open_,
+            "close": close,
+            "high": high,
+            "low": low,
+            "volume": volume,
+            "amount": volume * close * 100,
+            "amplitude": (high - low) / prev_close * 100,
+            "change_pct": change / prev_close * 100,
+            "change": change,
+            "turnover": rng.uniform(0.1, 5.0, num_days),
+            "stock_name": name,
+            "stock_code": code,
+        })
+
+        path = out_dir / f"{key}.parquet"
+        df.to_parquet(path, index=False)
+        paths.append(path)
+
+    return paths
+
+
+def generate_knowledge_index(
+    path: Path,
+    num_docs: int = 10000,
+    seed: int = 0
+) -> List[Dict]:
+    """
+    生成合成知识库索引
+
+    Args:
+        path: 输出文件路径（.json）
+        num_docs: 文档数
+        seed: 随机种子
+
+    Returns:
+        文档列表
+    """
+    rng = np.random.default_rng(seed)
+    docs = []
+
+    for i in range(num_docs):
+        keywords = list(rng.choice(TERMS, size=int(rng.integers(3, 7)), replace=False))
+        sentences = []
+
+        for _ in range(int(rng.integers(4, 12))):
+            a, b, c = rng.choice(TERMS, size=3, replace=False)
+            sentences.append(SENTENCES[int(rng.integers(len(SENTENCES)))].format(a=a, b=b, c=c))
+
+        docs.append({
+            "content": f"# {keywords[0]}\n\n" + "".join(sentences),
+            "title": f"{keywords[0]}详解（{i}）",
+            "source": f"synthetic/doc_{i}.md",
+            "keywords": keywords,
+        })
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(docs, f, ensure_ascii=False)
+
+    return docs
+
+
+def main():
+    parser = argparse.ArgumentParser(description="生成基准测试用的合成数据")
+    parser.add_argument("--stocks", type=int, default=500, help="股票数")
+    parser.add_argument("--years", type=int, default=5, help="每只股票的年数")
+    parser.add_argument("--docs", type=int, default=10000, help="知识库文档数")
+    parser.add_argument("--seed", type=int, default=0, help="随机种子")
+    parser.add_argument("--out", default="./bench_data", help="输出目录")
+    args = parser.parse_args()
+
+    out = Path(args.out)
+    generate_stocks(out / "stocks", args.stocks, args.years, args.seed)
+    generate_knowledge_index(out / "knowledge_index.json", args.docs, args.seed)
+
+    print(f"已生成: {args.stocks}只股票 × {args.years}年, {args.docs}条知识库文档 -> {out}")
+
+
+if __name__ == "__main__":
+    main()
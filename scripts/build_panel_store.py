@@ -0,0 +1,38 @@
+"""
+构建行情数据的内存映射列存储
+
+把data/stocks下的parquet文件转换为每列一个.npy文件的目录（默认data/stocks/.panel），
+服务启动时StockDataLoader会直接以只读方式映射该目录，多个worker共享同一份物理内存。
+parquet文件有变化时存储自动失效，重新运行本脚本即可
+"""
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.stock_loader import StockDataLoader
+from server.src.data.panel_store import StockPanel
+
+
+def build_panel_store():
+    parser = argparse.ArgumentParser(description="构建行情数据的内存映射列存储")
+    parser.add_argument("--data-dir", default="./data/stocks", help="parquet文件目录")
+    parser.add_argument("--store-dir", default=None, help="存储目录（默认为数据目录下的.panel）")
+    args = parser.parse_args()
+    
+    loader = StockDataLoader(args.data_dir, args.store_dir)
+    
+    start = time.perf_counter()
+    store_dir = loader.build_store()
+    elapsed = time.perf_counter() - start
+    
+    panel = StockPanel.load(store_dir)
+    print(f"已生成: {store_dir}（{len(panel)}只股票，{panel.nbytes / 1024 ** 2:.1f} MB，耗时{elapsed:.2f}秒）")
+
+
+if __name__ == "__main__":
+    build_panel_store()
@@ -0,0 +1,103 @@
+"""
+批量问答（离线评估）
+
+从JSONL文件读取问题，每行为 {"query": "...", ...} 或一个JSON字符串，
+结果按完成顺序逐行写出，包含answer、route和各阶段耗时，并保留输入行的其他字段（如id）。
+
+默认在本进程内创建Agent处理；指定--url时提交给服务端的/chat/batch接口
+"""
+
+import argparse
+import contextlib
+import json
+import sys
+import time
+from pathlib import Path
+from typing import List, Dict, Iterator
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+
+def read_records(path: str) -> List[Dict]:
+    """读取输入文件（跳过空行）"""
+    records = []
+    
+    with open(path, 'r', encoding='utf-8') as f:
+        for line_no, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            
+            record = json.loads(line)
+            if isinstance(record, str):
+                record = {"query": record}
+            elif not isinstance(record, dict) or not isinstance(record.get("query"), str):
+                raise ValueError(f"第{line_no}行缺少query字段")
+            
+            records.append(record)
+    
+    return records
+
+
+def run_local(queries: List[str], config_path: str) -> Iterator[Dict]:
+    """在本进程内批量处理"""
+    from server.src.agent.stock_agent import SimpleStockAgent
+    
+    agent = SimpleStockAgent(config_path)
+    
+    for item in agent.chat_batch(queries):
+        yield item.to_dict()
+
+
+def run_remote(queries: List[str], url: str) -> Iterator[Dict]:
+    """提交给服务端的/chat/batch接口，逐行读取NDJSON结果"""
+    import httpx
+    
+    with httpx.Client(timeout=None) as client:
+        with client.stream("POST", url.rstrip("/") + "/chat/batch", json={"queries": queries}) as response:
+            response.raise_for_status()
+            for line in response.iter_lines():
+                if line:
+                    yield json.loads(line)
+
+
+def chat_batch():
+    parser = argparse.ArgumentParser(description="批量问答（JSONL输入，按完成顺序输出JSONL结果）")
+    parser.add_argument("--input", required=True, help="问题文件（JSONL）")
+    parser.add_argument("--output", default=None, help="结果文件（JSONL），默认输出到标准输出")
+    parser.add_argument("--config", default="./server/configs/server_config.yaml", help="服务端配置文件（本地模式）")
+    parser.add_argument("--url", default=None, help="服务地址，如http://localhost:8765（指定时不在本地创建Agent）")
+    args = parser.parse_args()
+    
+    records = read_records(args.input)
+    queries = [record["query"] for record in records]
+    
+    results = run_remote(queries, args.url) if args.url else run_local(queries, args.config)
+    
+    out = open(args.output, 'w', encoding='utf-8') if args.output else sys.stdout
+    start = time.perf_counter()
+    count = errors = duplicates = 0
+    
+    try:
+        # Agent的日志改为输出到标准错误，标准输出只有结果
+        with contextlib.redirect_stdout(sys.stderr):
+            for result in results:
+                # 保留输入行的其他字段（如id、期望答案）
+                extra = {k: v for k, v in records[result["index"]].items() if k != "query"}
+                out.write(json.dumps({**extra, **result}, ensure_ascii=False) + "\n")
+                out.flush()
+                
+                count += 1
+                errors += "error" in result
+                duplicates += "duplicate_of" in result
+    finally:
+        if out is not sys.stdout:
+            out.close()
+    
+    elapsed = time.perf_counter() - start
+    print(f"完成: {count}个问题（重复{duplicates}个），失败{errors}个，耗时{elapsed:.2f}秒", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    chat_batch()
@@ -1,222 +1,227 @@
 """
-股票数据下载脚本
+股票数据下载/增量更新脚本
 
-使用 akshare 下载50只热门A股的历史数据（2020-2024）
-数据保存为 parquet 格式，便于快速加载
+维护STOCK_LIST中的A股以及数据目录中已有股票的日线数据（akshare，前复权）：
+- 新股票：下载2020-01-01至今的全部历史
+- 已有股票：从最后一个交易日开始只拉取缺失的K线，按年追加到分区文件
+  （data/stocks/股票名称_代码/年份.parquet），历史文件不会被重写
+- 前复权价格发生变化（除权除息）时，该股票重新下载全部历史
+
+更新完成后可以通知运行中的服务刷新内存中的数据（--notify）
+
+用法：
+    python scripts/download_stock_data.py
+    python scripts/download_stock_data.py --notify http://localhost:8765
+    python scripts/download_stock_data.py --source local --source-dir ./bench_data/stocks
 """
 
+import argparse
 import sys
+import time
+from datetime import date
 from pathlib import Path
-from datetime import datetime, timedelta
+from typing import List, Tuple, Optional
+
+import yaml
 
 # 设置UTF-8编码（Windows兼容）
 if sys.platform == "win32":
     import codecs
     sys.stdout = codecs.getwriter("utf-8")(sys.stdout.detach())
 
-def download_stock_data():
-    """下载股票数据"""
-    try:
-        import akshare as ak
-        import pandas as pd
-    except ImportError:
-        print("❌ 请先安装 akshare 和 pandas:")
-        print("   pip install akshare pandas pyarrow")
-        sys.exit(1)
-    
-    # 保存目录
-    data_dir = Path(__file__).parent.parent / "data" / "stocks"
-    data_dir.mkdir(parents=True, exist_ok=True)
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.stock_loader import scan_stock_files
+from server.src.data.updater import StockUpdater, AkshareFetcher, LocalFetcher
+
+
+CONFIG_PATH = Path(__file__).parent.parent / "server" / "configs" / "server_config.yaml"
+
+DATA_DIR = Path(__file__).parent.parent / "data" / "stocks"
+
+# 50只热门A股
+STOCK_LIST = [
+    ("贵州茅台", "600519"),
+    ("比亚迪", "002594"),
+    ("宁德时代", "300750"),
+    ("中国平安", "601318"),
+    ("招商银行", "600036"),
+    ("五粮液", "000858"),
+    ("隆基绿能", "601012"),
+    ("药明康德", "603259"),
+    ("迈瑞医疗", "300760"),
+    ("京东方A", "000725"),
+    ("工商银行", "601398"),
+    ("建设银行", "601939"),
+    ("农业银行", "601288"),
+    ("中国银行", "601988"),
+    ("兴业银行", "601166"),
+    ("中信证券", "600030"),
+    ("华泰证券", "601688"),
+    ("海天味业", "603288"),
+    ("伊利股份", "600887"),
+    ("美的集团", "000333"),
+    ("格力电器", "000651"),
+    ("海康威视", "002415"),
+    ("立讯精密", "002475"),
+    ("恒瑞医药", "600276"),
+    ("长江电力", "600900"),
+    ("万科A", "000002"),
+    ("保利发展", "600048"),
+    ("中国石油", "601857"),
+    ("中国石化", "600028"),
+    ("中国神华", "601088"),
+    ("紫金矿业", "601899"),
+    ("山西汾酒", "600809"),
+    ("泸州老窖", "000568"),
+    ("洋河股份", "002304"),
+    ("古井贡酒", "000596"),
+    ("中国中免", "601888"),
+    ("三一重工", "600031"),
+    ("中联重科", "000157"),
+    ("徐工机械", "000425"),
+    ("上海机场", "600009"),
+    ("白云机场", "600004"),
+    ("顺丰控股", "002352"),
+    ("中通快递", "ZTO"),  # 美股
+    ("东方财富", "300059"),
+    ("同花顺", "300033"),
+    ("宝钢股份", "600019"),
+    ("华友钴业", "603799"),
+    ("赣锋锂业", "002460"),
+    ("天齐锂业", "002466"),
+    ("亿纬锂能", "300014"),
+]
+
+
+def select_stocks(data_dir: Path, only: Optional[List[str]] = None) -> List[Tuple[str, str]]:
+    """
+    要更新的股票：STOCK_LIST加上数据目录中已有的股票（跳过非A股）
     
-    # 50只热门A股
-    stocks = [
-        ("贵州茅台", "600519"),
-        ("比亚迪", "002594"),
-        ("宁德时代", "300750"),
-        ("中国平安", "601318"),
-        ("招商银行", "600036"),
-        ("五粮液", "000858"),
-        ("隆基绿能", "601012"),
-        ("药明康德", "603259"),
-        ("迈瑞医疗", "300760"),
-        ("京东方A", "000725"),
-        ("工商银行", "601398"),
-        ("建设银行", "601939"),
-        ("农业银行", "601288"),
-        ("中国银行", "601988"),
-        ("兴业银行", "601166"),
-        ("中信证券", "600030"),
-        ("华泰证券", "601688"),
-        ("海天味业", "603288"),
-        ("伊利股份", "600887"),
-        ("美的集团", "000333"),
-        ("格力电器", "000651"),
-        ("海康威视", "002415"),
-        ("立讯精密", "002475"),
-        ("恒瑞医药", "600276"),
-        ("长江电力", "600900"),
-        ("万科A", "000002"),
-        ("保利发展", "600048"),
-        ("中国石油", "601857"),
-        ("中国石化", "600028"),
-        ("中国神华", "601088"),
-        ("紫金矿业", "601899"),
-        ("山西汾酒", "600809"),
-        ("泸州老窖", "000568"),
-        ("洋河股份", "002304"),
-        ("古井贡酒", "000596"),
-        ("中国中免", "601888"),
-        ("三一重工", "600031"),
-        ("中联重科", "000157"),
-        ("徐工机械", "000425"),
-        ("上海机场", "600009"),
-        ("白云机场", "600004"),
-        ("顺丰控股", "002352"),
-        ("中通快递", "ZTO"),  # 美股
-        ("东方财富", "300059"),
-        ("同花顺", "300033"),
-        ("宝钢股份", "600019"),
-        ("华友钴业", "603799"),
-        ("赣锋锂业", "002460"),
-        ("天齐锂业", "002466"),
-        ("亿纬锂能", "300014"),
-    ]
+    Args:
+        data_dir: 数据目录
+        only: 只更新这些股票（名称或代码）
+    """
+    stocks = list(STOCK_LIST)
     
-    print("=" * 60)
-    print("[下载] 股票数据下载工具")
-    print("=" * 60)
-    print(f"[路径] 保存位置: {data_dir}")
-    print(f"[数量] 股票数量: {len(stocks)} 只")
-    print(f"[范围] 数据范围: 2020-01-01 至今")
-    print()
+    for key in scan_stock_files(data_dir):
+        stock = tuple(key.rsplit("_", 1))
+        if stock not in stocks:
+            stocks.append(stock)
     
-    # 日期范围
-    start_date = "20200101"
-    end_date = datetime.now().strftime("%Y%m%d")
+    if only:
+        stocks = [(name, code) for name, code in stocks if name in only or code in only]
     
-    success_count = 0
-    failed_stocks = []
-    
-    print("⏳ 开始下载数据...")
-    print()
+    return [(name, code) for name, code in stocks if code.isdigit()]
+
+
+def notify_server(url: str, stocks: List[str], token: Optional[str] = None) -> dict:
+    """
+    通知运行中的服务刷新指定股票
+    
+    Args:
+        url: 服务地址（如 http://localhost:8765）
+        stocks: 股票键列表
+        token: 管理令牌（服务端auth.enabled时需要）
+    """
+    import httpx
+    
+    headers = {"Authorization": f"Bearer {token}"} if token else {}
+    response = httpx.post(
+        f"{url.rstrip('/')}/admin/refresh",
+        json={"stocks": stocks},
+        headers=headers,
+        timeout=60
+    )
+    response.raise_for_status()
+    
+    return response.json()
+
+
+def default_token() -> Optional[str]:
+    """从服务端配置读取管理令牌"""
+    try:
+        with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
+            auth = yaml.safe_load(f).get('auth', {})
+    except OSError:
+        return None
     
-    for i, (name, code) in enumerate(stocks, 1):
-        print(f"[{i}/{len(stocks)}] {name} ({code})...", end=" ")
-        
+    return auth.get('token') if auth.get('enabled', False) else None
+
+
+def main():
+    """主函数"""
+    parser = argparse.ArgumentParser(description="股票数据下载/增量更新")
+    parser.add_argument("--data-dir", default=str(DATA_DIR), help="数据目录")
+    parser.add_argument("--source", choices=["akshare", "local"], default="akshare", help="数据源")
+    parser.add_argument("--source-dir", default=None, help="本地数据源目录（--source local时使用）")
+    parser.add_argument("--stocks", nargs="+", default=None, help="只更新这些股票（名称或代码）")
+    parser.add_argument("--workers", type=int, default=4, help="并发拉取的线程数")
+    parser.add_argument("--end", default=None, help="结束日期 YYYY-MM-DD（默认今天）")
+    parser.add_argument("--notify", default=None, help="更新后通知该地址的服务刷新数据")
+    parser.add_argument("--token", default=None, help="管理令牌（默认读取服务端配置）")
+    args = parser.parse_args()
+    
+    if args.source == "local":
+        if not args.source_dir:
+            parser.error("--source local 需要指定 --source-dir")
+        fetcher = LocalFetcher(args.source_dir)
+    else:
         try:
-            # 跳过美股（需要不同的API）
-            if not code.isdigit():
-                print("跳过 (非A股)")
-                continue
-            
-            # 下载数据
-            df = ak.stock_zh_a_hist(
-                symbol=code,
-                period="daily",
-                start_date=start_date,
-                end_date=end_date,
-                adjust="qfq"  # 前复权
-            )
-            
-            if df.empty:
-                print("[FAIL] 无数据")
-                failed_stocks.append(name)
-                continue
-            
-            # 重命名列为英文
-            df = df.rename(columns={
-                "日期": "date",
-                "开盘": "open",
-                "收盘": "close",
-                "最高": "high",
-                "最低": "low",
-                "成交量": "volume",
-                "成交额": "amount",
-                "振幅": "amplitude",
-                "涨跌幅": "change_pct",
-                "涨跌额": "change",
-                "换手率": "turnover"
-            })
-            
-            # 添加股票信息
-            df["stock_name"] = name
-            df["stock_code"] = code
-            
-            # 保存为parquet
-            file_path = data_dir / f"{name}_{code}.parquet"
-            df.to_parquet(file_path, index=False)
-            
-            print(f"[OK] {len(df)} 条记录")
-            success_count += 1
-            
-        except Exception as e:
-            print(f"[FAIL] 失败: {str(e)[:30]}")
-            failed_stocks.append(name)
+            fetcher = AkshareFetcher()
+        except ImportError as e:
+            print(f"[FAIL] {e}")
+            sys.exit(1)
+    
+    data_dir = Path(args.data_dir)
+    data_dir.mkdir(parents=True, exist_ok=True)
+    stocks = select_stocks(data_dir, args.stocks)
+    end = date.fromisoformat(args.end) if args.end else None
     
-    print()
     print("=" * 60)
-    print("[完成] 下载完成")
+    print("[更新] 股票数据增量更新")
     print("=" * 60)
-    print(f"[成功] 成功: {success_count} 只")
-    print(f"[失败] 失败: {len(failed_stocks)} 只")
-    
-    if failed_stocks:
-        print(f"   失败列表: {', '.join(failed_stocks)}")
-    
-    print()
-    print(f"[路径] 数据位置: {data_dir}")
-    print(f"[文件] 文件数量: {len(list(data_dir.glob('*.parquet')))} 个")
-    
-    # 计算总大小
-    total_size = sum(f.stat().st_size for f in data_dir.glob('*.parquet'))
-    print(f"[大小] 总大小: {total_size / 1024 / 1024:.1f} MB")
-    
-    print()
-    print("[下一步]:")
-    print("  1. 构建向量数据库:")
-    print("     python scripts/build_vectordb.py")
+    print(f"[路径] 数据目录: {data_dir}")
+    print(f"[数量] 股票数量: {len(stocks)} 只")
+    print(f"[来源] 数据源: {args.source}，并发: {args.workers}")
     print()
     
-    return success_count > 0
-
-def check_data_exists():
-    """检查数据是否已存在"""
-    data_dir = Path(__file__).parent.parent / "data" / "stocks"
-    
-    if not data_dir.exists():
-        return False
+    start = time.perf_counter()
+    results = StockUpdater(str(data_dir), fetcher, max_workers=args.workers).update(stocks, end)
+    elapsed = time.perf_counter() - start
     
-    files = list(data_dir.glob('*.parquet'))
+    for i, result in enumerate(results, 1):
+        if result.error:
+            status = f"[FAIL] 失败: {result.error[:50]}"
+        elif result.full:
+            status = f"[OK] 复权价格变化，重新下载 {result.added} 条"
+        elif result.added:
+            status = f"[OK] 新增 {result.added} 条，最新 {result.last_date}"
+        else:
+            status = f"[跳过] 已是最新 {result.last_date or ''}"
+        print(f"[{i}/{len(results)}] {result.key}: {status}")
     
-    if files:
-        print(f"[已存在] 已有 {len(files)} 个股票数据文件")
-        print(f"[位置] {data_dir}")
-        return True
+    updated = [result.key for result in results if result.added]
+    failed = [result.key for result in results if result.error]
     
-    return False
-
-def main():
-    """主函数"""
     print()
     print("=" * 60)
-    print("[工具] 股票数据下载工具 (akshare)")
-    print("=" * 60)
-    print()
+    print(f"[完成] 耗时 {elapsed:.1f} 秒，更新 {len(updated)} 只，失败 {len(failed)} 只")
     
-    # 检查是否已有数据
-    if check_data_exists():
-        choice = input("数据已存在，是否重新下载? [y/N]: ").strip().lower()
-        if choice != 'y':
-            print("[跳过] 跳过下载")
-            return
+    if failed:
+        print(f"   失败列表: {', '.join(failed)}")
     
-    # 开始下载
-    success = download_stock_data()
+    if args.notify and updated:
+        try:
+            result = notify_server(args.notify, updated, args.token or default_token())
+            print(f"[通知] 服务已刷新: 更新 {len(result['updated'])} 只，新增 {len(result['added'])} 只，"
+                  f"耗时 {result['seconds']} 秒")
+        except Exception as e:
+            print(f"[通知] 通知服务失败: {e}")
     
-    if success:
-        sys.exit(0)
-    else:
-        sys.exit(1)
+    sys.exit(1 if failed and not updated else 0)
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,160 @@
+"""
+批量问答
+
+离线评估时一次回放大量问题：
+- 规范化后相同的问题只处理一次，结果复制给所有重复项
+- 按路由、工具和股票分组排序后再准备，同类工具调用相邻执行，共享已加载的行情面板和工具缓存
+- 需要LLM的提示词并发提交（启用批量推理时由连续批处理引擎合并成批次）
+- 结果按完成顺序逐条产出，附带各阶段耗时
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor, Future, wait, FIRST_COMPLETED
+from dataclasses import dataclass, field, replace
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from server.src.cache.response_cache import normalize_query
+from server.src.data.stock_loader import get_loader
+
+
+# 单次批量请求最多的问题数
+MAX_BATCH_QUERIES = 5000
+
+# 路由、检索和工具调用的并发线程数
+PREPARE_WORKERS = 4
+
+
+@dataclass
+class BatchItem:
+    """一个问题的批量处理结果"""
+    index: int  # 在输入中的位置
+    query: str
+    answer: Optional[str] = None
+    route: Optional[str] = None
+    error: Optional[str] = None
+    duplicate_of: Optional[int] = None  # 重复问题：第一次出现的位置
+    timings: Dict[str, float] = field(default_factory=dict)  # 毫秒：prepare、llm、elapsed（自批次开始）
+
+    def to_dict(self) -> Dict:
+        data = {
+            "index": self.index,
+            "query": self.query,
+            "answer": self.answer,
+            "route": self.route,
+            "timings": {stage: round(ms, 3) for stage, ms in self.timings.items()},
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if self.duplicate_of is not None:
+            data["duplicate_of"] = self.duplicate_of
+        return data
+
+
+def run_batch(agent, queries: List[str], llm_workers: Optional[int] = None) -> Iterator[BatchItem]:
+    """
+    批量处理问题
+
+    Args:
+        agent: SimpleStockAgent
+        queries: 问题列表
+        llm_workers: 并发调用LLM的线程数，默认为批量推理的最大批大小（未启用批量推理时为1）
+
+    Yields:
+        每个输入问题的结果（按完成顺序，重复的问题紧跟在第一次出现的问题之后）
+
+    Raises:
+        ValueError: 问题数超过MAX_BATCH_QUERIES
+    """
+    if len(queries) > MAX_BATCH_QUERIES:
+        raise ValueError(f"单次最多{MAX_BATCH_QUERIES}个问题")
+
+    start = time.perf_counter()
+
+    # 去重：规范化后相同的问题只处理第一次出现的
+    duplicates: Dict[str, List[int]] = {}
+    for i, query in enumerate(queries):
+        duplicates.setdefault(normalize_query(query), []).append(i)
+
+    unique = sorted((indices[0] for indices in duplicates.values()), key=lambda i: _group_key(agent, queries[i]))
+
+    # 先加载行情面板，之后所有工具调用都从同一份面板切片
+    get_loader().get_panel()
+
+    if llm_workers is None:
+        engine = getattr(agent.llm, "engine", None)
+        llm_workers = engine.max_batch_size if engine is not None else 1
+
+    with ThreadPoolExecutor(max_workers=PREPARE_WORKERS, thread_name_prefix="batch-prepare") as prepare_pool, \
+            ThreadPoolExecutor(max_workers=llm_workers, thread_name_prefix="batch-llm") as llm_pool:
+        stages: Dict[Future, Tuple[BatchItem, object]] = {}
+
+        for i in unique:
+            item = BatchItem(i, queries[i])
+            stages[prepare_pool.submit(_timed, _prepare, agent, item.query)] = (item, None)
+
+        try:
+            while stages:
+                done, _ = wait(stages, return_when=FIRST_COMPLETED)
+
+                for future in done:
+                    item, prepared = stages.pop(future)
+
+                    try:
+                        result, ms = future.result()
+                    except Exception as e:
+                        item.error = str(e)
+                        yield from _finish(item, queries, duplicates, start)
+                        continue
+
+                    if prepared is None:
+                        # 准备阶段完成
+                        prepared, answer = result
+                        item.route = prepared.route
+                        item.timings["prepare"] = ms
+
+                        if answer is None:
+                            stages[llm_pool.submit(_timed, agent.generate_answer, item.query, prepared)] = (item, prepared)
+                            continue
+                    else:
+                        # LLM生成完成
+                        answer = result
+                        item.timings["llm"] = ms
+
+                    item.answer = answer
+                    yield from _finish(item, queries, duplicates, start)
+        finally:
+            # 调用方提前停止读取（如客户端断开）时取消还没开始的任务
+            for future in stages:
+                future.cancel()
+
+
+def _prepare(agent, query: str):
+    """路由、检索或调用工具，并查找不需要LLM的回答"""
+    prepared = agent.prepare(query)
+    return prepared, agent.cached_answer(query, prepared)
+
+
+def _group_key(agent, query: str) -> Tuple[str, str, str]:
+    """分组键：路由、工具、股票（只用于排序，与prepare中的实际选择可能不同）"""
+    route = agent.route_query(query)
+
+    if route != "tool":
+        return route, "", ""
+
+    return route, agent.select_tool(query), agent.extract_stock_name(query)
+
+
+def _finish(item: BatchItem, queries: List[str], duplicates: Dict[str, List[int]], start: float) -> Iterator[BatchItem]:
+    """记录完成时间，产出结果和它的所有重复项"""
+    item.timings["elapsed"] = (time.perf_counter() - start) * 1000
+    yield item
+
+    for i in duplicates[normalize_query(item.query)][1:]:
+        yield replace(item, index=i, query=queries[i], duplicate_of=item.index, timings=dict(item.timings))
+
+
+def _timed(func, *args):
+    """调用函数，返回结果和耗时（毫秒）"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
@@ -0,0 +1,129 @@
+"""
+多工具执行计划
+
+一个问题可能需要多次工具调用（如“分析比亚迪并和宁德时代比较”），
+计划是工具调用组成的有向无环图：没有依赖关系的调用在线程池中并发执行，
+全部完成后合并结果，只交给LLM一次
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Tuple
+
+from server.src.tools.results import ToolResult
+
+
+# 并发执行工具调用的线程数
+MAX_TOOL_WORKERS = 4
+
+# 单个问题最多的工具调用数
+MAX_PLAN_CALLS = 6
+
+
+@dataclass
+class ToolCall:
+    """计划中的一次工具调用"""
+    id: str
+    tool: str
+    kwargs: Dict
+    depends_on: Tuple[str, ...] = ()  # 需要先完成的调用id
+
+    def describe(self) -> str:
+        """调用的简短描述（用于合并结果时的小标题）"""
+        args = ", ".join(
+            "、".join(value) if isinstance(value, list) else str(value)
+            for value in self.kwargs.values()
+        )
+        return f"{self.tool}({args})"
+
+
+@dataclass
+class ToolPlan:
+    """工具调用计划"""
+    calls: List[ToolCall] = field(default_factory=list)
+
+    def add(self, tool: str, kwargs: Dict, depends_on: Tuple[str, ...] = ()) -> bool:
+        """
+        添加调用（相同工具和参数的调用只保留一次）
+
+        Returns:
+            是否添加成功（重复或超出MAX_PLAN_CALLS时为False）
+        """
+        if len(self.calls) >= MAX_PLAN_CALLS:
+            return False
+
+        if any(call.tool == tool and call.kwargs == kwargs for call in self.calls):
+            return False
+
+        self.calls.append(ToolCall(f"t{len(self.calls) + 1}", tool, kwargs, depends_on))
+        return True
+
+    def waves(self) -> List[List[ToolCall]]:
+        """
+        按依赖关系分层（拓扑排序），同一层的调用互不依赖
+
+        Raises:
+            ValueError: 依赖不存在或存在环
+        """
+        ids = {call.id for call in self.calls}
+        done = set()
+        pending = list(self.calls)
+        waves = []
+
+        for call in pending:
+            missing = set(call.depends_on) - ids
+            if missing:
+                raise ValueError(f"工具调用{call.id}依赖不存在的调用: {sorted(missing)}")
+
+        while pending:
+            wave = [call for call in pending if done.issuperset(call.depends_on)]
+            if not wave:
+                raise ValueError("工具调用计划存在循环依赖")
+
+            waves.append(wave)
+            done.update(call.id for call in wave)
+            pending = [call for call in pending if call.id not in done]
+
+        return waves
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+
+def execute_plan(
+    plan: ToolPlan,
+    call_tool: Callable[..., ToolResult],
+    pool: ThreadPoolExecutor
+) -> Dict[str, ToolResult]:
+    """
+    执行计划：逐层执行，同一层的调用并发
+
+    Args:
+        plan: 工具调用计划
+        call_tool: 工具调用函数（工具名, **参数）-> 输出
+        pool: 线程池
+
+    Returns:
+        调用id到工具输出的映射（顺序与plan.calls一致）
+    """
+    results: Dict[str, ToolResult] = {}
+
+    for wave in plan.waves():
+        if len(wave) == 1:
+            call = wave[0]
+            results[call.id] = call_tool(call.tool, **call.kwargs)
+            continue
+
+        futures = [(call, pool.submit(call_tool, call.tool, **call.kwargs)) for call in wave]
+        for call, future in futures:
+            results[call.id] = future.result()
+
+    return {call.id: results[call.id] for call in plan.calls}
+
+
+def merge_results(plan: ToolPlan, results: Dict[str, ToolResult]) -> str:
+    """把多个工具输出合并为一段文本（每段前加调用描述）"""
+    return "\n\n".join(
+        f"【{i}. {call.describe()}】\n{results[call.id]}"
+        for i, call in enumerate(plan.calls, start=1)
+    )
@@ -4,8 +4,15 @@
 基于LangGraph的股票咨询Agent，集成工具和RAG
 """
 
-from typing import TypedDict, Annotated, Sequence, Literal
+from typing import TypedDict, Annotated, Sequence, Literal, Optional, AsyncIterator, Iterator, Dict, List, Any
+from dataclasses import dataclass, field
+import asyncio
 import operator
+from contextlib import aclosing
+import threading
+from concurrent.futures import ThreadPoolExecutor
+import re
+import yaml
 from langchain_core.messages import BaseMessage, HumanMessage, AIMessage, ToolMessage
 import sys
 from pathlib import Path
@@ -14,8 +21,39 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent.parent))
 
 from server.src.llm.factory import create_llm_from_config_file
-from server.src.tools.stock_tools import get_all_tools
+from server.src.tools.stock_tools import get_all_tools, HISTORY_MAX_DAYS
+from server.src.tools.results import ToolResult, error_result
+from server.src.data.stock_loader import get_loader
+from server.src.cache.response_cache import ResponseCache
+from server.src.monitoring.metrics import (
+    STAGE_SECONDS, TOOL_SECONDS, TOOL_CALLS, LLM_PROMPT_TOKENS, LLM_OUTPUT_TOKENS, AGENT_ANSWERS
+)
 from server.src.rag.simple_retriever import get_retriever
+from server.src.agent.planner import ToolPlan, MAX_TOOL_WORKERS, execute_plan, merge_results
+from server.src.agent.batch import BatchItem, run_batch
+from server.src.agent.templates import FAST_PATH_TOOLS, is_simple_query, render_answer
+
+
+# ==================== 提示词 ====================
+
+# 固定的说明文字放在提示词开头，作为前缀交给LLM缓存KV状态（见llm/prefix_cache.py），
+# 每次变化的问题和数据放在后面
+KNOWLEDGE_PROMPT_PREFIX = (
+    "请基于以下知识回答用户的问题。"
+    "请用简洁明了的语言回答，如果知识库中的信息不足，可以适当补充你的理解。\n\n"
+)
+
+TOOL_PROMPT_PREFIX = (
+    "请基于工具的查询结果，回答用户的问题。"
+    "请用自然、友好的语言总结这些信息，给用户一个清晰的回答。"
+    "如果有投资建议的需求，请务必提醒\"投资有风险，仅供参考\"。\n\n"
+)
+
+PLAN_PROMPT_PREFIX = (
+    "请基于以下多个工具的查询结果，回答用户的问题。"
+    "请用自然、友好的语言综合这些信息，逐一回应问题的各个部分，给用户一个清晰完整的回答。"
+    "如果有投资建议的需求，请务必提醒\"投资有风险，仅供参考\"。\n\n"
+)
 
 
 # ==================== 状态定义 ====================
@@ -28,12 +66,93 @@ class AgentState(TypedDict):
     next_action: str  # 下一步动作
 
 
+@dataclass
+class PreparedQuery:
+    """调用LLM之前的准备结果"""
+    route: str
+    prompt: Optional[str] = None  # 交给LLM的提示词
+    prefix: Optional[str] = None  # 提示词开头的固定部分（LLM可缓存其KV状态）
+    answer: Optional[str] = None  # 不需要LLM时的直接回答
+    answer_source: Optional[str] = None  # 直接回答的来源：template（模板快速路径）、fallback（固定回答）
+    context: str = ""  # 工具结果或检索到的知识
+    timings: Dict[str, float] = field(default_factory=dict)  # 知识检索各阶段耗时（毫秒）
+
+
+# 选股查询关键词
+SCREEN_KEYWORDS = ["筛选", "选股", "排名", "排行", "涨幅榜", "跌幅榜", "哪些股票", "哪只股票", "超卖的股票", "超买的股票"]
+
+# 选股条件中的中文指标名 -> 选股字段
+SCREEN_FIELD_NAMES = {
+    "rsi": "rsi",
+    "量比": "volume_ratio",
+    "今日涨幅": "change_pct",
+    "涨跌幅": "change_pct",
+    "收盘价": "close",
+    "股价": "close",
+    "价格": "close",
+    "macd": "macd",
+}
+
+SCREEN_COMPARATORS = {
+    "低于": "<", "小于": "<", "<": "<", "<=": "<=",
+    "高于": ">", "大于": ">", "超过": ">", ">": ">", ">=": ">=",
+}
+
+# 指标阈值条件：RSI低于30、量比大于2、股价高于100
+SCREEN_CONDITION_PATTERN = re.compile(
+    r"({})\s*({})\s*(-?\d+(?:\.\d+)?)".format(
+        "|".join(sorted(SCREEN_FIELD_NAMES, key=len, reverse=True)),
+        "|".join(re.escape(c) for c in sorted(SCREEN_COMPARATORS, key=len, reverse=True))
+    )
+)
+
+CHINESE_NUMBERS = {"三": 3, "五": 5, "十": 10, "二十": 20, "三十": 30, "五十": 50}
+
+CHINESE_DIGITS = {"零": 0, "一": 1, "二": 2, "两": 2, "三": 3, "四": 4, "五": 5, "六": 6, "七": 7, "八": 8, "九": 9}
+
+# 历史行情的天数：“最近15天”、“三十个交易日”
+# （前面不能是数字、“月”或小数点，排除股票代码、“1月5日”这类日期；年份后面不跟“天/日”）
+HISTORY_DAYS_PATTERN = re.compile(r"(?<![\d月.])(\d{1,5}|[零一二两三四五六七八九十]+)\s*个?(?:交易日|天|日)")
+
+# 不明确的天数：“最近几天”、“前几个交易日”
+VAGUE_DAYS_PATTERN = re.compile(r"[几数多]\s*个?(?:交易日|天|日)")
+
+# 历史行情的默认天数
+DEFAULT_HISTORY_DAYS = 10
+
+# 多部分问题的分句（每个分句可能对应一次工具调用）
+# （“并”只在引出下一分句时分句，如“分析比亚迪并和宁德时代比较”，不拆开“并购”、“合并”）
+CLAUSE_PATTERN = re.compile(r"[，,；;。！!？?]|并且|然后|同时|以及|另外|(?<![合吞兼归])并(?=[和与且跟同])")
+
+
+def parse_chinese_number(text: str) -> Optional[int]:
+    """
+    解析一百以内的中文数字（如“三”、“十五”、“二十”、“三十五”）
+    
+    Returns:
+        数值，无法解析时返回None
+    """
+    tens, sep, ones = text.partition("十")
+    
+    if not sep:
+        return CHINESE_DIGITS.get(text) if len(text) == 1 else None
+    
+    if len(tens) > 1 or len(ones) > 1 or (tens and tens not in CHINESE_DIGITS) or (ones and ones not in CHINESE_DIGITS):
+        return None
+    
+    return CHINESE_DIGITS.get(tens, 1) * 10 + CHINESE_DIGITS.get(ones, 0)
+
+
 # ==================== 简化版Agent ====================
 
 class SimpleStockAgent:
     """简化版股票咨询Agent（无GPU版本）"""
     
     def __init__(self, config_path: str = "./server/configs/server_config.yaml"):
+        # 加载配置
+        with open(config_path, 'r', encoding='utf-8') as f:
+            self.config = yaml.safe_load(f) or {}
+        
         # 初始化LLM
         self.llm = create_llm_from_config_file(config_path)
         
@@ -41,7 +160,24 @@ class SimpleStockAgent:
         self.tools = {tool.name: tool for tool in get_all_tools()}
         
         # 初始化RAG
-        self.retriever = get_retriever()
+        self.retriever = get_retriever(rag_config=self.config.get('rag') or {})
+        
+        # 初始化响应缓存
+        self.cache = ResponseCache.from_config(self.config)
+        
+        # 多工具计划中互不依赖的调用并发执行
+        self.tool_pool = ThreadPoolExecutor(max_workers=MAX_TOOL_WORKERS, thread_name_prefix="agent-tool")
+        
+        # 模板快速路径：按意图开关，启用的工具的简单问题不调用LLM
+        fast_path = self.config.get('fast_path') or {}
+        self.fast_path_tools = set()
+        if fast_path.get('enabled', False):
+            routes = fast_path.get('routes') or {}
+            self.fast_path_tools = {tool for intent, tool in FAST_PATH_TOOLS.items() if routes.get(intent, True)}
+        
+        # 回答来源统计（llm / template / cache / fallback）
+        self.answer_counts: Dict[str, int] = {}
+        self._answer_lock = threading.Lock()
         
         print(f"Agent初始化完成：LLM={type(self.llm).__name__}, 工具数={len(self.tools)}")
     
@@ -57,6 +193,10 @@ class SimpleStockAgent:
         """
         query_lower = query.lower()
         
+        # 选股查询（可能包含“哪些”等知识类关键词，优先判断）
+        if self.is_screen_query(query):
+            return "tool"
+        
         # 工具查询关键词
         tool_keywords = [
             "价格", "多少钱", "股价", "行情",
@@ -68,8 +208,8 @@ class SimpleStockAgent:
         
         # 知识查询关键词
         knowledge_keywords = [
-            "什么是", "如何", "怎么", "为什么", "哪些",
-            "概念", "定义", "含义", "解释", "介绍"
+            "什么是", "如何", "怎么", "为什么", "哪些", "什么样",
+            "概念", "定义", "含义", "解释", "介绍", "特点"
         ]
         
         # 判断
@@ -97,7 +237,9 @@ class SimpleStockAgent:
         query_lower = query.lower()
         
         # 简单的规则匹配
-        if "价格" in query or "多少钱" in query or "股价" in query:
+        if self.is_screen_query(query):
+            return "screen_stocks"
+        elif "价格" in query or "多少钱" in query or "股价" in query:
             return "get_stock_price"
         elif "技术指标" in query or "MACD" in query or "RSI" in query:
             return "get_technical_indicators"
@@ -111,6 +253,82 @@ class SimpleStockAgent:
             # 默认使用综合分析
             return "analyze_stock"
     
+    def is_screen_query(self, query: str) -> bool:
+        """
+        判断是否为全市场选股类查询
+        
+        Args:
+            query: 用户查询
+            
+        Returns:
+            是否为选股查询
+        """
+        if any(kw in query for kw in SCREEN_KEYWORDS):
+            return True
+        
+        # 没有具体股票的指标阈值条件（“RSI低于30的股票有哪些”）或排名（“涨幅前10”、“RSI前五”）；
+        # 只说“……的股票”而没有具体条件的问题（“如何挑选好的股票”）交给知识库
+        has_screen_pattern = SCREEN_CONDITION_PATTERN.search(query.lower()) is not None \
+            or re.search(r"前\s*(\d+|[三五十]|二十|三十|五十)\s*(只|名|的)?", query) is not None
+        
+        return has_screen_pattern and not get_loader().find_stocks(query)
+    
+    def screen_arguments(self, query: str) -> dict:
+        """
+        从选股查询中提取筛选条件和排序方式
+        
+        Args:
+            query: 用户查询
+            
+        Returns:
+            screen_stocks工具参数
+        """
+        query_lower = query.lower()
+        conditions = []
+        sort_by, ascending = None, False
+        
+        # 指标阈值：RSI低于30、量比大于2、股价高于100
+        for name, comparator, value in SCREEN_CONDITION_PATTERN.findall(query_lower):
+            field = SCREEN_FIELD_NAMES[name]
+            op = SCREEN_COMPARATORS[comparator]
+            conditions.append(f"{field} {op} {value}")
+            if sort_by is None:
+                sort_by, ascending = field, op.startswith("<")
+        
+        if "超卖" in query:
+            conditions.append("rsi < 30")
+            sort_by, ascending = sort_by or "rsi", True
+        elif "超买" in query:
+            conditions.append("rsi > 70")
+            sort_by, ascending = sort_by or "rsi", False
+        
+        # 排序：N日涨幅/跌幅，今日涨幅/跌幅
+        match = re.search(r"(\d+)\s*日(涨幅|跌幅)", query)
+        if match:
+            days = int(match.group(1))
+            sort_by = f"change_{days}d" if days > 1 else "change_pct"
+            ascending = match.group(2) == "跌幅"
+        elif "跌幅" in query:
+            sort_by, ascending = "change_pct", True
+        elif "涨幅" in query:
+            sort_by, ascending = "change_pct", False
+        elif "量比" in query and sort_by is None:
+            sort_by = "volume_ratio"
+        
+        # 数量：前10、前五
+        top_n = 10
+        match = re.search(r"前\s*(\d+|二十|三十|五十|[三五十])", query)
+        if match:
+            value = match.group(1)
+            top_n = int(value) if value.isdigit() else CHINESE_NUMBERS[value]
+        
+        return {
+            "condition": " and ".join(conditions),
+            "sort_by": sort_by or "change_20d",
+            "ascending": ascending,
+            "top_n": top_n,
+        }
+    
     def extract_stock_name(self, query: str) -> str:
         """
         从查询中提取股票名称
@@ -121,15 +339,10 @@ class SimpleStockAgent:
         Returns:
             股票名称
         """
-        # 常见股票列表（前10只）
-        common_stocks = [
-            "比亚迪", "宁德时代", "贵州茅台", "中国平安", "招商银行",
-            "工商银行", "建设银行", "中国石油", "中国石化", "五粮液"
-        ]
-        
-        for stock in common_stocks:
-            if stock in query:
-                return stock
+        # 一次扫描找出问题中提到的股票（名称、代码、简称）
+        stocks = get_loader().find_stocks(query)
+        if stocks:
+            return stocks[0]
         
         # 如果没找到，返回查询本身（让工具处理）
         words = query.replace("？", "").replace("?", "").split()
@@ -139,7 +352,7 @@ class SimpleStockAgent:
         
         return "比亚迪"  # 默认
     
-    def call_tool(self, tool_name: str, **kwargs) -> str:
+    def call_tool(self, tool_name: str, **kwargs) -> ToolResult:
         """
         调用工具
         
@@ -148,128 +361,420 @@ class SimpleStockAgent:
             **kwargs: 工具参数
             
         Returns:
-            工具输出
+            工具结果对象（str()得到交给LLM的文本）
         """
         if tool_name not in self.tools:
-            return f"工具 {tool_name} 不存在"
+            return error_result(f"工具 {tool_name} 不存在")
         
         tool = self.tools[tool_name]
         
+        # 查找缓存（键包含数据文件版本，数据更新后自动失效）
+        cache_key = None
+        if self.cache.enabled:
+            cache_key = ResponseCache.tool_key(tool_name, kwargs, self._data_version(kwargs))
+            cached = self.cache.get("tool", cache_key)
+            if cached is not None:
+                print(f"[Agent] 命中工具缓存: {tool_name}")
+                TOOL_CALLS.inc(tool=tool_name, result="cached")
+                return cached
+        
         try:
-            result = tool.func(**kwargs)
-            return result
+            with TOOL_SECONDS.time(tool=tool_name):
+                result = tool.func(**kwargs)
         except Exception as e:
-            return f"工具调用失败：{str(e)}"
+            TOOL_CALLS.inc(tool=tool_name, result="error")
+            return error_result(f"工具调用失败：{str(e)}")
+        
+        if not result.ok:
+            # 未找到数据、参数不合法等不缓存
+            TOOL_CALLS.inc(tool=tool_name, result="error")
+            return result
+        
+        TOOL_CALLS.inc(tool=tool_name, result="ok")
+        
+        if cache_key is not None:
+            self.cache.set(cache_key, result)
+        
+        return result
     
-    def query(self, user_query: str) -> str:
+    def _data_version(self, tool_kwargs: dict) -> str:
+        """工具参数涉及的股票数据版本"""
+        if "stock" in tool_kwargs:
+            stocks = [tool_kwargs["stock"]]
+        else:
+            stocks = tool_kwargs.get("stocks")
+        
+        return get_loader().get_data_version(stocks)
+    
+    def tool_arguments(self, tool_name: str, user_query: str, stock: Optional[str] = None) -> dict:
         """
-        处理用户查询
+        从查询中提取工具参数
         
         Args:
+            tool_name: 工具名称
             user_query: 用户查询
+            stock: 已确定的股票（不再从查询中提取）
             
         Returns:
-            回答
+            工具参数
+        """
+        if tool_name == "screen_stocks":
+            return self.screen_arguments(user_query)
+        
+        if tool_name == "compare_stocks":
+            # 对比工具需要股票列表（最多5只）
+            stocks = get_loader().find_stocks(user_query)[:5]
+            
+            if len(stocks) < 2:
+                stocks = ["比亚迪", "宁德时代", "贵州茅台"]  # 默认对比
+            
+            return {"stocks": stocks}
+        
+        # 其他工具需要股票名称
+        stock_name = stock
+        if stock_name is None:
+            stock_name = self.extract_stock_name(user_query)
+            print(f"[Agent] 提取股票: {stock_name}")
+        
+        if tool_name == "get_stock_history":
+            # 历史数据工具可能需要天数参数
+            days = self.history_days(user_query)
+            return {"stock": stock_name, "days": days or DEFAULT_HISTORY_DAYS}
+        
+        return {"stock": stock_name}
+    
+    def history_days(self, query: str) -> Optional[int]:
+        """
+        从查询中提取历史行情的天数
+        
+        Args:
+            query: 用户查询
+            
+        Returns:
+            天数，没有明确天数时返回None
+        """
+        match = HISTORY_DAYS_PATTERN.search(query)
+        if match is None:
+            return None
+        
+        value = match.group(1)
+        return int(value) if value.isdigit() else parse_chinese_number(value)
+    
+    def plan_tools(self, user_query: str) -> ToolPlan:
+        """
+        为多部分问题生成工具调用计划
+        
+        按连接词和标点分句，每个分句选择工具；分句中提到几只股票就调用几次，
+        没有提到股票时沿用前一个分句的股票，对比类分句使用问题中提到的全部股票
+        
+        Args:
+            user_query: 用户查询
+            
+        Returns:
+            工具调用计划（相同的调用只保留一次）
+        """
+        plan = ToolPlan()
+        
+        if self.is_screen_query(user_query):
+            return plan
+        
+        loader = get_loader()
+        previous = loader.find_stocks(user_query)[:1]
+        
+        for clause in CLAUSE_PATTERN.split(user_query):
+            clause = clause.strip()
+            if not clause:
+                continue
+            
+            tool_name = self.select_tool(clause)
+            
+            if tool_name == "compare_stocks":
+                plan.add(tool_name, self.tool_arguments(tool_name, user_query))
+                continue
+            
+            if tool_name == "screen_stocks":
+                continue
+            
+            stocks = loader.find_stocks(clause) or previous
+            previous = stocks
+            
+            for stock in stocks:
+                plan.add(tool_name, self.tool_arguments(tool_name, clause, stock=stock))
+        
+        return plan
+    
+    def prepare(self, user_query: str) -> PreparedQuery:
+        """
+        路由查询、检索知识或调用工具，生成交给LLM的提示词
+        
+        Args:
+            user_query: 用户查询
+            
+        Returns:
+            准备结果：不需要LLM时prompt为None，answer为直接回答
         """
         # 1. 路由
-        route = self.route_query(user_query)
+        with STAGE_SECONDS.time(stage="route_query"):
+            route = self.route_query(user_query)
         
         print(f"\n[Agent] 查询路由: {route}")
         
         if route == "knowledge":
             # 知识库查询
             print("[Agent] 从知识库检索...")
-            knowledge = self.retriever.get_relevant_knowledge(user_query)
+            timings = {}
+            knowledge = self.retriever.get_relevant_knowledge(user_query, timings=timings)
+            print("[Agent] 检索耗时: " + ", ".join(f"{stage}={ms:.2f}ms" for stage, ms in timings.items()))
             
-            if knowledge:
-                # 使用LLM基于知识生成回答
-                prompt = f"""请基于以下知识回答用户的问题。
-
-用户问题：{user_query}
-
-相关知识：
-{knowledge}
-
-请用简洁明了的语言回答，如果知识库中的信息不足，可以适当补充你的理解。"""
-                
-                # 使用同步方法
-                if hasattr(self.llm, 'generate_sync'):
-                    answer = self.llm.generate_sync(prompt)
-                else:
-                    # 如果没有同步方法，尝试异步方法
-                    import asyncio
-                    answer = asyncio.run(self.llm.generate(prompt))
-                return answer
-            else:
-                return "抱歉，我在知识库中没有找到相关信息。您可以换个方式提问。"
+            if not knowledge:
+                return PreparedQuery(
+                    route=route,
+                    answer="抱歉，我在知识库中没有找到相关信息。您可以换个方式提问。",
+                    answer_source="fallback",
+                    timings=timings
+                )
+            
+            # 使用LLM基于知识生成回答
+            prompt = KNOWLEDGE_PROMPT_PREFIX + f"用户问题：{user_query}\n\n相关知识：\n{knowledge}"
+            
+            return PreparedQuery(
+                route=route, prompt=prompt, prefix=KNOWLEDGE_PROMPT_PREFIX, context=knowledge, timings=timings
+            )
         
         elif route == "tool":
             # 工具调用
             print("[Agent] 调用工具...")
             
-            # 选择工具
-            tool_name = self.select_tool(user_query)
+            # 生成工具调用计划，问题包含多个部分时并发执行多个工具，只调用一次LLM
+            with STAGE_SECONDS.time(stage="select_tool"):
+                plan = self.plan_tools(user_query)
+                
+                if len(plan) == 1:
+                    # 只有一次调用：直接使用计划中的工具和参数
+                    tool_name, tool_args = plan.calls[0].tool, plan.calls[0].kwargs
+                elif not plan:
+                    # 选股问题或没有识别出股票：按整个问题选择工具
+                    tool_name = self.select_tool(user_query)
+                    tool_args = self.tool_arguments(tool_name, user_query)
+            
+            if len(plan) > 1:
+                return self._prepare_plan(user_query, plan)
+            
             print(f"[Agent] 选择工具: {tool_name}")
             
-            # 提取参数
-            if tool_name == "compare_stocks":
-                # 对比工具需要股票列表
-                # 简单处理：提取多个股票名
-                stocks = []
-                for stock in ["比亚迪", "宁德时代", "贵州茅台", "中国平安", "招商银行"]:
-                    if stock in user_query:
-                        stocks.append(stock)
-                
-                if len(stocks) < 2:
-                    stocks = ["比亚迪", "宁德时代", "贵州茅台"]  # 默认对比
-                
-                tool_result = self.call_tool(tool_name, stocks=stocks)
-            else:
-                # 其他工具需要股票名称
-                stock_name = self.extract_stock_name(user_query)
-                print(f"[Agent] 提取股票: {stock_name}")
-                
-                if tool_name == "get_stock_history":
-                    # 历史数据工具可能需要天数参数
-                    days = 10  # 默认10天
-                    if "5" in user_query or "五" in user_query:
-                        days = 5
-                    elif "20" in user_query or "二十" in user_query:
-                        days = 20
-                    
-                    tool_result = self.call_tool(tool_name, stock=stock_name, days=days)
-                else:
-                    tool_result = self.call_tool(tool_name, stock=stock_name)
+            # 调用工具
+            result = self.call_tool(tool_name, **tool_args)
             
             print(f"[Agent] 工具执行完成")
             
+            # 简单行情问题按模板直接回答
+            answer = self.fast_path_answer(user_query, tool_name, result)
+            if answer is not None:
+                print(f"[Agent] 模板回答（不调用LLM）")
+                return PreparedQuery(route=route, answer=answer, answer_source="template")
+            
+            tool_result = str(result)
+            
             # 使用LLM总结工具结果
-            prompt = f"""请基于工具的查询结果，回答用户的问题。
-
-用户问题：{user_query}
-
-工具结果：
-{tool_result}
-
-请用自然、友好的语言总结这些信息，给用户一个清晰的回答。如果有投资建议的需求，请务必提醒"投资有风险，仅供参考"。"""
+            prompt = TOOL_PROMPT_PREFIX + f"用户问题：{user_query}\n\n工具结果：\n{tool_result}"
             
-            # 使用同步方法
-            if hasattr(self.llm, 'generate_sync'):
-                answer = self.llm.generate_sync(prompt)
-            else:
-                import asyncio
-                answer = asyncio.run(self.llm.generate(prompt))
-            return answer
+            return PreparedQuery(route=route, prompt=prompt, prefix=TOOL_PROMPT_PREFIX, context=tool_result)
         
         else:
             # 直接回答
             print("[Agent] 直接回答...")
+            return PreparedQuery(route=route, prompt=user_query)
+    
+    def fast_path_answer(self, user_query: str, tool_name: str, result: ToolResult) -> Optional[str]:
+        """
+        模板快速路径：只问价格或最近走势、且明确提到一只股票的问题，直接按模板回答
+        
+        Returns:
+            回答文本，工具未启用快速路径、问题需要分析或没有明确股票时返回None
+        """
+        if tool_name not in self.fast_path_tools or not is_simple_query(user_query):
+            return None
+        
+        # 没有提到股票时extract_stock_name会使用默认股票，不能直接回答
+        if len(get_loader().find_stocks(user_query)) != 1:
+            return None
+        
+        # 走势问题只在天数明确且在范围内（或没有提天数）时直接回答
+        if tool_name == "get_stock_history":
+            days = self.history_days(user_query)
+            if days is None and VAGUE_DAYS_PATTERN.search(user_query):
+                return None
+            if days is not None and not 1 <= days <= HISTORY_MAX_DAYS:
+                return None
+        
+        return render_answer(tool_name, result)
+    
+    def _prepare_plan(self, user_query: str, plan: ToolPlan) -> PreparedQuery:
+        """执行多工具计划，合并结果生成一个提示词"""
+        print(f"[Agent] 工具计划: " + ", ".join(call.describe() for call in plan.calls))
+        
+        results = execute_plan(plan, self.call_tool, self.tool_pool)
+        tool_result = merge_results(plan, results)
+        
+        print(f"[Agent] {len(plan)}个工具执行完成")
+        
+        prompt = PLAN_PROMPT_PREFIX + f"用户问题：{user_query}\n\n工具结果：\n{tool_result}"
+        
+        return PreparedQuery(route="tool", prompt=prompt, prefix=PLAN_PROMPT_PREFIX, context=tool_result)
+    
+    def generate(self, prompt: str, prefix: Optional[str] = None) -> str:
+        """
+        同步调用LLM生成回答
+        
+        Args:
+            prompt: 提示词
+            prefix: 提示词开头的固定部分（支持前缀缓存的LLM复用其KV状态）
+            
+        Returns:
+            回答
+        """
+        with STAGE_SECONDS.time(stage="llm_generate"):
+            # 使用同步方法
             if hasattr(self.llm, 'generate_sync'):
-                answer = self.llm.generate_sync(user_query)
+                answer = self.llm.generate_sync(prompt, prefix=prefix)
             else:
-                import asyncio
-                answer = asyncio.run(self.llm.generate(user_query))
-            return answer
+                # 如果没有同步方法，尝试异步方法
+                answer = asyncio.run(self.llm.generate(prompt, prefix=prefix))
+        
+        self._record_tokens(prompt, answer)
+        
+        return answer
+    
+    def _record_tokens(self, prompt: str, answer: str):
+        """记录LLM的输入/输出token数"""
+        LLM_PROMPT_TOKENS.observe(self.llm.count_tokens(prompt))
+        LLM_OUTPUT_TOKENS.observe(self.llm.count_tokens(answer))
+    
+    def query(self, user_query: str) -> str:
+        """
+        处理用户查询
+        
+        Args:
+            user_query: 用户查询
+            
+        Returns:
+            回答
+        """
+        return self.answer(user_query, self.prepare(user_query))
+    
+    def answer(self, user_query: str, prepared: PreparedQuery) -> str:
+        """
+        根据准备结果得到回答：直接回答、命中回答缓存，或调用LLM生成并写入缓存
+        
+        Args:
+            user_query: 用户查询
+            prepared: prepare的结果
+            
+        Returns:
+            回答
+        """
+        cached = self.cached_answer(user_query, prepared)
+        if cached is not None:
+            return cached
+        
+        return self.generate_answer(user_query, prepared)
+    
+    def generate_answer(self, user_query: str, prepared: PreparedQuery) -> str:
+        """调用LLM生成回答并写入回答缓存（不查找缓存）"""
+        answer = self.generate(prepared.prompt, prepared.prefix)
+        self._record_answer(prepared.route, "llm")
+        
+        cache_key = self._answer_cache_key(user_query, prepared)
+        if cache_key is not None:
+            self.cache.set(cache_key, answer)
+        
+        return answer
+    
+    def cached_answer(self, user_query: str, prepared: PreparedQuery) -> Optional[str]:
+        """不需要调用LLM的回答（直接回答或命中回答缓存），没有时返回None"""
+        if prepared.answer is not None:
+            self._record_answer(prepared.route, prepared.answer_source or "fallback")
+            return prepared.answer
+        
+        cache_key = self._answer_cache_key(user_query, prepared)
+        if cache_key is not None:
+            cached = self.cache.get("answer", cache_key)
+            if cached is not None:
+                print("[Agent] 命中回答缓存")
+                self._record_answer(prepared.route, "cache")
+                return cached
+        
+        return None
+    
+    def _record_answer(self, route: str, source: str):
+        """记录一次回答的来源"""
+        AGENT_ANSWERS.inc(route=route, source=source)
+        
+        with self._answer_lock:
+            self.answer_counts[source] = self.answer_counts.get(source, 0) + 1
+    
+    def answer_stats(self) -> Dict[str, Any]:
+        """
+        回答来源统计
+        
+        Returns:
+            总数、各来源次数和不调用LLM的比例
+        """
+        with self._answer_lock:
+            counts = dict(self.answer_counts)
+        
+        total = sum(counts.values())
+        without_llm = total - counts.get("llm", 0)
+        
+        return {
+            "total": total,
+            "sources": counts,
+            "without_llm_ratio": round(without_llm / total, 4) if total else 0.0
+        }
+    
+    async def query_stream(self, user_query: str) -> AsyncIterator[str]:
+        """
+        流式处理用户查询
+        
+        路由、检索和工具调用在工作线程中执行，
+        之后直接转发LLM流式生成的增量文本
+        
+        Args:
+            user_query: 用户查询
+            
+        Yields:
+            回答的增量文本
+        """
+        prepared = await asyncio.to_thread(self.prepare, user_query)
+        
+        cached = self.cached_answer(user_query, prepared)
+        if cached is not None:
+            yield cached
+            return
+        
+        parts = []
+        with STAGE_SECONDS.time(stage="llm_generate"):
+            # 调用方提前关闭时同时关闭LLM的流，取消生成
+            async with aclosing(self.llm.generate_stream(prepared.prompt, prefix=prepared.prefix)) as stream:
+                async for delta in stream:
+                    if delta:
+                        parts.append(delta)
+                        yield delta
+        
+        answer = "".join(parts)
+        self._record_tokens(prepared.prompt, answer)
+        self._record_answer(prepared.route, "llm")
+        
+        cache_key = self._answer_cache_key(user_query, prepared)
+        if cache_key is not None:
+            self.cache.set(cache_key, answer)
+    
+    def _answer_cache_key(self, user_query: str, prepared: PreparedQuery) -> Optional[str]:
+        """最终回答的缓存键（缓存未启用时返回None）"""
+        if not self.cache.enabled:
+            return None
+        
+        return ResponseCache.answer_key(user_query, prepared.route, prepared.context)
     
     def chat(self, user_query: str) -> str:
         """
@@ -282,6 +787,18 @@ class SimpleStockAgent:
             回答
         """
         return self.query(user_query)
+    
+    def chat_batch(self, queries: List[str]) -> Iterator[BatchItem]:
+        """
+        批量问答（去重、按路由/工具分组准备、并发提交LLM）
+        
+        Args:
+            queries: 问题列表
+            
+        Yields:
+            每个问题的结果，按完成顺序
+        """
+        return run_batch(self, queries)
 
 
 # ==================== 全局实例 ====================
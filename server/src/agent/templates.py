@@ -0,0 +1,109 @@
+"""
+模板回答（快速路径）
+
+只问最新价格或最近N日走势的简单问题，LLM只是复述工具结果。
+这类问题直接用结构化的工具结果按模板生成确定的回答，不调用LLM；
+包含分析、建议类措辞的问题仍交给LLM
+"""
+
+import re
+from typing import Callable, Dict, Optional
+
+import numpy as np
+
+from server.src.tools.results import ToolResult, PriceResult, HistoryResult
+
+
+# 可以走快速路径的意图 -> 工具
+FAST_PATH_TOOLS = {
+    "price": "get_stock_price",
+    "history": "get_stock_history",
+}
+
+# 出现这些词时需要LLM分析或解释，不走快速路径
+ANALYSIS_KEYWORDS = [
+    "分析", "建议", "为什么", "原因", "怎么看", "如何看", "值得", "能买", "能不能", "该不该",
+    "买入", "卖出", "持有", "加仓", "减仓", "抄底", "预测", "会不会", "后市", "前景", "风险",
+    "技术指标", "MACD", "RSI", "均线", "对比", "比较",
+]
+
+DISCLAIMER = "以上数据仅供参考，不构成投资建议。"
+
+
+# 指定年份或日期的问题（“2025年”、“1月5日以来”），模板只能回答最新数据
+DATE_PATTERN = re.compile(r"\d{2,4}\s*年|\d{1,2}\s*月|[一二三四五六七八九十]+月|去年|今年|上个?月|上周")
+
+
+def is_simple_query(query: str) -> bool:
+    """问题中没有需要分析或解释的措辞，也没有指定日期"""
+    if any(kw in query.upper() for kw in ANALYSIS_KEYWORDS):
+        return False
+
+    if DATE_PATTERN.search(query):
+        return False
+
+    # “涨了吗”这类是非问题需要LLM组织回答
+    return re.search(r"[吗么]\s*[？?]?\s*$", query) is None
+
+
+def render_price(result: PriceResult) -> str:
+    """最新行情的回答"""
+    text = f"{result.stock}最新收盘价为{result.close:.2f}元（{result.date}）"
+
+    if result.change_pct is not None:
+        text += f"，{_describe_change(result.change_pct)}"
+
+    text += (
+        f"。当日开盘{result.open:.2f}元，最高{result.high:.2f}元，最低{result.low:.2f}元，"
+        f"成交量{result.volume:,}手。\n\n{DISCLAIMER}"
+    )
+    return text
+
+
+def render_history(result: HistoryResult) -> str:
+    """最近N个交易日走势的回答"""
+    dates = result.dates.astype("datetime64[D]").astype(str)
+    closes = result.close
+    changes = result.change_pct[~np.isnan(result.change_pct)]
+
+    text = (
+        f"{result.stock}最近{len(closes)}个交易日（{dates[0]}至{dates[-1]}）"
+        f"{_describe_change(result.period_change, '区间')}，"
+        f"收盘价从{closes[0]:.2f}元到{closes[-1]:.2f}元。"
+        f"期间最高价{result.high:.2f}元，最低价{result.low:.2f}元，平均收盘价{result.mean_close:.2f}元"
+    )
+
+    if len(changes):
+        text += f"，其中上涨{int((changes > 0).sum())}天、下跌{int((changes < 0).sum())}天"
+
+    return text + f"。\n\n{DISCLAIMER}"
+
+
+# 工具 -> 模板
+TEMPLATES: Dict[str, Callable] = {
+    "get_stock_price": render_price,
+    "get_stock_history": render_history,
+}
+
+
+def render_answer(tool_name: str, result: ToolResult) -> Optional[str]:
+    """
+    按模板生成回答
+
+    Returns:
+        回答文本，没有对应模板或工具未返回数据时为None
+    """
+    template = TEMPLATES.get(tool_name)
+
+    if template is None or not result.ok:
+        return None
+
+    return template(result)
+
+
+def _describe_change(change_pct: float, label: str = "") -> str:
+    if change_pct > 0:
+        return f"{label}上涨{change_pct:.2f}%"
+    if change_pct < 0:
+        return f"{label}下跌{-change_pct:.2f}%"
+    return f"{label}持平"
@@ -0,0 +1,193 @@
+"""
+行情数据接口
+
+直接读取行情面板和指标列返回数据，不经过路由和LLM，供看板等只需要数字的客户端轮询：
+- GET /v1/quote/{symbol}：最新行情
+- GET /v1/quotes?symbols=a,b：批量最新行情
+- GET /v1/indicators/{symbol}：最新技术指标
+- GET /v1/history/{symbol}?days=：最近N个交易日（按列返回）
+
+默认返回JSON；format=arrow或Accept为application/vnd.apache.arrow.stream时返回Arrow IPC流
+"""
+
+from typing import Optional, Dict, Any
+
+import numpy as np
+from fastapi import APIRouter, HTTPException, Request, Query
+from fastapi.responses import JSONResponse, Response
+
+from server.src.data.stock_loader import get_loader
+from server.src.data.stock_analyzer import get_indicator_engine
+from server.src.data.panel_store import PANEL_COLUMNS
+from server.src.tools.results import IndicatorResult, jsonable
+
+
+ARROW_MEDIA_TYPE = "application/vnd.apache.arrow.stream"
+
+# 单次历史数据请求最多的交易日数
+MAX_HISTORY_DAYS = 2500
+
+# 批量行情单次最多的股票数
+MAX_BATCH_SYMBOLS = 200
+
+# 行情字段（最新行情和批量行情的列顺序）
+QUOTE_FIELDS = ("date",) + PANEL_COLUMNS
+
+
+router = APIRouter(prefix="/v1", tags=["data"])
+
+
+@router.get("/quote/{symbol}")
+def get_quote(symbol: str, request: Request, format: Optional[str] = Query(None, pattern="^(json|arrow)$")):
+    """最新行情"""
+    quote = _quote(symbol)
+
+    if quote is None:
+        raise HTTPException(status_code=404, detail=f"未找到股票 '{symbol}' 的数据")
+
+    if _wants_arrow(request, format):
+        return _arrow_response({name: [value] for name, value in quote.items()})
+
+    return JSONResponse(quote)
+
+
+@router.get("/quotes")
+def get_quotes(
+    request: Request,
+    symbols: str = Query(..., description="逗号分隔的股票名称或代码"),
+    format: Optional[str] = Query(None, pattern="^(json|arrow)$")
+):
+    """批量最新行情（找不到的股票列在missing中）"""
+    names = list(dict.fromkeys(name.strip() for name in symbols.split(",") if name.strip()))
+
+    if not names:
+        raise HTTPException(status_code=400, detail="symbols不能为空")
+
+    if len(names) > MAX_BATCH_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"单次最多查询{MAX_BATCH_SYMBOLS}只股票")
+
+    quotes = []
+    missing = []
+
+    for name in names:
+        quote = _quote(name)
+        if quote is None:
+            missing.append(name)
+        else:
+            quotes.append(quote)
+
+    if _wants_arrow(request, format):
+        fields = ("symbol", "key") + QUOTE_FIELDS
+        return _arrow_response({field: [quote[field] for quote in quotes] for field in fields})
+
+    return JSONResponse({"quotes": quotes, "missing": missing, "count": len(quotes)})
+
+
+@router.get("/indicators/{symbol}")
+def get_indicators(symbol: str, request: Request, format: Optional[str] = Query(None, pattern="^(json|arrow)$")):
+    """最新技术指标（MA、MACD、RSI、布林带、趋势、支撑/压力位、量比）"""
+    indicators = get_indicator_engine().get(symbol)
+
+    if indicators is None:
+        raise HTTPException(status_code=404, detail=f"未找到股票 '{symbol}' 的数据")
+
+    data = IndicatorResult.from_series(symbol, indicators).to_dict()
+    del data["type"], data["ok"], data["stock"]
+    data = {"symbol": symbol, "key": get_loader().get_catalog().resolve(symbol), **data}
+
+    if _wants_arrow(request, format):
+        return _arrow_response({name: [value] for name, value in _flatten(data).items()})
+
+    return JSONResponse(data)
+
+
+@router.get("/history/{symbol}")
+def get_history(
+    symbol: str,
+    request: Request,
+    days: int = Query(30, ge=1, le=MAX_HISTORY_DAYS),
+    start: Optional[str] = Query(None, description="起始日期（包含），YYYY-MM-DD"),
+    end: Optional[str] = Query(None, description="结束日期（包含），YYYY-MM-DD"),
+    columns: Optional[str] = Query(None, description="逗号分隔的列名，默认全部"),
+    format: Optional[str] = Query(None, pattern="^(json|arrow)$")
+):
+    """最近N个交易日的行情（按列返回，日期升序）"""
+    names = PANEL_COLUMNS
+    if columns:
+        names = tuple(dict.fromkeys(name.strip() for name in columns.split(",") if name.strip() not in ("", "date")))
+        unknown = [name for name in names if name not in PANEL_COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"不支持的列: {unknown}，可用列: {list(PANEL_COLUMNS)}")
+
+    try:
+        window = get_loader().get_window(symbol, names, last_n=days, start=start, end=end)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"日期格式有误：{e}")
+
+    if window is None:
+        raise HTTPException(status_code=404, detail=f"未找到股票 '{symbol}' 的数据")
+
+    window = {"date": window["date"], **{name: window[name] for name in names}}
+
+    if _wants_arrow(request, format):
+        return _arrow_response(window)
+
+    return JSONResponse({
+        "symbol": symbol,
+        "key": get_loader().get_catalog().resolve(symbol),
+        "count": len(window["date"]),
+        "columns": {name: jsonable(values) for name, values in window.items()}
+    })
+
+
+# ==================== 辅助函数 ====================
+
+def _quote(symbol: str) -> Optional[Dict[str, Any]]:
+    """最新行情（包含请求的symbol和解析后的股票键），股票不存在或无数据时返回None"""
+    loader = get_loader()
+    bar = loader.get_latest_price(symbol)
+
+    if bar is None:
+        return None
+
+    return {"symbol": symbol, "key": loader.get_catalog().resolve(symbol), **bar}
+
+
+def _wants_arrow(request: Request, format: Optional[str]) -> bool:
+    """format参数优先，未指定时按Accept头判断"""
+    if format is not None:
+        return format == "arrow"
+
+    return ARROW_MEDIA_TYPE in request.headers.get("accept", "")
+
+
+def _flatten(data: Dict[str, Any], prefix: str = "") -> Dict[str, Any]:
+    """嵌套字典展开为一层（键用.连接），用于单行的Arrow表"""
+    flat = {}
+
+    for key, value in data.items():
+        if isinstance(value, dict):
+            flat.update(_flatten(value, f"{prefix}{key}."))
+        else:
+            flat[f"{prefix}{key}"] = value
+
+    return flat
+
+
+def _arrow_response(columns: Dict[str, Any]) -> Response:
+    """按列的数据编码为Arrow IPC流"""
+    try:
+        import pyarrow as pa
+    except ImportError:
+        raise HTTPException(status_code=406, detail="服务端未安装pyarrow，无法返回Arrow格式")
+
+    table = pa.table({
+        name: pa.array(values, from_pandas=True) if isinstance(values, np.ndarray) else pa.array(values)
+        for name, values in columns.items()
+    })
+    sink = pa.BufferOutputStream()
+
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+
+    return Response(content=sink.getvalue().to_pybytes(), media_type=ARROW_MEDIA_TYPE)
@@ -4,13 +4,16 @@ FastAPI服务主入口
 提供股票咨询Agent的HTTP API接口
 """
 
-from fastapi import FastAPI, HTTPException, Request
-from fastapi.responses import StreamingResponse, JSONResponse
+from fastapi import FastAPI, HTTPException, Request, Body
+from fastapi.responses import StreamingResponse, JSONResponse, Response
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
-from typing import Optional, AsyncIterator
+from starlette.concurrency import iterate_in_threadpool
+from pydantic import BaseModel, ValidationError
+from typing import Optional, List, Dict, Any, AsyncIterator
 import asyncio
+import json
 import sys
+import time
 from pathlib import Path
 import yaml
 
@@ -18,7 +21,29 @@ import yaml
 sys.path.append(str(Path(__file__).parent.parent.parent.parent))
 
 from server.src.agent.stock_agent import get_agent
+from server.src.agent.batch import MAX_BATCH_QUERIES
 from server.src.llm.factory import create_llm_from_config_file
+from server.src.api.data_api import router as data_router
+from server.src.api.scheduler import (
+    RequestScheduler,
+    QueueFullError,
+    QueueWaitTimeout,
+    RequestTimeout
+)
+from server.src.data.stock_loader import get_loader
+from server.src.data.stock_analyzer import get_indicator_engine
+from server.src.data.watcher import StockDataWatcher
+from server.src.monitoring.metrics import (
+    REGISTRY,
+    CONTENT_TYPE,
+    REQUEST_SECONDS,
+    CACHE_ENTRIES,
+    CACHE_LOOKUPS,
+    QUEUE_DEPTH,
+    STOCK_PANEL_BYTES,
+    FRAME_CACHE_BYTES,
+    FRAME_CACHE_EVENTS
+)
 
 
 # ==================== 配置 ====================
@@ -31,6 +56,11 @@ with open(CONFIG_PATH, 'r', encoding='utf-8') as f:
 
 SERVER_HOST = server_config.get('server', {}).get('host', '0.0.0.0')
 SERVER_PORT = server_config.get('server', {}).get('port', 8765)
+MONITORING_ENABLED = server_config.get('monitoring', {}).get('enabled', True)
+
+# 管理接口（/admin/*）的令牌，auth.enabled为false时不校验
+AUTH_CONFIG = server_config.get('auth', {})
+ADMIN_TOKEN = AUTH_CONFIG.get('token') if AUTH_CONFIG.get('enabled', False) else None
 
 
 # ==================== FastAPI应用 ====================
@@ -50,6 +80,9 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 行情数据接口（/v1/*，不经过LLM）
+app.include_router(data_router)
+
 
 # ==================== 请求/响应模型 ====================
 
@@ -66,9 +99,21 @@ class QueryResponse(BaseModel):
     error: Optional[str] = None
 
 
+class BatchQueryRequest(BaseModel):
+    """批量查询请求"""
+    queries: List[str]
+
+
+class RefreshRequest(BaseModel):
+    """行情数据刷新请求"""
+    stocks: Optional[List[str]] = None  # 股票名称、代码或键，为空时重新加载全部
+
+
 # ==================== 全局变量 ====================
 
 agent = None
+scheduler: Optional[RequestScheduler] = None
+data_watcher: Optional[StockDataWatcher] = None
 
 
 # ==================== 生命周期 ====================
@@ -76,19 +121,49 @@ agent = None
 @app.on_event("startup")
 async def startup_event():
     """启动时初始化Agent"""
-    global agent
+    global agent, scheduler, data_watcher
     
     print("=" * 60)
     print("启动股票咨询Agent服务...")
     print("=" * 60)
     
+    # 行情DataFrame缓存的内存预算
+    frame_cache_mb = server_config.get('data', {}).get('frame_cache_mb')
+    if frame_cache_mb is not None:
+        get_loader().frame_cache.resize(int(frame_cache_mb * 1024 ** 2))
+    
+    # 预热行情数据（首次启动时生成合并的列存储，之后直接映射）
+    if server_config.get('data', {}).get('prewarm', True):
+        start = time.perf_counter()
+        panel = await asyncio.to_thread(get_loader().prewarm)
+        print(f"行情数据预热完成: {len(panel)}只股票, 耗时{time.perf_counter() - start:.2f}秒"
+              f"{'（内存映射）' if panel.mapped else ''}")
+        
+        # 预计算技术指标，避免首个请求承担全部股票的计算
+        start = time.perf_counter()
+        count = await asyncio.to_thread(get_indicator_engine().prewarm)
+        print(f"技术指标预计算完成: {count}只股票, 耗时{time.perf_counter() - start:.2f}秒")
+    
+    # 监视数据目录，行情文件更新后自动刷新（无需重启）
+    watch_interval = server_config.get('data', {}).get('watch_interval', 10)
+    if watch_interval and watch_interval > 0:
+        data_watcher = StockDataWatcher(get_loader(), watch_interval)
+        data_watcher.start()
+    
     # 初始化Agent
     agent = get_agent(CONFIG_PATH)
     
+    # 初始化请求调度器
+    scheduler = RequestScheduler.from_config(server_config)
+    
+    # 注册抓取时读取的仪表
+    _register_gauges()
+    
     print(f"\n服务已启动:")
     print(f"  - Host: {SERVER_HOST}")
     print(f"  - Port: {SERVER_PORT}")
     print(f"  - API Docs: http://{SERVER_HOST}:{SERVER_PORT}/docs")
+    print(f"  - 并发上限: {scheduler.max_concurrent}, 排队上限: {scheduler.max_queue_size}, 超时: {scheduler.timeout}秒")
     print("=" * 60)
 
 
@@ -96,6 +171,87 @@ async def startup_event():
 async def shutdown_event():
     """关闭时清理资源"""
     print("\n关闭服务...")
+    
+    if scheduler is not None:
+        scheduler.shutdown()
+    
+    if data_watcher is not None:
+        data_watcher.stop()
+
+
+# ==================== 监控 ====================
+
+@app.middleware("http")
+async def record_request_metrics(request: Request, call_next):
+    """记录每个请求的总耗时（流式响应计到最后一段发送完毕）"""
+    start = time.perf_counter()
+    
+    def observe(status: int):
+        # 使用路由模板作为标签，避免路径参数造成标签爆炸
+        route = request.scope.get("route")
+        REQUEST_SECONDS.observe(
+            time.perf_counter() - start,
+            method=request.method,
+            path=getattr(route, "path", "unmatched"),
+            status=str(status)
+        )
+    
+    try:
+        response = await call_next(request)
+    except Exception:
+        observe(500)
+        raise
+    
+    body = response.body_iterator
+    
+    async def body_with_timing():
+        try:
+            async for chunk in body:
+                yield chunk
+        finally:
+            observe(response.status_code)
+    
+    response.body_iterator = body_with_timing()
+    
+    return response
+
+
+def _register_gauges():
+    """注册缓存大小、排队数等仪表和缓存命中次数等计数器的回调"""
+    loader = get_loader()
+    
+    CACHE_ENTRIES.set_function(
+        lambda: len(agent.cache.local) if agent is not None and agent.cache.local is not None else 0,
+        cache="response"
+    )
+    CACHE_ENTRIES.set_function(lambda: loader.cache_stats()["frames"], cache="stock_frames")
+    STOCK_PANEL_BYTES.set_function(lambda: loader.cache_stats()["panel_bytes"])
+    FRAME_CACHE_BYTES.set_function(lambda: loader.frame_cache.nbytes)
+    
+    for result, attr in (("hit", "hits"), ("miss", "misses"), ("eviction", "evictions")):
+        FRAME_CACHE_EVENTS.set_function(lambda attr=attr: getattr(loader.frame_cache, attr), result=result)
+    
+    for namespace in ("tool", "answer"):
+        for key, result in (("hits", "hit"), ("misses", "miss")):
+            CACHE_LOOKUPS.set_function(
+                lambda namespace=namespace, key=key: (
+                    agent.cache.stats().get(namespace, {}).get(key, 0) if agent is not None else None
+                ),
+                namespace=namespace,
+                result=result
+            )
+    
+    QUEUE_DEPTH.set_function(lambda: scheduler.running, state="running")
+    QUEUE_DEPTH.set_function(lambda: scheduler.waiting, state="waiting")
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus格式的监控指标"""
+    if not MONITORING_ENABLED:
+        raise HTTPException(status_code=404, detail="监控未启用")
+    
+    return Response(content=REGISTRY.render(), media_type=CONTENT_TYPE)
 
 
 # ==================== API端点 ====================
@@ -116,10 +272,32 @@ async def health_check():
     """健康检查"""
     return {
         "status": "healthy",
-        "agent_ready": agent is not None
+        "agent_ready": agent is not None,
+        "data": get_loader().cache_stats(),
+        "data_watcher": data_watcher.stats() if data_watcher is not None else None,
+        "queue": scheduler.stats() if scheduler is not None else None,
+        "answers": agent.answer_stats() if agent is not None else None
     }
 
 
+@app.get("/queue")
+async def queue_status():
+    """请求队列状态"""
+    if scheduler is None:
+        raise HTTPException(status_code=503, detail="调度器未初始化")
+    
+    return scheduler.stats()
+
+
+@app.get("/cache")
+async def cache_stats():
+    """响应缓存统计（命中/未命中）"""
+    if agent is None:
+        raise HTTPException(status_code=503, detail="Agent未初始化")
+    
+    return agent.cache.stats()
+
+
 @app.post("/chat", response_model=QueryResponse)
 async def chat(request: QueryRequest):
     """
@@ -135,14 +313,17 @@ async def chat(request: QueryRequest):
         raise HTTPException(status_code=503, detail="Agent未初始化")
     
     try:
-        # 调用Agent
-        answer = agent.chat(request.query)
+        # 在工作线程中调用Agent（不阻塞事件循环）
+        answer = await scheduler.run(agent.chat, request.query)
         
         return QueryResponse(
             answer=answer,
             success=True
         )
     
+    except (QueueFullError, QueueWaitTimeout, RequestTimeout) as e:
+        raise _queue_http_error(e)
+    
     except Exception as e:
         return QueryResponse(
             answer="",
@@ -165,28 +346,111 @@ async def chat_stream(request: QueryRequest):
     if agent is None:
         raise HTTPException(status_code=503, detail="Agent未初始化")
     
+    # 先占用执行名额，排队已满或超时直接返回HTTP错误
+    deadline = time.monotonic() + scheduler.timeout
+    
+    try:
+        await scheduler.acquire(deadline)
+    except (QueueFullError, QueueWaitTimeout) as e:
+        raise _queue_http_error(e)
+    
     async def generate_stream() -> AsyncIterator[str]:
-        """生成流式响应"""
+        """生成流式响应（逐段转发LLM的增量输出）"""
+        stream = agent.query_stream(request.query)
+        
         try:
-            # 获取答案
-            answer = agent.chat(request.query)
-            
-            # 模拟流式输出（每次输出几个字符）
-            chunk_size = 10
-            for i in range(0, len(answer), chunk_size):
-                chunk = answer[i:i+chunk_size]
-                yield f"data: {chunk}\n\n"
-                await asyncio.sleep(0.05)  # 模拟延迟
+            while True:
+                # 每段输出都按剩余时间等待，生成卡住时也能按时结束
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise asyncio.TimeoutError
+                
+                try:
+                    delta = await asyncio.wait_for(stream.__anext__(), timeout=remaining)
+                except StopAsyncIteration:
+                    break
+                
+                yield _sse_event(delta)
             
             yield "data: [DONE]\n\n"
         
+        except asyncio.TimeoutError:
+            yield _sse_event(f"[ERROR: 请求处理超过{scheduler.timeout}秒]")
+        
         except Exception as e:
-            yield f"data: [ERROR: {str(e)}]\n\n"
+            yield _sse_event(f"[ERROR: {str(e)}]")
+        
+        finally:
+            # 超时或客户端断开时关闭生成器，取消LLM生成
+            await stream.aclose()
     
-    return StreamingResponse(
-        generate_stream(),
-        media_type="text/event-stream"
-    )
+    return _slot_response(generate_stream(), media_type="text/event-stream")
+
+
+@app.post("/chat/batch")
+async def chat_batch(request: BatchQueryRequest):
+    """
+    批量聊天接口（离线评估）
+    
+    相同的问题只处理一次，按路由/工具分组准备，提示词并发提交LLM；
+    结果按完成顺序以NDJSON逐行返回，每行包含index、answer、route和各阶段耗时。
+    整批只占用一个执行名额，不受单个请求的超时限制
+    
+    Args:
+        request: 批量查询请求
+        
+    Returns:
+        NDJSON流式响应
+    """
+    if agent is None:
+        raise HTTPException(status_code=503, detail="Agent未初始化")
+    
+    if len(request.queries) > MAX_BATCH_QUERIES:
+        raise HTTPException(status_code=413, detail=f"单次最多{MAX_BATCH_QUERIES}个问题")
+    
+    try:
+        await scheduler.acquire(time.monotonic() + scheduler.timeout)
+    except (QueueFullError, QueueWaitTimeout) as e:
+        raise _queue_http_error(e)
+    
+    async def generate_lines() -> AsyncIterator[str]:
+        async for item in iterate_in_threadpool(agent.chat_batch(request.queries)):
+            yield json.dumps(item.to_dict(), ensure_ascii=False) + "\n"
+    
+    return _slot_response(generate_lines(), media_type="application/x-ndjson")
+
+
+class SlotStreamingResponse(StreamingResponse):
+    """
+    占用调度器执行名额的流式响应
+    
+    名额在响应结束时释放，包括客户端在响应体开始之前就断开、
+    生成器从未被迭代（其finally不会执行）的情况
+    """
+    
+    def __init__(self, content, release, **kwargs):
+        super().__init__(content, **kwargs)
+        self._release = release
+    
+    async def __call__(self, scope, receive, send):
+        try:
+            await super().__call__(scope, receive, send)
+        finally:
+            self._release()
+
+
+def _slot_response(content, media_type: str) -> SlotStreamingResponse:
+    """为已占用名额的请求创建流式响应（创建失败时立即释放名额）"""
+    try:
+        return SlotStreamingResponse(content, scheduler.release, media_type=media_type)
+    except BaseException:
+        scheduler.release()
+        raise
+
+
+def _sse_event(data: str) -> str:
+    """格式化SSE事件（多行文本按协议拆成多个data行）"""
+    return "".join(f"data: {line}\n" for line in data.split("\n")) + "\n"
 
 
 @app.get("/tools")
@@ -209,11 +473,37 @@ async def list_tools():
     }
 
 
+@app.post("/tools/{tool_name}")
+async def run_tool(tool_name: str, arguments: Dict[str, Any] = Body(default_factory=dict), render: bool = False):
+    """
+    直接调用工具，返回结构化结果（不经过LLM）
+    
+    请求体为工具参数，如 {"stock": "比亚迪", "days": 10}；render=true时同时返回渲染后的文本
+    """
+    if agent is None:
+        raise HTTPException(status_code=503, detail="Agent未初始化")
+    
+    tool = agent.tools.get(tool_name)
+    if tool is None:
+        raise HTTPException(status_code=404, detail=f"工具 {tool_name} 不存在")
+    
+    try:
+        kwargs = tool.args_schema(**arguments).model_dump()
+    except ValidationError as e:
+        raise HTTPException(status_code=422, detail=e.errors(include_url=False))
+    
+    result = await asyncio.to_thread(agent.call_tool, tool_name, **kwargs)
+    
+    response = {"tool": tool_name, "result": result.to_dict()}
+    if render:
+        response["text"] = str(result)
+    
+    return response
+
+
 @app.get("/stocks")
 async def list_stocks():
     """列出所有支持的股票"""
-    from server.src.data.stock_loader import get_loader
-    
     loader = get_loader()
     stocks = loader.list_available_stocks()
     
@@ -223,8 +513,58 @@ async def list_stocks():
     }
 
 
+# ==================== 管理接口 ====================
+
+def _check_admin(request: Request):
+    """校验管理接口令牌（Authorization: Bearer <token>）"""
+    if ADMIN_TOKEN is None:
+        return
+    
+    if request.headers.get("Authorization", "") != f"Bearer {ADMIN_TOKEN}":
+        raise HTTPException(status_code=401, detail="管理令牌无效")
+
+
+@app.post("/admin/refresh")
+async def refresh_data(body: RefreshRequest, request: Request):
+    """
+    行情数据文件更新后刷新内存中的数据（增量更新脚本写入新K线后调用）
+    
+    重新读取指定股票，生成新的面板快照后整体替换，不影响正在处理的请求
+    """
+    _check_admin(request)
+    
+    start = time.perf_counter()
+    result = await asyncio.to_thread(get_loader().refresh, body.stocks)
+    result["seconds"] = round(time.perf_counter() - start, 3)
+    
+    return result
+
+
+@app.get("/admin/cache")
+async def data_cache_stats(request: Request):
+    """行情数据缓存统计（DataFrame缓存的条数、字节数、命中/未命中/淘汰次数和面板大小）"""
+    _check_admin(request)
+    
+    return get_loader().cache_stats()
+
+
 # ==================== 错误处理 ====================
 
+def _queue_http_error(error: Exception) -> HTTPException:
+    """把调度器异常转换为HTTP错误"""
+    if isinstance(error, QueueFullError):
+        return HTTPException(
+            status_code=429,
+            detail=f"服务繁忙：{error}",
+            headers={"Retry-After": "1"}
+        )
+    
+    if isinstance(error, QueueWaitTimeout):
+        return HTTPException(status_code=503, detail=f"服务繁忙：{error}")
+    
+    return HTTPException(status_code=504, detail=str(error))
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """全局异常处理"""
@@ -241,13 +581,22 @@ async def global_exception_handler(request: Request, exc: Exception):
 # ==================== 主函数 ====================
 
 def main():
-    """运行服务器"""
+    """运行服务器（server.workers大于1时以多进程模式运行）"""
     import uvicorn
     
+    workers = max(int(server_config.get('server', {}).get('workers', 1)), 1)
+    
+    if workers > 1:
+        # 先把行情数据转换为内存映射列存储，各worker只读映射同一份文件，
+        # 增加worker时行情数据不会重复占用内存
+        store_dir = get_loader().build_store()
+        print(f"多进程模式: {workers}个worker，共享行情数据 {store_dir}")
+    
     uvicorn.run(
         "server.src.api.main:app",
         host=SERVER_HOST,
         port=SERVER_PORT,
+        workers=workers,
         reload=False,
         log_level="info"
     )
@@ -0,0 +1,211 @@
+"""
+请求调度器
+
+把同步的Agent调用放到独立的工作线程池中执行，避免阻塞事件循环，
+并按配置文件中的queue段限制并发数、排队长度和请求超时
+"""
+
+import asyncio
+import functools
+import time
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import asynccontextmanager
+from typing import Callable, Dict, Any, AsyncIterator, Optional
+
+
+class QueueFullError(Exception):
+    """排队已满（对应HTTP 429）"""
+
+
+class QueueWaitTimeout(Exception):
+    """排队等待超时（对应HTTP 503）"""
+
+
+class RequestTimeout(Exception):
+    """请求执行超时（对应HTTP 504）"""
+
+
+class RequestScheduler:
+    """
+    有界并发的请求调度器
+
+    - 最多max_concurrent个请求同时执行，其余请求排队
+    - 排队请求超过max_queue_size时直接拒绝
+    - 每个请求从进入队列开始计时，超过timeout秒即返回超时
+    """
+
+    def __init__(
+        self,
+        max_concurrent: int = 3,
+        max_queue_size: int = 10,
+        timeout: float = 60
+    ):
+        self.max_concurrent = max_concurrent
+        self.max_queue_size = max_queue_size
+        self.timeout = timeout
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_concurrent,
+            thread_name_prefix="agent-worker"
+        )
+        self._slots: Optional[asyncio.Semaphore] = None
+
+        # 运行状态
+        self.running = 0
+        self.waiting = 0
+
+        # 统计
+        self.completed = 0
+        self.failed = 0
+        self.rejected = 0
+        self.timed_out = 0
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "RequestScheduler":
+        """
+        从配置创建调度器
+
+        Args:
+            config: 完整的服务端配置（使用其中的queue段）
+        """
+        queue_config = config.get('queue', {})
+
+        return cls(
+            max_concurrent=queue_config.get('max_concurrent', 3),
+            max_queue_size=queue_config.get('max_queue_size', 10),
+            timeout=queue_config.get('timeout', 60)
+        )
+
+    @property
+    def slots(self) -> asyncio.Semaphore:
+        # 在事件循环中首次使用时创建
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.max_concurrent)
+        return self._slots
+
+    async def acquire(self, deadline: float):
+        """
+        排队等待执行名额（使用完毕后必须调用release）
+
+        Args:
+            deadline: 截止时间（time.monotonic()）
+
+        Raises:
+            QueueFullError: 排队已满
+            QueueWaitTimeout: 等待名额超时
+        """
+        # 已接纳的请求数（执行中 + 排队中）达到上限时直接拒绝
+        if self.running + self.waiting >= self.max_concurrent + self.max_queue_size:
+            self.rejected += 1
+            raise QueueFullError(f"排队请求已达上限（{self.max_queue_size}）")
+
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            self.timed_out += 1
+            raise QueueWaitTimeout(f"排队等待超过{self.timeout}秒")
+
+        self.waiting += 1
+        try:
+            await asyncio.wait_for(self.slots.acquire(), timeout=remaining)
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise QueueWaitTimeout(f"排队等待超过{self.timeout}秒")
+        finally:
+            self.waiting -= 1
+
+        self.running += 1
+
+    def release(self):
+        """释放执行名额"""
+        self.running -= 1
+        self.slots.release()
+
+    @asynccontextmanager
+    async def slot(self, deadline: Optional[float] = None) -> AsyncIterator[None]:
+        """
+        占用一个执行名额
+
+        Args:
+            deadline: 截止时间（time.monotonic()），默认为当前时间 + timeout
+
+        Raises:
+            QueueFullError: 排队已满
+            QueueWaitTimeout: 等待名额超时
+        """
+        if deadline is None:
+            deadline = time.monotonic() + self.timeout
+
+        await self.acquire(deadline)
+
+        try:
+            yield
+        finally:
+            self.release()
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        在工作线程中执行同步函数
+
+        超时后立即返回，但工作线程无法被中断，
+        其名额会保留到函数真正结束为止，保证并发数不会超过上限
+
+        Args:
+            func: 同步函数
+            *args, **kwargs: 函数参数
+
+        Returns:
+            函数返回值
+
+        Raises:
+            QueueFullError: 排队已满
+            QueueWaitTimeout: 等待名额超时
+            RequestTimeout: 执行超时
+        """
+        deadline = time.monotonic() + self.timeout
+
+        await self.acquire(deadline)
+
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(self._executor, functools.partial(func, *args, **kwargs))
+        future.add_done_callback(self._on_done)
+
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(future),
+                timeout=max(deadline - time.monotonic(), 0)
+            )
+        except asyncio.TimeoutError:
+            self.timed_out += 1
+            raise RequestTimeout(f"请求处理超过{self.timeout}秒")
+
+    def _on_done(self, future: asyncio.Future):
+        """工作线程结束后释放名额"""
+        self.release()
+
+        if future.cancelled() or future.exception() is not None:
+            self.failed += 1
+        else:
+            self.completed += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取调度器状态
+
+        Returns:
+            包含并发、排队和统计信息的字典
+        """
+        return {
+            "max_concurrent": self.max_concurrent,
+            "max_queue_size": self.max_queue_size,
+            "timeout": self.timeout,
+            "running": self.running,
+            "waiting": self.waiting,
+            "completed": self.completed,
+            "failed": self.failed,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+        }
+
+    def shutdown(self):
+        """关闭工作线程池（不等待正在执行的请求）"""
+        self._executor.shutdown(wait=False)
@@ -0,0 +1,110 @@
+"""
+行情DataFrame缓存
+
+按字节预算限制的进程内LRU缓存：每项按DataFrame实际占用的内存计算大小，
+总大小超过预算时淘汰最久未使用的项，并统计命中、未命中和淘汰次数
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Optional, Dict, Hashable
+
+import pandas as pd
+
+
+def frame_nbytes(df: pd.DataFrame) -> int:
+    """DataFrame占用的字节数（包含索引和object列的实际内容）"""
+    return int(df.memory_usage(index=True, deep=True).sum())
+
+
+class FrameCache:
+    """按字节预算淘汰的LRU缓存（线程安全）"""
+    
+    def __init__(self, max_bytes: int = 256 * 1024 ** 2):
+        """
+        Args:
+            max_bytes: 字节预算，0表示不缓存
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: Hashable) -> Optional[pd.DataFrame]:
+        """获取缓存的DataFrame，不存在时返回None"""
+        with self._lock:
+            item = self._data.get(key)
+            
+            if item is None:
+                self.misses += 1
+                return None
+            
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[0]
+    
+    def set(self, key: Hashable, df: pd.DataFrame):
+        """写入缓存，超过预算时淘汰最久未使用的项（单项超过预算时不缓存）"""
+        size = frame_nbytes(df)
+        
+        with self._lock:
+            self._remove(key)
+            
+            if size > self.max_bytes:
+                return
+            
+            self._data[key] = (df, size)
+            self.nbytes += size
+            self._evict()
+    
+    def discard(self, stock_key: str):
+        """删除某只股票的全部缓存项（缓存键为以股票键开头的元组）"""
+        with self._lock:
+            for key in [k for k in self._data if k[0] == stock_key]:
+                self._remove(key)
+    
+    def resize(self, max_bytes: int):
+        """调整字节预算"""
+        with self._lock:
+            self.max_bytes = max_bytes
+            self._evict()
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+            self.nbytes = 0
+    
+    def stats(self) -> Dict:
+        """缓存统计"""
+        lookups = self.hits + self.misses
+        
+        return {
+            "entries": len(self._data),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+        }
+    
+    def __len__(self) -> int:
+        return len(self._data)
+    
+    def __contains__(self, key: Hashable) -> bool:
+        return key in self._data
+    
+    def _remove(self, key: Hashable):
+        item = self._data.pop(key, None)
+        if item is not None:
+            self.nbytes -= item[1]
+    
+    def _evict(self):
+        while self.nbytes > self.max_bytes and self._data:
+            _, (_, size) = self._data.popitem(last=False)
+            self.nbytes -= size
+            self.evictions += 1
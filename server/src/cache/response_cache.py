@@ -0,0 +1,262 @@
+"""
+响应缓存
+
+两级缓存：进程内LRU（带TTL）+ 可选的Redis协议后端，
+用于缓存工具结果（按工具名、参数和数据文件版本）和最终回答（按规范化问题和工具结果哈希）
+
+工具结果在进程内直接缓存结果对象，Redis中保存其紧凑JSON，读回时还原为结果对象
+"""
+
+import hashlib
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Any, Union
+
+from server.src.tools.results import ToolResult
+
+
+class LRUCache:
+    """进程内LRU缓存（线程安全，每项带过期时间）"""
+    
+    def __init__(self, max_entries: int = 1024, ttl: float = 3600):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key: str) -> Optional[str]:
+        """获取缓存值，不存在或已过期时返回None"""
+        with self._lock:
+            item = self._data.get(key)
+            
+            if item is None:
+                return None
+            
+            value, expires_at = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            
+            self._data.move_to_end(key)
+            return value
+    
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        """写入缓存，超过容量时淘汰最久未使用的项"""
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        
+        with self._lock:
+            self._data[key] = (value, expires_at)
+            self._data.move_to_end(key)
+            
+            while len(self._data) > self.max_entries:
+                self._data.popitem(last=False)
+    
+    def clear(self):
+        """清空缓存"""
+        with self._lock:
+            self._data.clear()
+    
+    def __len__(self) -> int:
+        return len(self._data)
+
+
+class RedisCache:
+    """
+    Redis协议缓存后端
+    
+    只依赖客户端的get/set(ex=)接口，可以传入redis.Redis，
+    也可以传入fakeredis等本地替身；后端出错时视为未命中，不影响主流程
+    """
+    
+    def __init__(self, client: Any, ttl: float = 3600, prefix: str = "stock-agent:"):
+        self.client = client
+        self.ttl = ttl
+        self.prefix = prefix
+        self.errors = 0
+    
+    @classmethod
+    def from_config(cls, cache_config: Dict[str, Any]) -> Optional["RedisCache"]:
+        """
+        根据配置连接Redis
+        
+        Args:
+            cache_config: 配置文件中的cache段
+            
+        Returns:
+            Redis后端，未安装redis包时返回None
+        """
+        try:
+            import redis
+        except ImportError:
+            print("⚠️  未安装redis，仅使用进程内缓存: pip install redis")
+            return None
+        
+        client = redis.Redis(
+            host=cache_config.get('redis_host', 'localhost'),
+            port=cache_config.get('redis_port', 6379),
+            db=cache_config.get('redis_db', 0),
+            socket_timeout=0.5
+        )
+        
+        return cls(client, ttl=cache_config.get('ttl', 3600))
+    
+    def get(self, key: str) -> Optional[str]:
+        try:
+            value = self.client.get(self.prefix + key)
+        except Exception:
+            self.errors += 1
+            return None
+        
+        if value is None:
+            return None
+        
+        return value.decode('utf-8') if isinstance(value, bytes) else value
+    
+    def set(self, key: str, value: str, ttl: Optional[float] = None):
+        try:
+            self.client.set(self.prefix + key, value.encode('utf-8'), ex=int(self.ttl if ttl is None else ttl))
+        except Exception:
+            self.errors += 1
+
+
+class ResponseCache:
+    """工具结果和最终回答的两级缓存"""
+    
+    NAMESPACES = ("tool", "answer")
+    
+    def __init__(
+        self,
+        local: Optional[LRUCache] = None,
+        remote: Optional[RedisCache] = None
+    ):
+        self.local = local
+        self.remote = remote
+        self._stats = {
+            namespace: {"hits": 0, "local_hits": 0, "remote_hits": 0, "misses": 0}
+            for namespace in self.NAMESPACES
+        }
+    
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ResponseCache":
+        """
+        从配置创建缓存
+        
+        Args:
+            config: 完整的服务端配置（使用其中的cache段）
+        """
+        cache_config = config.get('cache', {})
+        ttl = cache_config.get('ttl', 3600)
+        
+        local = None
+        if cache_config.get('local_enabled', True):
+            local = LRUCache(
+                max_entries=cache_config.get('local_max_entries', 1024),
+                ttl=ttl
+            )
+        
+        remote = None
+        if cache_config.get('enabled', False):
+            remote = RedisCache.from_config(cache_config)
+        
+        return cls(local=local, remote=remote)
+    
+    @property
+    def enabled(self) -> bool:
+        return self.local is not None or self.remote is not None
+    
+    # ==================== 键 ====================
+    
+    @staticmethod
+    def tool_key(tool_name: str, arguments: Dict[str, Any], data_version: str) -> str:
+        """工具结果的缓存键：工具名 + 参数 + 数据版本"""
+        payload = json.dumps([tool_name, arguments, data_version], ensure_ascii=False, sort_keys=True)
+        return "tool:" + _digest(payload)
+    
+    @staticmethod
+    def answer_key(user_query: str, route: str, context: str) -> str:
+        """最终回答的缓存键：规范化问题 + 路由 + 工具结果/知识的哈希"""
+        return "answer:" + _digest("\0".join([normalize_query(user_query), route, _digest(context)]))
+    
+    # ==================== 读写 ====================
+    
+    def get(self, namespace: str, key: str) -> Optional[Union[str, ToolResult]]:
+        """
+        按两级顺序查找缓存，Redis命中时回填进程内缓存
+        
+        Args:
+            namespace: tool 或 answer
+            key: 缓存键
+            
+        Returns:
+            tool命名空间为工具结果对象，answer命名空间为回答文本
+        """
+        stats = self._stats[namespace]
+        
+        if self.local is not None:
+            value = self.local.get(key)
+            if value is not None:
+                stats["hits"] += 1
+                stats["local_hits"] += 1
+                return value
+        
+        if self.remote is not None:
+            value = self.remote.get(key)
+            if value is not None:
+                stats["hits"] += 1
+                stats["remote_hits"] += 1
+                if namespace == "tool":
+                    value = ToolResult.from_json(value)
+                if self.local is not None:
+                    self.local.set(key, value)
+                return value
+        
+        stats["misses"] += 1
+        return None
+    
+    def set(self, key: str, value: Union[str, ToolResult]):
+        """写入两级缓存（工具结果对象在Redis中保存为JSON）"""
+        if self.local is not None:
+            self.local.set(key, value)
+        
+        if self.remote is not None:
+            self.remote.set(key, value if isinstance(value, str) else value.to_json())
+    
+    def clear(self):
+        """清空进程内缓存（Redis中的数据按TTL自然过期）"""
+        if self.local is not None:
+            self.local.clear()
+    
+    def stats(self) -> Dict[str, Any]:
+        """
+        获取缓存统计
+        
+        Returns:
+            各命名空间的命中/未命中次数和命中率，以及缓存大小
+        """
+        result = {}
+        
+        for namespace, stats in self._stats.items():
+            total = stats["hits"] + stats["misses"]
+            result[namespace] = dict(stats, hit_rate=round(stats["hits"] / total, 4) if total else 0.0)
+        
+        result["local_size"] = len(self.local) if self.local is not None else 0
+        result["local_max_entries"] = self.local.max_entries if self.local is not None else 0
+        result["remote"] = self.remote is not None
+        result["remote_errors"] = self.remote.errors if self.remote is not None else 0
+        
+        return result
+
+
+_PUNCTUATION = re.compile(r"[\s？?！!。，,、~～]+")
+
+
+def normalize_query(query: str) -> str:
+    """规范化问题：小写并去掉空白和标点"""
+    return _PUNCTUATION.sub("", query.lower())
+
+
+def _digest(text: str) -> str:
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
@@ -0,0 +1,674 @@
+"""
+股票面板数据存储
+
+将所有股票的行情数据加载到连续的NumPy数组中（列式存储），
+通过股票ID和偏移量定位每只股票的数据区间，
+最新价格和尾部窗口查询都是O(1)的数组切片
+
+面板可以保存为每列一个.npy文件的目录（内存映射列存储），
+多个进程以只读方式映射同一份文件，物理内存只占一份
+"""
+
+import json
+import os
+import shutil
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional, Dict, List, Iterable, Iterator, Tuple
+import numpy as np
+import pandas as pd
+
+
+# 面板中保存的数值列（date单独保存）
+PANEL_COLUMNS = ("open", "high", "low", "close", "volume", "change_pct")
+
+# 内存映射列存储的格式版本，格式变化时旧目录自动失效
+STORE_VERSION = 1
+
+# 各列的存储类型
+COLUMN_DTYPES = {
+    "open": np.float64,
+    "high": np.float64,
+    "low": np.float64,
+    "close": np.float64,
+    "volume": np.int64,
+    "change_pct": np.float64,
+}
+
+
+class StockPanel:
+    """
+    列式股票面板
+
+    所有股票的同一列首尾相接存放在一个数组中，
+    第i只股票的数据位于 [offsets[i], offsets[i+1]) 区间内
+    """
+
+    def __init__(
+        self,
+        keys: List[str],
+        dates: np.ndarray,
+        columns: Dict[str, np.ndarray],
+        offsets: np.ndarray
+    ):
+        """
+        Args:
+            keys: 股票键列表（文件名，格式：股票名称_代码）
+            dates: 日期数组（datetime64[D]）
+            columns: 列名到数组的映射
+            offsets: 每只股票的起始偏移，长度为股票数+1
+        """
+        self.keys = list(keys)
+        self.dates = dates
+        self.columns = columns
+        self.offsets = offsets
+        self._ids: Dict[str, int] = {key: i for i, key in enumerate(self.keys)}
+
+    # ==================== 构建 ====================
+
+    @classmethod
+    def from_frames(cls, frames: Dict[str, pd.DataFrame]) -> "StockPanel":
+        """
+        从多个DataFrame构建面板
+
+        Args:
+            frames: 股票键到DataFrame的映射
+
+        Returns:
+            股票面板
+        """
+        keys = list(frames.keys())
+        return cls._assemble(keys, [_frame_arrays(frames[key]) for key in keys])
+
+    @classmethod
+    def from_files(cls, file_paths: Iterable[Path], max_workers: Optional[int] = None) -> "StockPanel":
+        """
+        从parquet文件构建面板（每只股票一个文件，文件名即股票键）
+
+        Args:
+            file_paths: parquet文件路径
+            max_workers: 读取线程数，默认按CPU核数
+
+        Returns:
+            股票面板（读取失败的文件会被跳过）
+        """
+        return cls.from_sources({path.stem: [path] for path in file_paths}, max_workers)
+
+    @classmethod
+    def from_sources(cls, sources: Dict[str, List[Path]], max_workers: Optional[int] = None) -> "StockPanel":
+        """
+        从parquet文件构建面板
+
+        用线程池并行读取和转换各股票（parquet解码时会释放GIL）
+
+        Args:
+            sources: 股票键到数据文件列表的映射（完整历史文件和按年分区文件，
+                     同一日期出现多次时以列表中靠后的文件为准）
+            max_workers: 读取线程数，默认按CPU核数
+
+        Returns:
+            股票面板（读取失败的股票会被跳过）
+        """
+        keys = sorted(sources)
+        results = read_stocks([sources[key] for key in keys], max_workers)
+
+        present = [i for i, result in enumerate(results) if result is not None]
+
+        return cls._assemble([keys[i] for i in present], [results[i] for i in present])
+
+    @classmethod
+    def _assemble(cls, keys: List[str], arrays: List[Dict[str, np.ndarray]]) -> "StockPanel":
+        """把每只股票的列数组首尾相接拼成面板"""
+        offsets = np.zeros(len(keys) + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum([len(item["date"]) for item in arrays])
+
+        if arrays:
+            dates = np.concatenate([item["date"] for item in arrays])
+            columns = {name: np.concatenate([item[name] for item in arrays]) for name in COLUMN_DTYPES}
+        else:
+            dates = np.empty(0, dtype="datetime64[D]")
+            columns = {name: np.empty(0, dtype=dtype) for name, dtype in COLUMN_DTYPES.items()}
+
+        return cls(keys, dates, columns, offsets)
+
+    def replace(
+        self,
+        arrays: Dict[str, Dict[str, np.ndarray]],
+        remove: Iterable[str] = ()
+    ) -> "StockPanel":
+        """
+        生成替换了部分股票数据的新面板（原面板不变，正在使用它的查询不受影响）
+
+        Args:
+            arrays: 股票键到列数组的映射（见read_stocks），
+                    已有的股票原位替换，新股票追加在末尾
+            remove: 要移除的股票键
+
+        Returns:
+            新面板
+        """
+        remove = set(remove)
+        keys = [key for key in self.keys if key not in remove]
+        keys += [key for key in arrays if key not in self._ids]
+        stock_arrays = []
+
+        for key in keys:
+            if key in arrays:
+                stock_arrays.append(arrays[key])
+            else:
+                sid = self._ids[key]
+                stock_arrays.append({name: self.column(sid, name) for name in ("date",) + tuple(self.columns)})
+
+        return self._assemble(keys, stock_arrays)
+
+    # ==================== 内存映射列存储 ====================
+
+    def save(self, directory: Path, source: Optional[Dict] = None):
+        """
+        保存为内存映射列存储
+
+        先写入临时目录再整体替换，正在映射旧文件的进程不受影响
+
+        Args:
+            directory: 存储目录
+            source: 源数据指纹（见files_fingerprint），用于判断是否过期
+        """
+        directory = Path(directory)
+        tmp = directory.with_name(f"{directory.name}.tmp{os.getpid()}")
+        old = directory.with_name(f"{directory.name}.old{os.getpid()}")
+
+        shutil.rmtree(tmp, ignore_errors=True)
+        tmp.mkdir(parents=True)
+
+        np.save(tmp / "dates.npy", self.dates)
+        np.save(tmp / "offsets.npy", self.offsets)
+        for name, values in self.columns.items():
+            np.save(tmp / f"{name}.npy", values)
+
+        meta = {
+            "version": STORE_VERSION,
+            "keys": self.keys,
+            "columns": list(self.columns),
+            "source": source,
+        }
+        (tmp / "meta.json").write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+
+        if directory.exists():
+            os.replace(directory, old)
+        os.replace(tmp, directory)
+        shutil.rmtree(old, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory: Path, source: Optional[Dict] = None) -> Optional["StockPanel"]:
+        """
+        以只读内存映射方式加载列存储
+
+        Args:
+            directory: 存储目录
+            source: 当前源数据指纹，为None时不检查是否过期
+
+        Returns:
+            股票面板，目录不存在、格式不符、已过期或正在被替换时返回None
+        """
+        meta_path = Path(directory) / "meta.json"
+
+        if not meta_path.exists():
+            return None
+
+        # 其他进程可能正在替换列存储：读取失败按未命中处理，
+        # 读取前后元数据不一致说明数组可能来自不同版本，同样放弃
+        try:
+            meta_text = meta_path.read_text(encoding="utf-8")
+            meta = json.loads(meta_text)
+
+            if meta.get("version") != STORE_VERSION:
+                return None
+
+            if source is not None and meta.get("source") != source:
+                return None
+
+            directory = Path(directory)
+
+            panel = cls(
+                keys=meta["keys"],
+                dates=np.load(directory / "dates.npy", mmap_mode="r"),
+                columns={
+                    name: np.load(directory / f"{name}.npy", mmap_mode="r")
+                    for name in meta["columns"]
+                },
+                offsets=np.load(directory / "offsets.npy")
+            )
+
+            if meta_path.read_text(encoding="utf-8") != meta_text:
+                return None
+        except (OSError, ValueError, KeyError):
+            return None
+
+        return panel
+
+    @property
+    def mapped(self) -> bool:
+        """数据是否来自内存映射文件"""
+        return isinstance(self.dates, np.memmap)
+
+    # ==================== 查询 ====================
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._ids
+
+    @property
+    def nbytes(self) -> int:
+        """面板占用的字节数"""
+        return self.dates.nbytes + sum(arr.nbytes for arr in self.columns.values())
+
+    def stock_id(self, key: str) -> Optional[int]:
+        """根据股票键获取股票ID"""
+        return self._ids.get(key)
+
+    def bounds(self, sid: int) -> Tuple[int, int]:
+        """获取股票数据在面板中的区间 [start, end)"""
+        return int(self.offsets[sid]), int(self.offsets[sid + 1])
+
+    def length(self, sid: int) -> int:
+        """获取股票的数据条数"""
+        start, end = self.bounds(sid)
+        return end - start
+
+    def column(self, sid: int, name: str) -> np.ndarray:
+        """获取股票某一列的全部数据（视图，不复制）"""
+        start, end = self.bounds(sid)
+        return self._array(name)[start:end]
+
+    def tail(self, sid: int, name: str, n: int) -> np.ndarray:
+        """获取股票某一列最近n条数据（视图，不复制）"""
+        start, end = self.bounds(sid)
+        return self._array(name)[max(start, end - n):end]
+
+    def lengths(self) -> np.ndarray:
+        """每只股票的数据条数"""
+        return np.diff(self.offsets)
+
+    def tail_matrix(self, name: str, n: int) -> np.ndarray:
+        """
+        获取所有股票某一列最近n条数据组成的矩阵
+
+        Args:
+            name: 列名
+            n: 每只股票取最近n条
+
+        Returns:
+            形状为 (股票数, n) 的float64矩阵，右对齐，
+            最后一列为各股票的最新数据，历史不足n条的股票左侧填NaN
+        """
+        starts, ends = self.offsets[:-1], self.offsets[1:]
+        index = ends[:, None] - n + np.arange(n)
+        valid = index >= starts[:, None]
+
+        values = self._array(name)
+        if len(values) == 0:
+            return np.full((len(self.keys), n), np.nan)
+
+        matrix = values[np.where(valid, index, 0)].astype(np.float64)
+        matrix[~valid] = np.nan
+
+        return matrix
+
+    def latest(self, sid: int) -> Optional[Dict]:
+        """
+        获取最新一条行情
+
+        Args:
+            sid: 股票ID
+
+        Returns:
+            包含最新价格信息的字典，无数据时返回None
+        """
+        return latest_bar(self.window(sid, last_n=1))
+
+    def window(
+        self,
+        sid: int,
+        columns: Optional[Iterable[str]] = None,
+        last_n: Optional[int] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        获取股票的一段数据（视图，不复制）
+
+        Args:
+            sid: 股票ID
+            columns: 只取这些列（date列总是包含），None表示全部
+            last_n: 只取最近n条（与日期范围同时给出时取范围内的最近n条）
+            start: 起始日期（包含），YYYY-MM-DD
+            end: 结束日期（包含），YYYY-MM-DD
+
+        Returns:
+            列名到数组的映射
+        """
+        lo, hi = self.bounds(sid)
+
+        if start is not None or end is not None:
+            dates = self.dates[lo:hi]
+            if end is not None:
+                hi = lo + int(np.searchsorted(dates, np.datetime64(end, "D"), side="right"))
+            if start is not None:
+                lo = lo + int(np.searchsorted(dates, np.datetime64(start, "D"), side="left"))
+            hi = max(lo, hi)
+
+        if last_n is not None:
+            lo = max(lo, hi - last_n)
+
+        data = {"date": self.dates[lo:hi]}
+        for name in (PANEL_COLUMNS if columns is None else columns):
+            if name != "date":
+                data[name] = self.columns[name][lo:hi]
+
+        return data
+
+    def to_frame(
+        self,
+        sid: int,
+        last_n: Optional[int] = None,
+        columns: Optional[Iterable[str]] = None
+    ) -> pd.DataFrame:
+        """
+        将股票数据转换为DataFrame
+
+        Args:
+            sid: 股票ID
+            last_n: 只取最近n条，None表示全部
+            columns: 只取这些列（date列总是包含），None表示全部
+
+        Returns:
+            股票数据DataFrame
+        """
+        return pd.DataFrame(self.window(sid, columns, last_n))
+
+    def _array(self, name: str) -> np.ndarray:
+        return self.dates if name == "date" else self.columns[name]
+
+
+@contextmanager
+def store_lock(directory: Path) -> Iterator[None]:
+    """
+    列存储的跨进程写锁
+
+    多个worker同时发现列存储过期时只有一个进程重建，其他进程等待后直接映射。
+    使用fcntl文件锁，不支持的平台上不加锁
+
+    Args:
+        directory: 存储目录（锁文件为同级的<目录名>.lock）
+    """
+    try:
+        import fcntl
+    except ImportError:
+        yield
+        return
+
+    directory = Path(directory)
+    directory.parent.mkdir(parents=True, exist_ok=True)
+
+    with open(directory.with_name(f"{directory.name}.lock"), "a") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def files_fingerprint(file_paths: Iterable[Path], root: Optional[Path] = None) -> Dict[str, List[int]]:
+    """
+    源数据文件的指纹（文件名 -> [大小, 修改时间]）
+
+    Args:
+        file_paths: 数据文件路径
+        root: 数据目录，给出时以相对路径作为文件名（区分不同股票的同名分区文件）
+    """
+    fingerprint = {}
+
+    for file_path in sorted(file_paths):
+        name = file_path.relative_to(root).as_posix() if root is not None else file_path.name
+        stat = file_path.stat()
+        fingerprint[name] = [stat.st_size, stat.st_mtime_ns]
+
+    return fingerprint
+
+
+def read_stocks(
+    sources: List[List[Path]],
+    max_workers: Optional[int] = None
+) -> List[Optional[Dict[str, np.ndarray]]]:
+    """
+    并行读取多只股票的数据文件
+
+    Args:
+        sources: 每只股票的数据文件列表
+        max_workers: 读取线程数，默认按CPU核数
+
+    Returns:
+        每只股票的列数组，读取失败时为None
+    """
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+
+    with ThreadPoolExecutor(max_workers=max(max_workers, 1)) as pool:
+        return list(pool.map(_read_stock, sources))
+
+
+def latest_bar(arrays: Dict[str, np.ndarray]) -> Optional[Dict]:
+    """
+    数据窗口中的最后一条行情
+
+    Args:
+        arrays: 列名到数组的映射（需包含date和PANEL_COLUMNS）
+
+    Returns:
+        包含最新价格信息的字典，无数据时返回None
+    """
+    if len(arrays["date"]) == 0:
+        return None
+
+    change_pct = arrays["change_pct"][-1]
+
+    return {
+        "date": str(arrays["date"][-1]),
+        "open": float(arrays["open"][-1]),
+        "close": float(arrays["close"][-1]),
+        "high": float(arrays["high"][-1]),
+        "low": float(arrays["low"][-1]),
+        "volume": int(arrays["volume"][-1]),
+        "change_pct": None if np.isnan(change_pct) else float(change_pct)
+    }
+
+
+def read_window(
+    file_paths: List[Path],
+    columns: Optional[Iterable[str]] = None,
+    last_n: Optional[int] = None,
+    start: Optional[str] = None,
+    end: Optional[str] = None
+) -> Optional[Dict[str, np.ndarray]]:
+    """
+    直接从数据文件读取一只股票的一段数据（不加载面板）
+
+    只读取需要的列；按年分区文件先按文件名中的年份裁剪，
+    日期范围通过parquet行组统计信息和谓词下推过滤，
+    最近n条从最新的文件和行组开始倒序读取，够n条即停止
+
+    Args:
+        file_paths: 股票的数据文件（见scan_stock_files）
+        columns: 只取这些列（date列总是包含），None表示全部
+        last_n: 只取最近n条
+        start: 起始日期（包含），YYYY-MM-DD
+        end: 结束日期（包含），YYYY-MM-DD
+
+    Returns:
+        列名到数组的映射（与StockPanel.window一致），读取失败时返回None
+    """
+    import pyarrow.parquet as pq
+
+    names = [name for name in (PANEL_COLUMNS if columns is None else columns) if name != "date"]
+    files = [path for path in file_paths if _year_overlaps(path, start, end)]
+    frames: List[pd.DataFrame] = []
+
+    try:
+        # 倒序读取：分区文件按年份排在完整历史文件之后
+        for path in reversed(files):
+            parquet = pq.ParquetFile(path)
+            available = [name for name in ["date"] + names if name in parquet.schema_arrow.names]
+
+            if start is not None or end is not None:
+                filters = _date_filters(parquet.schema_arrow.field("date").type, start, end)
+                table = pq.read_table(path, columns=available, filters=filters)
+            elif last_n is not None:
+                table = _read_tail(parquet, available, last_n)
+            else:
+                table = parquet.read(columns=available)
+
+            frames.insert(0, table.to_pandas())
+
+            if last_n is not None and _unique_rows(frames) >= last_n:
+                break
+    except Exception as e:
+        print(f"读取股票数据失败 {file_paths[0].name if file_paths else ''}: {e}")
+        return None
+
+    df = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame({"date": pd.Series([], dtype=object)})
+    arrays = _frame_arrays(df, names)
+
+    if len(frames) > 1:
+        arrays = _dedupe_dates(arrays)
+
+    if last_n is not None:
+        arrays = {name: values[-last_n:] if last_n else values[:0] for name, values in arrays.items()}
+
+    return arrays
+
+
+def _frame_arrays(df: pd.DataFrame, names: Optional[Iterable[str]] = None) -> Dict[str, np.ndarray]:
+    """
+    把单只股票的DataFrame转换为面板各列的数组（缺失的列用NaN或0填充）
+
+    Args:
+        df: 股票数据
+        names: 需要的列（不含date），None表示面板的全部列
+    """
+    arrays = {"date": _to_dates(df["date"])}
+
+    for name in (COLUMN_DTYPES if names is None else names):
+        dtype = COLUMN_DTYPES[name]
+        if name in df.columns:
+            values = df[name]
+            if dtype is np.int64:
+                values = values.fillna(0)
+            arrays[name] = values.to_numpy(dtype=dtype)
+        else:
+            arrays[name] = np.full(len(df), np.nan if dtype is np.float64 else 0, dtype=dtype)
+
+    return arrays
+
+
+def _read_stock(file_paths: List[Path]) -> Optional[Dict[str, np.ndarray]]:
+    """读取一只股票的全部数据文件并转换为列数组，失败时返回None"""
+    try:
+        frames = [pd.read_parquet(path, columns=_existing_columns(path)) for path in file_paths]
+    except Exception as e:
+        print(f"读取股票数据失败 {file_paths[0].name}: {e}")
+        return None
+
+    if not frames:
+        return None
+
+    arrays = _frame_arrays(frames[0] if len(frames) == 1 else pd.concat(frames, ignore_index=True))
+
+    if len(frames) > 1:
+        arrays = _dedupe_dates(arrays)
+
+    return arrays
+
+
+def _dedupe_dates(arrays: Dict[str, np.ndarray]) -> Dict[str, np.ndarray]:
+    """按日期排序，同一日期保留最后出现的一条（后面的文件更新）"""
+    order = np.argsort(arrays["date"], kind="stable")
+    dates = arrays["date"][order]
+    keep = np.append(dates[1:] != dates[:-1], True)
+    return {name: values[order[keep]] for name, values in arrays.items()}
+
+
+def _unique_rows(frames: List[pd.DataFrame]) -> int:
+    """多个文件合并去重后的条数"""
+    return len(set().union(*(frame["date"].astype(str) for frame in frames)))
+
+
+def _year_overlaps(file_path: Path, start: Optional[str], end: Optional[str]) -> bool:
+    """按年分区文件（年份.parquet）是否与日期范围相交，完整历史文件总是需要读取"""
+    if not file_path.stem.isdigit():
+        return True
+
+    year = file_path.stem
+    return (start is None or year >= start[:4]) and (end is None or year <= end[:4])
+
+
+def _date_filters(date_type, start: Optional[str], end: Optional[str]) -> List[Tuple]:
+    """日期范围的parquet过滤条件（日期列为字符串时按YYYY-MM-DD字符串比较）"""
+    import pyarrow as pa
+
+    is_string = pa.types.is_string(date_type) or pa.types.is_large_string(date_type)
+    # 结束日期按“早于下一天”比较，带时间部分的日期也能包含在内
+    upper = pd.Timestamp(end) + pd.Timedelta(days=1) if end is not None else None
+
+    def bound(value: pd.Timestamp):
+        if is_string:
+            return value.strftime("%Y-%m-%d")
+        if pa.types.is_date(date_type):
+            return value.date()
+        return value
+
+    filters = []
+    if start is not None:
+        filters.append(("date", ">=", bound(pd.Timestamp(start))))
+    if upper is not None:
+        filters.append(("date", "<", bound(upper)))
+    return filters
+
+
+def _read_tail(parquet, columns: List[str], n: int):
+    """从最后一个行组开始倒序读取，直到够n条"""
+    import pyarrow as pa
+
+    groups, rows = [], 0
+    for i in reversed(range(parquet.num_row_groups)):
+        groups.insert(0, i)
+        rows += parquet.metadata.row_group(i).num_rows
+        if rows >= n:
+            break
+
+    if not groups:
+        return parquet.schema_arrow.empty_table().select(columns)
+
+    return pa.concat_tables([parquet.read_row_group(i, columns=columns) for i in groups])
+
+
+def _to_dates(values: pd.Series) -> np.ndarray:
+    """将日期列统一转换为datetime64[D]"""
+    # ISO格式的日期字符串直接由NumPy解析，比pd.to_datetime快数倍
+    try:
+        return values.to_numpy().astype("datetime64[D]")
+    except (ValueError, TypeError):
+        return pd.to_datetime(values).to_numpy().astype("datetime64[D]")
+
+
+def _existing_columns(file_path: Path) -> Optional[List[str]]:
+    """只读取面板需要的列"""
+    try:
+        import pyarrow.parquet as pq
+        names = pq.read_schema(file_path).names
+    except Exception:
+        return None
+
+    return [name for name in ("date",) + PANEL_COLUMNS if name in names]
@@ -0,0 +1,388 @@
+"""
+全市场选股
+
+把所有股票最近一段行情取成 股票 × 日期 的矩阵，
+一次向量化计算出每只股票的最新指标，再用筛选表达式和排序表达式选出股票。
+表达式只允许字段名、数字、四则运算、比较和 and/or/not，例如：
+
+    rsi < 30 and close > ma20
+    change_20d
+"""
+
+import ast
+import operator
+import re
+import threading
+from dataclasses import dataclass, field
+from typing import Optional, Dict, List, Callable, Set
+
+import numpy as np
+
+from .panel_store import PANEL_COLUMNS
+from .stock_analyzer import (
+    MACD_SLOW, MACD_SIGNAL, RSI_PERIOD, BOLL_PERIOD,
+    rolling_mean_2d, macd_2d, rsi_2d, boll_2d, volume_ratio_2d, period_change_2d
+)
+
+
+# 每只股票参与计算的最近交易日数
+# （覆盖最长的均线和涨跌幅窗口，EMA起点之前的历史影响可以忽略）
+LOOKBACK = 250
+
+# 可用字段及说明（maN中的N可以是1到LOOKBACK之间的任意整数，change_Nd中的N为2到LOOKBACK；
+# change_Nd是最近N个交易日首尾收盘价的涨跌幅，当日涨跌幅用change_pct）
+SCREEN_FIELDS = {
+    "close": "收盘价",
+    "open": "开盘价",
+    "high": "最高价",
+    "low": "最低价",
+    "volume": "成交量",
+    "change_pct": "今日涨跌幅(%)",
+    "ma5": "5日均线",
+    "ma10": "10日均线",
+    "ma20": "20日均线",
+    "ma60": "60日均线",
+    "dif": "MACD DIF",
+    "dea": "MACD DEA",
+    "macd": "MACD柱",
+    "rsi": "RSI(14)",
+    "boll_upper": "布林上轨",
+    "boll_middle": "布林中轨",
+    "boll_lower": "布林下轨",
+    "volume_ratio": "量比",
+    "change_5d": "5日涨跌幅(%)",
+    "change_20d": "20日涨跌幅(%)",
+    "change_60d": "60日涨跌幅(%)",
+}
+
+_MA_PATTERN = re.compile(r"ma(\d+)$")
+_CHANGE_PATTERN = re.compile(r"change_(\d+)d$")
+
+_BINARY_OPERATORS = {
+    ast.Add: operator.add,
+    ast.Sub: operator.sub,
+    ast.Mult: operator.mul,
+    ast.Div: operator.truediv,
+}
+
+_COMPARE_OPERATORS = {
+    ast.Lt: operator.lt,
+    ast.LtE: operator.le,
+    ast.Gt: operator.gt,
+    ast.GtE: operator.ge,
+    ast.Eq: operator.eq,
+    ast.NotEq: operator.ne,
+}
+
+
+class ScreenerError(ValueError):
+    """选股表达式错误"""
+
+
+# ==================== 表达式 ====================
+
+class ScreenExpression:
+    """
+    选股表达式
+
+    用ast解析并校验，只允许白名单中的语法节点和字段，
+    计算时每个字段是一个长度为股票数的数组
+    """
+
+    def __init__(self, source: str):
+        self.source = source.strip()
+
+        try:
+            tree = ast.parse(self.source, mode="eval")
+        except SyntaxError:
+            raise ScreenerError(f"表达式语法错误: {source}")
+
+        self.fields: Set[str] = set()
+        self._check(tree.body)
+        self._tree = tree.body
+
+    def _check(self, node: ast.AST):
+        """校验语法节点并收集字段名"""
+        if isinstance(node, ast.BoolOp):
+            for value in node.values:
+                self._check(value)
+        elif isinstance(node, ast.UnaryOp) and isinstance(node.op, (ast.Not, ast.USub, ast.UAdd)):
+            self._check(node.operand)
+        elif isinstance(node, ast.BinOp) and type(node.op) in _BINARY_OPERATORS:
+            self._check(node.left)
+            self._check(node.right)
+        elif isinstance(node, ast.Compare) and all(type(op) in _COMPARE_OPERATORS for op in node.ops):
+            self._check(node.left)
+            for comparator in node.comparators:
+                self._check(comparator)
+        elif isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "abs" \
+                and len(node.args) == 1 and not node.keywords:
+            self._check(node.args[0])
+        elif isinstance(node, ast.Name):
+            name = node.id.lower()
+            if _CHANGE_PATTERN.match(name) and not is_screen_field(name):
+                raise ScreenerError(f"区间涨跌幅字段 {node.id} 的天数应在2到{LOOKBACK}之间（当日涨跌幅用change_pct）")
+            if not is_screen_field(name):
+                raise ScreenerError(f"未知字段: {node.id}（可用字段: {', '.join(SCREEN_FIELDS)}）")
+            self.fields.add(name)
+        elif isinstance(node, ast.Constant) and isinstance(node.value, (int, float)) \
+                and not isinstance(node.value, bool):
+            pass
+        else:
+            raise ScreenerError(f"表达式中不支持的写法: {ast.dump(node)[:40]}")
+
+    def evaluate(self, fields: Callable[[str], np.ndarray]):
+        """
+        计算表达式
+
+        Args:
+            fields: 根据字段名返回数组的函数
+
+        Returns:
+            数组（或常数）
+        """
+        with np.errstate(divide="ignore", invalid="ignore"):
+            return self._evaluate(self._tree, fields)
+
+    def _evaluate(self, node: ast.AST, fields: Callable[[str], np.ndarray]):
+        if isinstance(node, ast.BoolOp):
+            combine = np.logical_and if isinstance(node.op, ast.And) else np.logical_or
+            result = self._evaluate(node.values[0], fields)
+            for value in node.values[1:]:
+                result = combine(result, self._evaluate(value, fields))
+            return result
+
+        if isinstance(node, ast.UnaryOp):
+            operand = self._evaluate(node.operand, fields)
+            if isinstance(node.op, ast.Not):
+                return np.logical_not(operand)
+            return -operand if isinstance(node.op, ast.USub) else operand
+
+        if isinstance(node, ast.BinOp):
+            return _BINARY_OPERATORS[type(node.op)](
+                self._evaluate(node.left, fields),
+                self._evaluate(node.right, fields)
+            )
+
+        if isinstance(node, ast.Compare):
+            # 链式比较：a < b < c 等价于 a < b and b < c
+            left = self._evaluate(node.left, fields)
+            result = True
+            for op, comparator in zip(node.ops, node.comparators):
+                right = self._evaluate(comparator, fields)
+                result = np.logical_and(result, _COMPARE_OPERATORS[type(op)](left, right))
+                left = right
+            return result
+
+        if isinstance(node, ast.Call):
+            return np.abs(self._evaluate(node.args[0], fields))
+
+        if isinstance(node, ast.Name):
+            return fields(node.id.lower())
+
+        return node.value
+
+    def __str__(self) -> str:
+        return self.source
+
+
+def is_screen_field(name: str) -> bool:
+    """判断是否为可用字段"""
+    if name in SCREEN_FIELDS:
+        return True
+
+    match = _MA_PATTERN.match(name)
+    if match:
+        return 1 <= int(match.group(1)) <= LOOKBACK
+
+    # change_1d的首尾是同一天，恒为NaN
+    match = _CHANGE_PATTERN.match(name)
+    return match is not None and 2 <= int(match.group(1)) <= LOOKBACK
+
+
+# ==================== 选股器 ====================
+
+@dataclass
+class ScreenMatch:
+    """选股结果"""
+    total: int  # 参与筛选的股票数
+    matched: int  # 符合条件的股票数
+    keys: List[str] = field(default_factory=list)  # 排序后前N只股票的键
+    values: Dict[str, List[float]] = field(default_factory=dict)  # 字段 -> 与keys对应的值
+
+
+class StockScreener:
+    """
+    基于一份面板数据的选股器
+
+    字段按需计算并缓存，同一份面板上的后续查询只做表达式求值和排序
+    """
+
+    def __init__(self, panel, lookback: int = LOOKBACK):
+        """
+        Args:
+            panel: 股票面板（StockPanel）
+            lookback: 每只股票参与计算的最近交易日数
+        """
+        self.panel = panel
+        self.lookback = lookback
+        self._lengths = panel.lengths()
+        self._matrices: Dict[str, np.ndarray] = {}
+        self._fields: Dict[str, np.ndarray] = {}
+        self._lock = threading.Lock()
+
+    def matrix(self, column: str) -> np.ndarray:
+        """行情列的 股票 × 日期 矩阵"""
+        matrix = self._matrices.get(column)
+
+        if matrix is None:
+            matrix = self.panel.tail_matrix(column, self.lookback)
+            self._matrices[column] = matrix
+
+        return matrix
+
+    def field(self, name: str) -> np.ndarray:
+        """
+        获取字段的最新值
+
+        Args:
+            name: 字段名
+
+        Returns:
+            长度为股票数的数组，数据不足时为NaN
+        """
+        values = self._fields.get(name)
+
+        if values is None:
+            with self._lock:
+                values = self._fields.get(name)
+                if values is None:
+                    self._compute(name)
+                    values = self._fields[name]
+
+        return values
+
+    def _compute(self, name: str):
+        """计算字段（一次计算同组的全部字段）"""
+        if name in PANEL_COLUMNS:
+            self._fields[name] = self.matrix(name)[:, -1]
+            return
+
+        close = self.matrix("close")
+
+        match = _MA_PATTERN.match(name)
+        if match:
+            self._fields[name] = rolling_mean_2d(close[:, -int(match.group(1)):], int(match.group(1)))[:, -1]
+            return
+
+        match = _CHANGE_PATTERN.match(name)
+        if match:
+            days = int(match.group(1))
+            self._fields[name] = period_change_2d(close[:, -days:], days)[:, -1]
+            return
+
+        if name in ("dif", "dea", "macd"):
+            # 与IndicatorSeries.macd()一致：数据不足时不给出MACD
+            too_short = self._lengths < MACD_SLOW + MACD_SIGNAL
+            for key, values in macd_2d(close).items():
+                latest = values[:, -1].copy()
+                latest[too_short] = np.nan
+                self._fields[key] = latest
+            return
+
+        # 只有最新值需要时，窗口类指标只取所需的最近几列
+        if name == "rsi":
+            self._fields[name] = rsi_2d(close[:, -(RSI_PERIOD + 1):])[:, -1]
+        elif name.startswith("boll_"):
+            for key, values in boll_2d(close[:, -BOLL_PERIOD:]).items():
+                self._fields[key] = values[:, -1]
+        elif name == "volume_ratio":
+            self._fields[name] = volume_ratio_2d(self.matrix("volume")[:, -6:])[:, -1]
+        else:
+            raise ScreenerError(f"未知字段: {name}")
+
+    def screen(
+        self,
+        condition: Optional[str] = None,
+        sort_by: Optional[str] = None,
+        ascending: bool = False,
+        top_n: int = 10,
+        columns: Optional[List[str]] = None
+    ) -> ScreenMatch:
+        """
+        选股
+
+        Args:
+            condition: 筛选表达式，如"rsi < 30 and close > ma20"，为空表示不筛选
+            sort_by: 排序表达式，如"change_20d"，为空表示按面板顺序
+            ascending: 是否升序
+            top_n: 返回前N只
+            columns: 结果中附带的字段，默认为close、change_pct以及表达式中用到的字段
+
+        Returns:
+            选股结果
+
+        Raises:
+            ScreenerError: 表达式错误
+        """
+        total = len(self.panel)
+        selected = self._lengths > 0
+
+        expressions = []
+
+        if condition:
+            expression = ScreenExpression(condition)
+            expressions.append(expression)
+            selected = selected & np.broadcast_to(np.asarray(expression.evaluate(self.field), dtype=bool), (total,))
+
+        candidates = np.flatnonzero(selected)
+
+        if sort_by:
+            expression = ScreenExpression(sort_by)
+            expressions.append(expression)
+            scores = np.broadcast_to(np.asarray(expression.evaluate(self.field), dtype=np.float64), (total,))
+
+            # NaN（数据不足）排在最后
+            keys = scores[candidates] if ascending else -scores[candidates]
+            keys = np.where(np.isnan(keys), np.inf, keys)
+
+            if len(candidates) > top_n > 0:
+                part = np.argpartition(keys, top_n - 1)[:top_n]
+                candidates, keys = candidates[part], keys[part]
+
+            candidates = candidates[np.lexsort((candidates, keys))]
+
+        matched = int(selected.sum())
+        candidates = candidates[:max(top_n, 0)]
+
+        if columns is None:
+            columns = ["close", "change_pct"]
+            for expression in expressions:
+                columns.extend(sorted(expression.fields - set(columns)))
+            if sort_by and sort_by.strip().lower() not in columns and is_screen_field(sort_by.strip().lower()):
+                columns.append(sort_by.strip().lower())
+
+        return ScreenMatch(
+            total=total,
+            matched=matched,
+            keys=[self.panel.keys[i] for i in candidates],
+            values={name: [float(v) for v in self.field(name)[candidates]] for name in columns}
+        )
+
+
+# ==================== 全局实例 ====================
+
+_screener: Optional[StockScreener] = None
+
+
+def get_screener() -> StockScreener:
+    """获取基于当前面板数据的选股器（面板更新后自动重建）"""
+    global _screener
+
+    from .stock_loader import get_loader
+    panel = get_loader().get_panel()
+
+    if _screener is None or _screener.panel is not panel:
+        _screener = StockScreener(panel)
+
+    return _screener
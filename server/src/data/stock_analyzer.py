@@ -2,8 +2,10 @@
 股票技术指标计算
 
 计算常用的技术指标：MA, MACD, RSI, BOLL等
+并提供预计算、可增量更新的指标引擎（IndicatorEngine）
 """
 
+import threading
 from typing import Dict, Optional
 import pandas as pd
 import numpy as np
@@ -66,13 +68,17 @@ def calculate_macd(
     # MACD柱
     macd = (dif - dea) * 2
     
-    # 返回最新值
+    return _macd_summary(dif.to_numpy(), dea.to_numpy(), macd.to_numpy())
+
+
+def _macd_summary(dif: np.ndarray, dea: np.ndarray, macd: np.ndarray) -> Dict:
+    """根据DIF/DEA/MACD序列生成最新值和金叉死叉信号"""
     return {
-        "DIF": round(dif.iloc[-1], 2),
-        "DEA": round(dea.iloc[-1], 2),
-        "MACD": round(macd.iloc[-1], 2),
-        "signal": "金叉" if dif.iloc[-1] > dea.iloc[-1] and dif.iloc[-2] <= dea.iloc[-2] else 
-                  "死叉" if dif.iloc[-1] < dea.iloc[-1] and dif.iloc[-2] >= dea.iloc[-2] else "持有"
+        "DIF": round(dif[-1], 2),
+        "DEA": round(dea[-1], 2),
+        "MACD": round(macd[-1], 2),
+        "signal": "金叉" if dif[-1] > dea[-1] and dif[-2] <= dea[-2] else 
+                  "死叉" if dif[-1] < dea[-1] and dif[-2] >= dea[-2] else "持有"
     }
 
 
@@ -143,15 +149,18 @@ def calculate_boll(
     upper = middle + (std * std_dev)
     lower = middle - (std * std_dev)
     
-    current_price = close.iloc[-1]
-    
+    return _boll_summary(upper.iloc[-1], middle.iloc[-1], lower.iloc[-1], close.iloc[-1])
+
+
+def _boll_summary(upper: float, middle: float, lower: float, current_price: float) -> Dict:
+    """根据布林带上中下轨和当前价格生成描述"""
     return {
-        "upper": round(upper.iloc[-1], 2),
-        "middle": round(middle.iloc[-1], 2),
-        "lower": round(lower.iloc[-1], 2),
+        "upper": round(upper, 2),
+        "middle": round(middle, 2),
+        "lower": round(lower, 2),
         "current": round(current_price, 2),
-        "position": "上轨附近" if current_price > upper.iloc[-1] * 0.98 else
-                    "下轨附近" if current_price < lower.iloc[-1] * 1.02 else
+        "position": "上轨附近" if current_price > upper * 0.98 else
+                    "下轨附近" if current_price < lower * 1.02 else
                     "中轨附近"
     }
 
@@ -170,7 +179,13 @@ def analyze_trend(df: pd.DataFrame) -> str:
         return "数据不足"
     
     ma = calculate_ma(df, [5, 10, 20])
-    current_price = df.iloc[-1]["close"]
+    
+    return _trend_from(ma, df.tail(5)["close"].to_numpy())
+
+
+def _trend_from(ma: Dict[str, float], recent_close: np.ndarray) -> str:
+    """根据均线和最近5日收盘价判断趋势"""
+    current_price = recent_close[-1]
     
     # 判断多空排列
     if "MA5" in ma and "MA10" in ma and "MA20" in ma:
@@ -180,8 +195,7 @@ def analyze_trend(df: pd.DataFrame) -> str:
             return "弱势下跌（空头排列）"
     
     # 判断近期走势
-    recent_5 = df.tail(5)
-    change_5d = ((recent_5.iloc[-1]["close"] - recent_5.iloc[0]["close"]) / recent_5.iloc[0]["close"]) * 100
+    change_5d = ((recent_close[-1] - recent_close[0]) / recent_close[0]) * 100
     
     if change_5d > 5:
         return "短期强势上涨"
@@ -207,12 +221,14 @@ def get_support_resistance(df: pd.DataFrame, period: int = 20) -> Dict:
     
     recent = df.tail(period)
     
-    support = recent["low"].min()
-    resistance = recent["high"].max()
-    
+    return _support_resistance_from(recent["low"].to_numpy(), recent["high"].to_numpy())
+
+
+def _support_resistance_from(low: np.ndarray, high: np.ndarray) -> Dict:
+    """根据区间最低价和最高价计算支撑位和压力位"""
     return {
-        "support": round(support, 2),
-        "resistance": round(resistance, 2)
+        "support": round(low.min(), 2),
+        "resistance": round(high.max(), 2)
     }
 
 
@@ -229,11 +245,16 @@ def calculate_volume_ratio(df: pd.DataFrame) -> Optional[float]:
     if len(df) < 6:
         return None
     
+    return _volume_ratio_from(df.tail(6)["volume"].to_numpy())
+
+
+def _volume_ratio_from(volume: np.ndarray) -> Optional[float]:
+    """根据最近6日成交量计算量比（今日 / 过去5日均值）"""
     # 今日成交量
-    current_volume = df.iloc[-1]["volume"]
+    current_volume = volume[-1]
     
     # 过去5日平均成交量
-    avg_volume = df.tail(6).iloc[:-1]["volume"].mean()
+    avg_volume = volume[:-1].mean()
     
     if avg_volume == 0:
         return None
@@ -241,3 +262,497 @@ def calculate_volume_ratio(df: pd.DataFrame) -> Optional[float]:
     volume_ratio = current_volume / avg_volume
     
     return round(volume_ratio, 2)
+
+
+# ==================== 增量指标引擎 ====================
+
+# 指标参数（与上面各calculate_*函数的默认参数一致）
+MA_PERIODS = (5, 10, 20, 60)
+MACD_FAST = 12
+MACD_SLOW = 26
+MACD_SIGNAL = 9
+RSI_PERIOD = 14
+BOLL_PERIOD = 20
+BOLL_STD = 2.0
+
+# 指标列（除原始行情列外）
+INDICATOR_COLUMNS = (
+    tuple(f"ma{p}" for p in MA_PERIODS) +
+    ("ema_fast", "ema_slow", "dif", "dea", "macd",
+     "gain", "loss", "rsi",
+     "boll_middle", "boll_upper", "boll_lower")
+)
+
+# 原始行情列
+BAR_COLUMNS = ("close", "high", "low", "volume")
+
+
+def _ema_alpha(span: int) -> float:
+    """EMA平滑系数（与pandas ewm(span, adjust=False)一致）"""
+    return 2.0 / (span + 1)
+
+
+class IndicatorSeries:
+    """
+    单只股票的指标列
+    
+    创建时对全部历史一次性向量化计算各指标列，
+    之后每追加一根K线只更新最新一行（EMA携带状态，
+    滑动窗口指标只看固定长度的窗口），耗时与历史长度无关
+    """
+    
+    def __init__(
+        self,
+        close: np.ndarray,
+        high: np.ndarray,
+        low: np.ndarray,
+        volume: np.ndarray
+    ):
+        self._size = len(close)
+        self._data: Dict[str, np.ndarray] = {}
+        
+        capacity = max(self._size * 2, 64)
+        bars = {"close": close, "high": high, "low": low, "volume": volume}
+        
+        for name, values in bars.items():
+            self._data[name] = _with_capacity(np.asarray(values, dtype=np.float64), capacity)
+        
+        for name, values in self._precompute(pd.Series(bars["close"], dtype=np.float64)).items():
+            self._data[name] = _with_capacity(values, capacity)
+    
+    @staticmethod
+    def _precompute(close: pd.Series) -> Dict[str, np.ndarray]:
+        """向量化计算全部指标列"""
+        columns = {}
+        
+        for period in MA_PERIODS:
+            columns[f"ma{period}"] = close.rolling(window=period).mean()
+        
+        # MACD
+        ema_fast = close.ewm(span=MACD_FAST, adjust=False).mean()
+        ema_slow = close.ewm(span=MACD_SLOW, adjust=False).mean()
+        dif = ema_fast - ema_slow
+        dea = dif.ewm(span=MACD_SIGNAL, adjust=False).mean()
+        
+        columns["ema_fast"] = ema_fast
+        columns["ema_slow"] = ema_slow
+        columns["dif"] = dif
+        columns["dea"] = dea
+        columns["macd"] = (dif - dea) * 2
+        
+        # RSI
+        delta = close.diff()
+        gain = delta.where(delta > 0, 0)
+        loss = -delta.where(delta < 0, 0)
+        avg_gain = gain.rolling(window=RSI_PERIOD).mean()
+        avg_loss = loss.rolling(window=RSI_PERIOD).mean()
+        
+        columns["gain"] = gain
+        columns["loss"] = loss
+        columns["rsi"] = 100 - (100 / (1 + avg_gain / avg_loss))
+        
+        # 布林带
+        middle = close.rolling(window=BOLL_PERIOD).mean()
+        std = close.rolling(window=BOLL_PERIOD).std()
+        
+        columns["boll_middle"] = middle
+        columns["boll_upper"] = middle + std * BOLL_STD
+        columns["boll_lower"] = middle - std * BOLL_STD
+        
+        return {name: values.to_numpy(dtype=np.float64) for name, values in columns.items()}
+    
+    def __len__(self) -> int:
+        return self._size
+    
+    def column(self, name: str) -> np.ndarray:
+        """获取某一列（视图，不复制）"""
+        return self._data[name][:self._size]
+    
+    def copy(self) -> "IndicatorSeries":
+        """复制指标列（增量更新在副本上进行，不影响仍在读取旧版本的调用方）"""
+        series = object.__new__(IndicatorSeries)
+        series._size = self._size
+        series._data = {name: values.copy() for name, values in self._data.items()}
+        return series
+    
+    def append(self, close: float, high: float, low: float, volume: float):
+        """
+        追加一根K线并增量更新各指标
+        
+        Args:
+            close: 收盘价
+            high: 最高价
+            low: 最低价
+            volume: 成交量
+        """
+        n = self._size
+        
+        if n == len(self._data["close"]):
+            for name, values in self._data.items():
+                self._data[name] = _with_capacity(values[:n], n * 2)
+        
+        d = self._data
+        d["close"][n] = close
+        d["high"][n] = high
+        d["low"][n] = low
+        d["volume"][n] = volume
+        
+        size = n + 1
+        closes = d["close"][:size]
+        
+        for period in MA_PERIODS:
+            d[f"ma{period}"][n] = closes[-period:].mean() if size >= period else np.nan
+        
+        # MACD（EMA递推）
+        if n == 0:
+            d["ema_fast"][n] = close
+            d["ema_slow"][n] = close
+            d["dif"][n] = 0.0
+            d["dea"][n] = 0.0
+        else:
+            fast, slow, signal = _ema_alpha(MACD_FAST), _ema_alpha(MACD_SLOW), _ema_alpha(MACD_SIGNAL)
+            d["ema_fast"][n] = fast * close + (1 - fast) * d["ema_fast"][n - 1]
+            d["ema_slow"][n] = slow * close + (1 - slow) * d["ema_slow"][n - 1]
+            d["dif"][n] = d["ema_fast"][n] - d["ema_slow"][n]
+            d["dea"][n] = signal * d["dif"][n] + (1 - signal) * d["dea"][n - 1]
+        d["macd"][n] = (d["dif"][n] - d["dea"][n]) * 2
+        
+        # RSI（固定窗口）
+        delta = close - closes[-2] if n > 0 else 0.0
+        d["gain"][n] = max(delta, 0.0)
+        d["loss"][n] = max(-delta, 0.0)
+        
+        if size >= RSI_PERIOD:
+            avg_gain = d["gain"][size - RSI_PERIOD:size].mean()
+            avg_loss = d["loss"][size - RSI_PERIOD:size].mean()
+            with np.errstate(divide="ignore", invalid="ignore"):
+                d["rsi"][n] = 100 - (100 / (1 + np.float64(avg_gain) / avg_loss))
+        else:
+            d["rsi"][n] = np.nan
+        
+        # 布林带（固定窗口）
+        if size >= BOLL_PERIOD:
+            window = closes[-BOLL_PERIOD:]
+            middle = window.mean()
+            std = window.std(ddof=1)
+            d["boll_middle"][n] = middle
+            d["boll_upper"][n] = middle + std * BOLL_STD
+            d["boll_lower"][n] = middle - std * BOLL_STD
+        else:
+            d["boll_middle"][n] = d["boll_upper"][n] = d["boll_lower"][n] = np.nan
+        
+        self._size = size
+    
+    # ==================== 最新指标值 ====================
+    # 返回格式与对应的calculate_*函数一致
+    
+    def ma(self, periods: tuple = MA_PERIODS) -> Dict[str, float]:
+        """移动平均线"""
+        return {
+            f"MA{period}": round(self._data[f"ma{period}"][self._size - 1], 2)
+            for period in periods
+            if self._size >= period
+        }
+    
+    def macd(self) -> Optional[Dict]:
+        """MACD指标"""
+        if self._size < MACD_SLOW + MACD_SIGNAL:
+            return None
+        
+        tail = slice(self._size - 2, self._size)
+        return _macd_summary(
+            self._data["dif"][tail],
+            self._data["dea"][tail],
+            self._data["macd"][tail]
+        )
+    
+    def rsi(self) -> Optional[float]:
+        """RSI指标"""
+        if self._size < RSI_PERIOD + 1:
+            return None
+        
+        return round(self._data["rsi"][self._size - 1], 2)
+    
+    def boll(self) -> Optional[Dict]:
+        """布林带指标"""
+        if self._size < BOLL_PERIOD:
+            return None
+        
+        i = self._size - 1
+        return _boll_summary(
+            self._data["boll_upper"][i],
+            self._data["boll_middle"][i],
+            self._data["boll_lower"][i],
+            self._data["close"][i]
+        )
+    
+    def trend(self) -> str:
+        """趋势判断"""
+        if self._size < 20:
+            return "数据不足"
+        
+        return _trend_from(self.ma((5, 10, 20)), self.column("close")[-5:])
+    
+    def support_resistance(self, period: int = 20) -> Dict:
+        """支撑位和压力位"""
+        if self._size < period:
+            return {}
+        
+        return _support_resistance_from(
+            self.column("low")[-period:],
+            self.column("high")[-period:]
+        )
+    
+    def volume_ratio(self) -> Optional[float]:
+        """量比"""
+        if self._size < 6:
+            return None
+        
+        return _volume_ratio_from(self.column("volume")[-6:])
+
+
+def _with_capacity(values: np.ndarray, capacity: int) -> np.ndarray:
+    """复制数组到指定容量的缓冲区（多余部分填NaN）"""
+    buffer = np.full(max(capacity, len(values)), np.nan, dtype=np.float64)
+    buffer[:len(values)] = values
+    return buffer
+
+
+class IndicatorEngine:
+    """
+    指标引擎
+    
+    每只股票在首次查询时计算指标列，之后同一份面板数据直接复用（prewarm()可在启动时一次算完）；
+    面板更新后，对只追加了新K线的股票在旧指标列的副本上增量更新，其他股票重新计算。
+    每份面板对应一组独立的指标列，已返回的指标列不会被修改
+    """
+    
+    def __init__(self, loader=None):
+        self._loader = loader
+        self._series: Dict[str, IndicatorSeries] = {}   # 当前面板已计算的指标列
+        self._latest: Dict[str, IndicatorSeries] = {}   # 每只股票最近一次计算的指标列（增量更新的基础）
+        self._panel = None
+        self._lock = threading.Lock()
+    
+    @property
+    def loader(self):
+        if self._loader is None:
+            from .stock_loader import get_loader
+            self._loader = get_loader()
+        return self._loader
+    
+    def get(self, stock: str) -> Optional[IndicatorSeries]:
+        """
+        获取股票的指标列
+        
+        Args:
+            stock: 股票名称或代码
+            
+        Returns:
+            指标列，股票不存在或无数据时返回None
+        """
+        # 股票ID和指标列都基于同一份面板，期间发生刷新也不会混用新旧数据
+        panel = self.loader.get_panel()
+        
+        key = self.loader.get_catalog().resolve(stock)
+        sid = panel.stock_id(key) if key is not None else None
+        
+        if sid is None:
+            return None
+        
+        series = self._series_for(panel, sid)
+        
+        if len(series) == 0:
+            return None
+        
+        return series
+    
+    def prewarm(self) -> int:
+        """
+        为当前面板的所有股票计算指标列
+        
+        Returns:
+            股票数量
+        """
+        panel = self.loader.get_panel()
+        
+        for sid in range(len(panel.keys)):
+            self._series_for(panel, sid)
+        
+        return len(panel.keys)
+    
+    def _series_for(self, panel, sid: int) -> IndicatorSeries:
+        """获取面板中某只股票的指标列（计算在锁外进行）"""
+        key = panel.keys[sid]
+        
+        with self._lock:
+            if panel is not self._panel:
+                self._panel = panel
+                self._series = {}
+            
+            series = self._series.get(key)
+            if series is not None:
+                return series
+            
+            base = self._latest.get(key)
+        
+        bars = {name: panel.column(sid, name) for name in BAR_COLUMNS}
+        
+        if base is None or not _is_prefix(base, bars):
+            series = IndicatorSeries(**bars)
+        elif len(base) < len(bars["close"]):
+            series = base.copy()
+            for i in range(len(series), len(bars["close"])):
+                series.append(*(float(bars[name][i]) for name in BAR_COLUMNS))
+        else:
+            series = base
+        
+        with self._lock:
+            # 计算期间面板可能已切换，此时只返回结果、不写入新面板的缓存
+            if panel is self._panel:
+                series = self._series.setdefault(key, series)
+            self._latest[key] = series
+        
+        return series
+
+
+def _is_prefix(series: IndicatorSeries, bars: Dict[str, np.ndarray]) -> bool:
+    """
+    判断已有指标列是否为新数据的前缀（只追加了新K线）
+    
+    比较重叠部分的全部K线：历史被修订或复权后即使最后一根相同也要全量重算，
+    否则会沿用过期的EMA/RSI状态
+    """
+    n = len(series)
+    
+    if n == 0 or n > len(bars["close"]):
+        return False
+    
+    return all(
+        np.array_equal(series.column(name), np.asarray(bars[name][:n], dtype=np.float64), equal_nan=True)
+        for name in BAR_COLUMNS
+    )
+
+
+# 全局实例
+_engine: Optional[IndicatorEngine] = None
+
+
+def get_indicator_engine() -> IndicatorEngine:
+    """获取全局指标引擎实例"""
+    global _engine
+    
+    if _engine is None:
+        _engine = IndicatorEngine()
+    
+    return _engine
+
+
+# ==================== 截面指标（股票 × 日期矩阵） ====================
+#
+# 以下函数的输入是右对齐的二维矩阵：每行一只股票，每列一个交易日，
+# 最后一列为最新交易日，历史不足的股票在左侧用NaN填充（见StockPanel.tail_matrix）。
+# 指标定义与上面的calculate_*函数和IndicatorSeries一致，返回同样形状的矩阵
+
+def rolling_mean_2d(values: np.ndarray, window: int) -> np.ndarray:
+    """滑动平均（窗口内有NaN时结果为NaN）"""
+    result = np.full(values.shape, np.nan, dtype=np.float64)
+    
+    if values.shape[1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=1)
+        result[:, window - 1:] = windows.mean(axis=-1)
+    
+    return result
+
+
+def rolling_std_2d(values: np.ndarray, window: int) -> np.ndarray:
+    """滑动标准差（样本标准差，与pandas rolling().std()一致）"""
+    result = np.full(values.shape, np.nan, dtype=np.float64)
+    
+    if values.shape[1] >= window:
+        windows = np.lib.stride_tricks.sliding_window_view(values, window, axis=1)
+        result[:, window - 1:] = windows.std(axis=-1, ddof=1)
+    
+    return result
+
+
+def ema_2d(values: np.ndarray, span: int) -> np.ndarray:
+    """
+    指数移动平均（与pandas ewm(span, adjust=False)一致）
+    
+    每行从第一个非NaN值开始递推；矩阵只包含最近一段历史时，
+    起点之前的历史对结果的影响按(1 - alpha)^列数衰减
+    """
+    alpha = _ema_alpha(span)
+    result = np.empty(values.shape, dtype=np.float64)
+    
+    if values.shape[1] == 0:
+        return result
+    
+    result[:, 0] = values[:, 0]
+    
+    for t in range(1, values.shape[1]):
+        previous = result[:, t - 1]
+        result[:, t] = np.where(
+            np.isnan(previous),
+            values[:, t],
+            alpha * values[:, t] + (1 - alpha) * previous
+        )
+    
+    return result
+
+
+def macd_2d(close: np.ndarray) -> Dict[str, np.ndarray]:
+    """MACD（DIF、DEA、MACD柱）"""
+    dif = ema_2d(close, MACD_FAST) - ema_2d(close, MACD_SLOW)
+    dea = ema_2d(dif, MACD_SIGNAL)
+    
+    return {"dif": dif, "dea": dea, "macd": (dif - dea) * 2}
+
+
+def rsi_2d(close: np.ndarray, period: int = RSI_PERIOD) -> np.ndarray:
+    """RSI（简单平均，需要period + 1个交易日）"""
+    delta = np.full(close.shape, np.nan, dtype=np.float64)
+    delta[:, 1:] = np.diff(close, axis=1)
+    
+    gain = np.where(delta > 0, delta, np.where(np.isnan(delta), np.nan, 0.0))
+    loss = np.where(delta < 0, -delta, np.where(np.isnan(delta), np.nan, 0.0))
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return 100 - (100 / (1 + rolling_mean_2d(gain, period) / rolling_mean_2d(loss, period)))
+
+
+def boll_2d(close: np.ndarray) -> Dict[str, np.ndarray]:
+    """布林带（上轨、中轨、下轨）"""
+    middle = rolling_mean_2d(close, BOLL_PERIOD)
+    std = rolling_std_2d(close, BOLL_PERIOD)
+    
+    return {
+        "boll_upper": middle + std * BOLL_STD,
+        "boll_middle": middle,
+        "boll_lower": middle - std * BOLL_STD,
+    }
+
+
+def volume_ratio_2d(volume: np.ndarray) -> np.ndarray:
+    """量比（当日成交量 / 前5日平均成交量）"""
+    result = np.full(volume.shape, np.nan, dtype=np.float64)
+    average = rolling_mean_2d(volume, 5)
+    
+    with np.errstate(divide="ignore", invalid="ignore"):
+        result[:, 1:] = volume[:, 1:] / average[:, :-1]
+    
+    result[~np.isfinite(result)] = np.nan
+    
+    return result
+
+
+def period_change_2d(close: np.ndarray, days: int) -> np.ndarray:
+    """区间涨跌幅（%）：最近days个交易日的首尾收盘价"""
+    result = np.full(close.shape, np.nan, dtype=np.float64)
+    
+    if days >= 2 and close.shape[1] >= days:
+        start = close[:, :close.shape[1] - days + 1]
+        result[:, days - 1:] = (close[:, days - 1:] - start) / start * 100
+    
+    return result
@@ -1,46 +1,294 @@
 """
 股票数据加载器
 
-从parquet文件中加载股票数据
+从parquet文件中加载股票数据，统一存放在列式面板（StockPanel）中；
+数据目录下存在与parquet文件一致的内存映射列存储（.panel目录）时直接映射该存储
+
+每只股票的数据可以是一个完整历史文件（股票名称_代码.parquet），
+也可以加上按年分区的增量文件（股票名称_代码/年份.parquet，由增量更新器写入）
+
+数据文件变化后通过refresh()重新加载（见watcher.StockDataWatcher），
+新的股票目录和面板构建完成后整体替换，正在处理的请求继续使用旧快照
 """
 
+import threading
+from contextlib import nullcontext
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Optional, Dict, List, Iterable
+import numpy as np
 import pandas as pd
 
+from server.src.cache.frame_cache import FrameCache
+from .panel_store import StockPanel, files_fingerprint, read_stocks, read_window, latest_bar, store_lock
+from .symbol_resolver import SymbolResolver
+
+
+class StockCatalog:
+    """
+    股票目录：数据文件列表、名称映射和名称解析器
+    
+    创建后不再修改，数据文件变化时整体替换为新的目录
+    """
+    
+    def __init__(self, sources: Dict[str, List[Path]]):
+        """
+        Args:
+            sources: 股票键到数据文件列表的映射（见scan_stock_files）
+        """
+        stock_map = {}
+        
+        for key in sources:
+            # 股票键格式：股票名称_代码
+            stock_name, stock_code = key.rsplit('_', 1)
+            # 支持按名称和代码查询
+            stock_map[stock_name] = key
+            stock_map[stock_code] = key
+            stock_map[stock_name.lower()] = key
+            stock_map[key] = key
+        
+        self.sources = sources
+        self.stock_map = stock_map
+        self.resolver = SymbolResolver.from_keys(sources)
+    
+    def resolve(self, stock: str) -> Optional[str]:
+        """根据股票名称、代码或简称查找股票键"""
+        stock_key = stock.lower() if stock else ""
+        
+        if stock_key in self.stock_map:
+            return self.stock_map[stock_key]
+        
+        symbol = self.resolver.resolve(stock)
+        
+        if symbol is None:
+            return None
+        
+        return symbol.key
+    
+    def files(self) -> List[Path]:
+        """全部数据文件"""
+        return [file_path for files in self.sources.values() for file_path in files]
+
+
+# get_stock_data的DataFrame缓存默认字节预算
+DEFAULT_FRAME_CACHE_BYTES = 256 * 1024 ** 2
+
 
 class StockDataLoader:
     """股票数据加载器"""
     
-    def __init__(self, data_dir: str = "./data/stocks"):
+    def __init__(
+        self,
+        data_dir: str = "./data/stocks",
+        store_dir: Optional[str] = None,
+        frame_cache_bytes: int = DEFAULT_FRAME_CACHE_BYTES
+    ):
+        """
+        Args:
+            data_dir: parquet文件目录
+            store_dir: 内存映射列存储目录，默认为数据目录下的.panel
+            frame_cache_bytes: get_stock_data的DataFrame缓存字节预算（LRU淘汰）
+        """
         self.data_dir = Path(data_dir)
-        self._cache: Dict[str, pd.DataFrame] = {}
-        self._stock_map: Optional[Dict[str, str]] = None
+        self.store_dir = Path(store_dir) if store_dir else self.data_dir / ".panel"
+        self.frame_cache = FrameCache(frame_cache_bytes)
+        self._catalog: Optional[StockCatalog] = None
+        self._panel: Optional[StockPanel] = None
+        self._lock = threading.Lock()
+    
+    def get_catalog(self) -> StockCatalog:
+        """获取当前股票目录（首次调用时扫描数据目录）"""
+        catalog = self._catalog
+        
+        if catalog is None:
+            catalog = self._catalog = StockCatalog(scan_stock_files(self.data_dir))
+        
+        return catalog
+    
+    def get_resolver(self) -> SymbolResolver:
+        """获取股票名称解析器"""
+        return self.get_catalog().resolver
+    
+    def _resolve_key(self, stock: str) -> Optional[str]:
+        """根据股票名称、代码或简称查找股票键"""
+        return self.get_catalog().resolve(stock)
+    
+    def find_stocks(self, text: str) -> List[str]:
+        """
+        找出文本中提到的所有股票
+        
+        Args:
+            text: 用户问题
+            
+        Returns:
+            股票名称列表（按出现顺序）
+        """
+        return [symbol.name for symbol in self.get_resolver().find_all(text)]
+    
+    def get_panel(self) -> StockPanel:
+        """
+        获取列式面板（首次调用时加载全部股票数据）
+        
+        Returns:
+            股票面板
+        """
+        if self._panel is None:
+            with self._lock:
+                if self._panel is None:
+                    self._panel = self._load_panel(self.get_catalog(), save_store=False)
+        
+        return self._panel
+    
+    def prewarm(self) -> StockPanel:
+        """
+        启动预热：加载面板，并保证下次启动可以直接映射列存储
+        
+        列存储不存在或已过期时，并行读取全部parquet文件，
+        写入合并的未压缩列存储后改为映射该存储
+        
+        Returns:
+            股票面板
+        """
+        with self._lock:
+            self._panel = self._load_panel(self.get_catalog(), save_store=True)
+        
+        return self._panel
     
-    def _build_stock_map(self):
-        """构建股票名称到文件的映射"""
-        if self._stock_map is not None:
-            return
+    def _load_panel(self, catalog: StockCatalog, save_store: bool) -> StockPanel:
+        """优先映射与源文件一致的列存储（多进程共享同一份物理内存），否则读取parquet"""
+        fingerprint = files_fingerprint(catalog.files(), self.data_dir)
         
-        self._stock_map = {}
+        panel = StockPanel.load(self.store_dir, fingerprint)
         
-        if not self.data_dir.exists():
-            return
+        if panel is None and save_store:
+            # 多个worker同时发现列存储过期时只有一个重建，其他worker拿到锁后直接映射
+            with store_lock(self.store_dir):
+                panel = StockPanel.load(self.store_dir, fingerprint)
+                
+                if panel is None:
+                    panel = self._save_store(StockPanel.from_sources(catalog.sources), fingerprint)
+        elif panel is None:
+            panel = StockPanel.from_sources(catalog.sources)
         
-        for file_path in self.data_dir.glob("*.parquet"):
-            # 文件名格式：股票名称_代码.parquet
-            name = file_path.stem
-            if '_' in name:
-                stock_name, stock_code = name.rsplit('_', 1)
-                # 支持按名称和代码查询
-                self._stock_map[stock_name] = file_path
-                self._stock_map[stock_code] = file_path
-                self._stock_map[stock_name.lower()] = file_path
+        return panel
+    
+    def _save_store(self, panel: StockPanel, fingerprint: Dict) -> StockPanel:
+        """写入列存储并改为映射该存储，写入失败时返回原面板（调用方需持有store_lock）"""
+        try:
+            panel.save(self.store_dir, fingerprint)
+            return StockPanel.load(self.store_dir, fingerprint) or panel
+        except OSError as e:
+            print(f"写入列存储失败 {self.store_dir}: {e}")
+            return panel
+    
+    def build_store(self) -> Path:
+        """
+        把parquet数据转换为内存映射列存储（已是最新时跳过）
+        
+        只写文件，不保留在当前进程中，
+        适合在启动多个worker之前由主进程调用
+        
+        Returns:
+            存储目录
+        """
+        catalog = self.get_catalog()
+        fingerprint = files_fingerprint(catalog.files(), self.data_dir)
+        
+        with store_lock(self.store_dir):
+            if StockPanel.load(self.store_dir, fingerprint) is None:
+                StockPanel.from_sources(catalog.sources).save(self.store_dir, fingerprint)
+        
+        return self.store_dir
+    
+    def refresh(self, stocks: Optional[List[str]] = None) -> Dict:
+        """
+        数据文件更新后重新加载指定股票，生成新的面板快照并整体替换
+        
+        其他股票的数据从当前面板复制，不重新读取文件；数据文件已删除的股票从面板中移除。
+        正在执行的查询继续使用旧面板，指标引擎在下次查询时
+        对只追加了新K线的股票增量计算指标。
+        当前面板来自列存储时同时更新列存储（其他worker已写好时直接映射），
+        下次启动和其他worker仍可直接映射
+        
+        Args:
+            stocks: 股票名称、代码或键，None表示重新加载全部股票
+            
+        Returns:
+            刷新结果：updated（已有股票）、added（新股票）、removed（已删除）、
+            unknown（找不到数据文件）、failed（读取失败，保留旧数据）
+        """
+        with self._lock:
+            old = self._panel
+            catalog = StockCatalog(scan_stock_files(self.data_dir))
+            keys, unknown, removed, failed = [], [], [], []
+            
+            if stocks is None or old is None:
+                keys = list(catalog.sources)
+                panel = self._load_panel(catalog, save_store=old is not None and old.mapped)
+                failed = [key for key in keys if key not in panel]
+                self.frame_cache.clear()
+            else:
+                for stock in stocks:
+                    key = catalog.resolve(stock)
+                    if key is None:
+                        unknown.append(stock)
+                    elif key not in keys:
+                        keys.append(key)
+                
+                removed = [key for key in old.keys if key not in catalog.sources]
+                fingerprint = files_fingerprint(catalog.files(), self.data_dir)
+                
+                with store_lock(self.store_dir) if old.mapped else nullcontext():
+                    panel = StockPanel.load(self.store_dir, fingerprint) if old.mapped else None
+                    
+                    if panel is None:
+                        arrays = read_stocks([catalog.sources[key] for key in keys])
+                        failed = [key for key, item in zip(keys, arrays) if item is None]
+                        panel = old.replace(
+                            {key: item for key, item in zip(keys, arrays) if item is not None},
+                            remove=removed
+                        )
+                        
+                        if old.mapped and not failed:
+                            panel = self._save_store(panel, fingerprint)
+                
+                for key in keys + removed:
+                    self.frame_cache.discard(key)
+            
+            # 先替换面板再替换目录：查询通过目录找到的股票在面板中一定存在
+            self._panel = panel
+            self._catalog = catalog
+        
+        return {
+            "updated": [key for key in keys if key not in failed and old is not None and key in old],
+            "added": [key for key in keys if key not in failed and (old is None or key not in old)],
+            "removed": removed,
+            "unknown": unknown,
+            "failed": failed,
+            "stocks": len(panel),
+        }
+    
+    def get_stock_id(self, stock: str) -> Optional[int]:
+        """
+        获取股票在面板中的ID
+        
+        Args:
+            stock: 股票名称或代码
+            
+        Returns:
+            股票ID，如果不存在则返回None
+        """
+        key = self._resolve_key(stock)
+        
+        if key is None:
+            return None
+        
+        return self.get_panel().stock_id(key)
     
     def get_stock_data(
         self, 
         stock: str, 
-        use_cache: bool = True
+        use_cache: bool = True,
+        columns: Optional[Iterable[str]] = None
     ) -> Optional[pd.DataFrame]:
         """
         获取股票数据
@@ -48,41 +296,63 @@ class StockDataLoader:
         Args:
             stock: 股票名称或代码（如"比亚迪"或"002594"）
             use_cache: 是否使用缓存
+            columns: 只取这些列（date列总是包含），缓存中也只保存这些列；None表示全部
             
         Returns:
             股票数据DataFrame，如果不存在则返回None
         """
-        self._build_stock_map()
-        
-        # 查找文件
-        stock_key = stock.lower() if stock else ""
+        key = self._resolve_key(stock)
         
-        if stock_key not in self._stock_map:
-            # 尝试模糊匹配
-            for key in self._stock_map.keys():
-                if stock in key or key in stock:
-                    stock_key = key
-                    break
-            else:
-                return None
+        if key is None:
+            return None
         
-        file_path = self._stock_map[stock_key]
+        cache_key = (key, tuple(columns) if columns is not None else None)
         
         # 使用缓存
-        if use_cache and str(file_path) in self._cache:
-            return self._cache[str(file_path)]
+        if use_cache:
+            df = self.frame_cache.get(cache_key)
+            if df is not None:
+                return df
         
-        # 读取数据
-        try:
-            df = pd.read_parquet(file_path)
-            
-            if use_cache:
-                self._cache[str(file_path)] = df
-            
-            return df
-        except Exception as e:
-            print(f"读取股票数据失败 {stock}: {e}")
+        panel = self.get_panel()
+        sid = panel.stock_id(key)
+        
+        if sid is None:
             return None
+        
+        df = panel.to_frame(sid, columns=columns)
+        
+        if use_cache:
+            self.frame_cache.set(cache_key, df)
+        
+        return df
+    
+    def get_data_version(self, stocks: Optional[List[str]] = None) -> str:
+        """
+        获取数据版本（数据文件的修改时间），数据更新后版本随之变化
+        
+        Args:
+            stocks: 股票名称或代码列表，None表示全部股票
+            
+        Returns:
+            版本字符串
+        """
+        catalog = self.get_catalog()
+        
+        if stocks is None:
+            keys = set(catalog.sources)
+        else:
+            keys = {catalog.resolve(stock) for stock in stocks}
+        
+        versions = []
+        for key in sorted(k for k in keys if k is not None):
+            try:
+                mtime = max(file_path.stat().st_mtime_ns for file_path in catalog.sources[key])
+                versions.append(f"{key}@{mtime}")
+            except (OSError, KeyError):
+                versions.append(f"{key}@missing")
+        
+        return "|".join(versions)
     
     def list_available_stocks(self) -> List[Dict[str, str]]:
         """
@@ -91,27 +361,60 @@ class StockDataLoader:
         Returns:
             股票列表，每项包含name和code
         """
-        self._build_stock_map()
-        
         stocks = []
-        seen = set()
         
-        for key, file_path in self._stock_map.items():
-            if file_path in seen:
-                continue
-            
-            seen.add(file_path)
-            
-            name = file_path.stem
-            if '_' in name:
-                stock_name, stock_code = name.rsplit('_', 1)
-                stocks.append({
-                    "name": stock_name,
-                    "code": stock_code
-                })
+        for key in self.get_catalog().sources:
+            stock_name, stock_code = key.rsplit('_', 1)
+            stocks.append({
+                "name": stock_name,
+                "code": stock_code
+            })
         
         return stocks
     
+    def get_window(
+        self,
+        stock: str,
+        columns: Optional[Iterable[str]] = None,
+        last_n: Optional[int] = None,
+        start: Optional[str] = None,
+        end: Optional[str] = None
+    ) -> Optional[Dict[str, np.ndarray]]:
+        """
+        获取股票的一段数据，只包含需要的列和行
+        
+        面板已加载时直接从面板切片（视图，不复制）；面板未加载时只读取这只股票的数据文件
+        （列裁剪、按年分区和行组裁剪、日期谓词下推），不会为一次查询加载全部股票
+        
+        Args:
+            stock: 股票名称或代码
+            columns: 只取这些列（date列总是包含），None表示全部
+            last_n: 只取最近n条（与日期范围同时给出时取范围内的最近n条）
+            start: 起始日期（包含），YYYY-MM-DD
+            end: 结束日期（包含），YYYY-MM-DD
+            
+        Returns:
+            列名到数组的映射（按日期升序，需要DataFrame时用pd.DataFrame转换），
+            股票不存在时返回None
+        """
+        catalog = self.get_catalog()
+        key = catalog.resolve(stock)
+        
+        if key is None:
+            return None
+        
+        panel = self._panel
+        
+        if panel is None:
+            return read_window(catalog.sources[key], columns, last_n, start, end)
+        
+        sid = panel.stock_id(key)
+        
+        if sid is None:
+            return None
+        
+        return panel.window(sid, columns, last_n, start, end)
+    
     def get_latest_price(self, stock: str) -> Optional[Dict]:
         """
         获取最新价格
@@ -122,26 +425,54 @@ class StockDataLoader:
         Returns:
             包含最新价格信息的字典
         """
-        df = self.get_stock_data(stock)
+        arrays = self.get_window(stock, last_n=1)
         
-        if df is None or len(df) == 0:
+        if arrays is None:
             return None
         
-        latest = df.iloc[-1]
+        return latest_bar(arrays)
+    
+    def cache_stats(self) -> Dict:
+        """缓存统计：DataFrame缓存条数和详细统计、面板占用字节数和是否为内存映射"""
+        panel = self._panel
         
         return {
-            "date": latest["date"],
-            "open": float(latest["open"]),
-            "close": float(latest["close"]),
-            "high": float(latest["high"]),
-            "low": float(latest["low"]),
-            "volume": int(latest["volume"]),
-            "change_pct": float(latest["change_pct"]) if "change_pct" in latest else None
+            "frames": len(self.frame_cache),
+            "frame_cache": self.frame_cache.stats(),
+            "panel_bytes": panel.nbytes if panel is not None else 0,
+            "panel_mapped": panel.mapped if panel is not None else False,
         }
     
     def clear_cache(self):
         """清空缓存"""
-        self._cache.clear()
+        self.frame_cache.clear()
+        self._panel = None
+
+
+def scan_stock_files(data_dir: Path) -> Dict[str, List[Path]]:
+    """
+    扫描数据目录
+    
+    Args:
+        data_dir: 数据目录
+        
+    Returns:
+        股票键到数据文件列表的映射，完整历史文件在前，按年分区文件按年份排在后面
+    """
+    sources: Dict[str, List[Path]] = {}
+    
+    if not data_dir.exists():
+        return sources
+    
+    # 完整历史：股票名称_代码.parquet
+    for file_path in sorted(data_dir.glob("*.parquet")):
+        sources.setdefault(file_path.stem, []).append(file_path)
+    
+    # 按年分区：股票名称_代码/年份.parquet
+    for file_path in sorted(data_dir.glob("*/*.parquet")):
+        sources.setdefault(file_path.parent.name, []).append(file_path)
+    
+    return {key: files for key, files in sources.items() if '_' in key}
 
 
 # 全局实例
@@ -156,3 +487,14 @@ def get_loader(data_dir: str = "./data/stocks") -> StockDataLoader:
         _loader = StockDataLoader(data_dir)
     
     return _loader
+
+
+def set_loader(loader: StockDataLoader):
+    """
+    设置全局加载器实例（例如指向其他数据目录）
+    
+    Args:
+        loader: 加载器实例
+    """
+    global _loader
+    _loader = loader
@@ -0,0 +1,337 @@
+"""
+股票代码/名称解析器
+
+根据数据文件名（股票名称_代码）构建股票的所有称呼：
+名称、代码、小写名称、拼音首字母和常用简称（如茅台、招行），
+用Aho–Corasick自动机一次扫描整条用户问题，找出其中提到的所有股票，
+耗时只与问题长度有关，与股票数量无关
+"""
+
+from collections import deque
+from dataclasses import dataclass
+from typing import Optional, Dict, List, Iterable, Iterator, Tuple, Any
+
+
+# 常用简称 -> 股票名称（只有对应股票存在时才生效）
+# 不收录其他股票名称的前缀（“平安”/平安银行）或常见词语的一部分（“美的”/完美的、“中行”/其中行业）
+COMMON_ALIASES = {
+    "茅台": "贵州茅台",
+    "招行": "招商银行",
+    "宁德": "宁德时代",
+    "宁王": "宁德时代",
+    "农行": "农业银行",
+    "中石油": "中国石油",
+    "中石化": "中国石化",
+    "汾酒": "山西汾酒",
+    "老窖": "泸州老窖",
+    "格力": "格力电器",
+    "海康": "海康威视",
+    "立讯": "立讯精密",
+    "恒瑞": "恒瑞医药",
+    "万科": "万科A",
+    "京东方": "京东方A",
+    "中免": "中国中免",
+    "三一": "三一重工",
+    "顺丰": "顺丰控股",
+    "东财": "东方财富",
+    "宝钢": "宝钢股份",
+    "伊利": "伊利股份",
+    "洋河": "洋河股份",
+    "隆基": "隆基绿能",
+    "迈瑞": "迈瑞医疗",
+    "药明": "药明康德",
+    "紫金": "紫金矿业",
+    "神华": "中国神华",
+}
+
+# 不作为股票称呼的词（去后缀后的名称或简称是常见词语的一部分，如“完美的”、“其中行业”）
+AMBIGUOUS_TERMS = {"美的", "平安", "中行", "建行", "工行"}
+
+# 去掉后仍能唯一指代股票的名称后缀
+NAME_SUFFIXES = ("股份", "集团", "控股", "A", "B")
+
+
+# ==================== Aho–Corasick自动机 ====================
+
+class AhoCorasick:
+    """
+    Aho–Corasick多模式匹配自动机
+
+    先用add()添加所有模式串，调用build()后即可用iter()扫描文本
+    """
+
+    def __init__(self):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[int, Any]]] = [[]]
+        self._built = False
+
+    def add(self, pattern: str, value: Any):
+        """
+        添加模式串
+
+        Args:
+            pattern: 模式串
+            value: 匹配时返回的值
+        """
+        if not pattern:
+            return
+
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+                self._goto[state][char] = next_state
+            state = next_state
+
+        self._output[state].append((len(pattern), value))
+        self._built = False
+
+    def build(self):
+        """构建失败指针（广度优先）"""
+        queue = deque(self._goto[0].values())
+
+        for state in queue:
+            self._fail[state] = 0
+
+        while queue:
+            state = queue.popleft()
+
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+
+                fail = self._fail[state]
+                while fail and char not in self._goto[fail]:
+                    fail = self._fail[fail]
+
+                self._fail[next_state] = self._goto[fail].get(char, 0)
+                self._output[next_state] = (
+                    self._output[next_state] + self._output[self._fail[next_state]]
+                )
+
+        self._built = True
+
+    def iter(self, text: str) -> Iterator[Tuple[int, int, Any]]:
+        """
+        扫描文本中出现的所有模式串
+
+        Args:
+            text: 待扫描文本
+
+        Yields:
+            (起始位置, 结束位置, 值)，结束位置不包含
+        """
+        if not self._built:
+            self.build()
+
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+
+        for i, char in enumerate(text):
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+
+            for length, value in output[state]:
+                yield i + 1 - length, i + 1, value
+
+    def __len__(self) -> int:
+        return len(self._goto)
+
+
+# ==================== 股票解析器 ====================
+
+@dataclass(frozen=True)
+class StockSymbol:
+    """股票标识"""
+    key: str   # 文件名（股票名称_代码）
+    name: str
+    code: str
+
+
+class SymbolResolver:
+    """股票名称/代码/简称解析器"""
+
+    def __init__(
+        self,
+        symbols: Iterable[StockSymbol],
+        aliases: Optional[Dict[str, str]] = None
+    ):
+        """
+        Args:
+            symbols: 所有股票
+            aliases: 简称到股票名称的映射，默认使用COMMON_ALIASES
+        """
+        self.symbols = list(symbols)
+        self._terms: Dict[str, StockSymbol] = {}
+        self._automaton = AhoCorasick()
+
+        for term, symbol in self._build_terms(aliases).items():
+            self._terms[term] = symbol
+            self._automaton.add(term, symbol)
+
+        self._automaton.build()
+
+    @classmethod
+    def from_keys(
+        cls,
+        keys: Iterable[str],
+        aliases: Optional[Dict[str, str]] = None
+    ) -> "SymbolResolver":
+        """
+        从文件名列表构建解析器
+
+        Args:
+            keys: 文件名（不含扩展名），格式：股票名称_代码
+            aliases: 简称到股票名称的映射
+        """
+        symbols = []
+
+        for key in keys:
+            if '_' in key:
+                name, code = key.rsplit('_', 1)
+                symbols.append(StockSymbol(key=key, name=name, code=code))
+
+        return cls(symbols, aliases)
+
+    def _build_terms(self, aliases: Optional[Dict[str, str]]) -> Dict[str, StockSymbol]:
+        """生成所有称呼到股票的映射（有歧义的派生称呼会被丢弃）"""
+        terms: Dict[str, StockSymbol] = {}
+
+        # 名称和代码优先级最高
+        for symbol in self.symbols:
+            terms[symbol.name.lower()] = symbol
+            terms[symbol.code.lower()] = symbol
+
+        # 派生称呼：去后缀的名称、拼音首字母
+        derived: Dict[str, List[StockSymbol]] = {}
+        for symbol in self.symbols:
+            for term in _derived_terms(symbol.name):
+                derived.setdefault(term, []).append(symbol)
+
+        for term, candidates in derived.items():
+            if len(candidates) == 1 and term not in terms and term not in AMBIGUOUS_TERMS:
+                terms[term] = candidates[0]
+
+        # 常用简称（简称出现在其他股票名称中时有歧义，不使用）
+        by_name = {symbol.name: symbol for symbol in self.symbols}
+        for alias, name in (COMMON_ALIASES if aliases is None else aliases).items():
+            if name not in by_name or alias.lower() in terms or alias in AMBIGUOUS_TERMS:
+                continue
+            if any(alias in other for other in by_name if other != name):
+                continue
+            terms[alias.lower()] = by_name[name]
+
+        return terms
+
+    def lookup(self, text: str) -> Optional[StockSymbol]:
+        """
+        精确查找
+
+        Args:
+            text: 股票名称、代码或简称
+
+        Returns:
+            股票标识，找不到时返回None
+        """
+        return self._terms.get(text.strip().lower()) if text else None
+
+    def find_all(self, text: str) -> List[StockSymbol]:
+        """
+        找出文本中提到的所有股票
+
+        重叠的匹配取最左最长者，结果按出现顺序排列并去重
+
+        Args:
+            text: 用户问题
+
+        Returns:
+            股票标识列表
+        """
+        if not text:
+            return []
+
+        lowered = text.lower()
+        matches = [
+            (start, end, symbol)
+            for start, end, symbol in self._automaton.iter(lowered)
+            if _on_boundary(lowered, start, end)
+        ]
+        matches.sort(key=lambda m: (m[0], m[0] - m[1]))
+
+        found: List[StockSymbol] = []
+        position = 0
+
+        for start, end, symbol in matches:
+            if start < position:
+                continue
+            position = end
+            if symbol not in found:
+                found.append(symbol)
+
+        return found
+
+    def resolve(self, text: str) -> Optional[StockSymbol]:
+        """
+        解析股票：先精确查找，再扫描文本取第一个
+
+        Args:
+            text: 股票名称、代码、简称或包含它们的文本
+
+        Returns:
+            股票标识，找不到时返回None
+        """
+        symbol = self.lookup(text)
+
+        if symbol is None:
+            found = self.find_all(text)
+            symbol = found[0] if found else None
+
+        return symbol
+
+    def __len__(self) -> int:
+        return len(self.symbols)
+
+
+def _derived_terms(name: str) -> List[str]:
+    """由股票名称派生的称呼"""
+    terms = []
+
+    for suffix in NAME_SUFFIXES:
+        if name.endswith(suffix) and len(name) - len(suffix) >= 2:
+            terms.append(name[:-len(suffix)].lower())
+
+    initials = _pinyin_initials(name)
+    if initials and len(initials) >= 3:
+        terms.append(initials)
+
+    return terms
+
+
+def _pinyin_initials(name: str) -> Optional[str]:
+    """拼音首字母（需要安装pypinyin，未安装时返回None）"""
+    try:
+        from pypinyin import lazy_pinyin, Style
+    except ImportError:
+        return None
+
+    initials = "".join(lazy_pinyin(name, style=Style.FIRST_LETTER)).lower()
+
+    return initials if initials.isascii() and initials.isalnum() else None
+
+
+def _on_boundary(text: str, start: int, end: int) -> bool:
+    """字母/数字称呼要求前后不紧跟同类字符，避免匹配到长串中间"""
+    for char, neighbor in ((text[start], start - 1), (text[end - 1], end)):
+        if not char.isascii() or not char.isalnum():
+            continue
+        if 0 <= neighbor < len(text):
+            other = text[neighbor]
+            if other.isascii() and other.isalnum() and other.isdigit() == char.isdigit():
+                return False
+
+    return True
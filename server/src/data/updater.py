@@ -0,0 +1,280 @@
+"""
+行情数据增量更新
+
+读取每只股票已有数据的最后日期，只拉取之后的新K线，
+按年写入分区文件（股票名称_代码/年份.parquet），已有的历史文件不会被重写。
+
+数据源可以替换：AkshareFetcher从akshare拉取，LocalFetcher从本地parquet目录读取（用于测试），
+多只股票由有上限的线程池并发拉取
+"""
+
+import os
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from pathlib import Path
+from typing import Optional, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from .stock_loader import scan_stock_files
+
+
+# 新股票从该日期开始拉取全部历史
+DEFAULT_START = date(2020, 1, 1)
+
+# 数据文件的行情列（另有stock_name和stock_code）
+BAR_COLUMNS = (
+    "date", "open", "close", "high", "low", "volume",
+    "amount", "amplitude", "change_pct", "change", "turnover"
+)
+
+# akshare返回的中文列名
+AKSHARE_COLUMNS = {
+    "日期": "date",
+    "开盘": "open",
+    "收盘": "close",
+    "最高": "high",
+    "最低": "low",
+    "成交量": "volume",
+    "成交额": "amount",
+    "振幅": "amplitude",
+    "涨跌幅": "change_pct",
+    "涨跌额": "change",
+    "换手率": "turnover"
+}
+
+
+# ==================== 数据源 ====================
+
+class BarFetcher(ABC):
+    """日K线数据源"""
+
+    @abstractmethod
+    def fetch(self, code: str, start: date, end: date) -> pd.DataFrame:
+        """
+        拉取日K线
+
+        Args:
+            code: 股票代码
+            start: 起始日期（包含）
+            end: 结束日期（包含）
+
+        Returns:
+            英文列名（见BAR_COLUMNS）的DataFrame，无数据时为空
+        """
+
+
+class AkshareFetcher(BarFetcher):
+    """从akshare拉取A股日K线"""
+
+    def __init__(self, adjust: str = "qfq"):
+        """
+        Args:
+            adjust: 复权方式（qfq前复权 / hfq后复权 / 空字符串不复权）
+        """
+        try:
+            import akshare
+        except ImportError:
+            raise ImportError("请先安装 akshare: pip install akshare")
+
+        self._ak = akshare
+        self.adjust = adjust
+
+    def fetch(self, code: str, start: date, end: date) -> pd.DataFrame:
+        df = self._ak.stock_zh_a_hist(
+            symbol=code,
+            period="daily",
+            start_date=start.strftime("%Y%m%d"),
+            end_date=end.strftime("%Y%m%d"),
+            adjust=self.adjust
+        )
+        return df.rename(columns=AKSHARE_COLUMNS)
+
+
+class LocalFetcher(BarFetcher):
+    """从本地parquet目录读取日K线（目录布局与data/stocks相同），用于测试和离线环境"""
+
+    def __init__(self, source_dir: str):
+        self.source_dir = Path(source_dir)
+        self._sources = {
+            key.rsplit("_", 1)[1]: files
+            for key, files in scan_stock_files(self.source_dir).items()
+        }
+
+    def fetch(self, code: str, start: date, end: date) -> pd.DataFrame:
+        files = self._sources.get(code)
+
+        if not files:
+            return pd.DataFrame(columns=list(BAR_COLUMNS))
+
+        df = _normalize(pd.concat([pd.read_parquet(path) for path in files], ignore_index=True))
+        return df[(df["date"] >= start.isoformat()) & (df["date"] <= end.isoformat())]
+
+
+# ==================== 更新器 ====================
+
+@dataclass
+class UpdateResult:
+    """单只股票的更新结果"""
+    key: str
+    added: int = 0
+    last_date: Optional[str] = None
+    full: bool = False            # 复权价格发生变化，重新写入了全部历史
+    error: Optional[str] = None
+
+
+class StockUpdater:
+    """
+    行情数据增量更新器
+
+    每只股票从已有数据的最后一个交易日开始拉取（包含该日），
+    用重叠的这一条K线校验前复权价格：收盘价一致时只追加之后的K线，
+    不一致说明期间发生了除权除息、历史价格已整体调整，此时重新拉取全部历史
+    """
+
+    def __init__(
+        self,
+        data_dir: str,
+        fetcher: BarFetcher,
+        max_workers: int = 4,
+        start: date = DEFAULT_START
+    ):
+        """
+        Args:
+            data_dir: 数据目录
+            fetcher: 数据源
+            max_workers: 并发拉取的线程数
+            start: 新股票的起始日期
+        """
+        self.data_dir = Path(data_dir)
+        self.fetcher = fetcher
+        self.max_workers = max(max_workers, 1)
+        self.start = start
+
+    def update(self, stocks: List[Tuple[str, str]], end: Optional[date] = None) -> List[UpdateResult]:
+        """
+        更新多只股票
+
+        Args:
+            stocks: (股票名称, 代码) 列表
+            end: 结束日期，默认为今天
+
+        Returns:
+            每只股票的更新结果（顺序与stocks一致）
+        """
+        end = end or date.today()
+        sources = scan_stock_files(self.data_dir)
+
+        def update_one(stock: Tuple[str, str]) -> UpdateResult:
+            name, code = stock
+            return self._update_stock(name, code, sources.get(f"{name}_{code}", []), end)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as pool:
+            return list(pool.map(update_one, stocks))
+
+    def _update_stock(self, name: str, code: str, files: List[Path], end: date) -> UpdateResult:
+        key = f"{name}_{code}"
+
+        try:
+            last = _last_bar(files)
+            start = date.fromisoformat(last[0]) if last else self.start
+
+            if start > end:
+                return UpdateResult(key, last_date=last[0] if last else None)
+
+            bars = _normalize(self.fetcher.fetch(code, start, end))
+            full = last is None
+
+            if last is not None:
+                overlap = bars.loc[bars["date"] == last[0], "close"]
+
+                if len(overlap) and not np.isclose(overlap.iloc[0], last[1], rtol=1e-6):
+                    bars = _normalize(self.fetcher.fetch(code, self.start, end))
+                    full = True
+                else:
+                    bars = bars[bars["date"] > last[0]]
+
+            if bars.empty:
+                return UpdateResult(key, last_date=last[0] if last else None)
+
+            bars = bars.assign(stock_name=name, stock_code=code)
+            self._write(key, bars, replace=full)
+
+            return UpdateResult(
+                key,
+                added=len(bars),
+                last_date=bars["date"].iloc[-1],
+                full=full and last is not None
+            )
+
+        except Exception as e:
+            return UpdateResult(key, error=str(e))
+
+    def _write(self, key: str, bars: pd.DataFrame, replace: bool):
+        """
+        按年写入分区文件
+
+        Args:
+            key: 股票键
+            bars: 按日期排序的新K线
+            replace: True表示bars是全部历史，写入后删除其他数据文件；
+                     False表示追加，与同年份的已有分区合并
+        """
+        stock_dir = self.data_dir / key
+        stock_dir.mkdir(parents=True, exist_ok=True)
+        written = set()
+
+        for year, part in bars.groupby(bars["date"].str[:4], sort=True):
+            path = stock_dir / f"{year}.parquet"
+
+            if not replace and path.exists():
+                part = pd.concat([pd.read_parquet(path), part], ignore_index=True)
+                part = part.drop_duplicates("date", keep="last").sort_values("date")
+
+            _write_atomic(part, path)
+            written.add(path)
+
+        if replace:
+            for path in stock_dir.glob("*.parquet"):
+                if path not in written:
+                    path.unlink()
+
+            base = self.data_dir / f"{key}.parquet"
+            if base.exists():
+                base.unlink()
+
+
+def _last_bar(files: List[Path]) -> Optional[Tuple[str, float]]:
+    """已有数据的最后一条K线（日期，收盘价），无数据时返回None"""
+    if not files:
+        return None
+
+    # 分区文件按年份排在完整历史文件之后，最后一个文件包含最新数据
+    df = _normalize(pd.read_parquet(files[-1], columns=["date", "close"]))
+
+    if df.empty:
+        return None
+
+    return df["date"].iloc[-1], float(df["close"].iloc[-1])
+
+
+def _normalize(df: pd.DataFrame) -> pd.DataFrame:
+    """统一为YYYY-MM-DD格式的日期字符串，按日期排序去重"""
+    if df.empty:
+        return df.reindex(columns=list(BAR_COLUMNS))
+
+    columns = [c for c in BAR_COLUMNS if c in df.columns]
+    df = df[columns + [c for c in ("stock_name", "stock_code") if c in df.columns]].copy()
+    df["date"] = pd.to_datetime(df["date"]).dt.strftime("%Y-%m-%d")
+
+    return df.drop_duplicates("date", keep="last").sort_values("date").reset_index(drop=True)
+
+
+def _write_atomic(df: pd.DataFrame, path: Path):
+    """先写临时文件再替换，读取方不会看到写了一半的文件"""
+    tmp = path.with_name(f".{path.name}.tmp{os.getpid()}")
+    df.to_parquet(tmp, index=False)
+    os.replace(tmp, path)
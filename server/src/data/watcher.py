@@ -0,0 +1,119 @@
+"""
+行情数据热更新
+
+后台线程定期扫描数据目录（轮询各文件的大小和修改时间），
+发现新增、修改或删除的数据文件后只刷新受影响的股票（StockDataLoader.refresh），
+新的股票目录和面板整体替换，不需要重启服务，已预热的数据和指标也不会丢失
+"""
+
+import threading
+import time
+from typing import Optional, Dict, Tuple
+
+from .stock_loader import StockDataLoader, scan_stock_files
+
+
+class StockDataWatcher:
+    """数据目录监视器（轮询）"""
+
+    def __init__(self, loader: StockDataLoader, interval: float = 10.0):
+        """
+        Args:
+            loader: 股票数据加载器
+            interval: 轮询间隔（秒）
+        """
+        self.loader = loader
+        self.interval = interval
+        self.polls = 0
+        self.reloads = 0
+        self.last_reload: Optional[Dict] = None
+        self.last_error: Optional[str] = None
+        self._state: Dict[str, Tuple] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def start(self):
+        """记录当前文件状态并启动后台轮询线程"""
+        if self._thread is not None:
+            return
+
+        self._state = self._snapshot()
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name="stock-data-watcher", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止轮询"""
+        self._stop.set()
+
+        if self._thread is not None:
+            self._thread.join(timeout=self.interval + 1)
+            self._thread = None
+
+    def poll(self) -> Optional[Dict]:
+        """
+        检查一次数据目录，有变化时刷新受影响的股票
+
+        Returns:
+            刷新结果（见StockDataLoader.refresh），没有变化时返回None
+        """
+        current = self._snapshot()
+        self.polls += 1
+
+        changed = [
+            key for key in current.keys() | self._state.keys()
+            if current.get(key) != self._state.get(key)
+        ]
+
+        if not changed:
+            return None
+
+        # 已删除的股票不需要指定，refresh会把数据文件不存在的股票移出面板
+        result = self.loader.refresh([key for key in changed if key in current])
+
+        # 读取失败的股票（例如文件正在被其他程序写入）下次轮询时重试
+        for key in result["failed"]:
+            current.pop(key, None)
+
+        self._state = current
+        self.reloads += 1
+        self.last_reload = dict(result, time=time.strftime("%Y-%m-%d %H:%M:%S"))
+
+        print(f"行情数据已更新: 更新{len(result['updated'])}只, 新增{len(result['added'])}只, "
+              f"移除{len(result['removed'])}只, 失败{len(result['failed'])}只")
+
+        return result
+
+    def stats(self) -> Dict:
+        """监视器状态"""
+        return {
+            "running": self._thread is not None,
+            "interval": self.interval,
+            "polls": self.polls,
+            "reloads": self.reloads,
+            "last_reload": self.last_reload,
+            "last_error": self.last_error,
+        }
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.poll()
+                self.last_error = None
+            except Exception as e:
+                # 扫描期间文件被替换或删除等情况，下次轮询重试
+                self.last_error = str(e)
+                print(f"行情数据热更新失败: {e}")
+
+    def _snapshot(self) -> Dict[str, Tuple]:
+        """各股票数据文件的状态（文件名、大小、修改时间）"""
+        state = {}
+
+        for key, files in scan_stock_files(self.loader.data_dir).items():
+            entries = []
+            for file_path in files:
+                stat = file_path.stat()
+                entries.append((file_path.name, stat.st_size, stat.st_mtime_ns))
+            state[key] = tuple(entries)
+
+        return state
@@ -21,6 +21,10 @@ class LLMConfig(BaseModel):
     temperature: float = 0.7
     top_p: float = 0.9
     mock_mode: bool = False  # 是否使用Mock模式
+    batching: bool = False  # 是否启用批量推理（连续批处理）
+    max_batch_size: int = 8  # 批量推理的最大批大小
+    batch_window_ms: float = 10  # 空闲时收集同批请求的等待时间（毫秒）
+    prefix_cache_mb: float = 256  # 提示词前缀KV缓存的内存上限（MB），0为不启用
 
 
 class BaseLLM(ABC):
@@ -68,10 +72,22 @@ class BaseLLM(ABC):
             temperature: 温度参数
             
         Yields:
-            生成的文本片段
+            生成的文本片段（增量，拼接后即为完整回答）
         """
         pass
     
+    def count_tokens(self, text: str) -> int:
+        """
+        估算文本的token数（默认按字符数，有分词器的模型应覆盖）
+        
+        Args:
+            text: 文本
+            
+        Returns:
+            token数
+        """
+        return len(text)
+    
     @abstractmethod
     def get_info(self) -> Dict[str, Any]:
         """
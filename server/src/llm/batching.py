@@ -0,0 +1,590 @@
+"""
+批量推理引擎
+
+把并发的generate调用合并成批次执行，并支持连续批处理（continuous batching）：
+每一步解码结束后，已完成的序列立即退出，新到达的请求在下一步之前加入批次，
+不必等待整批全部生成完毕
+
+推理后端只需实现prefill（批量编码新序列）和step（所有活跃序列各解码一步）两个方法，
+目前提供MockLLM的延迟模拟后端和ChatGLM3后端
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from abc import ABC, abstractmethod
+from concurrent.futures import Future, InvalidStateError
+from typing import AsyncIterator, Optional, Dict, Any, List, Callable, Tuple
+
+from .base import BaseLLM, LLMConfig
+from .chatglm_llm import sample_token
+
+
+# ==================== 推理后端 ====================
+
+class BatchBackend(ABC):
+    """批量推理后端"""
+
+    @abstractmethod
+    def prefill(self, requests: List["GenerationRequest"]) -> List[Any]:
+        """
+        批量编码新加入的序列
+
+        Args:
+            requests: 新请求
+
+        Returns:
+            每个请求的解码状态（由后端自行定义）
+        """
+
+    @abstractmethod
+    def step(self, states: List[Any]) -> List[Tuple[str, bool]]:
+        """
+        所有活跃序列各解码一步
+
+        Args:
+            states: 活跃序列的解码状态
+
+        Returns:
+            每个序列的 (新增文本, 是否结束)
+        """
+
+    def release(self, states: List[Any]):
+        """序列结束后释放资源（可选）"""
+
+
+class MockBatchBackend(BatchBackend):
+    """
+    MockLLM的批量后端（延迟模拟）
+
+    每步耗时 = step_latency + per_sequence_latency × 批大小，
+    模拟批量推理时一次前向计算可同时服务多个序列
+    """
+
+    def __init__(
+        self,
+        llm,
+        step_latency: float = 0.02,
+        per_sequence_latency: float = 0.001,
+        prefill_latency: float = 0.05,
+        chars_per_token: int = 2
+    ):
+        self.llm = llm
+        self.step_latency = step_latency
+        self.per_sequence_latency = per_sequence_latency
+        self.prefill_latency = prefill_latency
+        self.chars_per_token = chars_per_token
+
+    def prefill(self, requests: List["GenerationRequest"]) -> List[Any]:
+        time.sleep(self.prefill_latency + self.per_sequence_latency * len(requests))
+
+        states = []
+        for request in requests:
+            self.llm.call_count += 1
+            text = self.llm._select_response(request.prompt)
+            states.append({"text": text, "position": 0})
+
+        return states
+
+    def step(self, states: List[Any]) -> List[Tuple[str, bool]]:
+        time.sleep(self.step_latency + self.per_sequence_latency * len(states))
+
+        outputs = []
+        for state in states:
+            start = state["position"]
+            state["position"] = start + self.chars_per_token
+            outputs.append((
+                state["text"][start:state["position"]],
+                state["position"] >= len(state["text"])
+            ))
+
+        return outputs
+
+
+class ChatGLMBatchBackend(BatchBackend):
+    """
+    ChatGLM3的批量后端
+
+    同一次prefill加入的序列组成一个队列组（cohort），共享左填充后的KV缓存；
+    每步对每个队列组执行一次前向计算，已结束或已取消的序列在下一次前向计算前
+    从KV缓存中移除，新请求组成新的队列组在下一步加入。
+
+    max_length与model.chat一致，为提示词和回答的总token数。
+    批量路径不使用前缀KV缓存（左填充的队列组无法共享单序列的前缀状态），
+    启用批量推理时prefix参数被忽略
+    """
+
+    def __init__(self, model, tokenizer, config: LLMConfig):
+        self.model = model
+        self.tokenizer = tokenizer
+        self.config = config
+
+        # ChatGLM3对话结束标记
+        self.stop_ids = {tokenizer.eos_token_id}
+        for token in ("<|user|>", "<|observation|>"):
+            try:
+                self.stop_ids.add(tokenizer.get_command(token))
+            except Exception:
+                pass
+
+    def prefill(self, requests: List["GenerationRequest"]) -> List[Any]:
+        import torch
+
+        encoded = [
+            self.tokenizer.build_chat_input(request.prompt, history=[], role="user")["input_ids"][0].tolist()
+            for request in requests
+        ]
+        width = max(len(ids) for ids in encoded)
+        pad_id = self.tokenizer.pad_token_id or 0
+
+        input_ids = torch.tensor([[pad_id] * (width - len(ids)) + ids for ids in encoded])
+        attention_mask = torch.tensor([[0] * (width - len(ids)) + [1] * len(ids) for ids in encoded])
+        position_ids = torch.arange(width).unsqueeze(0).repeat(len(encoded), 1)
+
+        device = self.model.device
+        with torch.no_grad():
+            output = self.model(
+                input_ids=input_ids.to(device),
+                attention_mask=attention_mask.to(device),
+                position_ids=position_ids.to(device),
+                use_cache=True,
+                return_dict=True
+            )
+
+        cohort = {
+            "past_key_values": output.past_key_values,
+            "logits": output.logits[:, -1, :],
+            "attention_mask": attention_mask.to(device),
+            "position": width,
+        }
+
+        return [
+            {
+                "cohort": cohort,
+                "row": row,
+                "request": request,
+                "tokens": [],
+                "text": "",
+                # 与model.chat一致：提示词 + 回答不超过max_length，至少生成一个token
+                "max_new_tokens": max(request.max_length - len(ids), 1),
+            }
+            for row, (request, ids) in enumerate(zip(requests, encoded))
+        ]
+
+    def step(self, states: List[Any]) -> List[Tuple[str, bool]]:
+        import torch
+
+        # 按队列组分组（不在states中的行已结束或被取消）
+        cohorts: Dict[int, List[Any]] = {}
+        for state in states:
+            cohorts.setdefault(id(state["cohort"]), []).append(state)
+
+        finished: Dict[int, bool] = {}
+
+        for members in cohorts.values():
+            cohort = members[0]["cohort"]
+
+            for state in members:
+                token = self._sample(cohort["logits"][state["row"]], state["request"])
+                state["tokens"].append(token)
+                finished[id(state)] = token in self.stop_ids or len(state["tokens"]) >= state["max_new_tokens"]
+
+            continuing = [state for state in members if not finished[id(state)]]
+            if not continuing:
+                continue
+
+            # 只保留继续生成的行，结束的行不再参与前向计算
+            device = self.model.device
+            if len(continuing) < cohort["logits"].shape[0]:
+                index = torch.tensor([state["row"] for state in continuing], device=device)
+                cohort["past_key_values"] = _select_rows(cohort["past_key_values"], index)
+                cohort["attention_mask"] = cohort["attention_mask"].index_select(0, index)
+                for row, state in enumerate(continuing):
+                    state["row"] = row
+
+            cohort["attention_mask"] = torch.cat(
+                [cohort["attention_mask"], torch.ones((len(continuing), 1), dtype=cohort["attention_mask"].dtype, device=device)],
+                dim=1
+            )
+            position_ids = torch.full((len(continuing), 1), cohort["position"], device=device)
+            cohort["position"] += 1
+
+            with torch.no_grad():
+                output = self.model(
+                    input_ids=torch.tensor([state["tokens"][-1] for state in continuing], device=device).unsqueeze(1),
+                    attention_mask=cohort["attention_mask"],
+                    position_ids=position_ids,
+                    past_key_values=cohort["past_key_values"],
+                    use_cache=True,
+                    return_dict=True
+                )
+
+            cohort["past_key_values"] = output.past_key_values
+            cohort["logits"] = output.logits[:, -1, :]
+
+        outputs = []
+        for state in states:
+            token = state["tokens"][-1]
+
+            tokens = state["tokens"][:-1] if token in self.stop_ids else state["tokens"]
+            text = self.tokenizer.decode(tokens)
+            delta = text[len(state["text"]):] if text.startswith(state["text"]) else text
+            state["text"] = text
+
+            outputs.append((delta, finished[id(state)]))
+
+        return outputs
+
+    def _sample(self, logits, request: "GenerationRequest") -> int:
+        """按temperature和top_p采样一个token"""
+        return sample_token(logits, request.temperature, self.config.top_p)
+
+
+def _select_rows(past_key_values, index):
+    """从KV缓存中选取部分序列（ChatGLM3的KV张量形状为 [seq, batch, groups, head_dim]）"""
+    return tuple(tuple(t.index_select(1, index) for t in layer) for layer in past_key_values)
+
+
+# ==================== 批量调度引擎 ====================
+
+class GenerationRequest:
+    """一次生成请求"""
+
+    __slots__ = (
+        "prompt", "max_length", "temperature", "future", "on_delta",
+        "parts", "tokens", "submitted_at", "started_at"
+    )
+
+    def __init__(
+        self,
+        prompt: str,
+        max_length: int,
+        temperature: float,
+        on_delta: Optional[Callable[[str], None]] = None
+    ):
+        """
+        Args:
+            prompt: 提示词
+            max_length: 最大长度（提示词 + 回答的token数，与model.chat一致）
+            temperature: 温度参数
+            on_delta: 每产生一段增量文本时的回调
+        """
+        self.prompt = prompt
+        self.max_length = max_length
+        self.temperature = temperature
+        self.future: Future = Future()
+        self.on_delta = on_delta
+        self.parts: List[str] = []
+        self.tokens = 0
+        self.submitted_at = time.monotonic()
+        self.started_at: Optional[float] = None
+
+
+class ContinuousBatchingEngine:
+    """
+    连续批处理引擎（独立后台线程）
+
+    空闲时收到第一个请求后等待batch_window秒，收集同一窗口内的请求一起prefill；
+    解码过程中每一步之前都会接纳新请求，直到批大小达到max_batch_size
+    """
+
+    def __init__(
+        self,
+        backend: BatchBackend,
+        max_batch_size: int = 8,
+        batch_window: float = 0.01
+    ):
+        self.backend = backend
+        self.max_batch_size = max_batch_size
+        self.batch_window = batch_window
+
+        self._pending: "queue.Queue[GenerationRequest]" = queue.Queue()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._loop, name="llm-batching", daemon=True)
+        self._thread.start()
+
+        # 统计
+        self.steps = 0
+        self.prefills = 0
+        self.sequences = 0
+        self.tokens = 0
+        self.cancelled = 0
+        self.batch_size_sum = 0
+        self.busy_seconds = 0.0
+
+    def submit(
+        self,
+        prompt: str,
+        max_length: int,
+        temperature: float,
+        on_delta: Optional[Callable[[str], None]] = None
+    ) -> Future:
+        """
+        提交生成请求（线程安全）
+
+        Args:
+            prompt: 提示词
+            max_length: 最大长度（提示词 + 回答）
+            temperature: 温度参数
+            on_delta: 每产生一段增量文本时的回调（在引擎线程中调用）
+
+        Returns:
+            完成后结果为完整文本的Future；调用future.cancel()取消生成，
+            序列在下一步解码前退出批次并释放KV缓存
+        """
+        request = GenerationRequest(prompt, max_length, temperature, on_delta)
+        self._pending.put(request)
+        return request.future
+
+    def _admit(self, active: List[Tuple[GenerationRequest, Any]], wait: bool):
+        """接纳新请求并批量prefill"""
+        new_requests = []
+
+        if wait:
+            # 空闲时阻塞等待第一个请求，再在窗口期内收集更多请求
+            try:
+                new_requests.append(self._pending.get(timeout=0.1))
+            except queue.Empty:
+                return
+
+            deadline = time.monotonic() + self.batch_window
+            while len(new_requests) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    new_requests.append(self._pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+        while len(active) + len(new_requests) < self.max_batch_size:
+            try:
+                new_requests.append(self._pending.get_nowait())
+            except queue.Empty:
+                break
+
+        # 排队期间已取消的请求不再prefill
+        self.cancelled += sum(request.future.cancelled() for request in new_requests)
+        new_requests = [request for request in new_requests if not request.future.cancelled()]
+
+        if not new_requests:
+            return
+
+        try:
+            states = self.backend.prefill(new_requests)
+        except Exception as e:
+            for request in new_requests:
+                _resolve(request.future, error=e)
+            return
+
+        now = time.monotonic()
+        for request, state in zip(new_requests, states):
+            request.started_at = now
+            active.append((request, state))
+
+        self.prefills += 1
+        self.sequences += len(new_requests)
+
+    def _loop(self):
+        active: List[Tuple[GenerationRequest, Any]] = []
+
+        while not self._stop.is_set():
+            self._admit(active, wait=not active)
+
+            if not active:
+                continue
+
+            started = time.monotonic()
+
+            try:
+                outputs = self.backend.step([state for _, state in active])
+            except Exception as e:
+                for request, _ in active:
+                    _resolve(request.future, error=e)
+                self.backend.release([state for _, state in active])
+                active = []
+                continue
+
+            self.busy_seconds += time.monotonic() - started
+            self.steps += 1
+            self.batch_size_sum += len(active)
+
+            still_active = []
+            finished_states = []
+
+            for (request, state), (delta, finished) in zip(active, outputs):
+                if request.future.cancelled():
+                    self.cancelled += 1
+                    finished_states.append(state)
+                    continue
+
+                if delta:
+                    request.parts.append(delta)
+                    request.tokens += 1
+                    self.tokens += 1
+                    if request.on_delta is not None:
+                        request.on_delta(delta)
+
+                if finished:
+                    _resolve(request.future, result="".join(request.parts))
+                    finished_states.append(state)
+                else:
+                    still_active.append((request, state))
+
+            if finished_states:
+                self.backend.release(finished_states)
+
+            active = still_active
+
+    def stats(self) -> Dict[str, Any]:
+        """引擎统计：步数、平均批大小、生成token数和吞吐"""
+        return {
+            "max_batch_size": self.max_batch_size,
+            "batch_window_ms": round(self.batch_window * 1000, 2),
+            "pending": self._pending.qsize(),
+            "steps": self.steps,
+            "prefills": self.prefills,
+            "sequences": self.sequences,
+            "tokens": self.tokens,
+            "cancelled": self.cancelled,
+            "avg_batch_size": round(self.batch_size_sum / self.steps, 2) if self.steps else 0.0,
+            "tokens_per_second": round(self.tokens / self.busy_seconds, 2) if self.busy_seconds else 0.0,
+        }
+
+    def close(self):
+        """停止引擎线程"""
+        self._stop.set()
+        self._thread.join(timeout=1)
+
+
+def _resolve(future: Future, result: Any = None, error: Optional[BaseException] = None):
+    """设置Future的结果或异常（调用方已取消时忽略）"""
+    try:
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+# ==================== BaseLLM封装 ====================
+
+class BatchingLLM(BaseLLM):
+    """
+    批量推理LLM
+
+    对外保持BaseLLM接口，内部把所有并发调用交给连续批处理引擎。
+    批量路径不使用前缀KV缓存，prefix参数被忽略（见ChatGLMBatchBackend）
+    """
+
+    def __init__(
+        self,
+        llm: BaseLLM,
+        backend: Optional[BatchBackend] = None,
+        max_batch_size: int = 8,
+        batch_window_ms: float = 10
+    ):
+        super().__init__(llm.config)
+        self.llm = llm
+        self.engine = ContinuousBatchingEngine(
+            backend or create_batch_backend(llm),
+            max_batch_size=max_batch_size,
+            batch_window=batch_window_ms / 1000
+        )
+
+    def _params(self, max_length: Optional[int], temperature: Optional[float]) -> Tuple[int, float]:
+        return (
+            max_length or self.config.max_length,
+            self.config.temperature if temperature is None else temperature
+        )
+
+    def generate_sync(
+        self,
+        prompt: str,
+        max_length: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> str:
+        """生成响应（同步版本，阻塞到所在批次中本序列结束）"""
+        return self.engine.submit(prompt, *self._params(max_length, temperature)).result()
+
+    async def generate(
+        self,
+        prompt: str,
+        max_length: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> str:
+        """生成响应（非流式）"""
+        future = self.engine.submit(prompt, *self._params(max_length, temperature))
+        return await asyncio.wrap_future(future)
+
+    async def generate_stream(
+        self,
+        prompt: str,
+        max_length: Optional[int] = None,
+        temperature: Optional[float] = None,
+        **kwargs
+    ) -> AsyncIterator[str]:
+        """生成响应（流式，每步解码的增量文本）"""
+        loop = asyncio.get_running_loop()
+        deltas: asyncio.Queue = asyncio.Queue()
+
+        future = self.engine.submit(
+            prompt,
+            *self._params(max_length, temperature),
+            on_delta=lambda delta: loop.call_soon_threadsafe(deltas.put_nowait, delta)
+        )
+        future.add_done_callback(lambda _: loop.call_soon_threadsafe(deltas.put_nowait, None))
+
+        try:
+            while True:
+                delta = await deltas.get()
+                if delta is None:
+                    break
+                yield delta
+
+            # 传播生成过程中的异常
+            future.result()
+        finally:
+            # 调用方提前关闭（如客户端断开）时取消序列，释放批次中的位置
+            future.cancel()
+
+    def count_tokens(self, text: str) -> int:
+        """使用底层模型的token计数"""
+        return self.llm.count_tokens(text)
+
+    def get_info(self) -> Dict[str, Any]:
+        """获取模型信息（含批处理统计）"""
+        info = self.llm.get_info()
+        info["batching"] = self.engine.stats()
+        return info
+
+    async def close(self):
+        """关闭引擎和底层模型"""
+        self.engine.close()
+        await self.llm.close()
+
+
+def create_batch_backend(llm: BaseLLM) -> BatchBackend:
+    """
+    为LLM创建对应的批量后端
+
+    Args:
+        llm: 底层LLM实例
+
+    Returns:
+        批量后端
+    """
+    from .mock_llm import MockLLM
+    from .chatglm_llm import ChatGLMLLM
+
+    if isinstance(llm, MockLLM):
+        return MockBatchBackend(llm)
+
+    if isinstance(llm, ChatGLMLLM):
+        return ChatGLMBatchBackend(llm.model, llm.tokenizer, llm.config)
+
+    raise ValueError(f"不支持批量推理的模型: {type(llm).__name__}")
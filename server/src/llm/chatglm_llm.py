@@ -6,8 +6,14 @@ ChatGLM3 LLM实现
 """
 
 import asyncio
-from typing import AsyncIterator, Optional, Dict, Any
+import threading
+from typing import AsyncIterator, Iterator, Optional, Dict, Any, List, Tuple
 from .base import BaseLLM, LLMConfig
+from .prefix_cache import PrefixCache, kv_nbytes
+
+
+# 流式生成结束标记
+_STREAM_END = object()
 
 
 class ChatGLMLLM(BaseLLM):
@@ -18,6 +24,12 @@ class ChatGLMLLM(BaseLLM):
         self.model = None
         self.tokenizer = None
         self._load_model()
+        
+        # 提示词固定前缀的KV缓存
+        self.prefix_cache = None
+        self._prefix_tokens: Dict[str, List[int]] = {}  # 前缀文字 -> 单独编码的token
+        if config.prefix_cache_mb and config.prefix_cache_mb > 0:
+            self.prefix_cache = PrefixCache(int(config.prefix_cache_mb * 1024 ** 2))
     
     def _load_model(self):
         """加载模型"""
@@ -57,6 +69,14 @@ class ChatGLMLLM(BaseLLM):
         
         self.model = self.model.eval()
         
+        # 对话结束标记
+        self.stop_ids = {self.tokenizer.eos_token_id}
+        for token in ("<|user|>", "<|observation|>"):
+            try:
+                self.stop_ids.add(self.tokenizer.get_command(token))
+            except Exception:
+                pass
+        
         print(f"✅ 模型加载完成")
         print(f"   设备: {self.config.device}")
         print(f"   量化: {self.config.quantization or 'None'}")
@@ -79,7 +99,8 @@ class ChatGLMLLM(BaseLLM):
             self._generate_sync,
             prompt,
             max_length,
-            temperature
+            temperature,
+            kwargs.get("prefix")
         )
         
         return response
@@ -88,9 +109,16 @@ class ChatGLMLLM(BaseLLM):
         self,
         prompt: str,
         max_length: int,
-        temperature: float
+        temperature: float,
+        prefix: Optional[str] = None
     ) -> str:
         """同步生成"""
+        if self._use_prefix_cache(prompt, prefix):
+            response = ""
+            for response in self._stream_with_prefix(prompt, prefix, max_length, temperature):
+                pass
+            return response
+        
         response, _ = self.model.chat(
             self.tokenizer,
             prompt,
@@ -100,6 +128,103 @@ class ChatGLMLLM(BaseLLM):
         )
         return response
     
+    def _use_prefix_cache(self, prompt: str, prefix: Optional[str]) -> bool:
+        return self.prefix_cache is not None and bool(prefix) and prompt.startswith(prefix)
+    
+    def _stream_with_prefix(
+        self,
+        prompt: str,
+        prefix: str,
+        max_length: int,
+        temperature: float
+    ) -> Iterator[str]:
+        """
+        复用前缀KV缓存生成（只编码前缀之后的token），逐token产出累计的回答文本
+        
+        与model.stream_chat的输出一致：不含结束标记，末尾为不完整的UTF-8字符时跳过
+        """
+        import torch
+        
+        input_ids = self.tokenizer.build_chat_input(prompt, history=[], role="user")["input_ids"][0].tolist()
+        prefix_len, past_key_values = self._prefix_state(prefix, input_ids)
+        
+        device = self.model.device
+        length = len(input_ids)
+        tokens: List[int] = []
+        
+        with torch.no_grad():
+            # prefill：只编码缓存前缀之后的部分
+            output = self.model(
+                input_ids=torch.tensor([input_ids[prefix_len:]], device=device),
+                position_ids=torch.arange(prefix_len, length, device=device).unsqueeze(0),
+                attention_mask=torch.ones((1, length), dtype=torch.long, device=device),
+                past_key_values=past_key_values,
+                use_cache=True,
+                return_dict=True
+            )
+            
+            while length < max_length:
+                token = sample_token(output.logits[0, -1], temperature, self.config.top_p)
+                if token in self.stop_ids:
+                    break
+                
+                tokens.append(token)
+                response = self.tokenizer.decode(tokens)
+                if response and response[-1] != "�":
+                    yield self.model.process_response(response, [])[0]
+                
+                output = self.model(
+                    input_ids=torch.tensor([[token]], device=device),
+                    position_ids=torch.tensor([[length]], device=device),
+                    attention_mask=torch.ones((1, length + 1), dtype=torch.long, device=device),
+                    past_key_values=output.past_key_values,
+                    use_cache=True,
+                    return_dict=True
+                )
+                length += 1
+    
+    def _prefix_state(self, prefix: str, input_ids: List[int]) -> Tuple[int, Optional[Any]]:
+        """
+        获取输入开头的前缀KV状态：命中缓存时直接返回，否则编码前缀并写入缓存
+        
+        Returns:
+            (前缀token数, KV状态)，无法确定前缀时为 (0, None)
+        """
+        # 前缀单独编码的token（去掉末尾的<|assistant|>和可能与后文合并的最后一个token），
+        # 每个前缀只编码一次；只取与完整输入一致的部分，且至少留一个token给prefill
+        prefix_ids = self._prefix_tokens.get(prefix)
+        if prefix_ids is None:
+            prefix_ids = self.tokenizer.build_chat_input(prefix, history=[], role="user")["input_ids"][0].tolist()[:-2]
+            self._prefix_tokens[prefix] = prefix_ids
+        
+        limit = min(len(prefix_ids), len(input_ids) - 1)
+        prefix_len = 0
+        while prefix_len < limit and prefix_ids[prefix_len] == input_ids[prefix_len]:
+            prefix_len += 1
+        
+        if prefix_len == 0:
+            return 0, None
+        
+        past_key_values = self.prefix_cache.lookup(input_ids[:prefix_len])
+        if past_key_values is not None:
+            return prefix_len, past_key_values
+        
+        import torch
+        
+        device = self.model.device
+        with torch.no_grad():
+            output = self.model(
+                input_ids=torch.tensor([input_ids[:prefix_len]], device=device),
+                position_ids=torch.arange(prefix_len, device=device).unsqueeze(0),
+                use_cache=True,
+                return_dict=True
+            )
+        
+        # 前向计算每次生成新的KV张量（torch.cat），缓存的状态不会被后续请求修改
+        self.prefix_cache.put(input_ids[:prefix_len], output.past_key_values, kv_nbytes(output.past_key_values))
+        
+        return prefix_len, output.past_key_values
+    
     async def generate_stream(
         self,
         prompt: str,
@@ -111,16 +236,66 @@ class ChatGLMLLM(BaseLLM):
         max_length = max_length or self.config.max_length
         temperature = temperature or self.config.temperature
         
-        # ChatGLM3的流式生成
-        for response, _ in self.model.stream_chat(
-            self.tokenizer,
-            prompt,
-            max_length=max_length,
-            temperature=temperature,
-            top_p=self.config.top_p
-        ):
-            yield response
-            await asyncio.sleep(0)  # 让出控制权
+        # ChatGLM3的stream_chat是阻塞生成器，且每次返回累计文本：
+        # 在线程池中迭代，通过队列把结果交回事件循环，并转换为增量文本
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        
+        def responses() -> Iterator[str]:
+            prefix = kwargs.get("prefix")
+            if self._use_prefix_cache(prompt, prefix):
+                yield from self._stream_with_prefix(prompt, prefix, max_length, temperature)
+                return
+            
+            for response, _ in self.model.stream_chat(
+                self.tokenizer,
+                prompt,
+                max_length=max_length,
+                temperature=temperature,
+                top_p=self.config.top_p
+            ):
+                yield response
+        
+        def produce():
+            try:
+                for response in responses():
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, response)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, _STREAM_END)
+        
+        producer = loop.run_in_executor(None, produce)
+        previous = ""
+        
+        try:
+            while True:
+                item = await queue.get()
+                
+                if item is _STREAM_END:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                
+                delta = item[len(previous):] if item.startswith(previous) else item
+                previous = item
+                
+                if delta:
+                    yield delta
+        finally:
+            # 客户端断开时通知生成线程尽快结束
+            stop.set()
+            await producer
+    
+    def count_tokens(self, text: str) -> int:
+        """使用模型分词器计算token数"""
+        if self.tokenizer is None:
+            return super().count_tokens(text)
+        
+        return len(self.tokenizer.encode(text, add_special_tokens=False))
     
     def get_info(self) -> Dict[str, Any]:
         """获取模型信息"""
@@ -132,6 +307,9 @@ class ChatGLMLLM(BaseLLM):
             "quantization": self.config.quantization,
         }
         
+        if self.prefix_cache is not None:
+            info["prefix_cache"] = self.prefix_cache.stats()
+        
         # 如果在CUDA上，添加显存信息
         if self.config.device == "cuda":
             try:
@@ -155,6 +333,9 @@ class ChatGLMLLM(BaseLLM):
             del self.tokenizer
             self.tokenizer = None
         
+        if self.prefix_cache is not None:
+            self.prefix_cache.clear()
+        
         # 清理CUDA缓存
         if self.config.device == "cuda":
             try:
@@ -164,6 +345,22 @@ class ChatGLMLLM(BaseLLM):
                 pass
 
 
+def sample_token(logits, temperature: float, top_p: float) -> int:
+    """按temperature和top_p从最后一个位置的logits采样一个token（temperature<=0时取最大值）"""
+    import torch
+    
+    if temperature <= 0:
+        return int(torch.argmax(logits))
+    
+    probs = torch.softmax(logits.float() / temperature, dim=-1)
+    sorted_probs, sorted_ids = torch.sort(probs, descending=True)
+    cumulative = torch.cumsum(sorted_probs, dim=-1)
+    sorted_probs[cumulative - sorted_probs > top_p] = 0
+    choice = torch.multinomial(sorted_probs / sorted_probs.sum(), 1)
+    
+    return int(sorted_ids[choice])
+
+
 # 便捷函数
 def create_chatglm_llm(config: LLMConfig) -> ChatGLMLLM:
     """创建ChatGLM LLM实例"""
@@ -25,6 +25,23 @@ def create_llm(config: Optional[LLMConfig] = None) -> BaseLLM:
     if config is None:
         config = LLMConfig()
     
+    llm = _create_base_llm(config)
+    
+    # 批量推理：把底层模型包装成连续批处理引擎
+    if config.batching:
+        from .batching import BatchingLLM
+        print(f"📦 启用批量推理: max_batch_size={config.max_batch_size}, window={config.batch_window_ms}ms")
+        return BatchingLLM(
+            llm,
+            max_batch_size=config.max_batch_size,
+            batch_window_ms=config.batch_window_ms
+        )
+    
+    return llm
+
+
+def _create_base_llm(config: LLMConfig) -> BaseLLM:
+    """创建底层LLM实例（Mock或真实模型）"""
     # 检查是否使用Mock模式
     if config.mock_mode:
         print("🎭 使用Mock LLM（无需GPU）")
@@ -86,7 +103,11 @@ def create_llm_from_config_file(config_path: str) -> BaseLLM:
         max_length=model_config.get('max_length', 4096),
         temperature=model_config.get('temperature', 0.7),
         top_p=model_config.get('top_p', 0.9),
-        mock_mode=model_config.get('mock_mode', False)
+        mock_mode=model_config.get('mock_mode', False),
+        batching=model_config.get('batching', {}).get('enabled', False),
+        max_batch_size=model_config.get('batching', {}).get('max_batch_size', 8),
+        batch_window_ms=model_config.get('batching', {}).get('window_ms', 10),
+        prefix_cache_mb=model_config.get('prefix_cache_mb', 256)
     )
     
     return create_llm(llm_config)
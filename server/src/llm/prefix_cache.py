@@ -0,0 +1,112 @@
+"""
+提示词前缀KV缓存
+
+Agent的提示词以固定的说明文字开头（如"请基于工具的查询结果，回答用户的问题…"），
+每次生成都要重新编码这段前缀。前缀缓存保存前缀token的KV状态，
+之后的请求只需编码前缀之后的部分，在CPU推理时可以显著缩短prefill时间。
+
+前缀是少数几个固定的说明文字，缓存以前缀的token元组为键（哈希查找，O(1)），
+调用方负责确认输入以该前缀开头；按KV状态占用的字节数做LRU淘汰
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Sequence, Tuple
+
+
+class PrefixCache:
+    """前缀token序列 -> KV状态的LRU缓存（线程安全，按字节数限制）"""
+
+    def __init__(self, max_bytes: int):
+        """
+        Args:
+            max_bytes: KV状态总字节数上限
+        """
+        self.max_bytes = max_bytes
+        self.nbytes = 0
+        self._entries: "OrderedDict[Tuple[int, ...], Tuple[Any, int]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.reused_tokens = 0
+
+    def lookup(self, prefix_ids: Sequence[int]) -> Optional[Any]:
+        """
+        查找前缀的KV状态
+
+        Args:
+            prefix_ids: 前缀token序列
+
+        Returns:
+            KV状态，未命中时为None
+        """
+        key = tuple(prefix_ids)
+
+        with self._lock:
+            entry = self._entries.get(key)
+
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            self.reused_tokens += len(key)
+            return entry[0]
+
+    def put(self, prefix_ids: Sequence[int], state: Any, nbytes: int):
+        """
+        写入前缀的KV状态，超出字节数上限时淘汰最久未使用的前缀
+
+        Args:
+            prefix_ids: 前缀token序列
+            state: KV状态（调用方保证之后不会原地修改）
+            nbytes: KV状态占用的字节数
+        """
+        if nbytes > self.max_bytes:
+            return
+
+        key = tuple(prefix_ids)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self.nbytes -= old[1]
+
+            self._entries[key] = (state, nbytes)
+            self.nbytes += nbytes
+
+            while self.nbytes > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.nbytes -= evicted
+                self.evictions += 1
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.nbytes = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """缓存统计：前缀数、字节数、命中/未命中/淘汰次数和复用的token数"""
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self.nbytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 4) if total else 0.0,
+            "evictions": self.evictions,
+            "reused_tokens": self.reused_tokens,
+        }
+
+
+def kv_nbytes(past_key_values) -> int:
+    """KV状态（每层一个 (key, value) 张量元组）占用的字节数"""
+    return sum(t.numel() * t.element_size() for layer in past_key_values for t in layer)
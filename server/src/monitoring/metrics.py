@@ -0,0 +1,328 @@
+"""
+监控指标
+
+进程内的计数器、仪表和直方图，按Prometheus文本格式导出（/metrics端点）。
+仪表可以注册回调函数，在每次抓取时读取当前值（缓存条数、排队数等）；
+计数器也可以注册回调，读取由其他对象维护的累计次数（缓存命中次数等）
+"""
+
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional, Dict, List, Tuple, Callable, Iterator, Sequence
+
+
+# 延迟直方图的默认分桶（秒）
+DEFAULT_BUCKETS = (
+    0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05,
+    0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0
+)
+
+# token数直方图的分桶
+TOKEN_BUCKETS = (16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+
+class Metric:
+    """指标基类"""
+
+    kind = ""
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.label_names = tuple(label_names)
+        self._lock = threading.Lock()
+
+    def _key(self, labels: Dict[str, str]) -> Tuple[str, ...]:
+        if set(labels) != set(self.label_names):
+            raise ValueError(f"指标 {self.name} 需要标签 {self.label_names}，实际为 {tuple(labels)}")
+        return tuple(str(labels[name]) for name in self.label_names)
+
+    def _labels(self, key: Tuple[str, ...], extra: Optional[Dict[str, str]] = None) -> str:
+        pairs = list(zip(self.label_names, key)) + list((extra or {}).items())
+        if not pairs:
+            return ""
+        return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+    def samples(self) -> List[str]:
+        raise NotImplementedError
+
+    def render(self) -> List[str]:
+        return [
+            f"# HELP {self.name} {self.documentation}",
+            f"# TYPE {self.name} {self.kind}",
+        ] + self.samples()
+
+
+class Counter(Metric):
+    """单调递增计数器（可直接累加，也可注册抓取时读取累计值的回调）"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], Optional[float]]] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_function(self, func: Callable[[], Optional[float]], **labels):
+        """
+        注册回调，抓取时读取累计值
+
+        Args:
+            func: 返回累计次数的函数（只增不减），返回None时不输出该样本
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._callbacks[key] = func
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            callbacks = dict(self._callbacks)
+        values = _apply_callbacks(values, callbacks)
+        return [f"{self.name}{self._labels(key)} {_format(value)}" for key, value in sorted(values.items())]
+
+
+class Gauge(Metric):
+    """仪表（可直接设置，也可注册抓取时调用的回调）"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, label_names: Sequence[str] = ()):
+        super().__init__(name, documentation, label_names)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._callbacks: Dict[Tuple[str, ...], Callable[[], Optional[float]]] = {}
+
+    def set(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = value
+
+    def set_function(self, func: Callable[[], Optional[float]], **labels):
+        """
+        注册回调，抓取时读取当前值
+
+        Args:
+            func: 返回当前值的函数，返回None时不输出该样本
+        """
+        key = self._key(labels)
+        with self._lock:
+            self._callbacks[key] = func
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            values = dict(self._values)
+            callbacks = dict(self._callbacks)
+        values = _apply_callbacks(values, callbacks)
+        return [f"{self.name}{self._labels(key)} {_format(value)}" for key, value in sorted(values.items())]
+
+
+class Histogram(Metric):
+    """直方图（累积分桶 + 总和 + 次数）"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ):
+        super().__init__(name, documentation, label_names)
+        self.buckets = tuple(sorted(buckets))
+        self._counts: Dict[Tuple[str, ...], List[int]] = {}
+        self._sums: Dict[Tuple[str, ...], float] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+
+        # 找到第一个上界不小于value的分桶（最后一个为+Inf）
+        index = len(self.buckets)
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                index = i
+                break
+
+        with self._lock:
+            counts = self._counts.get(key)
+            if counts is None:
+                counts = self._counts[key] = [0] * (len(self.buckets) + 1)
+                self._sums[key] = 0.0
+            counts[index] += 1
+            self._sums[key] += value
+
+    @contextmanager
+    def time(self, **labels) -> Iterator[None]:
+        """记录代码块的耗时（秒）"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def count(self, **labels) -> int:
+        return sum(self._counts.get(self._key(labels), ()))
+
+    def samples(self) -> List[str]:
+        with self._lock:
+            items = sorted((key, list(counts), self._sums[key]) for key, counts in self._counts.items())
+
+        lines = []
+        for key, counts, total in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                le = "+Inf" if bound == math.inf else _format(bound)
+                lines.append(f"{self.name}_bucket{self._labels(key, {'le': le})} {cumulative}")
+            lines.append(f"{self.name}_sum{self._labels(key)} {_format(total)}")
+            lines.append(f"{self.name}_count{self._labels(key)} {cumulative}")
+
+        return lines
+
+
+class MetricsRegistry:
+    """指标注册表"""
+
+    def __init__(self):
+        self._metrics: Dict[str, Metric] = {}
+        self._lock = threading.Lock()
+
+    def _register(self, metric: Metric) -> Metric:
+        with self._lock:
+            existing = self._metrics.get(metric.name)
+            if existing is not None:
+                return existing
+            self._metrics[metric.name] = metric
+            return metric
+
+    def counter(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Counter:
+        return self._register(Counter(name, documentation, label_names))
+
+    def gauge(self, name: str, documentation: str, label_names: Sequence[str] = ()) -> Gauge:
+        return self._register(Gauge(name, documentation, label_names))
+
+    def histogram(
+        self,
+        name: str,
+        documentation: str,
+        label_names: Sequence[str] = (),
+        buckets: Sequence[float] = DEFAULT_BUCKETS
+    ) -> Histogram:
+        return self._register(Histogram(name, documentation, label_names, buckets))
+
+    def render(self) -> str:
+        """按Prometheus文本格式导出所有指标"""
+        with self._lock:
+            metrics = list(self._metrics.values())
+
+        lines = []
+        for metric in metrics:
+            lines.extend(metric.render())
+
+        return "\n".join(lines) + "\n"
+
+
+def _apply_callbacks(
+    values: Dict[Tuple[str, ...], float],
+    callbacks: Dict[Tuple[str, ...], Callable[[], Optional[float]]]
+) -> Dict[Tuple[str, ...], float]:
+    """用回调的返回值覆盖样本值（回调出错或返回None时不输出该样本）"""
+    for key, func in callbacks.items():
+        try:
+            value = func()
+        except Exception:
+            value = None
+        if value is None:
+            values.pop(key, None)
+        else:
+            values[key] = value
+
+    return values
+
+
+def _format(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+# ==================== 全局注册表和指标 ====================
+
+REGISTRY = MetricsRegistry()
+
+# Agent各阶段耗时：route_query / select_tool / retriever_embed / retriever_search /
+# retriever_fuse / retriever_rerank / llm_generate
+STAGE_SECONDS = REGISTRY.histogram(
+    "agent_stage_duration_seconds", "Agent各阶段耗时（秒）", ["stage"]
+)
+
+RETRIEVER_RERANKS = REGISTRY.counter(
+    "retriever_rerank_total", "混合检索的重排序次数（done=已重排，skipped=超出耗时预算跳过）", ["result"]
+)
+
+TOOL_SECONDS = REGISTRY.histogram(
+    "tool_duration_seconds", "工具函数执行耗时（秒）", ["tool"]
+)
+
+TOOL_CALLS = REGISTRY.counter(
+    "tool_calls_total", "工具调用次数", ["tool", "result"]
+)
+
+AGENT_ANSWERS = REGISTRY.counter(
+    "agent_answers_total", "Agent回答次数（source：llm=调用LLM，template=模板快速路径，cache=回答缓存，fallback=固定回答）",
+    ["route", "source"]
+)
+
+LLM_PROMPT_TOKENS = REGISTRY.histogram(
+    "llm_prompt_tokens", "LLM提示词token数", [], TOKEN_BUCKETS
+)
+
+LLM_OUTPUT_TOKENS = REGISTRY.histogram(
+    "llm_output_tokens", "LLM输出token数", [], TOKEN_BUCKETS
+)
+
+REQUEST_SECONDS = REGISTRY.histogram(
+    "http_request_duration_seconds", "HTTP请求总耗时（秒）", ["method", "path", "status"]
+)
+
+CACHE_ENTRIES = REGISTRY.gauge(
+    "cache_entries", "进程内缓存条数", ["cache"]
+)
+
+CACHE_LOOKUPS = REGISTRY.counter(
+    "response_cache_lookups_total", "响应缓存查找次数", ["namespace", "result"]
+)
+
+STOCK_PANEL_BYTES = REGISTRY.gauge(
+    "stock_panel_bytes", "股票面板数据占用的字节数", []
+)
+
+FRAME_CACHE_BYTES = REGISTRY.gauge(
+    "stock_frame_cache_bytes", "行情DataFrame缓存占用的字节数", []
+)
+
+FRAME_CACHE_EVENTS = REGISTRY.counter(
+    "stock_frame_cache_events_total", "行情DataFrame缓存的命中、未命中和淘汰次数", ["result"]
+)
+
+QUEUE_DEPTH = REGISTRY.gauge(
+    "request_queue_depth", "请求调度器中的请求数", ["state"]
+)
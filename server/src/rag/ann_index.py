@@ -0,0 +1,300 @@
+"""
+向量近似最近邻索引（IVF）
+
+用球面k-means把归一化的文档向量聚成nlist个簇，向量按簇连续存放；
+查询时先与簇中心比较，只扫描最相近的nprobe个簇，扫描量约为全部向量的nprobe/nlist。
+文档较少时只有一个簇，等价于暴力检索。
+
+索引与倒排索引一样保存为.npz文件，知识库或向量模型变化后自动失效
+"""
+
+import json
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+import numpy as np
+
+from .embeddings import normalize
+
+
+# 索引文件格式版本，格式变化时旧文件自动失效
+INDEX_VERSION = 1
+
+# 每个簇的平均向量数（自动确定nlist时使用）
+VECTORS_PER_LIST = 256
+
+# k-means每个簇使用的训练样本数上限
+TRAIN_PER_LIST = 64
+
+# k-means迭代次数
+KMEANS_ITERATIONS = 10
+
+# 分块计算内积时每块的向量数，限制临时矩阵的内存
+BLOCK_SIZE = 8192
+
+
+class IVFIndex:
+    """倒排文件（IVF）向量索引"""
+
+    def __init__(
+        self,
+        centroids: np.ndarray,
+        offsets: np.ndarray,
+        ids: np.ndarray,
+        vectors: np.ndarray,
+        nprobe: int = 8
+    ):
+        """
+        Args:
+            centroids: (nlist, dim) 归一化的簇中心
+            offsets: 每个簇在ids/vectors中的起始位置，长度为nlist+1
+            ids: 按簇排列的文档编号
+            vectors: 与ids对应的归一化文档向量
+            nprobe: 默认扫描的簇数
+        """
+        self.centroids = centroids
+        self.offsets = offsets
+        self.ids = ids
+        self.vectors = vectors
+        self.nprobe = nprobe
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def dim(self) -> int:
+        return self.vectors.shape[1]
+
+    # ==================== 构建 ====================
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        seed: int = 0
+    ) -> "IVFIndex":
+        """
+        构建索引
+
+        Args:
+            vectors: (n, dim) 归一化的文档向量，行号即文档编号
+            nlist: 簇数，None时按每簇约VECTORS_PER_LIST个向量确定
+            nprobe: 默认扫描的簇数
+            seed: k-means随机种子
+
+        Returns:
+            IVF索引
+        """
+        vectors = np.ascontiguousarray(vectors, dtype=np.float32)
+        num = len(vectors)
+
+        if nlist is None:
+            nlist = num // VECTORS_PER_LIST
+        nlist = int(min(max(nlist, 1), max(num, 1)))
+
+        if nlist == 1:
+            centroids = normalize(vectors.sum(axis=0, keepdims=True, dtype=np.float32))
+            assign = np.zeros(num, dtype=np.int64)
+        else:
+            centroids = _kmeans(vectors, nlist, np.random.default_rng(seed))
+            assign = _assign(vectors, centroids)
+
+        order = np.argsort(assign, kind="stable")
+        offsets = np.zeros(nlist + 1, dtype=np.int64)
+        offsets[1:] = np.cumsum(np.bincount(assign, minlength=nlist))
+
+        return cls(
+            centroids=centroids,
+            offsets=offsets,
+            ids=order.astype(np.int64),
+            vectors=vectors[order],
+            nprobe=nprobe
+        )
+
+    # ==================== 持久化 ====================
+
+    def save(self, path: Path, fingerprint: Dict):
+        """
+        保存索引
+
+        Args:
+            path: 索引文件路径（.npz）
+            fingerprint: 知识库和向量模型的指纹，用于判断是否过期
+        """
+        meta = {"version": INDEX_VERSION, "fingerprint": fingerprint}
+
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+                centroids=self.centroids,
+                offsets=self.offsets,
+                ids=self.ids,
+                vectors=self.vectors
+            )
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: Dict, nprobe: int = 8) -> Optional["IVFIndex"]:
+        """
+        加载索引
+
+        Args:
+            path: 索引文件路径
+            fingerprint: 当前知识库和向量模型的指纹
+            nprobe: 默认扫描的簇数
+
+        Returns:
+            IVF索引，文件不存在或已过期时返回None
+        """
+        if not path.exists():
+            return None
+
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode('utf-8'))
+
+            if meta.get("version") != INDEX_VERSION or meta.get("fingerprint") != fingerprint:
+                return None
+
+            return cls(
+                centroids=data["centroids"],
+                offsets=data["offsets"],
+                ids=data["ids"],
+                vectors=data["vectors"],
+                nprobe=nprobe
+            )
+
+    # ==================== 查询 ====================
+
+    def search(
+        self,
+        queries: np.ndarray,
+        top_k: int = 3,
+        nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        批量近似检索
+
+        Args:
+            queries: (q, dim) 归一化的查询向量
+            top_k: 每个查询返回的结果数
+            nprobe: 扫描的簇数，None时使用默认值
+
+        Returns:
+            (文档编号, 分数)，形状均为(q, top_k)，按分数降序，不足top_k时编号为-1、分数为-inf
+        """
+        nprobe = min(nprobe or self.nprobe, self.nlist)
+
+        if nprobe >= self.nlist:
+            return self.exact_search(queries, top_k)
+
+        ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+
+        coarse = queries @ self.centroids.T
+        probes = np.argpartition(-coarse, nprobe - 1, axis=1)[:, :nprobe]
+
+        for row, lists in enumerate(probes):
+            # 每个簇的向量连续存放，直接在切片上计算内积，不复制向量
+            spans = [(self.offsets[i], self.offsets[i + 1]) for i in lists]
+            sims = np.concatenate([self.vectors[start:end] @ queries[row] for start, end in spans])
+            doc_ids = np.concatenate([self.ids[start:end] for start, end in spans])
+
+            hit, score = _top_k(sims, top_k)
+            ids[row, :len(hit)] = doc_ids[hit]
+            scores[row, :len(hit)] = score
+
+        return ids, scores
+
+    def exact_search(self, queries: np.ndarray, top_k: int = 3) -> Tuple[np.ndarray, np.ndarray]:
+        """暴力检索（分块扫描全部向量，每块保留各查询的前top_k），返回格式与search相同"""
+        ids = np.full((len(queries), top_k), -1, dtype=np.int64)
+        scores = np.full((len(queries), top_k), -np.inf, dtype=np.float32)
+
+        for start in range(0, len(self.vectors), BLOCK_SIZE):
+            block = queries @ self.vectors[start:start + BLOCK_SIZE].T
+
+            if block.shape[1] > top_k:
+                hit = np.argpartition(-block, top_k - 1, axis=1)[:, :top_k]
+            else:
+                hit = np.broadcast_to(np.arange(block.shape[1]), block.shape)
+
+            candidate_ids = np.concatenate([ids, self.ids[start + hit]], axis=1)
+            candidate_scores = np.concatenate([scores, np.take_along_axis(block, hit, axis=1)], axis=1)
+
+            best = np.argsort(-candidate_scores, axis=1, kind="stable")[:, :top_k]
+            ids = np.take_along_axis(candidate_ids, best, axis=1)
+            scores = np.take_along_axis(candidate_scores, best, axis=1)
+
+        return ids, scores
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+
+def recall_at_k(approx_ids: np.ndarray, exact_ids: np.ndarray) -> float:
+    """
+    近似检索相对暴力检索的召回率
+
+    Args:
+        approx_ids: 近似检索的文档编号 (q, k)
+        exact_ids: 暴力检索的文档编号 (q, k)
+
+    Returns:
+        每个查询的|近似结果 ∩ 精确结果| / |精确结果|的平均值
+    """
+    recalls = []
+
+    for approx, exact in zip(approx_ids, exact_ids):
+        exact = set(exact[exact >= 0].tolist())
+        if exact:
+            recalls.append(len(exact & set(approx.tolist())) / len(exact))
+
+    return float(np.mean(recalls)) if recalls else 1.0
+
+
+def _top_k(scores: np.ndarray, top_k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """分数最高的top_k个位置及其分数（降序）"""
+    if len(scores) > top_k:
+        hit = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        hit = np.arange(len(scores))
+
+    hit = hit[np.argsort(-scores[hit], kind="stable")]
+    return hit, scores[hit]
+
+
+def _assign(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """每个向量最相近的簇中心（分块计算）"""
+    return np.concatenate([
+        np.argmax(vectors[start:start + BLOCK_SIZE] @ centroids.T, axis=1)
+        for start in range(0, len(vectors), BLOCK_SIZE)
+    ])
+
+
+def _kmeans(vectors: np.ndarray, nlist: int, rng: np.random.Generator) -> np.ndarray:
+    """球面k-means（在采样的训练集上迭代），返回归一化的簇中心"""
+    sample_size = min(len(vectors), nlist * TRAIN_PER_LIST)
+    sample = vectors[rng.choice(len(vectors), sample_size, replace=False)]
+    centroids = sample[rng.choice(sample_size, nlist, replace=False)].copy()
+
+    for _ in range(KMEANS_ITERATIONS):
+        assign = _assign(sample, centroids)
+
+        counts = np.bincount(assign, minlength=nlist)
+        order = np.argsort(assign, kind="stable")
+        starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+
+        sums = np.zeros_like(centroids)
+        nonempty = counts > 0
+        sums[nonempty] = np.add.reduceat(sample[order], starts[nonempty], axis=0)
+
+        # 空簇重新取一个随机样本作为中心
+        empty = np.flatnonzero(counts == 0)
+        sums[empty] = sample[rng.choice(sample_size, len(empty), replace=False)]
+
+        centroids = normalize(sums)
+
+    return centroids
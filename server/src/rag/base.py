@@ -0,0 +1,161 @@
+"""
+RAG检索器基类
+
+定义统一的检索接口（search），上下文拼接和知识查询判断由各检索后端共用
+"""
+
+import time
+from abc import ABC, abstractmethod
+from typing import List, Dict, Optional
+
+
+class BaseRetriever(ABC):
+    """检索器基类"""
+    
+    # 非典型知识查询时，结果分数至少达到该值才作为相关知识返回（各后端的分数尺度不同）
+    relevance_score: float = 5.0
+    
+    @abstractmethod
+    def search(
+        self, 
+        query: str, 
+        top_k: int = 3,
+        min_score: float = 0.0
+    ) -> List[Dict]:
+        """
+        搜索相关知识
+        
+        Args:
+            query: 查询字符串
+            top_k: 返回前K个结果
+            min_score: 最小匹配分数
+            
+        Returns:
+            匹配的知识列表，每项包含content、title、source、score，按分数降序
+        """
+    
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_score: float = 0.0,
+        timings: Optional[Dict[str, float]] = None
+    ) -> List[Dict]:
+        """
+        搜索并记录各阶段耗时
+        
+        Args:
+            query: 查询字符串
+            top_k: 返回前K个结果
+            min_score: 最小匹配分数
+            timings: 不为None时写入各阶段耗时（毫秒），默认只有search一个阶段
+            
+        Returns:
+            匹配的知识列表（同search）
+        """
+        start = time.perf_counter()
+        results = self.search(query, top_k, min_score)
+        
+        if timings is not None:
+            timings["search"] = (time.perf_counter() - start) * 1000
+        
+        return results
+    
+    def get_context(
+        self, 
+        query: str, 
+        max_length: int = 500,
+        timings: Optional[Dict[str, float]] = None
+    ) -> str:
+        """
+        获取上下文字符串
+        
+        Args:
+            query: 查询字符串
+            max_length: 最大长度
+            timings: 不为None时写入检索各阶段耗时（毫秒）
+            
+        Returns:
+            拼接的上下文
+        """
+        results = self.retrieve(query, top_k=3, timings=timings)
+        
+        if not results:
+            return ""
+        
+        context_parts = []
+        current_length = 0
+        
+        for result in results:
+            content = result['content']
+            title = result.get('title', '')
+            
+            # 格式化内容
+            if title:
+                part = f"【{title}】\n{content}"
+            else:
+                part = content
+            
+            # 检查长度限制
+            if current_length + len(part) > max_length:
+                # 截断
+                remaining = max_length - current_length
+                if remaining > 100:  # 至少保留100字符
+                    part = part[:remaining] + "..."
+                    context_parts.append(part)
+                break
+            
+            context_parts.append(part)
+            current_length += len(part)
+        
+        return "\n\n---\n\n".join(context_parts)
+    
+    def is_knowledge_query(self, query: str) -> bool:
+        """
+        判断是否是知识查询
+        
+        Args:
+            query: 查询字符串
+            
+        Returns:
+            是否是知识查询
+        """
+        # 知识查询的关键词
+        knowledge_keywords = [
+            "什么是", "如何", "怎么", "为什么", "哪些",
+            "概念", "定义", "含义", "解释", "介绍",
+            "原理", "方法", "步骤", "技巧", "知识",
+            "什么叫", "啥是", "啥叫"
+        ]
+        
+        query_lower = query.lower()
+        
+        return any(kw in query_lower for kw in knowledge_keywords)
+    
+    def get_relevant_knowledge(
+        self,
+        query: str,
+        timings: Optional[Dict[str, float]] = None
+    ) -> Optional[str]:
+        """
+        获取相关知识（如果有）
+        
+        Args:
+            query: 查询字符串
+            timings: 不为None时写入检索各阶段耗时（毫秒）
+            
+        Returns:
+            相关知识或None
+        """
+        # 判断是否需要知识库
+        if not self.is_knowledge_query(query):
+            # 即使不是典型的知识查询，也尝试搜索一下
+            results = self.retrieve(query, top_k=1, min_score=self.relevance_score, timings=timings)
+            if results:
+                return results[0]['content']
+            return None
+        
+        # 获取上下文
+        context = self.get_context(query, max_length=800, timings=timings)
+        
+        return context if context else None
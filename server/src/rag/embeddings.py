@@ -0,0 +1,165 @@
+"""
+文本向量化
+
+- SentenceTransformerEmbedder：sentence-transformers模型（如bge-small-zh-v1.5），在CPU上按批编码，
+  模型可以是本地目录，离线环境不需要访问网络
+- HashingEmbedder：把切词结果哈希到固定维度的向量，不需要模型文件，结果确定，用于测试和无模型环境
+
+输出的向量都已归一化（L2范数为1），内积即余弦相似度
+"""
+
+import math
+import zlib
+from abc import ABC, abstractmethod
+from functools import lru_cache
+from typing import List, Dict, Tuple
+
+import numpy as np
+
+from .inverted_index import tokenize
+
+
+# 配置中使用哈希向量时的模型名
+HASHING_MODEL = "hashing"
+
+
+class Embedder(ABC):
+    """文本向量化模型"""
+
+    # 模型名称（写入向量索引，换模型后索引自动失效）
+    name: str = ""
+
+    # 向量维度
+    dim: int = 0
+
+    @abstractmethod
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        """
+        文档向量化
+
+        Args:
+            texts: 文本列表
+
+        Returns:
+            (len(texts), dim) 的float32矩阵，每行已归一化
+        """
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        """查询向量化（默认与文档相同）"""
+        return self.embed_documents(texts)
+
+
+class HashingEmbedder(Embedder):
+    """
+    哈希向量
+
+    切词方式与BM25索引相同（中文二元组、英文整词），每个词哈希到一个维度并带随机符号，
+    词频取对数后累加，不需要训练，同一文本在任何机器上得到相同的向量
+    """
+
+    def __init__(self, dim: int = 512):
+        """
+        Args:
+            dim: 向量维度
+        """
+        self.dim = dim
+        self.name = f"{HASHING_MODEL}-{dim}"
+        self._slot = lru_cache(maxsize=65536)(self._hash)
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        rows, slots, values = [], [], []
+
+        for row, text in enumerate(texts):
+            counts: Dict[str, int] = {}
+            for token in tokenize(text):
+                counts[token] = counts.get(token, 0) + 1
+
+            for token, count in counts.items():
+                slot, sign = self._slot(token)
+                rows.append(row)
+                slots.append(slot)
+                values.append(sign * (1.0 + math.log(count)))
+
+        vectors = np.zeros((len(texts), self.dim), dtype=np.float32)
+        np.add.at(vectors, (np.asarray(rows, dtype=np.int64), np.asarray(slots, dtype=np.int64)), values)
+
+        return normalize(vectors)
+
+    def _hash(self, token: str) -> Tuple[int, float]:
+        h = zlib.crc32(token.encode('utf-8'))
+        return h % self.dim, 1.0 if h >> 31 else -1.0
+
+
+class SentenceTransformerEmbedder(Embedder):
+    """sentence-transformers模型（CPU批量编码）"""
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        batch_size: int = 32,
+        query_instruction: str = ""
+    ):
+        """
+        Args:
+            model_name: 模型名称或本地模型目录
+            device: 推理设备
+            batch_size: 编码批大小
+            query_instruction: 查询前添加的指令（bge模型检索短查询时建议使用）
+        """
+        try:
+            from sentence_transformers import SentenceTransformer
+        except ImportError:
+            raise ImportError("请先安装 sentence-transformers: pip install sentence-transformers")
+
+        self.model = SentenceTransformer(model_name, device=device)
+        self.name = model_name
+        self.dim = int(self.model.get_sentence_embedding_dimension())
+        self.batch_size = batch_size
+        self.query_instruction = query_instruction
+
+    def embed_documents(self, texts: List[str]) -> np.ndarray:
+        if not texts:
+            return np.zeros((0, self.dim), dtype=np.float32)
+
+        vectors = self.model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False
+        )
+        return np.ascontiguousarray(vectors, dtype=np.float32)
+
+    def embed_queries(self, texts: List[str]) -> np.ndarray:
+        return self.embed_documents([self.query_instruction + text for text in texts])
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    """按行L2归一化（全零行保持为零）"""
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def create_embedder(rag_config: Dict) -> Embedder:
+    """
+    按配置创建向量化模型
+
+    Args:
+        rag_config: 配置文件的rag部分（embedding_model、embedding_dim、embedding_device、
+                    embedding_batch_size、query_instruction）
+
+    Returns:
+        向量化模型，embedding_model为"hashing"时使用哈希向量
+    """
+    model_name = rag_config.get('embedding_model', HASHING_MODEL)
+
+    if model_name == HASHING_MODEL:
+        return HashingEmbedder(int(rag_config.get('embedding_dim', 512)))
+
+    return SentenceTransformerEmbedder(
+        model_name,
+        device=rag_config.get('embedding_device', 'cpu'),
+        batch_size=int(rag_config.get('embedding_batch_size', 32)),
+        query_instruction=rag_config.get('query_instruction', '')
+    )
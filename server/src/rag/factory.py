@@ -0,0 +1,83 @@
+"""
+检索器工厂
+
+根据配置的rag.backend创建BM25关键词检索器、向量检索器或两者融合的混合检索器
+"""
+
+from typing import Dict
+
+from .base import BaseRetriever
+from .simple_retriever import SimpleRetriever
+
+
+def create_retriever(rag_config: Dict, index_path: str = "./data/knowledge_index.json") -> BaseRetriever:
+    """
+    创建检索器
+
+    Args:
+        rag_config: 配置文件的rag部分
+        index_path: 知识库索引文件
+
+    Returns:
+        检索器实例，backend为vector/hybrid但缺少向量模型依赖时退回BM25
+    """
+    backend = rag_config.get('backend', 'bm25')
+
+    if backend in ('vector', 'hybrid'):
+        try:
+            vector = _create_vector_retriever(rag_config, index_path)
+        except ImportError as e:
+            print(f"⚠️  {e}，改用BM25检索")
+            return SimpleRetriever(index_path)
+
+        if backend == 'vector':
+            return vector
+
+        return _create_hybrid_retriever(rag_config, SimpleRetriever(index_path), vector)
+
+    if backend != 'bm25':
+        raise ValueError(f"不支持的检索后端: {backend}")
+
+    return SimpleRetriever(index_path)
+
+
+def _create_vector_retriever(rag_config: Dict, index_path: str) -> BaseRetriever:
+    from .embeddings import create_embedder
+    from .vector_retriever import VectorRetriever
+
+    embedder = create_embedder(rag_config)
+    print(f"🔎 使用向量检索: {embedder.name}")
+
+    return VectorRetriever(
+        index_path,
+        embedder,
+        nlist=rag_config.get('ann_nlist'),
+        nprobe=int(rag_config.get('ann_nprobe', 8)),
+        relevance_score=float(rag_config.get('score_threshold', 0.7))
+    )
+
+
+def _create_hybrid_retriever(rag_config: Dict, lexical: BaseRetriever, vector: BaseRetriever) -> BaseRetriever:
+    from .hybrid_retriever import HybridRetriever, RRF_K
+    from .reranker import CrossEncoderReranker
+
+    reranker = None
+    reranker_model = rag_config.get('reranker_model')
+
+    if reranker_model:
+        try:
+            reranker = CrossEncoderReranker(reranker_model, device=rag_config.get('embedding_device', 'cpu'))
+        except ImportError as e:
+            print(f"⚠️  {e}，不使用重排序")
+
+    print(f"🔀 使用混合检索: BM25 + 向量{'，重排序: ' + reranker_model if reranker else ''}")
+
+    return HybridRetriever(
+        lexical,
+        vector,
+        reranker=reranker,
+        candidates=int(rag_config.get('hybrid_candidates', 20)),
+        rrf_k=int(rag_config.get('rrf_k', RRF_K)),
+        rerank_top_n=int(rag_config.get('rerank_top_n', 10)),
+        rerank_budget_ms=float(rag_config.get('rerank_budget_ms', 200))
+    )
@@ -0,0 +1,188 @@
+"""
+混合检索
+
+BM25关键词检索和向量检索各自漏掉的查询不同（关键词检索不懂同义表达，向量检索对专有名词不敏感），
+两路并发检索后按倒数排名融合（RRF）：文档分数为 Σ 1 / (rrf_k + 排名)，
+两路分数尺度不同也不需要归一化。
+
+融合后可选用交叉编码器对前N个候选重排序，重排序有耗时预算：
+检索已用的时间加上按历史耗时估计的重排序时间超出预算时跳过重排序，直接返回融合结果
+"""
+
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Dict, Optional, Tuple
+
+from .base import BaseRetriever
+from .reranker import CrossEncoderReranker
+from server.src.monitoring.metrics import STAGE_SECONDS, RETRIEVER_RERANKS
+
+
+# RRF平滑常数（原论文取60）
+RRF_K = 60
+
+# 执行向量检索的线程数（并发请求的向量检索可同时进行）
+VECTOR_WORKERS = 4
+
+# 重排序单个候选耗时估计的平滑系数（指数移动平均）
+RERANK_COST_ALPHA = 0.2
+
+
+class HybridRetriever(BaseRetriever):
+    """混合检索器（关键词 + 向量，RRF融合，可选重排序）"""
+
+    # min_score为各路检索自身relevance_score的倍数（两路分数尺度不同，无法共用一个阈值）
+    relevance_score: float = 1.0
+
+    def __init__(
+        self,
+        lexical: BaseRetriever,
+        vector: BaseRetriever,
+        reranker: Optional[CrossEncoderReranker] = None,
+        candidates: int = 20,
+        rrf_k: int = RRF_K,
+        rerank_top_n: int = 10,
+        rerank_budget_ms: float = 200.0
+    ):
+        """
+        Args:
+            lexical: 关键词检索器
+            vector: 向量检索器
+            reranker: 交叉编码器，None时不重排序
+            candidates: 每路检索取的候选数
+            rrf_k: RRF平滑常数
+            rerank_top_n: 重排序的候选数（取融合结果的前N个）
+            rerank_budget_ms: 单次检索的耗时预算（毫秒），预计超出时跳过重排序
+        """
+        self.lexical = lexical
+        self.vector = vector
+        self.reranker = reranker
+        self.candidates = candidates
+        self.rrf_k = rrf_k
+        self.rerank_top_n = rerank_top_n
+        self.rerank_budget_ms = rerank_budget_ms
+        self.rerank_ms_per_doc: Optional[float] = None
+        self._pool = ThreadPoolExecutor(max_workers=VECTOR_WORKERS, thread_name_prefix="hybrid-vector")
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_score: float = 0.0
+    ) -> List[Dict]:
+        return self.retrieve(query, top_k, min_score)
+
+    def retrieve(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_score: float = 0.0,
+        timings: Optional[Dict[str, float]] = None
+    ) -> List[Dict]:
+        """
+        混合检索
+
+        Args:
+            query: 查询字符串
+            top_k: 返回前K个结果
+            min_score: 各路检索结果至少达到其relevance_score的倍数（0为不过滤）
+            timings: 不为None时写入各阶段耗时（毫秒）：lexical、vector、fuse、rerank、total，
+                     超出预算跳过重排序时rerank_skipped为1
+
+        Returns:
+            匹配的知识列表，score为RRF分数（重排序后为交叉编码器分数）
+        """
+        if top_k <= 0:
+            return []
+
+        start = time.perf_counter()
+        stage_ms: Dict[str, float] = {}
+        fetch_k = max(self.candidates, top_k)
+
+        # 向量检索放到线程池，关键词检索在当前线程执行，两路同时进行
+        vector_future = self._pool.submit(
+            _timed, self.vector.search, query, fetch_k, min_score * self.vector.relevance_score
+        )
+        lexical_hits, stage_ms["lexical"] = _timed(
+            self.lexical.search, query, fetch_k, min_score * self.lexical.relevance_score
+        )
+        vector_hits, stage_ms["vector"] = vector_future.result()
+
+        with STAGE_SECONDS.time(stage="retriever_fuse"):
+            fuse_start = time.perf_counter()
+            results = self.fuse([lexical_hits, vector_hits])
+            stage_ms["fuse"] = (time.perf_counter() - fuse_start) * 1000
+
+        if self.reranker is not None and len(results) > 1:
+            results = self._rerank(query, results, start, stage_ms)
+
+        stage_ms["total"] = (time.perf_counter() - start) * 1000
+
+        if timings is not None:
+            timings.update(stage_ms)
+
+        return results[:top_k]
+
+    def fuse(self, ranked_lists: List[List[Dict]]) -> List[Dict]:
+        """
+        倒数排名融合
+
+        Args:
+            ranked_lists: 各路检索结果（按分数降序）
+
+        Returns:
+            融合后的结果，按RRF分数降序（同分时先出现的在前）
+        """
+        fused: Dict[Tuple[str, str], Dict] = {}
+
+        for hits in ranked_lists:
+            for rank, hit in enumerate(hits, start=1):
+                key = (hit.get('source', ''), hit.get('content', ''))
+                item = fused.get(key)
+
+                if item is None:
+                    item = fused[key] = dict(hit, score=0.0)
+
+                item['score'] += 1.0 / (self.rrf_k + rank)
+
+        return sorted(fused.values(), key=lambda item: -item['score'])
+
+    def _rerank(self, query: str, results: List[Dict], start: float, stage_ms: Dict[str, float]) -> List[Dict]:
+        """在耗时预算内用交叉编码器重排序前rerank_top_n个候选"""
+        head = results[:self.rerank_top_n]
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        estimate_ms = (self.rerank_ms_per_doc or 0.0) * len(head)
+
+        if elapsed_ms + estimate_ms > self.rerank_budget_ms:
+            # 估计值逐步衰减，之后会再次尝试（避免一次偶发的慢调用永久关闭重排序）
+            if self.rerank_ms_per_doc is not None:
+                self.rerank_ms_per_doc *= 1 - RERANK_COST_ALPHA
+            RETRIEVER_RERANKS.inc(result="skipped")
+            stage_ms["rerank_skipped"] = 1.0
+            return results
+
+        with STAGE_SECONDS.time(stage="retriever_rerank"):
+            texts = [f"{hit['title']}\n{hit['content']}" if hit.get('title') else hit['content'] for hit in head]
+            scores, rerank_ms = _timed(self.reranker.score, query, texts)
+
+        per_doc = rerank_ms / len(head)
+        if self.rerank_ms_per_doc is None:
+            self.rerank_ms_per_doc = per_doc
+        else:
+            self.rerank_ms_per_doc += RERANK_COST_ALPHA * (per_doc - self.rerank_ms_per_doc)
+
+        RETRIEVER_RERANKS.inc(result="done")
+        stage_ms["rerank"] = rerank_ms
+
+        reranked = sorted(
+            (dict(hit, score=float(score)) for hit, score in zip(head, scores)),
+            key=lambda item: -item['score']
+        )
+        return reranked + results[len(head):]
+
+
+def _timed(func, *args) -> Tuple[object, float]:
+    """调用函数，返回结果和耗时（毫秒）"""
+    start = time.perf_counter()
+    result = func(*args)
+    return result, (time.perf_counter() - start) * 1000
@@ -0,0 +1,298 @@
+"""
+倒排索引 + BM25检索
+
+中文按字二元组（bigram）切词，英文/数字按连续字母数字切词；
+索引在加载知识库时构建一次并保存到知识库索引文件旁边，
+查询只遍历命中词的倒排表，耗时与命中的倒排项数量有关，与文档总数无关
+"""
+
+import json
+import math
+import re
+from pathlib import Path
+from typing import List, Dict, Tuple, Optional
+import numpy as np
+
+from server.src.data.symbol_resolver import AhoCorasick
+
+
+# BM25参数
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+# 标题在索引文本中重复的次数（提高标题权重）
+TITLE_BOOST = 2
+
+# 查询命中文档关键词时的加分（与旧版关键词匹配分值一致）
+KEYWORD_SCORE = 5.0
+
+# 索引文件格式版本，格式变化时旧文件自动失效
+INDEX_VERSION = 1
+
+# 查询中的疑问词，不参与评分（否则会匹配到大量问答类文档）
+QUERY_STOPWORDS = (
+    "什么是", "什么叫", "是什么", "什么", "啥是", "啥叫",
+    "怎么样", "怎么", "如何", "为什么", "哪些",
+    "意思", "请问", "一下", "介绍",
+)
+
+_TOKEN_PATTERN = re.compile(r"[a-z0-9]+|[\u4e00-\u9fff]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """
+    切词
+
+    英文/数字取整词，中文连续片段取相邻两字（单字片段取单字）
+
+    Args:
+        text: 文本
+
+    Returns:
+        词列表（含重复）
+    """
+    tokens = []
+
+    for piece in _TOKEN_PATTERN.findall(text.lower()):
+        if piece.isascii():
+            tokens.append(piece)
+        elif len(piece) == 1:
+            tokens.append(piece)
+        else:
+            tokens.extend(piece[i:i + 2] for i in range(len(piece) - 1))
+
+    return tokens
+
+
+class InvertedIndex:
+    """BM25倒排索引"""
+
+    def __init__(
+        self,
+        terms: Dict[str, int],
+        offsets: np.ndarray,
+        doc_ids: np.ndarray,
+        weights: np.ndarray,
+        idf: np.ndarray,
+        keywords: Dict[str, List[int]],
+        num_docs: int
+    ):
+        """
+        Args:
+            terms: 词到编号的映射
+            offsets: 每个词的倒排表在doc_ids/weights中的起始位置，长度为词数+1
+            doc_ids: 拼接后的倒排表（文档编号）
+            weights: 与doc_ids对应的BM25词频权重（已按文档长度归一化）
+            idf: 每个词的IDF
+            keywords: 文档关键词（小写）到文档编号列表的映射
+            num_docs: 文档总数
+        """
+        self.terms = terms
+        self.offsets = offsets
+        self.doc_ids = doc_ids
+        self.weights = weights
+        self.idf = idf
+        self.keywords = keywords
+        self.num_docs = num_docs
+
+        self._keyword_matcher = AhoCorasick()
+        for keyword in keywords:
+            self._keyword_matcher.add(keyword, keyword)
+        self._keyword_matcher.build()
+
+    # ==================== 构建 ====================
+
+    @classmethod
+    def build(cls, docs: List[Dict]) -> "InvertedIndex":
+        """
+        从知识库文档构建索引
+
+        Args:
+            docs: 文档列表，每项包含content、title、keywords
+
+        Returns:
+            倒排索引
+        """
+        postings: Dict[str, Dict[int, int]] = {}
+        keywords: Dict[str, List[int]] = {}
+        lengths = np.zeros(len(docs), dtype=np.float64)
+
+        for doc_id, doc in enumerate(docs):
+            title = doc.get('title', '')
+            doc_keywords = doc.get('keywords', [])
+            text = " ".join([title] * TITLE_BOOST + doc_keywords + [doc.get('content', '')])
+
+            tokens = tokenize(text)
+            lengths[doc_id] = len(tokens)
+
+            for token in tokens:
+                term_postings = postings.setdefault(token, {})
+                term_postings[doc_id] = term_postings.get(doc_id, 0) + 1
+
+            for keyword in doc_keywords:
+                keyword = keyword.lower()
+                if keyword and (keyword not in keywords or keywords[keyword][-1] != doc_id):
+                    keywords.setdefault(keyword, []).append(doc_id)
+
+        num_docs = len(docs)
+        avg_length = lengths.mean() if num_docs else 0.0
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / avg_length) if num_docs else lengths
+
+        terms = {}
+        offsets = np.zeros(len(postings) + 1, dtype=np.int64)
+        idf = np.zeros(len(postings), dtype=np.float32)
+        doc_id_parts, weight_parts = [], []
+
+        for term_id, (term, term_postings) in enumerate(postings.items()):
+            ids = np.fromiter(term_postings.keys(), dtype=np.int32, count=len(term_postings))
+            tf = np.fromiter(term_postings.values(), dtype=np.float64, count=len(term_postings))
+
+            terms[term] = term_id
+            offsets[term_id + 1] = offsets[term_id] + len(ids)
+            idf[term_id] = math.log(1 + (num_docs - len(ids) + 0.5) / (len(ids) + 0.5))
+            doc_id_parts.append(ids)
+            weight_parts.append((tf * (BM25_K1 + 1) / (tf + norm[ids])).astype(np.float32))
+
+        return cls(
+            terms=terms,
+            offsets=offsets,
+            doc_ids=np.concatenate(doc_id_parts) if doc_id_parts else np.zeros(0, dtype=np.int32),
+            weights=np.concatenate(weight_parts) if weight_parts else np.zeros(0, dtype=np.float32),
+            idf=idf,
+            keywords=keywords,
+            num_docs=num_docs
+        )
+
+    # ==================== 持久化 ====================
+
+    def save(self, path: Path, fingerprint: Dict):
+        """
+        保存索引
+
+        Args:
+            path: 索引文件路径（.npz）
+            fingerprint: 知识库索引文件的指纹，用于判断是否过期
+        """
+        meta = {
+            "version": INDEX_VERSION,
+            "fingerprint": fingerprint,
+            "num_docs": self.num_docs,
+            "terms": list(self.terms.keys()),
+            "keywords": self.keywords,
+        }
+
+        with open(path, 'wb') as f:
+            np.savez(
+                f,
+                meta=np.frombuffer(json.dumps(meta, ensure_ascii=False).encode('utf-8'), dtype=np.uint8),
+                offsets=self.offsets,
+                doc_ids=self.doc_ids,
+                weights=self.weights,
+                idf=self.idf
+            )
+
+    @classmethod
+    def load(cls, path: Path, fingerprint: Dict) -> Optional["InvertedIndex"]:
+        """
+        加载索引
+
+        Args:
+            path: 索引文件路径
+            fingerprint: 当前知识库索引文件的指纹
+
+        Returns:
+            倒排索引，文件不存在或已过期时返回None
+        """
+        if not path.exists():
+            return None
+
+        with np.load(path) as data:
+            meta = json.loads(data["meta"].tobytes().decode('utf-8'))
+
+            if meta.get("version") != INDEX_VERSION or meta.get("fingerprint") != fingerprint:
+                return None
+
+            return cls(
+                terms={term: i for i, term in enumerate(meta["terms"])},
+                offsets=data["offsets"],
+                doc_ids=data["doc_ids"],
+                weights=data["weights"],
+                idf=data["idf"],
+                keywords=meta["keywords"],
+                num_docs=meta["num_docs"]
+            )
+
+    # ==================== 查询 ====================
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_score: float = 0.0
+    ) -> List[Tuple[int, float]]:
+        """
+        BM25检索
+
+        Args:
+            query: 查询字符串
+            top_k: 返回前K个结果
+            min_score: 最小匹配分数
+
+        Returns:
+            (文档编号, 分数) 列表，按分数降序
+        """
+        if top_k <= 0:
+            return []
+
+        id_parts, score_parts = [], []
+
+        for token in set(tokenize(_strip_stopwords(query))):
+            term_id = self.terms.get(token)
+            if term_id is None:
+                continue
+
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            id_parts.append(self.doc_ids[start:end])
+            score_parts.append(self.weights[start:end] * self.idf[term_id])
+
+        # 关键词命中加分
+        matched = {keyword for _, _, keyword in self._keyword_matcher.iter(query.lower())}
+        for keyword in matched:
+            ids = np.asarray(self.keywords[keyword], dtype=np.int32)
+            id_parts.append(ids)
+            score_parts.append(np.full(len(ids), KEYWORD_SCORE, dtype=np.float32))
+
+        if not id_parts:
+            return []
+
+        ids, inverse = np.unique(np.concatenate(id_parts), return_inverse=True)
+        scores = np.bincount(inverse, weights=np.concatenate(score_parts))
+
+        candidates = np.flatnonzero(scores > min_score)
+        if len(candidates) > top_k:
+            candidates = candidates[np.argpartition(-scores[candidates], top_k - 1)[:top_k]]
+
+        ranked = sorted(candidates, key=lambda i: (-scores[i], ids[i]))
+
+        return [(int(ids[i]), float(scores[i])) for i in ranked]
+
+    def __len__(self) -> int:
+        return self.num_docs
+
+
+def _strip_stopwords(query: str) -> str:
+    """去掉查询中的疑问词"""
+    for word in QUERY_STOPWORDS:
+        query = query.replace(word, " ")
+    return query
+
+
+def index_fingerprint(index_path: Path, num_docs: int) -> Dict:
+    """知识库索引文件的指纹（大小、修改时间、文档数）"""
+    stat = index_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "num_docs": num_docs}
+
+
+def inverted_index_path(index_path: Path) -> Path:
+    """倒排索引文件路径（与知识库索引文件放在一起）"""
+    return index_path.with_name(index_path.stem + ".bm25.npz")
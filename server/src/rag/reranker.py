@@ -0,0 +1,58 @@
+"""
+交叉编码器重排序
+
+把查询和候选文档成对输入交叉编码器（如bge-reranker-base）打分，
+比向量内积更准，但每个候选都要一次模型推理，只用于融合后的少量候选
+"""
+
+from typing import List
+
+import numpy as np
+
+
+class CrossEncoderReranker:
+    """sentence-transformers交叉编码器（CPU批量打分）"""
+
+    def __init__(
+        self,
+        model_name: str,
+        device: str = "cpu",
+        batch_size: int = 16,
+        max_length: int = 512
+    ):
+        """
+        Args:
+            model_name: 模型名称或本地模型目录
+            device: 推理设备
+            batch_size: 打分批大小
+            max_length: 查询 + 文档的最大token数（超出部分截断）
+        """
+        try:
+            from sentence_transformers import CrossEncoder
+        except ImportError:
+            raise ImportError("请先安装 sentence-transformers: pip install sentence-transformers")
+
+        self.model = CrossEncoder(model_name, device=device, max_length=max_length)
+        self.name = model_name
+        self.batch_size = batch_size
+
+    def score(self, query: str, texts: List[str]) -> np.ndarray:
+        """
+        候选文档的相关性分数
+
+        Args:
+            query: 查询字符串
+            texts: 候选文档文本
+
+        Returns:
+            与texts对应的分数，越大越相关
+        """
+        if not texts:
+            return np.zeros(0, dtype=np.float32)
+
+        scores = self.model.predict(
+            [(query, text) for text in texts],
+            batch_size=self.batch_size,
+            show_progress_bar=False
+        )
+        return np.asarray(scores, dtype=np.float32)
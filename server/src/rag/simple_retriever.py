@@ -1,20 +1,25 @@
 """
 简化版RAG检索器
 
-基于关键词匹配的知识库检索，无需GPU
+基于倒排索引和BM25评分的知识库检索，无需GPU
 """
 
 import json
 from pathlib import Path
 from typing import List, Dict, Optional
 
+from .base import BaseRetriever
+from .inverted_index import InvertedIndex, index_fingerprint, inverted_index_path
+from server.src.monitoring.metrics import STAGE_SECONDS
 
-class SimpleRetriever:
-    """简单的关键词检索器"""
+
+class SimpleRetriever(BaseRetriever):
+    """简单的关键词检索器（倒排索引 + BM25）"""
     
     def __init__(self, index_path: str = "./data/knowledge_index.json"):
         self.index_path = Path(index_path)
         self.index: List[Dict] = []
+        self.inverted_index: Optional[InvertedIndex] = None
         self.load_index()
     
     def load_index(self):
@@ -29,6 +34,30 @@ class SimpleRetriever:
             print(f"已加载 {len(self.index)} 条知识库索引")
         except Exception as e:
             print(f"加载索引失败：{e}")
+            return
+        
+        self.inverted_index = self._load_inverted_index()
+    
+    def _load_inverted_index(self) -> InvertedIndex:
+        """加载倒排索引，不存在或已过期时重新构建并保存"""
+        path = inverted_index_path(self.index_path)
+        fingerprint = index_fingerprint(self.index_path, len(self.index))
+        
+        try:
+            inverted_index = InvertedIndex.load(path, fingerprint)
+            if inverted_index is not None:
+                return inverted_index
+        except Exception as e:
+            print(f"加载倒排索引失败，重新构建：{e}")
+        
+        inverted_index = InvertedIndex.build(self.index)
+        
+        try:
+            inverted_index.save(path, fingerprint)
+        except Exception as e:
+            print(f"保存倒排索引失败：{e}")
+        
+        return inverted_index
     
     def search(
         self, 
@@ -47,155 +76,56 @@ class SimpleRetriever:
         Returns:
             匹配的知识列表
         """
-        if not self.index:
+        if not self.index or self.inverted_index is None:
             return []
         
-        # 提取查询关键词
-        query_lower = query.lower()
-        query_words = set(query_lower.split())
+        with STAGE_SECONDS.time(stage="retriever_search"):
+            hits = self.inverted_index.search(query, top_k, min_score)
         
         results = []
         
-        for doc in self.index:
-            # 计算匹配分数
-            score = 0.0
-            content = doc.get('content', '').lower()
-            title = doc.get('title', '').lower()
-            keywords = doc.get('keywords', [])
-            
-            # 完全匹配（高分）
-            if query_lower in content or query_lower in title:
-                score += 10.0
-            
-            # 关键词匹配
-            for kw in keywords:
-                if kw.lower() in query_lower:
-                    score += 5.0
-                if kw.lower() in query_words:
-                    score += 3.0
-            
-            # 词语匹配
-            content_words = set(content.split())
-            title_words = set(title.split())
-            
-            common_words = query_words & (content_words | title_words)
-            score += len(common_words) * 0.5
-            
-            if score > min_score:
-                results.append({
-                    'content': doc.get('content', ''),
-                    'title': doc.get('title', ''),
-                    'source': doc.get('source', ''),
-                    'score': score
-                })
-        
-        # 按分数排序
-        results.sort(key=lambda x: x['score'], reverse=True)
-        
-        return results[:top_k]
-    
-    def get_context(
-        self, 
-        query: str, 
-        max_length: int = 500
-    ) -> str:
-        """
-        获取上下文字符串
-        
-        Args:
-            query: 查询字符串
-            max_length: 最大长度
-            
-        Returns:
-            拼接的上下文
-        """
-        results = self.search(query, top_k=3)
-        
-        if not results:
-            return ""
+        for doc_id, score in hits:
+            doc = self.index[doc_id]
+            results.append({
+                'content': doc.get('content', ''),
+                'title': doc.get('title', ''),
+                'source': doc.get('source', ''),
+                'score': score
+            })
         
-        context_parts = []
-        current_length = 0
-        
-        for result in results:
-            content = result['content']
-            title = result.get('title', '')
-            
-            # 格式化内容
-            if title:
-                part = f"【{title}】\n{content}"
-            else:
-                part = content
-            
-            # 检查长度限制
-            if current_length + len(part) > max_length:
-                # 截断
-                remaining = max_length - current_length
-                if remaining > 100:  # 至少保留100字符
-                    part = part[:remaining] + "..."
-                    context_parts.append(part)
-                break
-            
-            context_parts.append(part)
-            current_length += len(part)
-        
-        return "\n\n---\n\n".join(context_parts)
-    
-    def is_knowledge_query(self, query: str) -> bool:
-        """
-        判断是否是知识查询
-        
-        Args:
-            query: 查询字符串
-            
-        Returns:
-            是否是知识查询
-        """
-        # 知识查询的关键词
-        knowledge_keywords = [
-            "什么是", "如何", "怎么", "为什么", "哪些",
-            "概念", "定义", "含义", "解释", "介绍",
-            "原理", "方法", "步骤", "技巧", "知识",
-            "什么叫", "啥是", "啥叫"
-        ]
-        
-        query_lower = query.lower()
-        
-        return any(kw in query_lower for kw in knowledge_keywords)
-    
-    def get_relevant_knowledge(self, query: str) -> Optional[str]:
-        """
-        获取相关知识（如果有）
-        
-        Args:
-            query: 查询字符串
-            
-        Returns:
-            相关知识或None
-        """
-        # 判断是否需要知识库
-        if not self.is_knowledge_query(query):
-            # 即使不是典型的知识查询，也尝试搜索一下
-            results = self.search(query, top_k=1, min_score=5.0)
-            if results:
-                return results[0]['content']
-            return None
-        
-        # 获取上下文
-        context = self.get_context(query, max_length=800)
-        
-        return context if context else None
+        return results
 
 
 # 全局实例
-_retriever: Optional[SimpleRetriever] = None
+_retriever: Optional[BaseRetriever] = None
 
 
-def get_retriever(index_path: str = "./data/knowledge_index.json") -> SimpleRetriever:
-    """获取全局检索器实例"""
+def get_retriever(
+    index_path: str = "./data/knowledge_index.json",
+    rag_config: Optional[Dict] = None
+) -> BaseRetriever:
+    """
+    获取全局检索器实例
+    
+    Args:
+        index_path: 知识库索引文件
+        rag_config: 配置文件的rag部分，首次创建时按其中的backend选择检索后端（默认BM25）
+    """
     global _retriever
     
     if _retriever is None:
-        _retriever = SimpleRetriever(index_path)
+        from .factory import create_retriever
+        _retriever = create_retriever(rag_config or {}, index_path)
     
     return _retriever
+
+
+def set_retriever(retriever: BaseRetriever):
+    """
+    设置全局检索器实例（例如使用其他知识库索引文件）
+    
+    Args:
+        retriever: 检索器实例
+    """
+    global _retriever
+    _retriever = retriever
@@ -0,0 +1,192 @@
+"""
+向量检索器
+
+知识库文档的归一化向量在首次加载时计算一次，连同IVF索引保存在知识库索引文件旁边，
+之后启动直接加载；查询批量向量化后在IVF索引中检索，分数为余弦相似度
+"""
+
+import json
+import time
+from pathlib import Path
+from typing import List, Dict, Optional
+
+from .ann_index import IVFIndex, recall_at_k
+from .base import BaseRetriever
+from .embeddings import Embedder
+from .inverted_index import index_fingerprint
+from server.src.monitoring.metrics import STAGE_SECONDS
+
+
+class VectorRetriever(BaseRetriever):
+    """语义检索器（向量 + IVF近似最近邻）"""
+
+    def __init__(
+        self,
+        index_path: str,
+        embedder: Embedder,
+        nlist: Optional[int] = None,
+        nprobe: int = 8,
+        relevance_score: float = 0.7
+    ):
+        """
+        Args:
+            index_path: 知识库索引文件
+            embedder: 向量化模型
+            nlist: IVF簇数，None时按文档数自动确定
+            nprobe: 查询时扫描的簇数
+            relevance_score: 非典型知识查询时作为相关知识返回的最低余弦相似度
+        """
+        self.index_path = Path(index_path)
+        self.embedder = embedder
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.relevance_score = relevance_score
+        self.index: List[Dict] = []
+        self.vector_index: Optional[IVFIndex] = None
+        self.load_index()
+
+    def load_index(self):
+        """加载知识库和向量索引"""
+        if not self.index_path.exists():
+            print(f"警告：索引文件不存在 {self.index_path}")
+            return
+
+        try:
+            with open(self.index_path, 'r', encoding='utf-8') as f:
+                self.index = json.load(f)
+            print(f"已加载 {len(self.index)} 条知识库索引")
+        except Exception as e:
+            print(f"加载索引失败：{e}")
+            return
+
+        self.vector_index = self._load_vector_index()
+
+    def _load_vector_index(self) -> IVFIndex:
+        """加载向量索引，不存在或已过期（知识库、向量模型或簇数变化）时重新构建并保存"""
+        path = vector_index_path(self.index_path)
+        fingerprint = dict(
+            index_fingerprint(self.index_path, len(self.index)),
+            embedder=self.embedder.name,
+            dim=self.embedder.dim,
+            nlist=self.nlist
+        )
+
+        try:
+            vector_index = IVFIndex.load(path, fingerprint, self.nprobe)
+            if vector_index is not None:
+                return vector_index
+        except Exception as e:
+            print(f"加载向量索引失败，重新构建：{e}")
+
+        start = time.perf_counter()
+        vectors = self.embedder.embed_documents([document_text(doc) for doc in self.index])
+        vector_index = IVFIndex.build(vectors, self.nlist, self.nprobe)
+        print(f"已构建向量索引: {len(vector_index)}条, {vector_index.nlist}个簇, "
+              f"耗时{time.perf_counter() - start:.2f}秒")
+
+        try:
+            vector_index.save(path, fingerprint)
+        except Exception as e:
+            print(f"保存向量索引失败：{e}")
+
+        return vector_index
+
+    def search(
+        self,
+        query: str,
+        top_k: int = 3,
+        min_score: float = 0.0
+    ) -> List[Dict]:
+        return self.search_batch([query], top_k, min_score)[0]
+
+    def search_batch(
+        self,
+        queries: List[str],
+        top_k: int = 3,
+        min_score: float = 0.0
+    ) -> List[List[Dict]]:
+        """
+        批量搜索（查询一次性向量化）
+
+        Args:
+            queries: 查询列表
+            top_k: 每个查询返回前K个结果
+            min_score: 最小余弦相似度
+
+        Returns:
+            每个查询的匹配知识列表
+        """
+        if not self.index or self.vector_index is None or not queries or top_k <= 0:
+            return [[] for _ in queries]
+
+        with STAGE_SECONDS.time(stage="retriever_embed"):
+            vectors = self.embedder.embed_queries(queries)
+
+        with STAGE_SECONDS.time(stage="retriever_search"):
+            ids, scores = self.vector_index.search(vectors, top_k)
+
+        results = []
+
+        for row_ids, row_scores in zip(ids, scores):
+            hits = []
+            for doc_id, score in zip(row_ids, row_scores):
+                if doc_id < 0 or score <= min_score:
+                    continue
+
+                doc = self.index[doc_id]
+                hits.append({
+                    'content': doc.get('content', ''),
+                    'title': doc.get('title', ''),
+                    'source': doc.get('source', ''),
+                    'score': float(score)
+                })
+            results.append(hits)
+
+        return results
+
+    def evaluate_recall(self, queries: List[str], top_k: int = 3, nprobe: Optional[int] = None) -> Dict:
+        """
+        IVF检索相对暴力检索的召回率和耗时
+
+        Args:
+            queries: 查询列表
+            top_k: 返回结果数
+            nprobe: 扫描的簇数，None时使用默认值
+
+        Returns:
+            recall_at_k、查询数、两种检索的平均耗时（毫秒）
+        """
+        if self.vector_index is None or not queries:
+            return {"queries": 0, "top_k": top_k, "recall_at_k": 1.0}
+
+        vectors = self.embedder.embed_queries(queries)
+
+        start = time.perf_counter()
+        approx_ids, _ = self.vector_index.search(vectors, top_k, nprobe)
+        ann_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        exact_ids, _ = self.vector_index.exact_search(vectors, top_k)
+        exact_ms = (time.perf_counter() - start) * 1000
+
+        return {
+            "queries": len(queries),
+            "top_k": top_k,
+            "nlist": self.vector_index.nlist,
+            "nprobe": min(nprobe or self.vector_index.nprobe, self.vector_index.nlist),
+            "recall_at_k": round(recall_at_k(approx_ids, exact_ids), 4),
+            "ann_mean_ms": round(ann_ms / len(queries), 4),
+            "exact_mean_ms": round(exact_ms / len(queries), 4),
+        }
+
+
+def document_text(doc: Dict) -> str:
+    """参与向量化的文档文本（标题 + 正文）"""
+    title = doc.get('title', '')
+    content = doc.get('content', '')
+    return f"{title}\n{content}" if title else content
+
+
+def vector_index_path(index_path: Path) -> Path:
+    """向量索引文件路径（与知识库索引文件放在一起）"""
+    return index_path.with_name(index_path.stem + ".ivf.npz")
@@ -0,0 +1,469 @@
+"""
+工具结果类型
+
+工具返回带类型的结果对象（保存NumPy数值和数组），需要文本时才渲染：
+- str(result)：交给LLM的文本（第一次渲染后缓存）
+- result.to_dict()：可JSON序列化的字典，用于API直接返回
+- to_json / from_json：紧凑的JSON形式，用于Redis等只能存字符串的缓存
+"""
+
+import json
+import math
+from dataclasses import dataclass, field, fields
+from typing import Optional, List, Dict, Any, ClassVar, Type
+
+import numpy as np
+
+
+# 类型名 -> 结果类（from_dict按type字段还原）
+RESULT_TYPES: Dict[str, Type["ToolResult"]] = {}
+
+
+def _register(cls):
+    RESULT_TYPES[cls.__name__] = cls
+    return cls
+
+
+@dataclass(slots=True)
+class ToolResult:
+    """工具结果基类"""
+
+    # 渲染后的文本（惰性生成）
+    _text: Optional[str] = field(default=None, init=False, repr=False, compare=False)
+
+    ok: ClassVar[bool] = True
+
+    def render(self) -> str:
+        """渲染为文本"""
+        raise NotImplementedError
+
+    def __str__(self) -> str:
+        if self._text is None:
+            self._text = self.render()
+        return self._text
+
+    def to_dict(self) -> Dict[str, Any]:
+        """可JSON序列化的字典（NumPy数组转为列表，NaN转为None）"""
+        data = {"type": type(self).__name__, "ok": self.ok}
+
+        for f in fields(self):
+            if f.init:
+                data[f.name] = jsonable(getattr(self, f.name))
+
+        return data
+
+    def to_json(self) -> str:
+        return json.dumps(self.to_dict(), ensure_ascii=False, separators=(",", ":"))
+
+    @staticmethod
+    def from_dict(data: Dict[str, Any]) -> "ToolResult":
+        """从to_dict的结果还原"""
+        cls = RESULT_TYPES[data["type"]]
+        kwargs = {}
+
+        for f in fields(cls):
+            if not f.init or f.name not in data:
+                continue
+
+            value = data[f.name]
+            if isinstance(f.type, type) and issubclass(f.type, ToolResult):
+                value = ToolResult.from_dict(value)
+            elif f.type is np.ndarray:
+                value = np.array([np.nan if v is None else v for v in value])
+            elif f.type == Dict[str, np.ndarray]:
+                value = {k: np.array([np.nan if v is None else v for v in vs]) for k, vs in value.items()}
+            kwargs[f.name] = value
+
+        return cls(**kwargs)
+
+    @staticmethod
+    def from_json(text: str) -> "ToolResult":
+        """从to_json的结果还原（不是结果JSON时作为纯文本结果）"""
+        try:
+            data = json.loads(text)
+        except ValueError:
+            return TextResult(text)
+
+        if not isinstance(data, dict) or data.get("type") not in RESULT_TYPES:
+            return TextResult(text)
+
+        return ToolResult.from_dict(data)
+
+
+@_register
+@dataclass(slots=True)
+class TextResult(ToolResult):
+    """纯文本结果（参数不合法、未找到数据、调用失败等）"""
+    text: str = ""
+    error: bool = False
+
+    @property
+    def ok(self) -> bool:
+        return not self.error
+
+    def render(self) -> str:
+        return self.text
+
+
+def error_result(text: str) -> TextResult:
+    return TextResult(text, error=True)
+
+
+# ==================== 行情 ====================
+
+@_register
+@dataclass(slots=True)
+class PriceResult(ToolResult):
+    """最新行情"""
+    stock: str
+    date: str
+    open: float
+    close: float
+    high: float
+    low: float
+    volume: int
+    change_pct: Optional[float] = None
+
+    def render(self) -> str:
+        lines = [
+            f"【{self.stock}】最新行情：",
+            f"日期：{self.date}",
+            f"收盘价：{self.close:.2f}元",
+            f"开盘价：{self.open:.2f}元",
+            f"最高价：{self.high:.2f}元",
+            f"最低价：{self.low:.2f}元",
+            f"成交量：{self.volume:,}手",
+        ]
+
+        if self.change_pct is not None:
+            lines.append(f"涨跌幅：{self.change_pct:+.2f}%")
+
+        return "\n".join(lines) + "\n"
+
+
+# ==================== 技术指标 ====================
+
+@_register
+@dataclass(slots=True)
+class IndicatorResult(ToolResult):
+    """技术指标"""
+    stock: str
+    ma: Dict[str, float]
+    macd: Optional[Dict[str, Any]]
+    rsi: Optional[float]
+    boll: Optional[Dict[str, Any]]
+    trend: str
+    support_resistance: Dict[str, float]
+    volume_ratio: Optional[float]
+
+    @classmethod
+    def from_series(cls, stock: str, indicators) -> "IndicatorResult":
+        """从指标列（stock_analyzer.IndicatorSeries）取最新的各项指标"""
+        return cls(
+            stock,
+            ma=indicators.ma(),
+            macd=indicators.macd(),
+            rsi=indicators.rsi(),
+            boll=indicators.boll(),
+            trend=indicators.trend(),
+            support_resistance=indicators.support_resistance(),
+            volume_ratio=indicators.volume_ratio()
+        )
+
+    def render(self) -> str:
+        lines = [f"【{self.stock}】技术指标分析：", ""]
+
+        if self.ma:
+            lines.append("【移动平均线】")
+            lines.extend(f"  {key}: {value:.2f}元" for key, value in self.ma.items())
+            lines.append("")
+
+        if self.macd:
+            lines += [
+                "【MACD指标】",
+                f"  DIF: {self.macd['DIF']:.2f}",
+                f"  DEA: {self.macd['DEA']:.2f}",
+                f"  MACD: {self.macd['MACD']:.2f}",
+                f"  信号: {self.macd['signal']}",
+                "",
+            ]
+
+        if self.rsi:
+            if self.rsi > 70:
+                state = "超买区域，注意回调风险"
+            elif self.rsi < 30:
+                state = "超卖区域，可能存在反弹机会"
+            else:
+                state = "正常区域"
+            lines += ["【RSI指标】", f"  RSI(14): {self.rsi:.2f}", f"  状态: {state}", ""]
+
+        if self.boll:
+            lines += [
+                "【布林带】",
+                f"  上轨: {self.boll['upper']:.2f}元",
+                f"  中轨: {self.boll['middle']:.2f}元",
+                f"  下轨: {self.boll['lower']:.2f}元",
+                f"  当前价格: {self.boll['current']:.2f}元 ({self.boll['position']})",
+                "",
+            ]
+
+        lines += [f"【趋势判断】{self.trend}", ""]
+
+        if self.support_resistance:
+            lines += [
+                "【支撑/压力位】",
+                f"  支撑位: {self.support_resistance['support']:.2f}元",
+                f"  压力位: {self.support_resistance['resistance']:.2f}元",
+                "",
+            ]
+
+        if self.volume_ratio:
+            lines.append(f"【量比】{self.volume_ratio:.2f}")
+            if self.volume_ratio > 2:
+                lines.append("  成交量显著放大")
+            elif self.volume_ratio < 0.5:
+                lines.append("  成交量萎缩")
+
+        return "\n".join(lines) + "\n"
+
+
+# ==================== 历史数据 ====================
+
+@_register
+@dataclass(slots=True)
+class HistoryResult(ToolResult):
+    """最近N个交易日的行情"""
+    stock: str
+    dates: np.ndarray
+    close: np.ndarray
+    change_pct: np.ndarray
+    volume: np.ndarray
+    high: float
+    low: float
+
+    @property
+    def mean_close(self) -> float:
+        return float(self.close.mean())
+
+    @property
+    def period_change(self) -> float:
+        return period_change(self.close)
+
+    def render(self) -> str:
+        # 整列转换为Python数值后一次拼接，避免逐个访问NumPy标量
+        dates = self.dates.astype("datetime64[D]").astype(str)
+        changes = np.nan_to_num(self.change_pct, nan=0.0)
+        rows = "".join(
+            f"{date:<12} {close:>7.2f} {change_pct:>6.2f}% {volume:>10,}手\n"
+            for date, close, change_pct, volume in zip(
+                dates.tolist(), self.close.tolist(), changes.tolist(), self.volume.tolist()
+            )
+        )
+
+        return (
+            f"【{self.stock}】最近{len(self.close)}个交易日数据：\n\n"
+            f"{'日期':<12} {'收盘':<8} {'涨跌幅':<8} {'成交量':<12}\n"
+            + "-" * 50 + "\n"
+            + rows
+            + "\n【统计信息】\n"
+            f"  最高价: {self.high:.2f}元\n"
+            f"  最低价: {self.low:.2f}元\n"
+            f"  平均价: {self.mean_close:.2f}元\n"
+            f"  区间涨跌: {self.period_change:+.2f}%\n"
+        )
+
+
+# ==================== 股票对比 ====================
+
+@_register
+@dataclass(slots=True)
+class CompareResult(ToolResult):
+    """多只股票对比（缺少数据的股票各列为NaN）"""
+    stocks: List[str]
+    price: np.ndarray
+    today: np.ndarray
+    change_5d: np.ndarray
+    change_20d: np.ndarray
+
+    def render(self) -> str:
+        lines = [
+            f"【股票对比】共{len(self.stocks)}只",
+            "",
+            f"{'股票':<10} {'最新价':<10} {'今日涨跌':<10} {'5日涨跌':<10} {'20日涨跌':<10}",
+            "-" * 60,
+        ]
+
+        # 最多5只股票，直接用Python数值比逐个调用NumPy函数更快
+        rows = list(zip(
+            self.stocks, self.price.tolist(), self.today.tolist(),
+            self.change_5d.tolist(), self.change_20d.tolist()
+        ))
+        available = [row for row in rows if not math.isnan(row[1])]
+
+        for stock, price, today, change_5d, change_20d in rows:
+            if math.isnan(price):
+                lines.append(f"{stock:<10} 数据缺失")
+            else:
+                lines.append(f"{stock:<10} {price:>8.2f} {today:>8.2f}% {change_5d:>8.2f}% {change_20d:>8.2f}%")
+
+        if len(available) >= 2:
+            lines += ["", "【对比分析】"]
+
+            # max()同值时取靠前的股票
+            for label, column in (("今日", 2), ("5日", 3), ("20日", 4)):
+                best = max(available, key=lambda row: row[column])
+                lines.append(f"  {label}涨幅最大: {best[0]} ({best[column]:+.2f}%)")
+
+        return "\n".join(lines) + "\n"
+
+
+# ==================== 综合分析 ====================
+
+@_register
+@dataclass(slots=True)
+class AnalysisResult(ToolResult):
+    """综合分析（行情 + 近期表现 + 技术指标）"""
+    stock: str
+    latest: PriceResult
+    records: int
+    period_changes: Dict[int, float]
+    ma: Dict[str, float]
+    trend: str
+    macd: Optional[Dict[str, Any]]
+    rsi: Optional[float]
+    support_resistance: Dict[str, float]
+    volume_ratio: Optional[float]
+
+    def render(self) -> str:
+        latest = self.latest
+        lines = [
+            f"【{self.stock}】综合分析报告",
+            "=" * 50,
+            "",
+            "【基本行情】",
+            f"  日期: {latest.date}",
+            f"  收盘价: {latest.close:.2f}元",
+            f"  涨跌幅: {latest.change_pct or 0:+.2f}%",
+            f"  成交量: {latest.volume:,}手",
+            f"  数据记录: {self.records}条",
+            "",
+            "【近期表现】",
+        ]
+
+        lines.extend(f"  近{days}日涨跌: {change:+.2f}%" for days, change in self.period_changes.items())
+        lines += ["", "【技术指标】"]
+        lines.extend(f"  {key}: {value:.2f}元" for key, value in self.ma.items())
+        lines += [f"  趋势: {self.trend}", ""]
+
+        if self.macd:
+            lines += [
+                "【MACD】",
+                f"  信号: {self.macd['signal']}",
+                f"  DIF: {self.macd['DIF']:.2f}, DEA: {self.macd['DEA']:.2f}",
+                "",
+            ]
+
+        if self.rsi:
+            if self.rsi > 70:
+                state = "超买，注意回调风险"
+            elif self.rsi < 30:
+                state = "超卖，可能存在反弹机会"
+            else:
+                state = "正常区域"
+            lines += [f"【RSI】{self.rsi:.2f}", f"  状态: {state}", ""]
+
+        if self.support_resistance:
+            lines += [
+                "【支撑/压力】",
+                f"  支撑位: {self.support_resistance['support']:.2f}元",
+                f"  压力位: {self.support_resistance['resistance']:.2f}元",
+                "",
+            ]
+
+        if self.volume_ratio:
+            lines.append(f"【量比】{self.volume_ratio:.2f}")
+            if self.volume_ratio > 2:
+                lines.append("  成交量显著放大，市场关注度高")
+            elif self.volume_ratio < 0.5:
+                lines.append("  成交量萎缩，市场观望情绪浓厚")
+
+        return "\n".join(lines) + "\n"
+
+
+# ==================== 选股 ====================
+
+@_register
+@dataclass(slots=True)
+class ScreenResult(ToolResult):
+    """选股结果"""
+    condition: str
+    sort_by: str
+    ascending: bool
+    total: int
+    matched: int
+    keys: List[str]
+    values: Dict[str, np.ndarray]
+    field_names: Dict[str, str] = field(default_factory=dict)  # 字段 -> 中文名（表头）
+
+    def render(self) -> str:
+        lines = ["【选股结果】", f"筛选条件：{self.condition or '无'}"]
+        if self.sort_by:
+            lines.append(f"排序：{self.sort_by} {'升序' if self.ascending else '降序'}")
+
+        summary = f"共扫描{self.total}只股票，符合条件{self.matched}只"
+
+        if not self.keys:
+            lines.append(summary + "。")
+            return "\n".join(lines) + "\n"
+
+        columns = list(self.values)
+        lines += [
+            summary + f"，显示前{len(self.keys)}只：",
+            "",
+            f"{'股票':<10} {'代码':<8} " + " ".join(f"{self.field_names.get(c, c):<10}" for c in columns),
+            "-" * (20 + 11 * len(columns)),
+        ]
+
+        cells = {
+            column: [
+                f"{'-':>10}" if np.isnan(value)
+                else f"{value:>10,.0f}" if column == "volume"
+                else f"{value:>10.2f}"
+                for value in self.values[column].tolist()
+            ]
+            for column in columns
+        }
+
+        for i, key in enumerate(self.keys):
+            name, _, code = key.rpartition("_")
+            lines.append(f"{name or key:<10} {code:<8} " + " ".join(cells[column][i] for column in columns))
+
+        return "\n".join(lines) + "\n"
+
+
+# ==================== 辅助函数 ====================
+
+def period_change(closes: np.ndarray) -> float:
+    """计算区间涨跌幅（首尾收盘价）"""
+    return float((closes[-1] - closes[0]) / closes[0] * 100)
+
+
+def jsonable(value: Any) -> Any:
+    """转换为可JSON序列化的值"""
+    if isinstance(value, ToolResult):
+        return value.to_dict()
+    if isinstance(value, np.ndarray):
+        if value.dtype.kind == "M":
+            return value.astype("datetime64[D]").astype(str).tolist()
+        if value.dtype.kind == "f":
+            return [None if np.isnan(v) else v for v in value.tolist()]
+        return value.tolist()
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and np.isnan(value):
+        return None
+    if isinstance(value, dict):
+        return {str(k): jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [jsonable(v) for v in value]
+    return value
@@ -1,11 +1,12 @@
 """
 股票工具集
 
-实现5个核心股票查询工具，供Agent使用
+实现6个核心股票查询工具，供Agent使用
 """
 
 from typing import Optional, List, Dict, Any, Callable
 from pydantic import BaseModel, Field
+import numpy as np
 import sys
 from pathlib import Path
 
@@ -13,17 +14,21 @@ from pathlib import Path
 sys.path.append(str(Path(__file__).parent.parent.parent.parent))
 
 from server.src.data.stock_loader import get_loader
-from server.src.data.stock_analyzer import (
-    calculate_ma,
-    calculate_macd,
-    calculate_rsi,
-    calculate_boll,
-    analyze_trend,
-    get_support_resistance,
-    calculate_volume_ratio
+from server.src.data.stock_analyzer import get_indicator_engine
+from server.src.data.screener import get_screener, SCREEN_FIELDS, ScreenerError
+from server.src.tools.results import (
+    ToolResult, error_result, PriceResult, IndicatorResult,
+    HistoryResult, CompareResult, AnalysisResult, ScreenResult, period_change
 )
 
 
+# get_stock_history读取的列
+HISTORY_COLUMNS = ("close", "change_pct", "volume", "high", "low")
+
+# get_stock_history最多返回的交易日数
+HISTORY_MAX_DAYS = 30
+
+
 # ==================== 简化的工具类 ====================
 
 class SimpleTool:
@@ -41,11 +46,11 @@ class SimpleTool:
         self.func = func
         self.args_schema = args_schema
     
-    def run(self, **kwargs) -> str:
+    def run(self, **kwargs) -> ToolResult:
         """运行工具"""
         return self.func(**kwargs)
     
-    def __call__(self, **kwargs) -> str:
+    def __call__(self, **kwargs) -> ToolResult:
         """使工具可调用"""
         return self.run(**kwargs)
 
@@ -57,7 +62,7 @@ class GetStockPriceInput(BaseModel):
     stock: str = Field(description="股票名称或代码，如'比亚迪'或'002594'")
 
 
-def get_stock_price_func(stock: str) -> str:
+def get_stock_price_func(stock: str) -> ToolResult:
     """
     获取指定股票的最新价格信息
     
@@ -65,31 +70,19 @@ def get_stock_price_func(stock: str) -> str:
         stock: 股票名称或代码
         
     Returns:
-        价格信息的字符串描述
+        PriceResult，未找到或失败时为TextResult
     """
     try:
         loader = get_loader()
         price_info = loader.get_latest_price(stock)
         
         if price_info is None:
-            return f"未找到股票 '{stock}' 的数据。请检查股票名称或代码是否正确。"
-        
-        result = f"【{stock}】最新行情：\n"
-        result += f"日期：{price_info['date']}\n"
-        result += f"收盘价：{price_info['close']:.2f}元\n"
-        result += f"开盘价：{price_info['open']:.2f}元\n"
-        result += f"最高价：{price_info['high']:.2f}元\n"
-        result += f"最低价：{price_info['low']:.2f}元\n"
-        result += f"成交量：{price_info['volume']:,}手\n"
+            return error_result(f"未找到股票 '{stock}' 的数据。请检查股票名称或代码是否正确。")
         
-        if price_info.get('change_pct') is not None:
-            change_pct = price_info['change_pct']
-            result += f"涨跌幅：{change_pct:+.2f}%\n"
-        
-        return result
+        return PriceResult(stock, **price_info)
     
     except Exception as e:
-        return f"获取股票价格失败：{str(e)}"
+        return error_result(f"获取股票价格失败：{str(e)}")
 
 
 get_stock_price_tool = SimpleTool(
@@ -107,7 +100,7 @@ class GetTechnicalIndicatorsInput(BaseModel):
     stock: str = Field(description="股票名称或代码，如'比亚迪'或'002594'")
 
 
-def get_technical_indicators_func(stock: str) -> str:
+def get_technical_indicators_func(stock: str) -> ToolResult:
     """
     获取指定股票的技术指标（MA、MACD、RSI、BOLL等）
     
@@ -115,80 +108,18 @@ def get_technical_indicators_func(stock: str) -> str:
         stock: 股票名称或代码
         
     Returns:
-        技术指标信息的字符串描述
+        IndicatorResult，未找到或失败时为TextResult
     """
     try:
-        loader = get_loader()
-        df = loader.get_stock_data(stock)
-        
-        if df is None or len(df) == 0:
-            return f"未找到股票 '{stock}' 的数据。"
-        
-        result = f"【{stock}】技术指标分析：\n\n"
+        indicators = get_indicator_engine().get(stock)
         
-        # MA均线
-        ma = calculate_ma(df)
-        if ma:
-            result += "【移动平均线】\n"
-            for key, value in ma.items():
-                result += f"  {key}: {value:.2f}元\n"
-            result += "\n"
+        if indicators is None:
+            return error_result(f"未找到股票 '{stock}' 的数据。")
         
-        # MACD
-        macd = calculate_macd(df)
-        if macd:
-            result += "【MACD指标】\n"
-            result += f"  DIF: {macd['DIF']:.2f}\n"
-            result += f"  DEA: {macd['DEA']:.2f}\n"
-            result += f"  MACD: {macd['MACD']:.2f}\n"
-            result += f"  信号: {macd['signal']}\n\n"
-        
-        # RSI
-        rsi = calculate_rsi(df)
-        if rsi:
-            result += "【RSI指标】\n"
-            result += f"  RSI(14): {rsi:.2f}\n"
-            if rsi > 70:
-                result += "  状态: 超买区域，注意回调风险\n"
-            elif rsi < 30:
-                result += "  状态: 超卖区域，可能存在反弹机会\n"
-            else:
-                result += "  状态: 正常区域\n"
-            result += "\n"
-        
-        # 布林带
-        boll = calculate_boll(df)
-        if boll:
-            result += "【布林带】\n"
-            result += f"  上轨: {boll['upper']:.2f}元\n"
-            result += f"  中轨: {boll['middle']:.2f}元\n"
-            result += f"  下轨: {boll['lower']:.2f}元\n"
-            result += f"  当前价格: {boll['current']:.2f}元 ({boll['position']})\n\n"
-        
-        # 趋势分析
-        trend = analyze_trend(df)
-        result += f"【趋势判断】{trend}\n\n"
-        
-        # 支撑压力
-        sr = get_support_resistance(df)
-        if sr:
-            result += "【支撑/压力位】\n"
-            result += f"  支撑位: {sr['support']:.2f}元\n"
-            result += f"  压力位: {sr['resistance']:.2f}元\n\n"
-        
-        # 量比
-        volume_ratio = calculate_volume_ratio(df)
-        if volume_ratio:
-            result += f"【量比】{volume_ratio:.2f}\n"
-            if volume_ratio > 2:
-                result += "  成交量显著放大\n"
-            elif volume_ratio < 0.5:
-                result += "  成交量萎缩\n"
-        
-        return result
+        return IndicatorResult.from_series(stock, indicators)
     
     except Exception as e:
-        return f"获取技术指标失败：{str(e)}"
+        return error_result(f"获取技术指标失败：{str(e)}")
 
 
 get_technical_indicators_tool = SimpleTool(
@@ -207,7 +138,7 @@ class GetStockHistoryInput(BaseModel):
     days: int = Field(default=10, description="获取最近N天的数据，默认10天")
 
 
-def get_stock_history_func(stock: str, days: int = 10) -> str:
+def get_stock_history_func(stock: str, days: int = 10) -> ToolResult:
     """
     获取指定股票的历史数据
     
@@ -216,46 +147,31 @@ def get_stock_history_func(stock: str, days: int = 10) -> str:
         days: 获取最近N天的数据
         
     Returns:
-        历史数据的字符串描述
+        HistoryResult，未找到或失败时为TextResult
     """
     try:
-        loader = get_loader()
-        df = loader.get_stock_data(stock)
-        
-        if df is None or len(df) == 0:
-            return f"未找到股票 '{stock}' 的数据。"
-        
         # 限制天数
-        days = min(days, 30)  # 最多返回30天
+        days = min(days, HISTORY_MAX_DAYS)  # 最多返回30天
         days = max(days, 1)   # 至少返回1天
         
-        recent_df = df.tail(days)
-        
-        result = f"【{stock}】最近{len(recent_df)}个交易日数据：\n\n"
-        result += f"{'日期':<12} {'收盘':<8} {'涨跌幅':<8} {'成交量':<12}\n"
-        result += "-" * 50 + "\n"
-        
-        for _, row in recent_df.iterrows():
-            date_str = str(row['date'])[:10]
-            close = row['close']
-            change_pct = row.get('change_pct', 0)
-            volume = row['volume']
-            
-            result += f"{date_str:<12} {close:>7.2f} {change_pct:>6.2f}% {volume:>10,}手\n"
-        
-        # 统计信息
-        result += "\n【统计信息】\n"
-        result += f"  最高价: {recent_df['high'].max():.2f}元\n"
-        result += f"  最低价: {recent_df['low'].min():.2f}元\n"
-        result += f"  平均价: {recent_df['close'].mean():.2f}元\n"
-        
-        change_total = ((recent_df.iloc[-1]['close'] - recent_df.iloc[0]['close']) / recent_df.iloc[0]['close']) * 100
-        result += f"  区间涨跌: {change_total:+.2f}%\n"
-        
-        return result
+        window = get_loader().get_window(stock, HISTORY_COLUMNS, last_n=days)
+        
+        if window is None or len(window["date"]) == 0:
+            return error_result(f"未找到股票 '{stock}' 的数据。")
+        
+        # 面板切片是视图，结果可能被缓存，复制后不再引用面板数据
+        return HistoryResult(
+            stock,
+            dates=window["date"].copy(),
+            close=window["close"].copy(),
+            change_pct=window["change_pct"].copy(),
+            volume=window["volume"].copy(),
+            high=float(window["high"].max()),
+            low=float(window["low"].min())
+        )
     
     except Exception as e:
-        return f"获取历史数据失败：{str(e)}"
+        return error_result(f"获取历史数据失败：{str(e)}")
 
 
 get_stock_history_tool = SimpleTool(
@@ -273,7 +189,7 @@ class CompareStocksInput(BaseModel):
     stocks: List[str] = Field(description="要比较的股票列表，如['比亚迪', '宁德时代']")
 
 
-def compare_stocks_func(stocks: List[str]) -> str:
+def compare_stocks_func(stocks: List[str]) -> ToolResult:
     """
     比较多只股票的表现
     
@@ -281,75 +197,39 @@ def compare_stocks_func(stocks: List[str]) -> str:
         stocks: 股票列表
         
     Returns:
-        对比结果的字符串描述
+        CompareResult，参数不合法或失败时为TextResult
     """
     try:
         if len(stocks) < 2:
-            return "请至少提供2只股票进行对比。"
+            return error_result("请至少提供2只股票进行对比。")
         
         if len(stocks) > 5:
-            return "最多支持同时比较5只股票。"
+            return error_result("最多支持同时比较5只股票。")
         
         loader = get_loader()
         
-        result = f"【股票对比】共{len(stocks)}只\n\n"
-        result += f"{'股票':<10} {'最新价':<10} {'今日涨跌':<10} {'5日涨跌':<10} {'20日涨跌':<10}\n"
-        result += "-" * 60 + "\n"
-        
-        stock_data = []
+        # 每列一个数组，缺少数据的股票保持NaN
+        table = np.full((4, len(stocks)), np.nan)
         
-        for stock in stocks:
-            df = loader.get_stock_data(stock)
-            if df is None or len(df) == 0:
-                result += f"{stock:<10} 数据缺失\n"
+        for i, stock in enumerate(stocks):
+            window = loader.get_window(stock, ("close", "change_pct"), last_n=20)
+            if window is None or len(window["date"]) == 0:
                 continue
             
-            latest = df.iloc[-1]
-            latest_price = latest['close']
-            today_change = latest.get('change_pct', 0)
-            
-            # 5日涨跌
-            if len(df) >= 5:
-                change_5d = ((df.tail(5).iloc[-1]['close'] - df.tail(5).iloc[0]['close']) / df.tail(5).iloc[0]['close']) * 100
-            else:
-                change_5d = 0
-            
-            # 20日涨跌
-            if len(df) >= 20:
-                change_20d = ((df.tail(20).iloc[-1]['close'] - df.tail(20).iloc[0]['close']) / df.tail(20).iloc[0]['close']) * 100
-            else:
-                change_20d = 0
-            
-            result += f"{stock:<10} {latest_price:>8.2f} {today_change:>8.2f}% {change_5d:>8.2f}% {change_20d:>8.2f}%\n"
-            
-            stock_data.append({
-                'name': stock,
-                'price': latest_price,
-                'today': today_change,
-                '5d': change_5d,
-                '20d': change_20d
-            })
-        
-        # 分析
-        if len(stock_data) >= 2:
-            result += "\n【对比分析】\n"
-            
-            # 今日最强
-            best_today = max(stock_data, key=lambda x: x['today'])
-            result += f"  今日涨幅最大: {best_today['name']} ({best_today['today']:+.2f}%)\n"
-            
-            # 5日最强
-            best_5d = max(stock_data, key=lambda x: x['5d'])
-            result += f"  5日涨幅最大: {best_5d['name']} ({best_5d['5d']:+.2f}%)\n"
+            closes = window["close"]
+            today_change = window["change_pct"][-1]
             
-            # 20日最强
-            best_20d = max(stock_data, key=lambda x: x['20d'])
-            result += f"  20日涨幅最大: {best_20d['name']} ({best_20d['20d']:+.2f}%)\n"
-        
-        return result
+            table[:, i] = (
+                closes[-1],
+                0.0 if np.isnan(today_change) else today_change,
+                period_change(closes[-5:]) if len(closes) >= 5 else 0,  # 5日涨跌
+                period_change(closes) if len(closes) >= 20 else 0       # 20日涨跌
+            )
+        
+        return CompareResult(list(stocks), *table)
     
     except Exception as e:
-        return f"比较股票失败：{str(e)}"
+        return error_result(f"比较股票失败：{str(e)}")
 
 
 compare_stocks_tool = SimpleTool(
@@ -367,7 +247,7 @@ class AnalyzeStockInput(BaseModel):
     stock: str = Field(description="股票名称或代码，如'比亚迪'或'002594'")
 
 
-def analyze_stock_func(stock: str) -> str:
+def analyze_stock_func(stock: str) -> ToolResult:
     """
     对股票进行综合分析（价格+技术指标+趋势）
     
@@ -375,82 +255,40 @@ def analyze_stock_func(stock: str) -> str:
         stock: 股票名称或代码
         
     Returns:
-        综合分析结果
+        AnalysisResult，未找到或失败时为TextResult
     """
     try:
         loader = get_loader()
-        df = loader.get_stock_data(stock)
-        
-        if df is None or len(df) == 0:
-            return f"未找到股票 '{stock}' 的数据。"
-        
-        result = f"【{stock}】综合分析报告\n"
-        result += "=" * 50 + "\n\n"
-        
-        # 1. 基本信息
-        latest = df.iloc[-1]
-        result += "【基本行情】\n"
-        result += f"  日期: {latest['date']}\n"
-        result += f"  收盘价: {latest['close']:.2f}元\n"
-        result += f"  涨跌幅: {latest.get('change_pct', 0):+.2f}%\n"
-        result += f"  成交量: {latest['volume']:,}手\n"
-        result += f"  数据记录: {len(df)}条\n\n"
-        
-        # 2. 近期表现
-        result += "【近期表现】\n"
-        for days in [5, 20, 60]:
-            if len(df) >= days:
-                change = ((df.tail(days).iloc[-1]['close'] - df.tail(days).iloc[0]['close']) / df.tail(days).iloc[0]['close']) * 100
-                result += f"  近{days}日涨跌: {change:+.2f}%\n"
-        result += "\n"
-        
-        # 3. 技术指标
-        result += "【技术指标】\n"
-        ma = calculate_ma(df)
-        for key, value in ma.items():
-            result += f"  {key}: {value:.2f}元\n"
-        
-        trend = analyze_trend(df)
-        result += f"  趋势: {trend}\n\n"
-        
-        # 4. MACD
-        macd = calculate_macd(df)
-        if macd:
-            result += "【MACD】\n"
-            result += f"  信号: {macd['signal']}\n"
-            result += f"  DIF: {macd['DIF']:.2f}, DEA: {macd['DEA']:.2f}\n\n"
-        
-        # 5. RSI
-        rsi = calculate_rsi(df)
-        if rsi:
-            result += f"【RSI】{rsi:.2f}\n"
-            if rsi > 70:
-                result += "  状态: 超买，注意回调风险\n\n"
-            elif rsi < 30:
-                result += "  状态: 超卖，可能存在反弹机会\n\n"
-            else:
-                result += "  状态: 正常区域\n\n"
-        
-        # 6. 支撑压力
-        sr = get_support_resistance(df)
-        if sr:
-            result += "【支撑/压力】\n"
-            result += f"  支撑位: {sr['support']:.2f}元\n"
-            result += f"  压力位: {sr['resistance']:.2f}元\n\n"
-        
-        # 7. 量能
-        volume_ratio = calculate_volume_ratio(df)
-        if volume_ratio:
-            result += f"【量比】{volume_ratio:.2f}\n"
-            if volume_ratio > 2:
-                result += "  成交量显著放大，市场关注度高\n"
-            elif volume_ratio < 0.5:
-                result += "  成交量萎缩，市场观望情绪浓厚\n"
-        
-        return result
+        indicators = get_indicator_engine().get(stock)
+        latest = loader.get_latest_price(stock)
+        
+        # 两次查询之间数据目录可能被刷新，任一为空都按找不到处理
+        if indicators is None or latest is None:
+            return error_result(f"未找到股票 '{stock}' 的数据。")
+        
+        # 近期表现
+        closes = indicators.column("close")
+        period_changes = {
+            days: period_change(closes[-days:])
+            for days in [5, 20, 60]
+            if len(closes) >= days
+        }
+        
+        return AnalysisResult(
+            stock,
+            latest=PriceResult(stock, **latest),
+            records=len(indicators),
+            period_changes=period_changes,
+            ma=indicators.ma(),
+            trend=indicators.trend(),
+            macd=indicators.macd(),
+            rsi=indicators.rsi(),
+            support_resistance=indicators.support_resistance(),
+            volume_ratio=indicators.volume_ratio()
+        )
     
     except Exception as e:
-        return f"综合分析失败：{str(e)}"
+        return error_result(f"综合分析失败：{str(e)}")
 
 
 analyze_stock_tool = SimpleTool(
@@ -461,6 +299,68 @@ analyze_stock_tool = SimpleTool(
 )
 
 
+# ==================== 工具6：全市场选股 ====================
+
+class ScreenStocksInput(BaseModel):
+    """全市场选股的输入参数"""
+    condition: str = Field(default="", description="筛选条件表达式，如'rsi < 30 and close > ma20'，为空表示不筛选")
+    sort_by: str = Field(default="change_20d", description="排序字段或表达式，如'change_20d'")
+    ascending: bool = Field(default=False, description="是否升序排列，默认降序")
+    top_n: int = Field(default=10, description="返回前N只股票，默认10只")
+
+
+def screen_stocks_func(
+    condition: str = "",
+    sort_by: str = "change_20d",
+    ascending: bool = False,
+    top_n: int = 10
+) -> ToolResult:
+    """
+    在全部股票中按条件筛选并排序
+    
+    Args:
+        condition: 筛选条件表达式
+        sort_by: 排序字段或表达式
+        ascending: 是否升序
+        top_n: 返回前N只
+        
+    Returns:
+        ScreenResult，条件有误或失败时为TextResult
+    """
+    try:
+        top_n = min(max(top_n, 1), 50)  # 最多返回50只
+        
+        screen = get_screener().screen(condition, sort_by, ascending, top_n)
+        
+        return ScreenResult(
+            condition,
+            sort_by,
+            ascending,
+            total=screen.total,
+            matched=screen.matched,
+            keys=list(screen.keys),
+            values={column: np.asarray(values, dtype=float) for column, values in screen.values.items()},
+            field_names=SCREEN_FIELDS
+        )
+    
+    except ScreenerError as e:
+        return error_result(f"选股条件有误：{str(e)}")
+    except Exception as e:
+        return error_result(f"选股失败：{str(e)}")
+
+
+screen_stocks_tool = SimpleTool(
+    name="screen_stocks",
+    description=(
+        "在全部股票中按技术指标筛选和排序。条件和排序使用表达式，可用字段："
+        + "、".join(f"{k}({v})" for k, v in SCREEN_FIELDS.items())
+        + "。适合回答'RSI低于30的股票有哪些'、'20日涨幅前10的股票'等问题。"
+    ),
+    func=screen_stocks_func,
+    args_schema=ScreenStocksInput
+)
+
+
 # ==================== 导出所有工具 ====================
 
 ALL_TOOLS = [
@@ -468,7 +368,8 @@ ALL_TOOLS = [
     get_technical_indicators_tool,
     get_stock_history_tool,
     compare_stocks_tool,
-    analyze_stock_tool
+    analyze_stock_tool,
+    screen_stocks_tool
 ]
 
 
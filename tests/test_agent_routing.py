@@ -0,0 +1,97 @@
+"""
+Agent路由、参数提取和模板快速路径测试
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pytest
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.agent.stock_agent import SimpleStockAgent
+
+
+@pytest.fixture(scope="module")
+def agent():
+    return SimpleStockAgent("./server/configs/server_config.yaml")
+
+
+@pytest.mark.parametrize("query", [
+    # screen_stocks工具描述中的示例
+    "RSI低于30的股票有哪些",
+    "20日涨幅前10的股票",
+    "量比大于2的股票",
+    "超卖的股票有哪些",
+])
+def test_screen_queries_route_to_screener(agent, query):
+    assert agent.route_query(query) == "tool"
+    assert agent.select_tool(query) == "screen_stocks"
+
+
+@pytest.mark.parametrize("query, tool", [
+    ("比亚迪现在多少钱", "get_stock_price"),
+    ("比亚迪RSI低于30吗", "get_technical_indicators"),
+    ("比亚迪最近10天走势", "get_stock_history"),
+])
+def test_single_stock_queries_do_not_screen(agent, query, tool):
+    assert agent.route_query(query) == "tool"
+    assert agent.select_tool(query) == tool
+
+
+@pytest.mark.parametrize("query", [
+    "什么是RSI",
+    "哪些指标能判断超买",
+    # 泛指股票、没有具体筛选条件的问题
+    "如何挑选好的股票",
+    "什么样的股票值得长期持有",
+    "新手适合买什么样的股票",
+    "请介绍一下市盈率低的股票有哪些特点",
+])
+def test_knowledge_queries(agent, query):
+    assert agent.route_query(query) == "knowledge"
+
+
+def test_screen_arguments(agent):
+    assert agent.screen_arguments("RSI低于30的股票有哪些")["condition"] == "rsi < 30"
+    assert agent.screen_arguments("20日涨幅前10的股票")["sort_by"] == "change_20d"
+    assert agent.screen_arguments("1日涨幅前5")["sort_by"] == "change_pct"
+
+
+@pytest.mark.parametrize("query, days", [
+    ("比亚迪最近15天走势", 15),
+    ("比亚迪最近三天走势", 3),
+    ("比亚迪最近二十个交易日走势", 20),
+    ("600519最近走势", None),
+    ("比亚迪2025年的历史走势", None),
+    ("比亚迪1月5日以来的走势", None),
+])
+def test_history_days(agent, query, days):
+    assert agent.history_days(query) == days
+
+
+@pytest.mark.parametrize("query, expected", [
+    ("比亚迪现在多少钱", True),
+    ("比亚迪最近15天走势", True),
+    ("600519最近走势", True),
+    ("比亚迪最近60天走势", False),
+    ("比亚迪最近几天走势", False),
+    ("比亚迪2025年的历史走势", False),
+    ("比亚迪最近走势怎么样？分析一下", False),
+])
+def test_fast_path(agent, monkeypatch, query, expected):
+    monkeypatch.setattr(agent, "fast_path_tools", {"get_stock_price", "get_stock_history"})
+    assert (agent.prepare(query).answer_source == "template") == expected
+
+
+def test_plan_splits_on_clause_starting_bing(agent):
+    plan = agent.plan_tools("分析比亚迪并和宁德时代比较")
+    assert sorted(call.tool for call in plan.calls) == ["analyze_stock", "compare_stocks"]
+
+
+def test_plan_keeps_words_containing_bing(agent):
+    plan = agent.plan_tools("分析比亚迪的并购和合并")
+    assert [call.tool for call in plan.calls] == ["analyze_stock"]
@@ -0,0 +1,78 @@
+"""
+HTTP接口测试（流式响应的执行名额释放）
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+from fastapi.testclient import TestClient
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.api import main
+from server.src.api.main import app, SlotStreamingResponse
+from server.src.api.scheduler import RequestScheduler, QueueFullError, QueueWaitTimeout, RequestTimeout
+
+
+@pytest.fixture(scope="module")
+def client():
+    with TestClient(app) as client:
+        yield client
+
+
+def test_chat_stream_releases_slot(client):
+    response = client.post("/chat/stream", json={"query": "比亚迪现在多少钱"})
+
+    assert response.status_code == 200
+    assert response.text.endswith("data: [DONE]\n\n")
+    assert main.scheduler.running == 0
+
+
+def test_chat_batch_releases_slot(client):
+    response = client.post("/chat/batch", json={"queries": ["比亚迪现在多少钱", "什么是RSI"]})
+
+    assert response.status_code == 200
+    assert len(response.text.strip().split("\n")) == 2
+    assert main.scheduler.running == 0
+
+
+def test_slot_released_when_client_disconnects_before_body():
+    scheduler = RequestScheduler(max_concurrent=1)
+    started = []
+
+    async def body():
+        started.append(True)
+        yield "data"
+
+    async def receive():
+        return {"type": "http.disconnect"}
+
+    async def send(message):
+        raise OSError("client disconnected")
+
+    async def run():
+        await scheduler.acquire(float("inf"))
+        response = SlotStreamingResponse(body(), scheduler.release)
+        scope = {"type": "http", "asgi": {"spec_version": "2.4"}}
+
+        with pytest.raises(Exception):
+            await response(scope, receive, send)
+
+    asyncio.run(run())
+
+    assert not started
+    assert scheduler.running == 0
+
+
+@pytest.mark.parametrize("error, status", [
+    (QueueFullError("full"), 429),
+    (QueueWaitTimeout("wait"), 503),
+    (RequestTimeout("slow"), 504),
+])
+def test_queue_errors_map_to_http_status(error, status):
+    assert main._queue_http_error(error).status_code == status
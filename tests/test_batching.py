@@ -0,0 +1,123 @@
+"""
+连续批处理引擎测试
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.llm.base import LLMConfig
+from server.src.llm.batching import BatchBackend, ContinuousBatchingEngine, BatchingLLM, MockBatchBackend
+from server.src.llm.mock_llm import MockLLM
+
+
+class CountingBackend(BatchBackend):
+    """提示词为生成的token数，每步输出一个字符，记录每步的批大小和释放的序列"""
+
+    def __init__(self, step_delay: float = 0.005, fail_prefill: bool = False):
+        self.step_delay = step_delay
+        self.fail_prefill = fail_prefill
+        self.batch_sizes = []
+        self.released = []
+        self.lock = threading.Lock()
+
+    def prefill(self, requests):
+        if self.fail_prefill:
+            raise RuntimeError("prefill failed")
+        return [{"prompt": request.prompt, "left": int(request.prompt)} for request in requests]
+
+    def step(self, states):
+        time.sleep(self.step_delay)
+        self.batch_sizes.append(len(states))
+        outputs = []
+        for state in states:
+            state["left"] -= 1
+            outputs.append(("x", state["left"] <= 0))
+        return outputs
+
+    def release(self, states):
+        with self.lock:
+            self.released.extend(state["prompt"] for state in states)
+
+
+@pytest.fixture
+def backend():
+    return CountingBackend()
+
+
+@pytest.fixture
+def engine(backend):
+    engine = ContinuousBatchingEngine(backend, max_batch_size=4, batch_window=0.02)
+    yield engine
+    engine.close()
+
+
+def test_concurrent_requests_share_steps(engine, backend):
+    futures = [engine.submit(str(n), 100, 0.7) for n in (3, 5, 5, 8)]
+
+    assert [future.result(timeout=5) for future in futures] == ["xxx", "xxxxx", "xxxxx", "xxxxxxxx"]
+    assert max(backend.batch_sizes) == 4
+    assert sorted(backend.released) == ["3", "5", "5", "8"]
+    assert engine.stats()["tokens"] == 21
+
+
+def test_new_requests_join_running_batch(engine, backend):
+    long = engine.submit("60", 100, 0.7)
+    time.sleep(0.05)
+    short = engine.submit("2", 100, 0.7)
+
+    # 后到的短请求在长请求结束前完成
+    assert short.result(timeout=5) == "xx"
+    assert not long.done()
+    assert long.result(timeout=5) == "x" * 60
+    assert engine.stats()["prefills"] == 2
+
+
+def test_cancelled_sequence_leaves_batch(engine, backend):
+    future = engine.submit("1000", 100, 0.7)
+    time.sleep(0.05)
+    future.cancel()
+
+    deadline = time.monotonic() + 5
+    while "1000" not in backend.released and time.monotonic() < deadline:
+        time.sleep(0.01)
+
+    assert "1000" in backend.released
+    assert engine.stats()["cancelled"] == 1
+
+
+def test_prefill_error_fails_requests():
+    engine = ContinuousBatchingEngine(CountingBackend(fail_prefill=True), max_batch_size=4)
+
+    try:
+        with pytest.raises(RuntimeError, match="prefill failed"):
+            engine.submit("3", 100, 0.7).result(timeout=5)
+    finally:
+        engine.close()
+
+
+def test_batching_llm_streams_mock_output():
+    llm = MockLLM(LLMConfig(mock_mode=True))
+    backend = MockBatchBackend(llm, step_latency=0, per_sequence_latency=0, prefill_latency=0)
+    batching = BatchingLLM(llm, backend)
+
+    async def run():
+        deltas = [delta async for delta in batching.generate_stream("你好")]
+        return deltas, await batching.generate("你好")
+
+    try:
+        deltas, text = asyncio.run(run())
+    finally:
+        batching.engine.close()
+
+    assert len(deltas) > 1
+    assert "".join(deltas) == text == llm.generate_sync("你好")
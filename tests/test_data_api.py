@@ -0,0 +1,74 @@
+"""
+行情数据接口测试（/v1/*）
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import pyarrow as pa
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.api.data_api import router, ARROW_MEDIA_TYPE
+from server.src.data.stock_loader import get_loader
+
+
+@pytest.fixture(scope="module")
+def client():
+    app = FastAPI()
+    app.include_router(router)
+    return TestClient(app)
+
+
+def read_arrow(response) -> pa.Table:
+    return pa.ipc.open_stream(response.content).read_all()
+
+
+def test_quote(client):
+    data = client.get("/v1/quote/比亚迪").json()
+
+    assert data["key"] == "比亚迪_002594"
+    assert data["close"] == get_loader().get_latest_price("比亚迪")["close"]
+    assert client.get("/v1/quote/不存在").status_code == 404
+
+
+def test_quotes_reports_missing(client):
+    data = client.get("/v1/quotes", params={"symbols": "比亚迪,600519,不存在,比亚迪"}).json()
+
+    assert [quote["key"] for quote in data["quotes"]] == ["比亚迪_002594", "贵州茅台_600519"]
+    assert data["missing"] == ["不存在"]
+    assert client.get("/v1/quotes", params={"symbols": " , "}).status_code == 400
+
+
+def test_indicators(client):
+    data = client.get("/v1/indicators/茅台").json()
+
+    assert data["key"] == "贵州茅台_600519"
+    assert {"ma", "macd", "rsi"} <= set(data)
+
+
+def test_history_columns_and_dates(client):
+    data = client.get("/v1/history/比亚迪", params={"days": 5, "columns": "close,volume"}).json()
+
+    assert data["count"] == 5
+    assert list(data["columns"]) == ["date", "close", "volume"]
+    assert data["columns"]["date"] == sorted(data["columns"]["date"])
+
+    assert client.get("/v1/history/比亚迪", params={"columns": "foo"}).status_code == 400
+    assert client.get("/v1/history/比亚迪", params={"days": 0}).status_code == 422
+
+
+def test_arrow_format(client):
+    by_param = read_arrow(client.get("/v1/history/比亚迪", params={"days": 3, "format": "arrow"}))
+    by_header = client.get("/v1/history/比亚迪", params={"days": 3}, headers={"Accept": ARROW_MEDIA_TYPE})
+
+    assert by_param.num_rows == 3
+    assert by_header.headers["content-type"] == ARROW_MEDIA_TYPE
+    assert read_arrow(by_header).equals(by_param)
+    assert read_arrow(client.get("/v1/quote/比亚迪", params={"format": "arrow"})).num_rows == 1
@@ -0,0 +1,70 @@
+"""
+行情DataFrame缓存测试（字节预算LRU）
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.cache.frame_cache import FrameCache, frame_nbytes
+
+
+def frame(rows: int) -> pd.DataFrame:
+    return pd.DataFrame({"close": np.arange(rows, dtype=float)})
+
+
+def test_evicts_least_recently_used_within_budget():
+    size = frame_nbytes(frame(100))
+    cache = FrameCache(max_bytes=size * 2)
+
+    cache.set(("a",), frame(100))
+    cache.set(("b",), frame(100))
+    cache.get(("a",))
+    cache.set(("c",), frame(100))
+
+    assert ("a",) in cache and ("c",) in cache and ("b",) not in cache
+    assert cache.nbytes == size * 2
+    assert cache.stats()["evictions"] == 1
+
+
+def test_oversized_frame_is_not_cached():
+    cache = FrameCache(max_bytes=frame_nbytes(frame(10)))
+    cache.set(("a",), frame(10))
+    cache.set(("a",), frame(1000))
+
+    # 替换时旧项也被移除
+    assert len(cache) == 0 and cache.nbytes == 0
+
+
+def test_hit_miss_counts_and_discard():
+    cache = FrameCache()
+    cache.set(("a", 10), frame(10))
+    cache.set(("a", None), frame(20))
+    cache.set(("b", None), frame(10))
+
+    assert cache.get(("a", 10)) is not None
+    assert cache.get(("c", None)) is None
+
+    cache.discard("a")
+
+    assert len(cache) == 1
+    assert cache.nbytes == frame_nbytes(frame(10))
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 1
+
+
+def test_resize_evicts():
+    cache = FrameCache()
+    for key in "abc":
+        cache.set((key,), frame(100))
+
+    cache.resize(frame_nbytes(frame(100)))
+
+    assert len(cache) == 1 and ("c",) in cache
+    assert cache.evictions == 2
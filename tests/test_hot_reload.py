@@ -0,0 +1,92 @@
+"""
+行情数据热更新测试（数据目录监视器 + 面板刷新）
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import shutil
+import sys
+from pathlib import Path
+
+import pandas as pd
+import pytest
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.stock_loader import StockDataLoader
+from server.src.data.stock_analyzer import IndicatorEngine
+from server.src.data.watcher import StockDataWatcher
+
+DATA_DIR = Path(__file__).parent.parent / "data" / "stocks"
+STOCKS = ["比亚迪_002594", "贵州茅台_600519"]
+
+
+@pytest.fixture
+def loader(tmp_path):
+    for key in STOCKS:
+        shutil.copy(DATA_DIR / f"{key}.parquet", tmp_path / f"{key}.parquet")
+
+    loader = StockDataLoader(str(tmp_path))
+    loader.prewarm()
+    return loader
+
+
+def append_bar(path: Path):
+    """在数据文件末尾追加一个交易日"""
+    df = pd.read_parquet(path)
+    last = df.iloc[[-1]].copy()
+    last["date"] = [(pd.Timestamp(last["date"].iloc[0]) + pd.Timedelta(days=1)).date()]
+    last["close"] = last["close"] * 1.05
+    pd.concat([df, last], ignore_index=True).to_parquet(path, index=False)
+
+
+def test_poll_refreshes_changed_stocks(loader, tmp_path):
+    watcher = StockDataWatcher(loader, interval=3600)
+    watcher.start()
+    engine = IndicatorEngine(loader)
+
+    try:
+        assert watcher.poll() is None
+
+        old_panel = loader.get_panel()
+        old_series = engine.get("比亚迪")
+        old_length = len(old_series)
+
+        append_bar(tmp_path / "比亚迪_002594.parquet")
+        result = watcher.poll()
+
+        assert result["updated"] == ["比亚迪_002594"]
+        assert result["failed"] == [] and result["removed"] == []
+
+        panel = loader.get_panel()
+        sid = panel.stock_id("比亚迪_002594")
+        assert panel is not old_panel and panel.mapped
+        assert panel.length(sid) == old_length + 1
+
+        # 新快照增量更新，旧快照的指标列不变
+        series = engine.get("比亚迪")
+        assert len(series) == old_length + 1
+        assert series.column("close")[-1] == pytest.approx(panel.column(sid, "close")[-1])
+        assert len(old_series) == old_length
+    finally:
+        watcher.stop()
+
+
+def test_poll_adds_and_removes_stocks(loader, tmp_path):
+    watcher = StockDataWatcher(loader, interval=3600)
+    watcher.start()
+
+    try:
+        shutil.copy(DATA_DIR / "招商银行_600036.parquet", tmp_path / "招商银行_600036.parquet")
+        (tmp_path / "贵州茅台_600519.parquet").unlink()
+
+        result = watcher.poll()
+
+        assert result["added"] == ["招商银行_600036"]
+        assert result["removed"] == ["贵州茅台_600519"]
+        assert loader.get_stock_id("招商银行") is not None
+        assert loader.get_stock_id("贵州茅台") is None
+        assert watcher.stats()["reloads"] == 1
+    finally:
+        watcher.stop()
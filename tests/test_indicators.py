@@ -0,0 +1,133 @@
+"""
+增量指标测试
+
+IndicatorSeries（一次计算和逐根追加）与calculate_*函数结果一致，
+IndicatorEngine在面板更新时增量更新且不修改旧版本的指标列
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.panel_store import StockPanel
+from server.src.data.stock_analyzer import (
+    IndicatorSeries, IndicatorEngine,
+    calculate_ma, calculate_macd, calculate_rsi, calculate_boll, calculate_volume_ratio
+)
+
+
+def make_frame(n: int, seed: int = 0) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 20 + np.cumsum(rng.normal(0, 0.5, n))
+    return pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=n, freq="D"),
+        "open": close + rng.normal(0, 0.1, n),
+        "high": close + 0.5,
+        "low": close - 0.5,
+        "close": close,
+        "volume": rng.integers(1000, 5000, n),
+        "change_pct": np.r_[0, np.diff(close) / close[:-1] * 100],
+    })
+
+
+def series_from(df: pd.DataFrame) -> IndicatorSeries:
+    return IndicatorSeries(*(df[name].to_numpy(dtype=float) for name in ("close", "high", "low", "volume")))
+
+
+def assert_matches(series: IndicatorSeries, df: pd.DataFrame):
+    assert series.ma() == calculate_ma(df)
+    assert series.macd() == calculate_macd(df)
+    assert series.rsi() == calculate_rsi(df)
+    assert series.boll() == calculate_boll(df)
+    assert series.volume_ratio() == calculate_volume_ratio(df)
+
+
+class FakeLoader:
+    """只提供IndicatorEngine用到的get_panel和get_catalog"""
+
+    def __init__(self, frames):
+        self.set_frames(frames)
+
+    def set_frames(self, frames):
+        self.panel = StockPanel.from_frames(frames)
+
+    def get_panel(self):
+        return self.panel
+
+    def get_catalog(self):
+        return self
+
+    def resolve(self, stock):
+        return stock
+
+
+@pytest.mark.parametrize("n", [10, 40, 120])
+def test_series_matches_calculate_functions(n):
+    df = make_frame(n)
+    assert_matches(series_from(df), df)
+
+
+def test_appended_series_matches_full_computation():
+    df = make_frame(120)
+    series = series_from(df.iloc[:80])
+
+    for _, row in df.iloc[80:].iterrows():
+        series.append(row["close"], row["high"], row["low"], row["volume"])
+
+    assert_matches(series, df)
+    for name in ("ema_fast", "dif", "dea", "rsi", "boll_upper"):
+        np.testing.assert_allclose(series.column(name), series_from(df).column(name), equal_nan=True)
+
+
+def test_engine_updates_incrementally_without_touching_old_series():
+    df = make_frame(120)
+    loader = FakeLoader({"A_000001": df.iloc[:100]})
+    engine = IndicatorEngine(loader)
+
+    old = engine.get("A_000001")
+    old_rsi = old.rsi()
+
+    loader.set_frames({"A_000001": df})
+    new = engine.get("A_000001")
+
+    assert new is not old
+    assert len(old) == 100 and old.rsi() == old_rsi
+    assert_matches(new, df)
+
+
+def test_engine_recomputes_revised_history():
+    df = make_frame(120)
+    loader = FakeLoader({"A_000001": df.iloc[:100]})
+    engine = IndicatorEngine(loader)
+    engine.get("A_000001")
+
+    # 复权：历史价格整体调整，最后一根相同
+    revised = df.copy()
+    revised.loc[:98, ["close", "high", "low"]] *= 0.9
+    loader.set_frames({"A_000001": revised})
+
+    assert_matches(engine.get("A_000001"), revised)
+
+
+def test_engine_unknown_stock():
+    engine = IndicatorEngine(FakeLoader({"A_000001": make_frame(30)}))
+    assert engine.get("B_000002") is None
+
+
+def test_engine_computes_lazily_and_prewarms():
+    loader = FakeLoader({"A_000001": make_frame(30), "B_000002": make_frame(30, seed=1)})
+    engine = IndicatorEngine(loader)
+
+    engine.get("A_000001")
+    assert list(engine._series) == ["A_000001"]
+
+    assert engine.prewarm() == 2
+    assert sorted(engine._series) == ["A_000001", "B_000002"]
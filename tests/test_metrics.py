@@ -0,0 +1,54 @@
+"""
+监控指标导出测试
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.monitoring.metrics import MetricsRegistry, REGISTRY
+
+
+def test_counter_callbacks_export_as_counter():
+    registry = MetricsRegistry()
+    lookups = registry.counter("cache_lookups_total", "查找次数", ["result"])
+    hits = {"hit": 3}
+
+    lookups.set_function(lambda: hits["hit"], result="hit")
+    lookups.set_function(lambda: None, result="miss")
+    lookups.inc(2, result="direct")
+
+    text = registry.render()
+
+    assert "# TYPE cache_lookups_total counter" in text
+    assert 'cache_lookups_total{result="hit"} 3' in text
+    assert 'cache_lookups_total{result="direct"} 2' in text
+    assert 'result="miss"' not in text
+
+    hits["hit"] = 5
+    assert 'cache_lookups_total{result="hit"} 5' in registry.render()
+
+
+def test_gauge_callback_errors_are_skipped():
+    registry = MetricsRegistry()
+    entries = registry.gauge("cache_entries", "缓存条数", ["cache"])
+
+    entries.set_function(lambda: 1 / 0, cache="broken")
+    entries.set(4, cache="ok")
+
+    text = registry.render()
+
+    assert "# TYPE cache_entries gauge" in text
+    assert 'cache_entries{cache="ok"} 4' in text
+    assert "broken" not in text
+
+
+def test_cache_event_metrics_are_counters():
+    text = REGISTRY.render()
+
+    assert "# TYPE response_cache_lookups_total counter" in text
+    assert "# TYPE stock_frame_cache_events_total counter" in text
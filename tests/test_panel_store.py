@@ -0,0 +1,104 @@
+"""
+列式面板和内存映射列存储测试
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import shutil
+import sys
+import threading
+import time
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.panel_store import StockPanel, store_lock
+
+
+def make_frame(n: int, start: float) -> pd.DataFrame:
+    close = start + np.arange(n, dtype=float)
+    return pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=n, freq="D"),
+        "open": close,
+        "high": close + 1,
+        "low": close - 1,
+        "close": close,
+        "volume": np.arange(n) * 100,
+        "change_pct": np.zeros(n),
+    })
+
+
+@pytest.fixture
+def panel():
+    return StockPanel.from_frames({"A_000001": make_frame(10, 10), "B_000002": make_frame(5, 100)})
+
+
+def test_window_and_latest(panel):
+    sid = panel.stock_id("B_000002")
+
+    assert list(panel.column(sid, "close")) == [100, 101, 102, 103, 104]
+    assert list(panel.window(sid, ["close"], last_n=2)["close"]) == [103, 104]
+    assert list(panel.window(sid, ["close"], start="2024-01-02", end="2024-01-03")["close"]) == [101, 102]
+    assert panel.latest(sid)["close"] == 104
+    assert panel.stock_id("C_000003") is None
+
+
+def test_tail_matrix_pads_short_history(panel):
+    matrix = panel.tail_matrix("close", 6)
+
+    assert matrix.shape == (2, 6)
+    assert list(matrix[0]) == [14, 15, 16, 17, 18, 19]
+    assert np.isnan(matrix[1, 0]) and list(matrix[1, 1:]) == [100, 101, 102, 103, 104]
+
+
+def test_save_and_load(panel, tmp_path):
+    store = tmp_path / ".panel"
+    panel.save(store, {"a": [1, 2]})
+
+    loaded = StockPanel.load(store, {"a": [1, 2]})
+
+    assert loaded.mapped
+    assert loaded.keys == panel.keys
+    assert np.array_equal(loaded.tail_matrix("close", 10), panel.tail_matrix("close", 10), equal_nan=True)
+
+    # 源数据变化后列存储过期
+    assert StockPanel.load(store, {"a": [1, 3]}) is None
+
+
+def test_load_treats_broken_store_as_miss(panel, tmp_path):
+    store = tmp_path / ".panel"
+    panel.save(store)
+
+    # 替换过程中数组文件缺失
+    (store / "close.npy").unlink()
+    assert StockPanel.load(store) is None
+
+    # 元数据写了一半
+    shutil.rmtree(store)
+    panel.save(store)
+    (store / "meta.json").write_text('{"version": 1, "keys": [', encoding="utf-8")
+    assert StockPanel.load(store) is None
+
+
+def test_store_lock_serializes_writers(tmp_path):
+    store = tmp_path / ".panel"
+    events = []
+
+    def writer(name):
+        with store_lock(store):
+            events.append(f"{name}-start")
+            time.sleep(0.05)
+            events.append(f"{name}-end")
+
+    threads = [threading.Thread(target=writer, args=(name,)) for name in "ab"]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert events[0][0] == events[1][0] and events[2][0] == events[3][0]
@@ -0,0 +1,67 @@
+"""
+提示词前缀KV缓存测试
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.llm.prefix_cache import PrefixCache, kv_nbytes
+
+
+class FakeTensor:
+    """只提供numel/element_size的张量替身"""
+
+    def __init__(self, numel: int, element_size: int = 2):
+        self._numel = numel
+        self._element_size = element_size
+
+    def numel(self):
+        return self._numel
+
+    def element_size(self):
+        return self._element_size
+
+
+def test_lookup_by_exact_prefix():
+    cache = PrefixCache(max_bytes=100)
+    cache.put([1, 2, 3], "kv-123", nbytes=10)
+
+    assert cache.lookup((1, 2, 3)) == "kv-123"
+    assert cache.lookup([1, 2]) is None
+    assert cache.lookup([1, 2, 3, 4]) is None
+
+    stats = cache.stats()
+    assert stats["hits"] == 1 and stats["misses"] == 2 and stats["reused_tokens"] == 3
+
+
+def test_lru_eviction_by_bytes():
+    cache = PrefixCache(max_bytes=25)
+    cache.put([1], "a", nbytes=10)
+    cache.put([2], "b", nbytes=10)
+    cache.lookup([1])
+    cache.put([3], "c", nbytes=10)
+
+    assert cache.lookup([2]) is None
+    assert cache.lookup([1]) == "a" and cache.lookup([3]) == "c"
+    assert cache.nbytes == 20 and cache.evictions == 1
+
+
+def test_replace_and_oversized_entries():
+    cache = PrefixCache(max_bytes=25)
+    cache.put([1], "a", nbytes=10)
+    cache.put([1], "a2", nbytes=15)
+    cache.put([2], "huge", nbytes=100)
+
+    assert len(cache) == 1 and cache.nbytes == 15
+    assert cache.lookup([1]) == "a2"
+
+
+def test_kv_nbytes():
+    layers = [(FakeTensor(8), FakeTensor(8)), (FakeTensor(4, 4), FakeTensor(4, 4))]
+
+    assert kv_nbytes(layers) == 8 * 2 * 2 + 4 * 4 * 2
@@ -0,0 +1,88 @@
+"""
+响应缓存测试（进程内LRU + Redis协议后端）
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+import time
+from pathlib import Path
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.cache.response_cache import LRUCache, RedisCache, ResponseCache, normalize_query
+from server.src.tools.results import PriceResult
+
+
+class FakeRedis:
+    """只实现get/set(ex=)的Redis替身"""
+
+    def __init__(self, broken: bool = False):
+        self.data = {}
+        self.broken = broken
+
+    def get(self, key):
+        if self.broken:
+            raise ConnectionError("redis down")
+        return self.data.get(key)
+
+    def set(self, key, value, ex=None):
+        if self.broken:
+            raise ConnectionError("redis down")
+        self.data[key] = value
+
+
+def price() -> PriceResult:
+    return PriceResult("比亚迪", "2025-01-10", 250.0, 255.5, 258.0, 249.0, 123456, 1.2)
+
+
+def test_lru_eviction_and_ttl():
+    cache = LRUCache(max_entries=2, ttl=60)
+    cache.set("a", "1")
+    cache.set("b", "2")
+    cache.get("a")
+    cache.set("c", "3")
+
+    assert cache.get("b") is None
+    assert cache.get("a") == "1" and cache.get("c") == "3"
+
+    cache.set("d", "4", ttl=0.01)
+    time.sleep(0.02)
+    assert cache.get("d") is None
+
+
+def test_remote_hit_fills_local_and_restores_result():
+    remote = RedisCache(FakeRedis())
+    writer = ResponseCache(local=LRUCache(), remote=remote)
+    key = ResponseCache.tool_key("get_stock_price", {"stock": "比亚迪"}, "v1")
+    writer.set(key, price())
+
+    # 另一个进程：本地为空，从Redis读回结果对象
+    reader = ResponseCache(local=LRUCache(), remote=remote)
+    value = reader.get("tool", key)
+
+    assert isinstance(value, PriceResult)
+    assert value == price() and str(value) == str(price())
+    assert reader.get("tool", key) is value
+
+    stats = reader.stats()["tool"]
+    assert stats["remote_hits"] == 1 and stats["local_hits"] == 1 and stats["misses"] == 0
+
+
+def test_remote_errors_are_misses():
+    cache = ResponseCache(local=None, remote=RedisCache(FakeRedis(broken=True)))
+    cache.set("answer:x", "回答")
+
+    assert cache.get("answer", "answer:x") is None
+    assert cache.stats()["remote_errors"] == 2
+    assert cache.stats()["answer"]["misses"] == 1
+
+
+def test_keys():
+    args = {"stock": "比亚迪", "days": 10}
+
+    assert ResponseCache.tool_key("t", args, "v1") == ResponseCache.tool_key("t", dict(reversed(args.items())), "v1")
+    assert ResponseCache.tool_key("t", args, "v1") != ResponseCache.tool_key("t", args, "v2")
+    assert normalize_query(" 比亚迪 现在多少钱？") == normalize_query("比亚迪现在多少钱")
+    assert ResponseCache.answer_key("比亚迪？", "tool", "ctx") != ResponseCache.answer_key("比亚迪", "tool", "ctx2")
@@ -0,0 +1,222 @@
+"""
+知识库检索测试（BM25倒排索引、IVF向量索引、混合检索）
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import math
+import sys
+from collections import Counter
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.rag.inverted_index import (
+    InvertedIndex, tokenize, BM25_K1, BM25_B, TITLE_BOOST, KEYWORD_SCORE
+)
+from server.src.rag.ann_index import IVFIndex, recall_at_k
+from server.src.rag.embeddings import normalize
+from server.src.rag.base import BaseRetriever
+from server.src.rag.hybrid_retriever import HybridRetriever
+
+
+DOCS = [
+    {"title": "RSI指标", "keywords": ["RSI", "超买"], "content": "RSI相对强弱指标，高于70为超买，低于30为超卖。"},
+    {"title": "MACD指标", "keywords": ["MACD", "金叉"], "content": "MACD由DIF和DEA组成，DIF上穿DEA为金叉。"},
+    {"title": "布林带", "keywords": ["BOLL"], "content": "布林带由中轨和上下轨组成，价格触及上轨可能超买。"},
+    {"title": "市盈率", "keywords": ["PE"], "content": "市盈率等于股价除以每股收益。"},
+]
+
+
+def bm25_reference(docs, query_tokens):
+    """逐文档按定义计算BM25分数（不含关键词加分）"""
+    texts = [
+        tokenize(" ".join([doc["title"]] * TITLE_BOOST + doc["keywords"] + [doc["content"]]))
+        for doc in docs
+    ]
+    avg = sum(len(tokens) for tokens in texts) / len(texts)
+    scores = []
+
+    for tokens in texts:
+        tf = Counter(tokens)
+        score = 0.0
+        for token in set(query_tokens):
+            df = sum(token in other for other in texts)
+            if not tf[token]:
+                continue
+            idf = math.log(1 + (len(docs) - df + 0.5) / (df + 0.5))
+            norm = BM25_K1 * (1 - BM25_B + BM25_B * len(tokens) / avg)
+            score += idf * tf[token] * (BM25_K1 + 1) / (tf[token] + norm)
+        scores.append(score)
+
+    return scores
+
+
+@pytest.fixture(scope="module")
+def index():
+    return InvertedIndex.build(DOCS)
+
+
+def test_tokenize():
+    assert tokenize("MACD金叉abc123") == ["macd", "金叉", "abc123"]
+    assert tokenize("股") == ["股"]
+
+
+def test_scores_match_bm25_definition(index):
+    query = "中轨上轨组成"
+    expected = bm25_reference(DOCS, tokenize(query))
+
+    hits = index.search(query, top_k=len(DOCS))
+
+    assert [doc_id for doc_id, _ in hits] == sorted(
+        (i for i, score in enumerate(expected) if score > 0), key=lambda i: -expected[i]
+    )
+    for doc_id, score in hits:
+        assert score == pytest.approx(expected[doc_id], rel=1e-5)
+
+
+def test_keyword_bonus_and_stopwords(index):
+    [(doc_id, score)] = index.search("什么是金叉", top_k=1)
+
+    assert doc_id == 1
+    assert score > KEYWORD_SCORE
+
+    # 只有疑问词时不命中任何文档
+    assert index.search("什么是") == []
+
+
+def test_top_k_and_min_score(index):
+    assert len(index.search("超买", top_k=1)) == 1
+    assert index.search("超买", top_k=0) == []
+    assert index.search("超买", min_score=1e9) == []
+
+
+def test_save_and_load(index, tmp_path):
+    path = tmp_path / "index.bm25.npz"
+    index.save(path, {"size": 1})
+
+    loaded = InvertedIndex.load(path, {"size": 1})
+
+    assert loaded.search("RSI超卖", top_k=4) == index.search("RSI超卖", top_k=4)
+    assert InvertedIndex.load(path, {"size": 2}) is None
+
+
+# ==================== IVF向量索引 ====================
+
+def random_vectors(n: int, dim: int = 32, seed: int = 0) -> np.ndarray:
+    return normalize(np.random.default_rng(seed).normal(size=(n, dim)).astype(np.float32))
+
+
+def test_exact_search_matches_brute_force():
+    vectors = random_vectors(1000)
+    queries = random_vectors(20, seed=1)
+    index = IVFIndex.build(vectors, nlist=1)
+
+    ids, scores = index.exact_search(queries, top_k=5)
+    expected = np.argsort(-(queries @ vectors.T), axis=1)[:, :5]
+
+    assert np.array_equal(ids, expected)
+    assert np.all(np.diff(scores, axis=1) <= 0)
+
+
+def test_ivf_recall_and_full_probe():
+    vectors = random_vectors(2000)
+    queries = random_vectors(50, seed=1)
+    index = IVFIndex.build(vectors, nlist=16)
+
+    exact_ids, _ = index.exact_search(queries, top_k=10)
+
+    # 扫描全部簇时与暴力检索一致，扫描一半簇时召回率仍然较高
+    assert np.array_equal(index.search(queries, top_k=10, nprobe=16)[0], exact_ids)
+    assert recall_at_k(index.search(queries, top_k=10, nprobe=8)[0], exact_ids) > 0.8
+    assert sorted(index.ids.tolist()) == list(range(len(vectors)))
+
+
+def test_ivf_pads_short_results(tmp_path):
+    index = IVFIndex.build(random_vectors(3), nlist=1)
+
+    ids, scores = index.search(random_vectors(1, seed=1), top_k=5)
+
+    assert list(ids[0, 3:]) == [-1, -1] and np.all(np.isinf(scores[0, 3:]))
+
+    path = tmp_path / "index.ivf.npz"
+    index.save(path, {"model": "a"})
+    assert np.array_equal(IVFIndex.load(path, {"model": "a"}).vectors, index.vectors)
+    assert IVFIndex.load(path, {"model": "b"}) is None
+
+
+# ==================== 混合检索 ====================
+
+class StaticRetriever(BaseRetriever):
+    """返回固定结果的检索器，记录收到的min_score"""
+
+    def __init__(self, hits, relevance_score=1.0):
+        self.hits = hits
+        self.relevance_score = relevance_score
+        self.min_scores = []
+
+    def search(self, query, top_k=3, min_score=0.0):
+        self.min_scores.append(min_score)
+        return [dict(hit) for hit in self.hits[:top_k]]
+
+
+class LengthReranker:
+    """按文本长度打分的重排序器"""
+
+    def score(self, query, texts):
+        return np.array([len(text) for text in texts], dtype=np.float32)
+
+
+def hit(name, content=None):
+    return {"source": name, "title": "", "content": content or name, "score": 1.0}
+
+
+def test_rrf_fusion():
+    lexical = StaticRetriever([hit("a"), hit("b"), hit("c")])
+    vector = StaticRetriever([hit("c"), hit("a"), hit("d")])
+    retriever = HybridRetriever(lexical, vector, rrf_k=60)
+
+    results = retriever.retrieve("q", top_k=4)
+
+    assert [item["source"] for item in results] == ["a", "c", "b", "d"]
+    assert results[0]["score"] == pytest.approx(1 / 61 + 1 / 62)
+    assert results[2]["score"] == pytest.approx(1 / 62)
+
+
+def test_min_score_is_scaled_per_retriever():
+    lexical = StaticRetriever([hit("a")], relevance_score=5.0)
+    vector = StaticRetriever([hit("b")], relevance_score=0.5)
+
+    HybridRetriever(lexical, vector).retrieve("q", min_score=2.0)
+
+    assert lexical.min_scores == [10.0] and vector.min_scores == [1.0]
+
+
+def test_rerank_within_budget():
+    lexical = StaticRetriever([hit("a", "短"), hit("b", "很长很长的内容")])
+    vector = StaticRetriever([])
+    retriever = HybridRetriever(lexical, vector, reranker=LengthReranker(), rerank_budget_ms=1e6)
+    timings = {}
+
+    results = retriever.retrieve("q", top_k=2, timings=timings)
+
+    assert [item["source"] for item in results] == ["b", "a"]
+    assert "rerank" in timings and retriever.rerank_ms_per_doc is not None
+
+
+def test_rerank_skipped_over_budget():
+    lexical = StaticRetriever([hit("a", "短"), hit("b", "很长很长的内容")])
+    retriever = HybridRetriever(lexical, StaticRetriever([]), reranker=LengthReranker(), rerank_budget_ms=50)
+    retriever.rerank_ms_per_doc = 100.0
+    timings = {}
+
+    results = retriever.retrieve("q", top_k=2, timings=timings)
+
+    assert [item["source"] for item in results] == ["a", "b"]
+    assert timings["rerank_skipped"] == 1.0
+    # 估计值衰减，之后会再次尝试重排序
+    assert retriever.rerank_ms_per_doc < 100.0
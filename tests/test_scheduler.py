@@ -0,0 +1,97 @@
+"""
+请求调度器测试（并发上限、排队上限和超时）
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+import pytest
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.api.scheduler import RequestScheduler, QueueFullError, QueueWaitTimeout, RequestTimeout
+
+
+def test_concurrency_is_bounded():
+    scheduler = RequestScheduler(max_concurrent=2, max_queue_size=10, timeout=5)
+    active, peak = [0], [0]
+    lock = threading.Lock()
+
+    def work():
+        with lock:
+            active[0] += 1
+            peak[0] = max(peak[0], active[0])
+        time.sleep(0.02)
+        with lock:
+            active[0] -= 1
+        return True
+
+    async def run():
+        return await asyncio.gather(*(scheduler.run(work) for _ in range(6)))
+
+    assert all(asyncio.run(run()))
+    assert peak[0] == 2
+    assert scheduler.stats()["completed"] == 6
+    assert scheduler.running == 0 and scheduler.waiting == 0
+
+
+def test_full_queue_is_rejected():
+    scheduler = RequestScheduler(max_concurrent=1, max_queue_size=1, timeout=5)
+
+    async def run():
+        await scheduler.acquire(time.monotonic() + 5)
+        waiter = asyncio.create_task(scheduler.acquire(time.monotonic() + 5))
+        await asyncio.sleep(0)
+
+        with pytest.raises(QueueFullError):
+            await scheduler.acquire(time.monotonic() + 5)
+
+        scheduler.release()
+        await waiter
+        scheduler.release()
+
+    asyncio.run(run())
+
+    assert scheduler.rejected == 1
+    assert scheduler.running == 0
+
+
+def test_queue_wait_timeout():
+    scheduler = RequestScheduler(max_concurrent=1, max_queue_size=5, timeout=0.05)
+
+    async def run():
+        async with scheduler.slot():
+            with pytest.raises(QueueWaitTimeout):
+                await scheduler.acquire(time.monotonic() + 0.05)
+
+    asyncio.run(run())
+
+    assert scheduler.timed_out == 1
+    assert scheduler.running == 0 and scheduler.waiting == 0
+
+
+def test_request_timeout_keeps_slot_until_work_finishes():
+    scheduler = RequestScheduler(max_concurrent=1, max_queue_size=5, timeout=0.05)
+    done = threading.Event()
+
+    async def run():
+        with pytest.raises(RequestTimeout):
+            await scheduler.run(lambda: done.wait(1))
+
+        # 工作线程仍在执行，名额未释放
+        assert scheduler.running == 1
+
+        done.set()
+        while scheduler.running:
+            await asyncio.sleep(0.01)
+
+    asyncio.run(run())
+
+    assert scheduler.timed_out == 1
+    assert scheduler.completed == 1
@@ -0,0 +1,121 @@
+"""
+全市场选股测试
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.panel_store import StockPanel
+from server.src.data.screener import StockScreener, ScreenExpression, ScreenerError
+from server.src.data.stock_analyzer import IndicatorSeries
+
+
+def make_frame(n: int, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 50 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame({
+        "date": pd.date_range("2024-01-01", periods=n, freq="D"),
+        "open": close,
+        "high": close + 1,
+        "low": close - 1,
+        "close": close,
+        "volume": rng.integers(1000, 5000, n),
+        "change_pct": rng.normal(0, 2, n),
+    })
+
+
+# 不同长度：覆盖MACD/RSI/均线数据不足的情况
+LENGTHS = {"A_000001": 300, "B_000002": 80, "C_000003": 30, "D_000004": 10}
+
+
+@pytest.fixture(scope="module")
+def screener():
+    frames = {key: make_frame(n, seed) for seed, (key, n) in enumerate(LENGTHS.items())}
+    return StockScreener(StockPanel.from_frames(frames))
+
+
+def series_for(screener, key) -> IndicatorSeries:
+    panel = screener.panel
+    sid = panel.stock_id(key)
+    return IndicatorSeries(*(panel.column(sid, name) for name in ("close", "high", "low", "volume")))
+
+
+@pytest.mark.parametrize("key", list(LENGTHS))
+def test_fields_match_indicator_series(screener, key):
+    series = series_for(screener, key)
+    sid = screener.panel.stock_id(key)
+
+    def check(field, expected):
+        actual = screener.field(field)[sid]
+        if expected is None:
+            assert np.isnan(actual)
+        else:
+            assert actual == pytest.approx(expected, abs=0.01)
+
+    ma = series.ma()
+    for period in (5, 10, 20, 60):
+        check(f"ma{period}", ma.get(f"MA{period}"))
+
+    macd = series.macd()
+    check("dif", macd and macd["DIF"])
+    check("dea", macd and macd["DEA"])
+
+    rsi = series.rsi()
+    check("rsi", rsi)
+
+    boll = series.boll()
+    check("boll_upper", boll and boll["upper"])
+
+
+def test_screen_filters_and_sorts(screener):
+    result = screener.screen(condition="close > 0", sort_by="change_pct", top_n=2)
+    change = screener.field("change_pct")
+    order = np.argsort(-change)
+
+    assert result.total == len(LENGTHS)
+    assert result.matched == len(LENGTHS)
+    assert result.keys == [screener.panel.keys[i] for i in order[:2]]
+    assert result.values["change_pct"] == pytest.approx(list(change[order[:2]]))
+
+
+def test_missing_values_sort_last(screener):
+    # D只有10天数据，没有20日均线
+    result = screener.screen(sort_by="ma20", ascending=True, top_n=10)
+
+    assert result.keys[-1] == "D_000004"
+    assert np.isnan(result.values["ma20"][-1])
+
+
+def test_condition_without_matches(screener):
+    result = screener.screen(condition="rsi > 1000")
+
+    assert result.matched == 0 and result.keys == []
+
+
+@pytest.mark.parametrize("source", [
+    "__import__('os').system('ls')",
+    "close.real > 1",
+    "foo > 1",
+    "change_1d > 0",
+    "close if rsi else 1",
+    "[close]",
+    "'a' < 'b'",
+])
+def test_expression_whitelist(source):
+    with pytest.raises(ScreenerError):
+        ScreenExpression(source)
+
+
+def test_expression_fields():
+    expression = ScreenExpression("RSI < 30 and abs(close - ma120) / ma120 < 0.1 and change_3d > -5")
+
+    assert expression.fields == {"rsi", "close", "ma120", "change_3d"}
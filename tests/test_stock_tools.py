@@ -0,0 +1,55 @@
+"""
+股票工具测试（结构化结果）
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.stock_loader import get_loader
+from server.src.tools import stock_tools
+from server.src.tools.results import HistoryResult, AnalysisResult, TextResult
+
+
+def test_history_does_not_reference_panel():
+    result = stock_tools.get_stock_history_func("比亚迪", days=5)
+    panel = get_loader().get_panel()
+
+    assert isinstance(result, HistoryResult)
+    assert len(result.close) == 5
+    for values in (result.dates, result.close, result.change_pct, result.volume):
+        assert not np.shares_memory(values, panel.columns["close"])
+        assert not np.shares_memory(values, panel.dates)
+
+
+def test_history_days_are_clamped():
+    assert len(stock_tools.get_stock_history_func("比亚迪", days=500).close) == stock_tools.HISTORY_MAX_DAYS
+    assert len(stock_tools.get_stock_history_func("比亚迪", days=0).close) == 1
+
+
+def test_analyze_stock():
+    result = stock_tools.analyze_stock_func("比亚迪")
+
+    assert isinstance(result, AnalysisResult)
+    assert result.latest.close == get_loader().get_latest_price("比亚迪")["close"]
+
+
+def test_analyze_stock_without_latest_price(monkeypatch):
+    # 指标查询之后数据被刷新、股票已不存在
+    monkeypatch.setattr(get_loader(), "get_latest_price", lambda stock: None)
+
+    result = stock_tools.analyze_stock_func("比亚迪")
+
+    assert isinstance(result, TextResult) and result.error
+
+
+def test_unknown_stock():
+    for func in (stock_tools.get_stock_history_func, stock_tools.analyze_stock_func):
+        result = func("不存在的股票")
+        assert isinstance(result, TextResult) and result.error
@@ -0,0 +1,64 @@
+"""
+股票名称解析测试
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from pathlib import Path
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.symbol_resolver import SymbolResolver, AhoCorasick
+
+
+KEYS = ["中国平安_601318", "平安银行_000001", "美的集团_000333", "贵州茅台_600519", "招商银行_600036", "京东方A_000725"]
+
+
+def names(resolver, text):
+    return [symbol.name for symbol in resolver.find_all(text)]
+
+
+def test_aho_corasick_finds_overlapping_patterns():
+    automaton = AhoCorasick()
+    for pattern in ("he", "she", "hers"):
+        automaton.add(pattern, pattern)
+
+    assert sorted(value for _, _, value in automaton.iter("ushers")) == ["he", "hers", "she"]
+
+
+def test_names_codes_and_aliases():
+    resolver = SymbolResolver.from_keys(KEYS)
+
+    assert names(resolver, "茅台和招行哪个好") == ["贵州茅台", "招商银行"]
+    assert names(resolver, "600519最新价格") == ["贵州茅台"]
+    assert names(resolver, "京东方走势") == ["京东方A"]
+    assert resolver.lookup("601318").name == "中国平安"
+
+
+def test_code_inside_longer_number_is_ignored():
+    resolver = SymbolResolver.from_keys(KEYS)
+
+    assert names(resolver, "订单号16005190") == []
+
+
+def test_prefix_alias_does_not_shadow_other_stock():
+    resolver = SymbolResolver.from_keys(KEYS)
+
+    assert names(resolver, "平安银行最新价格") == ["平安银行"]
+    assert names(resolver, "中国平安和平安银行对比") == ["中国平安", "平安银行"]
+
+
+def test_prefix_alias_without_the_other_stock():
+    resolver = SymbolResolver.from_keys(["中国平安_601318"])
+
+    assert names(resolver, "平安银行最新价格") == []
+
+
+def test_ordinary_words_are_not_stocks():
+    resolver = SymbolResolver.from_keys(KEYS)
+
+    assert names(resolver, "什么是完美的交易系统") == []
+    assert names(resolver, "甜美的回报") == []
+    assert names(resolver, "美的集团股价") == ["美的集团"]
@@ -0,0 +1,110 @@
+"""
+行情数据增量更新测试
+
+在项目根目录运行：python -m pytest tests
+"""
+
+import sys
+from datetime import date
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+# 添加项目路径
+sys.path.append(str(Path(__file__).parent.parent))
+
+from server.src.data.stock_loader import scan_stock_files
+from server.src.data.updater import BarFetcher, StockUpdater
+
+KEY = "测试股份_000001"
+END = date(2025, 1, 10)
+
+
+def make_bars(start: str, end: str, base: float = 10.0) -> pd.DataFrame:
+    dates = pd.bdate_range(start, end)
+    close = base + np.arange(len(dates), dtype=float)
+    return pd.DataFrame({
+        "date": dates.strftime("%Y-%m-%d"),
+        "open": close,
+        "close": close,
+        "high": close + 1,
+        "low": close - 1,
+        "volume": np.arange(len(dates)) * 100,
+        "change_pct": np.zeros(len(dates)),
+    })
+
+
+class FakeFetcher(BarFetcher):
+    """从内存中的DataFrame返回K线，记录每次请求的区间"""
+
+    def __init__(self, bars: pd.DataFrame):
+        self.bars = bars
+        self.calls = []
+
+    def fetch(self, code, start, end):
+        self.calls.append((start, end))
+        dates = self.bars["date"]
+        return self.bars[(dates >= start.isoformat()) & (dates <= end.isoformat())]
+
+
+def stored(data_dir: Path) -> pd.DataFrame:
+    files = scan_stock_files(data_dir)[KEY]
+    return pd.concat([pd.read_parquet(path) for path in files], ignore_index=True)
+
+
+def test_new_stock_writes_year_partitions(tmp_path):
+    fetcher = FakeFetcher(make_bars("2024-12-20", "2025-01-10"))
+
+    [result] = StockUpdater(tmp_path, fetcher).update([("测试股份", "000001")], end=END)
+
+    assert result.error is None and not result.full
+    assert result.added == len(fetcher.bars)
+    assert sorted(path.name for path in (tmp_path / KEY).iterdir()) == ["2024.parquet", "2025.parquet"]
+    assert list(stored(tmp_path)["date"]) == list(fetcher.bars["date"])
+
+
+def test_append_only_new_bars(tmp_path):
+    history = make_bars("2024-12-01", "2025-01-10")
+    history[history["date"] <= "2025-01-03"].assign(stock_name="测试股份", stock_code="000001") \
+        .to_parquet(tmp_path / f"{KEY}.parquet", index=False)
+    fetcher = FakeFetcher(history)
+
+    [result] = StockUpdater(tmp_path, fetcher).update([("测试股份", "000001")], end=END)
+
+    # 从已有的最后一天开始拉取，重叠的一条只用于校验
+    assert fetcher.calls == [(date(2025, 1, 3), END)]
+    assert result.added == 5 and not result.full
+    assert result.last_date == "2025-01-10"
+
+    data = stored(tmp_path)
+    assert data["date"].is_unique
+    assert list(data["date"]) == list(history["date"])
+
+
+def test_adjusted_history_is_rewritten(tmp_path):
+    make_bars("2024-12-01", "2025-01-03").to_parquet(tmp_path / f"{KEY}.parquet", index=False)
+    # 除权后历史价格整体调整
+    fetcher = FakeFetcher(make_bars("2024-12-01", "2025-01-10", base=5.0))
+
+    [result] = StockUpdater(tmp_path, fetcher, start=date(2024, 12, 1)).update([("测试股份", "000001")], end=END)
+
+    assert result.full
+    assert not (tmp_path / f"{KEY}.parquet").exists()
+    assert list(stored(tmp_path)["close"]) == list(fetcher.bars["close"])
+
+
+def test_up_to_date_and_errors(tmp_path):
+    make_bars("2025-01-01", "2025-01-10").to_parquet(tmp_path / f"{KEY}.parquet", index=False)
+
+    [result] = StockUpdater(tmp_path, FakeFetcher(make_bars("2025-01-01", "2025-01-10"))).update(
+        [("测试股份", "000001")], end=END
+    )
+    assert result.added == 0 and result.error is None
+
+    class BrokenFetcher(BarFetcher):
+        def fetch(self, code, start, end):
+            raise ConnectionError("network down")
+
+    [result] = StockUpdater(tmp_path, BrokenFetcher()).update([("测试股份", "000001")], end=END)
+    assert result.error == "network down"